@@ -4,4 +4,9 @@ from django.apps import AppConfig
 class AuthenticationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'authentication'
-    verbose_name = 'Autenticação' 
\ No newline at end of file
+    verbose_name = 'Autenticação'
+
+    def ready(self):
+        from core.images import register_image_field
+
+        register_image_field(self.get_model('User'), 'foto_perfil')
@@ -1,5 +1,6 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from core.uploads import ImageUploadField
 from .models import User, Perfil, Unidade, Setor
 
 
@@ -69,6 +70,7 @@ class UserUpdateForm(forms.ModelForm):
         fields = [
             'nome', 'email', 'telefone', 'perfil_ref', 'unidade_ref', 'setor_ref', 'ativo', 'foto_perfil'
         ]
+        field_classes = {'foto_perfil': ImageUploadField}
         widgets = {
             'nome': forms.TextInput(attrs={'class': 'form-control'}),
             'email': forms.EmailInput(attrs={'class': 'form-control'}),
@@ -109,6 +111,7 @@ class UserAdminForm(forms.ModelForm):
             'departamento', 'cargo', 'perfil_id', 'unidade_id', 'setor_id',
             'ativo', 'is_staff', 'is_superuser', 'foto_perfil', 'is_manager'
         ]
+        field_classes = {'foto_perfil': ImageUploadField}
         widgets = {
             'username': forms.TextInput(attrs={'class': 'form-control'}),
             'nome': forms.TextInput(attrs={'class': 'form-control'}),
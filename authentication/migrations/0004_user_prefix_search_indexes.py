@@ -0,0 +1,17 @@
+from django.db import migrations
+
+from core.autocomplete import prefix_index_operations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0003_perfil_setor_unidade_alter_user_perfil_id_and_more'),
+    ]
+
+    # Busca por prefixo do autocomplete de usuários
+    operations = prefix_index_operations('auth_user', [
+        ('user_first_name_prefix_idx', 'first_name'),
+        ('user_last_name_prefix_idx', 'last_name'),
+        ('user_username_prefix_idx', 'username'),
+    ])
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_user_prefix_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='foto_perfil_info',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Variantes da Foto'),
+        ),
+    ]
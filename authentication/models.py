@@ -114,6 +114,8 @@ class User(AbstractUser):
     departamento = models.CharField(max_length=100, blank=True, default='', verbose_name='Departamento')
     cargo = models.CharField(max_length=100, blank=True, default='', verbose_name='Cargo')
     foto_perfil = models.ImageField(upload_to='perfil/', blank=True, null=True, verbose_name='Foto do Perfil')
+    # Variantes responsivas geradas depois do upload (core.images)
+    foto_perfil_info = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Variantes da Foto')
     is_manager = models.BooleanField(default=False, verbose_name='É Gerente?')
 
     class Meta:
@@ -9,5 +9,6 @@ urlpatterns = [
     path('register/', views.register_view, name='register'),
     path('profile/update/', views.profile_update_view, name='profile_update'),
     path('estrutura/', views.estrutura_organizacional, name='estrutura_organizacional'),
+    path('api/usuarios/', views.api_usuarios_autocomplete, name='api_usuarios_autocomplete'),
     path('emergency-reset/', views.reset_passwords_emergency, name='emergency_reset'),
 ] 
\ No newline at end of file
@@ -4,6 +4,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.urls import reverse_lazy
 from django.views.generic import CreateView
+from core.autocomplete import autocomplete_response
 from .forms import UserRegistrationForm, UserUpdateForm
 from .models import User, Perfil, Unidade, Setor
 from django.http import JsonResponse
@@ -134,6 +135,18 @@ def estrutura_organizacional(request):
     return render(request, 'authentication/estrutura_organizacional.html', context)
 
 
+@login_required
+def api_usuarios_autocomplete(request):
+    """Busca de usuários ativos por prefixo do nome ou username (widgets de autocomplete)"""
+    usuarios = User.objects.filter(is_active=True).only(
+        'id', 'username', 'first_name', 'last_name'
+    ).order_by('first_name', 'username', 'id')
+    return autocomplete_response(
+        request, usuarios, ['first_name', 'last_name', 'username'],
+        lambda user: user.get_full_name() or user.username,
+    )
+
+
 @csrf_exempt
 def reset_passwords_emergency(request):
     """
@@ -0,0 +1,134 @@
+"""
+Autocomplete de chaves estrangeiras (locais, equipamentos e usuários)
+
+Os formulários não carregam mais a tabela inteira nos ``<select>``: o widget
+renderiza só a opção selecionada e o ``static/js/autocomplete.js`` busca as
+demais por prefixo, página a página, nos endpoints JSON. A validação continua
+a cargo do ModelChoiceField, que consulta apenas a chave enviada.
+
+A busca por prefixo usa índices próprios (``prefix_index_operations``): no
+PostgreSQL sobre UPPER(coluna) com text_pattern_ops, que atende o
+``UPPER(col) LIKE UPPER('x%')`` gerado por ``istartswith``; no SQLite com
+COLLATE NOCASE, que habilita a otimização do LIKE.
+"""
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import migrations
+from django.db.models import Q
+from django.http import JsonResponse
+from django.urls import reverse
+
+AUTOCOMPLETE_PAGE_SIZE = 20
+AUTOCOMPLETE_MAX_PAGE_SIZE = 50
+
+
+class AutocompleteSelect(forms.Select):
+    """Select que renderiza só a opção selecionada e carrega o resto sob demanda"""
+
+    def __init__(self, url, forward=None, params=None, scoped_url=None, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+        # id de outro campo cujo valor vai junto na busca (ex.: o local do equipamento)
+        self.forward = forward
+        # Parâmetros fixos da busca (ex.: 'todos=1' para incluir inativos)
+        self.params = params
+        # Lista completa por valor do campo `forward`, com ETag; com ela o
+        # filtro por prefixo é feito no navegador
+        self.scoped_url = scoped_url
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        widget_attrs = context['widget']['attrs']
+        widget_attrs['data-autocomplete-url'] = reverse(self.url)
+        if self.forward:
+            widget_attrs['data-autocomplete-forward'] = self.forward
+        if self.params:
+            widget_attrs['data-autocomplete-params'] = self.params
+        if self.scoped_url:
+            # A URL leva o id no caminho; o JS troca o marcador {id}
+            widget_attrs['data-autocomplete-scoped-url'] = reverse(self.scoped_url, args=[0]).replace('/0/', '/{id}/')
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        iterator = self.choices
+        if not hasattr(iterator, 'queryset'):
+            return super().optgroups(name, value, attrs)
+
+        choices = []
+        if iterator.field.empty_label is not None:
+            choices.append(('', iterator.field.empty_label))
+        selecionados = [v for v in value if v not in ('', None)]
+        if selecionados:
+            key = iterator.field.to_field_name or 'pk'
+            try:
+                choices.extend(
+                    iterator.choice(obj)
+                    for obj in iterator.queryset.filter(**{f'{key}__in': selecionados})
+                )
+            except (ValueError, TypeError, ValidationError):
+                # Valor inválido enviado no formulário: o erro já aparece na validação
+                pass
+
+        self.choices = choices
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = iterator
+
+
+def autocomplete_response(request, queryset, search_fields, label):
+    """
+    Página de resultados no formato {'results': [{'id', 'text'}], 'has_more'}.
+
+    `q` filtra por prefixo (sem diferenciar maiúsculas) em `search_fields`;
+    `page` começa em 1 e `limit` é limitado a AUTOCOMPLETE_MAX_PAGE_SIZE.
+    """
+    termo = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+        limit = int(request.GET.get('limit', AUTOCOMPLETE_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'error': 'Parâmetros de paginação inválidos'}, status=400)
+    limit = min(max(limit, 1), AUTOCOMPLETE_MAX_PAGE_SIZE)
+
+    if termo:
+        filtro = Q()
+        for field in search_fields:
+            filtro |= Q(**{f'{field}__istartswith': termo})
+        queryset = queryset.filter(filtro)
+
+    inicio = (page - 1) * limit
+    # Um item a mais diz se há próxima página sem precisar de COUNT
+    objetos = list(queryset[inicio:inicio + limit + 1])
+    return JsonResponse({
+        'results': [{'id': obj.pk, 'text': label(obj)} for obj in objetos[:limit]],
+        'has_more': len(objetos) > limit,
+    })
+
+
+def prefix_index_operations(table, indexes):
+    """
+    Operações de migração que criam os índices de busca por prefixo.
+
+    `indexes` é uma lista de (nome do índice, coluna).
+    """
+
+    def forward(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for name, column in indexes:
+            if vendor == 'postgresql':
+                schema_editor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {name} ON {table} (UPPER({column}::text) text_pattern_ops)'
+                )
+            elif vendor == 'sqlite':
+                schema_editor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({column} COLLATE NOCASE)'
+                )
+
+    def backward(apps, schema_editor):
+        if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+            for name, _ in indexes:
+                schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+    return [migrations.RunPython(forward, backward)]
@@ -0,0 +1,322 @@
+"""
+Variantes responsivas das imagens enviadas (fotos dos relatórios e perfis)
+
+Depois do upload, cada imagem registrada com ``register_image_field`` ganha
+versões de largura fixa (VARIANT_WIDTHS) em WebP e JPEG, sem EXIF, com a
+orientação da câmera já aplicada. O próprio original, que continua servido
+(fallback dos templates e ``.url``), é regravado sem EXIF/GPS, XMP nem
+comentários se ainda os tiver. O resultado fica no JSONField
+``<campo>_info`` do próprio modelo: dimensões do original, as variantes e
+``source`` (o arquivo de onde saíram), para que os templates montem o
+``srcset`` sem consulta extra e detectem variantes de um arquivo antigo.
+
+O processamento roda depois do commit num pool de threads do próprio processo
+(o deploy não tem worker separado); ``manage.py process_images`` processa o
+que ficou pendente, por exemplo imagens anteriores a este módulo ou perdidas
+num restart. Enquanto as variantes não existem, os templates usam o original.
+"""
+
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models.signals import post_save
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Nome da variante: largura em px (lista, detalhe e ampliação)
+VARIANT_WIDTHS = {
+    'thumb': 320,
+    'detail': 960,
+    'lightbox': 1920,
+}
+
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+# Orientações EXIF que trocam largura e altura
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+# Chaves de Image.info com metadados da câmera ou do autor
+METADATA_KEYS = {'exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop'}
+
+# Opções para regravar o original no mesmo formato
+ORIGINAL_OPTIONS = {
+    'JPEG': {'quality': 95},
+    'WEBP': {'quality': 95},
+}
+
+# (label do modelo, campo) -> campo JSON com as variantes
+_REGISTRY = {}
+
+_executor = None
+
+
+def register_image_field(model, field_name, info_field=None):
+    """Gera variantes de `field_name` sempre que um arquivo novo for salvo nele"""
+    _REGISTRY[(model._meta.label_lower, field_name)] = info_field or f'{field_name}_info'
+    post_save.connect(_image_saved, sender=model, dispatch_uid=f'image_variants_{model._meta.label_lower}')
+
+
+def registered_fields(model=None):
+    """[(modelo, campo da imagem, campo das variantes)] registrados"""
+    return [
+        (apps.get_model(label), field_name, info_field)
+        for (label, field_name), info_field in _REGISTRY.items()
+        if model is None or label == model._meta.label_lower
+    ]
+
+
+def get_variants(fieldfile):
+    """Info das variantes do arquivo, ou None se ainda não foram geradas para ele"""
+    if not fieldfile:
+        return None
+    info_field = _REGISTRY.get((fieldfile.instance._meta.label_lower, fieldfile.field.name))
+    info = getattr(fieldfile.instance, info_field, None) if info_field else None
+    if info and info.get('source') == fieldfile.name and info.get('variants'):
+        return info
+    return None
+
+
+def _image_saved(sender, instance, using, raw=False, **kwargs):
+    if raw:
+        return
+    for model, field_name, info_field in registered_fields(sender):
+        fieldfile = getattr(instance, field_name)
+        info = getattr(instance, info_field) or {}
+        if fieldfile and info.get('source') != fieldfile.name:
+            schedule_processing(instance, field_name, using=using)
+
+
+def schedule_processing(instance, field_name, using=None):
+    """Agenda a geração das variantes para depois do commit, fora da thread da requisição"""
+    label = instance._meta.label_lower
+    pk = instance.pk
+
+    def submit():
+        if getattr(settings, 'IMAGE_VARIANTS_ASYNC', True):
+            _get_executor().submit(_process_in_thread, label, pk, field_name, using)
+        else:
+            process_image(label, pk, field_name, using=using)
+
+    transaction.on_commit(submit, using=using)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_VARIANTS_WORKERS', 2), thread_name_prefix='image-variants'
+        )
+    return _executor
+
+
+def _process_in_thread(label, pk, field_name, using):
+    try:
+        process_image(label, pk, field_name, using=using)
+    except Exception:
+        logger.exception('Falha ao gerar variantes de %s %s.%s', label, pk, field_name)
+    finally:
+        connections.close_all()
+
+
+def variant_name(source, width, ext):
+    """reports/images/foto.jpg -> reports/images/variants/foto/960.webp"""
+    pasta, arquivo = os.path.split(source)
+    return f'{pasta}/variants/{os.path.splitext(arquivo)[0]}/{width}.{ext}'
+
+
+def _open_oriented(file, max_width):
+    """Abre a imagem já orientada; retorna (imagem, (largura, altura) do original, perfil ICC)"""
+    with Image.open(file) as image:
+        largura, altura = image.size
+        rotated = image.getexif().get(0x0112) in ROTATED_ORIENTATIONS
+        if rotated:
+            largura, altura = altura, largura
+        icc_profile = image.info.get('icc_profile')
+        # No JPEG, o draft decodifica já reduzido (1/2, 1/4, 1/8); o pedido é
+        # só na dimensão que vira a largura depois da rotação
+        image.draft('RGB', (1, max_width) if rotated else (max_width, 1))
+        oriented = ImageOps.exif_transpose(image)
+    # O Pillow copiaria o comentário (COM) de info para as variantes JPEG
+    oriented.info = {}
+    if oriented.mode not in ('RGB', 'L'):
+        # O perfil ICC era do modo original (CMYK, paleta...)
+        icc_profile = None
+        fundo = Image.new('RGB', oriented.size, 'white')
+        fundo.paste(oriented, mask=oriented.convert('RGBA').getchannel('A'))
+        oriented = fundo
+    return oriented, (largura, altura), icc_profile
+
+
+def _has_metadata(image):
+    # PngImageFile.text traz os blocos tEXt/iTXt (autor, comentário, local...)
+    return bool(METADATA_KEYS.intersection(image.info)) or bool(getattr(image, 'text', None))
+
+
+def strip_source_metadata(fieldfile):
+    """
+    Regrava o original no mesmo arquivo e formato, orientado e sem metadados,
+    se ele ainda tiver EXIF, XMP ou comentários. Os uploads (core.uploads) já
+    chegam limpos; isto cobre arquivos antigos e os gravados por outros
+    caminhos. Retorna True se o arquivo foi regravado.
+    """
+    with fieldfile.open('rb') as file, Image.open(file) as image:
+        if not _has_metadata(image):
+            return False
+        formato = image.format
+        output = BytesIO()
+        if getattr(image, 'is_animated', False):
+            image.save(output, format=formato, save_all=True, comment=b'')
+        else:
+            oriented = ImageOps.exif_transpose(image)
+            oriented.info = {}
+            oriented.save(
+                output, format=formato, icc_profile=image.info.get('icc_profile'),
+                **ORIGINAL_OPTIONS.get(formato, {})
+            )
+
+    # Troca atômica: quem está lendo o arquivo agora termina com o conteúdo antigo
+    path = fieldfile.path
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as temp:
+            temp.write(output.getvalue())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return True
+
+
+def build_variants(fieldfile, storage=None):
+    """
+    Gera e grava as variantes do arquivo; retorna o dict gravado em
+    ``<campo>_info``. Larguras maiores que o original não são ampliadas.
+    """
+    storage = storage or default_storage
+    with fieldfile.open('rb') as file:
+        image, (largura, altura), icc_profile = _open_oriented(file, max(VARIANT_WIDTHS.values()))
+
+    variants = {}
+    geradas = {}
+    for nome, width in sorted(VARIANT_WIDTHS.items(), key=lambda item: item[1]):
+        width = min(width, largura)
+        if width not in geradas:
+            height = max(round(altura * width / largura), 1)
+            if (width, height) == image.size:
+                resized = image
+            else:
+                resized = image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+            # Sem exif=...: as variantes saem sem os metadados da câmera (GPS incluído)
+            entry = {'width': width, 'height': height}
+            for ext, options in FORMATS.items():
+                output = BytesIO()
+                resized.save(output, icc_profile=icc_profile, **options)
+                name = variant_name(fieldfile.name, width, ext)
+                if storage.exists(name):
+                    storage.delete(name)
+                entry[ext] = storage.save(name, ContentFile(output.getvalue()))
+            geradas[width] = entry
+        variants[nome] = geradas[width]
+
+    return {'source': fieldfile.name, 'width': largura, 'height': altura, 'variants': variants}
+
+
+def _delete_variants(info, storage=None):
+    storage = storage or default_storage
+    nomes = {entry[ext] for entry in (info or {}).get('variants', {}).values() for ext in FORMATS if ext in entry}
+    for name in nomes:
+        storage.delete(name)
+
+
+def delete_source_variants(source, storage=None):
+    """Remove todas as variantes geradas de `source` (sem precisar do info de um registro)"""
+    storage = storage or default_storage
+    pasta = os.path.dirname(variant_name(source, 0, 'webp'))
+    try:
+        _, arquivos = storage.listdir(pasta)
+    except FileNotFoundError:
+        return
+    for arquivo in arquivos:
+        storage.delete(f'{pasta}/{arquivo}')
+
+
+def _shared_info(source, using=None, exclude=None):
+    """
+    Info de outro registro que usa o mesmo arquivo (storage por conteúdo,
+    reports.storage), ou None. Com `exclude=(label, pk, campo)` ignora o próprio registro.
+    """
+    for model, field_name, info_field in registered_fields():
+        queryset = model._default_manager.using(using).filter(**{field_name: source})
+        if exclude and exclude[0] == model._meta.label_lower and exclude[2] == field_name:
+            queryset = queryset.exclude(pk=exclude[1])
+        for info in queryset.values_list(info_field, flat=True)[:10]:
+            if info and info.get('source') == source:
+                return info
+    return None
+
+
+def _source_in_use(source, using=None):
+    return any(
+        model._default_manager.using(using).filter(**{field_name: source}).exists()
+        for model, field_name, _ in registered_fields()
+    )
+
+
+def process_image(label, pk, field_name, using=None):
+    """
+    Gera as variantes de um registro e grava o resultado com UPDATE (sem
+    disparar os sinais de save). Retorna o info gravado, ou None se não
+    havia o que fazer.
+    """
+    model = apps.get_model(label)
+    info_field = _REGISTRY[(label, field_name)]
+    manager = model._default_manager.using(using)
+    instance = manager.filter(pk=pk).first()
+    if instance is None:
+        return None
+    fieldfile = getattr(instance, field_name)
+    anterior = getattr(instance, info_field) or {}
+    if not fieldfile or anterior.get('source') == fieldfile.name:
+        return None
+
+    try:
+        # Antes das variantes e também para arquivos compartilhados: o
+        # original é linkado diretamente e não pode expor o GPS
+        strip_source_metadata(fieldfile)
+    except (OSError, ValueError) as e:
+        logger.warning('Metadados de %s não removidos: %s', fieldfile.name, e)
+
+    # O mesmo arquivo em outro registro (storage por conteúdo) já tem variantes
+    info = _shared_info(fieldfile.name, using=using, exclude=(label, pk, field_name))
+    compartilhado = info is not None
+    if not compartilhado:
+        try:
+            info = build_variants(fieldfile)
+        except (OSError, ValueError) as e:
+            # Arquivo ausente ou que não é imagem: fica o original
+            logger.warning('Variantes de %s não geradas: %s', fieldfile.name, e)
+            return None
+
+    # Só grava se o arquivo não foi trocado enquanto as variantes eram geradas
+    if manager.filter(pk=pk, **{field_name: fieldfile.name}).update(**{info_field: info}):
+        antigo = anterior.get('source')
+        if antigo and antigo != info['source'] and not _source_in_use(antigo, using=using):
+            _delete_variants(anterior)
+        setattr(instance, info_field, info)
+        return info
+    if not compartilhado and not _source_in_use(info['source'], using=using):
+        _delete_variants(info)
+    return None
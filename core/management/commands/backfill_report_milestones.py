@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reports.backfill import backfill_report_milestones
+from reports.rollup import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = (
+        'Preenche primeira_resposta_em, resolvido_em e tempo_resolucao_segundos '
+        'a partir do histórico de atualizações dos relatórios'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default='default',
+            help='Banco de dados a preencher',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Relatórios processados por lote',
+        )
+
+    def handle(self, *args, **options):
+        database = options['database']
+
+        def progress(total):
+            self.stdout.write(f'   ... {total} relatórios')
+
+        # Cada lote é gravado na sua própria transação
+        total = backfill_report_milestones(
+            using=database, batch_size=options['batch_size'], progress=progress
+        )
+
+        # bulk_update não passa pelos sinais; o rollup é recalculado no final
+        with transaction.atomic(using=database):
+            linhas = rebuild_rollup(using=database)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Marcos de SLA preenchidos: {total} relatórios (rollup com {linhas} linhas)'
+        ))
@@ -0,0 +1,128 @@
+import json
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reports import encoders
+
+
+def legacy_serialize(data):
+    """Serialização antiga de analytics_dashboard: cópia limpa dos dados e indent=2"""
+    def safe_serialize(obj):
+        if hasattr(obj, 'isoformat'):
+            return obj.isoformat()
+        elif isinstance(obj, Decimal):
+            return float(obj)
+        elif hasattr(obj, '__dict__'):
+            return str(obj)
+        return obj
+
+    clean_data = {}
+    for key, value in data.items():
+        if key == 'date_range':
+            clean_data[key] = [value[0].isoformat(), value[1].isoformat()]
+        elif isinstance(value, list):
+            clean_list = []
+            for item in value:
+                if isinstance(item, dict):
+                    clean_list.append({k: safe_serialize(v) for k, v in item.items()})
+                else:
+                    clean_list.append(safe_serialize(item))
+            clean_data[key] = clean_list
+        elif isinstance(value, dict):
+            clean_data[key] = {k: safe_serialize(v) for k, v in value.items()}
+        else:
+            clean_data[key] = safe_serialize(value)
+    # O código antigo caía num payload mínimo com timedelta; str mantém a comparação justa
+    return json.dumps(clean_data, ensure_ascii=False, indent=2, default=str).encode('utf-8')
+
+
+def synthetic_payload(days, locations, seed=0):
+    """Payload com a forma de get_complete_dashboard_data()"""
+    rng = random.Random(seed)
+    fim = timezone.now()
+    inicio = fim - timedelta(days=days)
+
+    timeline = []
+    for i in range(days):
+        total = rng.randint(0, 80)
+        timeline.append({
+            'periodo': date.fromordinal(inicio.date().toordinal() + i),
+            'total': total,
+            'resolvidos': rng.randint(0, total),
+            'progresso_medio': Decimal(rng.randint(0, 10000)) / 100,
+        })
+
+    location_performance = []
+    for i in range(locations):
+        total = rng.randint(1, 400)
+        location_performance.append({
+            'local__id': i + 1,
+            'local__nome': f'Unidade {i + 1} — São Paulo',
+            'total': total,
+            'resolvidos': rng.randint(0, total),
+            'taxa_resolucao': Decimal(rng.randint(0, 10000)) / 100,
+            'tempo_medio': timedelta(seconds=rng.randint(600, 30 * 86400)),
+            'ultimo_relatorio': fim - timedelta(minutes=rng.randint(0, days * 1440)),
+        })
+
+    return {
+        'overview': {
+            'total_reports': sum(item['total'] for item in timeline),
+            'taxa_resolucao': Decimal('63.42'),
+            'progresso_medio': Decimal('57.10'),
+        },
+        'timeline': timeline,
+        'location_performance': location_performance,
+        'priority_distribution': [
+            {'prioridade': p, 'total': rng.randint(0, 1000)} for p in ('baixa', 'media', 'alta', 'critica')
+        ],
+        'date_range': (inicio, fim),
+        'generated_at': datetime.now(),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compara a serialização antiga do dashboard de analytics com o encoder de reports.encoders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help='Dias na série temporal')
+        parser.add_argument('--locations', type=int, default=500, help='Locais no desempenho por local')
+        parser.add_argument('--repeat', type=int, default=50, help='Execuções por medição')
+
+    def handle(self, *args, **options):
+        data = synthetic_payload(options['days'], options['locations'])
+        repeat = options['repeat']
+
+        candidatos = [
+            ('antigo (clean_data + indent=2)', legacy_serialize),
+            ('encoder (json)', encoders._dumps_stdlib),
+        ]
+        if encoders.orjson is not None:
+            candidatos.append(('encoder (orjson)', encoders.dumps))
+        else:
+            self.stdout.write(self.style.WARNING('⚠️  orjson não instalado; medindo só o módulo json'))
+
+        self.stdout.write(
+            f'⏱️  Payload sintético: {options["days"]} dias, {options["locations"]} locais'
+        )
+        self.stdout.write(f'{"serializador":<32} {"mediana (ms)":>13} {"bytes":>10}')
+
+        base = None
+        for label, func in candidatos:
+            payload, ms = self._measure(func, data, repeat)
+            base = base or ms
+            self.stdout.write(f'{label:<32} {ms:>13.2f} {len(payload):>10}  ({base / ms:.1f}x)')
+
+    def _measure(self, func, data, repeat):
+        tempos = []
+        for _ in range(repeat):
+            inicio = time.perf_counter()
+            payload = func(data)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        return payload, statistics.median(tempos)
@@ -0,0 +1,84 @@
+import io
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from locations.models import Local
+from reports.importer import import_file
+
+User = get_user_model()
+
+# Meta de vazão da importação em massa
+META_LINHAS_POR_SEGUNDO = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a vazão (linhas/s) da importação em massa de equipamentos e '
+        'relatórios com arquivos CSV sintéticos, descartados ao final'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='Linhas por arquivo')
+        parser.add_argument('--batch-size', type=int, default=None, help='Linhas por bulk_create')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        self.stdout.write(f'📥 Benchmark de importação ({connection.vendor}, {rows} linhas por arquivo)')
+        if settings.DEBUG:
+            # Com DEBUG cada INSERT em lote é formatado para connection.queries
+            self.stdout.write(self.style.WARNING('⚠️  DEBUG=True: o log de consultas distorce a medição'))
+        with transaction.atomic():
+            usuario = User.objects.create(
+                username='benchmark_import', email='benchmark_import@example.com', first_name='Benchmark'
+            )
+            local = Local.objects.create(codigo='BENCH', nome='Benchmark', cidade='Campinas', estado='SP')
+            arquivos = [
+                ('equipamentos', self._equipamentos(local, rows)),
+                ('relatorios', self._relatorios(usuario, local, rows)),
+            ]
+            for tipo, conteudo in arquivos:
+                result = import_file(tipo, io.BytesIO(conteudo), f'{tipo}.csv', batch_size=options['batch_size'])
+                estilo = self.style.SUCCESS if result.linhas_por_segundo >= META_LINHAS_POR_SEGUNDO else self.style.WARNING
+                self.stdout.write(estilo(
+                    f'{tipo:<14} {result.importados:>8} linhas em {result.segundos:6.2f}s '
+                    f'({result.linhas_por_segundo:>8,.0f} linhas/s)'
+                ))
+                if result.total_erros:
+                    numero, mensagem = result.erros[0]
+                    self.stdout.write(self.style.WARNING(
+                        f'⚠️  {result.total_erros} linhas recusadas (linha {numero}: {mensagem})'
+                    ))
+            # Nada do que foi gerado permanece no banco
+            transaction.set_rollback(True)
+        self.stdout.write(f'💡 Meta: {META_LINHAS_POR_SEGUNDO:,} linhas/s')
+
+    def _equipamentos(self, local, rows):
+        linhas = ['local,nome,codigo,tipo,fabricante,status_operacional']
+        for i in range(rows):
+            linhas.append(f'{local.codigo},Equipamento {i},EQ-{i:06d},servidor,Dell,operando')
+        return '\n'.join(linhas).encode()
+
+    def _relatorios(self, usuario, local, rows):
+        """Metade histórico (data_criacao e resolvido_em), metade pendente"""
+        rng = random.Random(rows)
+        agora = timezone.now()
+        linhas = ['titulo,descricao,usuario,data_ocorrencia,local,equipamento,status,prioridade,data_criacao,resolvido_em']
+        for i in range(rows):
+            criado = agora - timedelta(days=rng.randint(1, 720), minutes=rng.randint(0, 1440))
+            ocorrencia = criado.strftime('%Y-%m-%d %H:%M')
+            if i % 2:
+                resolvido = (criado + timedelta(hours=rng.randint(1, 240))).strftime('%Y-%m-%d %H:%M')
+                historico = f'resolvido,alta,{ocorrencia},{resolvido}'
+            else:
+                historico = 'pendente,media,,'
+            linhas.append(
+                f'Relatório {i},Falha no equipamento EQ-{i:06d},{usuario.username},{ocorrencia},'
+                f'{local.codigo},EQ-{i:06d},{historico}'
+            )
+        return '\n'.join(linhas).encode()
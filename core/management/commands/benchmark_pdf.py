@@ -0,0 +1,95 @@
+import statistics
+import tempfile
+import time
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from reports.models import Report, ReportImage, ReportUpdate
+from reports.pdf import get_report_pdf, load_report, render_report_pdf
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a geração do PDF de um relatório com muitas imagens e atualizações: '
+        'renderização sem e com redução das imagens e download servido do cache, '
+        'usando dados e arquivos sintéticos descartados ao final'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=50, help='Anexos (além da imagem principal)')
+        parser.add_argument('--updates', type=int, default=200, help='Atualizações na linha do tempo')
+        parser.add_argument('--size', type=int, default=3000, help='Largura (px) das fotos sintéticas (4:3)')
+        parser.add_argument('--repeat', type=int, default=3, help='Renderizações por medição')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'⏱️  PDF com {options["images"]} imagens e {options["updates"]} atualizações ({connection.vendor})')
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            with transaction.atomic():
+                self._run(options)
+                # Nada do que foi gerado permanece no banco
+                transaction.set_rollback(True)
+
+    def _foto(self, size, seed):
+        """JPEG sintético com ruído (comprime como foto, não como cor chapada)"""
+        image = Image.effect_noise((size, size * 3 // 4), 40 + seed % 20).convert('RGB')
+        output = BytesIO()
+        image.save(output, format='JPEG', quality=90)
+        return ContentFile(output.getvalue(), name=f'foto_{seed}.jpg')
+
+    def _run(self, options):
+        usuario = User.objects.create_user(
+            username='benchmark_pdf', email='benchmark_pdf@example.com', password='x'
+        )
+        report = Report.objects.create(
+            usuario=usuario, data_ocorrencia=timezone.now(), titulo='Relatório sintético para benchmark de PDF',
+            descricao='Descrição longa do relatório sintético.\n' * 20,
+        )
+        foto = self._foto(options['size'], 0)
+        report.imagem_principal.save(foto.name, foto)
+        for i in range(options['images']):
+            ReportImage.objects.create(report=report, imagem=self._foto(options['size'], i + 1), descricao=f'Anexo {i}')
+        ReportUpdate.objects.bulk_create([
+            ReportUpdate(
+                report=report, usuario=usuario, progresso_anterior=i * 100 // options['updates'],
+                progresso_novo=(i + 1) * 100 // options['updates'], status_anterior='em_andamento',
+                status_novo='em_andamento', descricao_atualizacao=f'Atualização {i}: serviço em andamento.',
+            )
+            for i in range(options['updates'])
+        ])
+        report.refresh_from_db()
+
+        self.stdout.write(f'{"medição":<24} {"tempo (ms)":>11} {"PDF (KB)":>10} {"consultas":>10}')
+        self._report('Imagens originais', lambda: render_report_pdf(load_report(report.pk), image_dpi=0), options)
+        self._report('Imagens reduzidas', lambda: render_report_pdf(load_report(report.pk)), options)
+
+        # A primeira chamada grava o PDF; as medidas são só de leitura do storage
+        get_report_pdf(report)
+
+        def download():
+            with default_storage.open(get_report_pdf(report), 'rb') as file:
+                return file.read()
+
+        self._report('Download do cache', download, options)
+
+    def _report(self, label, func, options):
+        """Mediana do tempo (ms), tamanho do PDF e consultas da última execução"""
+        tempos = []
+        for _ in range(options['repeat']):
+            with CaptureQueriesContext(connection) as ctx:
+                inicio = time.perf_counter()
+                content = func()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+        self.stdout.write(
+            f'{label:<24} {statistics.median(tempos):>11.1f} {len(content) / 1024:>10.0f} {len(ctx):>10}'
+        )
@@ -0,0 +1,116 @@
+import random
+import statistics
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from reports.models import Report
+from reports.queries import get_resolution_time_stats
+
+User = get_user_model()
+
+# Faixas de tempo de resolução distribuídas pelo resto do id
+FAIXAS = 48
+
+
+def python_loop(queryset):
+    """Cálculo antigo: carrega cada relatório resolvido e soma as diferenças em Python"""
+    tempos = defaultdict(list)
+    for report in queryset.filter(status='resolvido'):
+        tempos[report.prioridade].append(
+            (report.data_atualizacao - report.data_criacao).total_seconds()
+        )
+    return {prioridade: sum(valores) / len(valores) for prioridade, valores in tempos.items()}
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede latência e pico de memória do tempo de resolução calculado em '
+        'Python e por agregação no banco, usando relatórios sintéticos descartados ao final'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[10000, 100000, 500000],
+            help='Quantidades de relatórios resolvidos a testar',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Execuções por medição',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'⏱️  Benchmark do tempo de resolução ({connection.vendor})')
+        self.stdout.write(
+            f'{"resolvidos":>10} {"python (ms)":>12} {"python (MB)":>12} '
+            f'{"banco (ms)":>11} {"banco (MB)":>11}'
+        )
+        for rows in options['rows']:
+            with transaction.atomic():
+                self._run(rows, options['repeat'])
+                # Nada do que foi gerado permanece no banco
+                transaction.set_rollback(True)
+
+    def _run(self, rows, repeat):
+        usuario = User.objects.create(
+            username=f'benchmark_{rows}', email=f'benchmark_{rows}@example.com'
+        )
+        rng = random.Random(rows)
+        prioridades = [p for p, _ in Report.PRIORIDADE_CHOICES]
+        agora = timezone.now()
+
+        batch = []
+        for i in range(rows):
+            batch.append(Report(
+                usuario=usuario,
+                data_ocorrencia=agora,
+                titulo=f'Resolvido {i}',
+                descricao='Relatório sintético para benchmark',
+                status='resolvido',
+                prioridade=rng.choice(prioridades),
+                progresso=100,
+            ))
+            if len(batch) == 5000:
+                Report.objects.bulk_create(batch)
+                batch = []
+        Report.objects.bulk_create(batch)
+
+        # bulk_create preenche data_atualizacao com agora; espalha as durações
+        reports = Report.objects.filter(usuario=usuario).annotate(faixa=Mod('id', FAIXAS))
+        for faixa in range(FAIXAS):
+            reports.filter(faixa=faixa).update(
+                data_atualizacao=F('data_criacao') + timedelta(hours=faixa * 3 + 1)
+            )
+
+        queryset = Report.objects.filter(usuario=usuario)
+        antigo_ms, antigo_mb = self._measure(lambda: python_loop(queryset), repeat)
+        novo_ms, novo_mb = self._measure(lambda: get_resolution_time_stats(queryset), repeat)
+        self.stdout.write(
+            f'{rows:>10} {antigo_ms:>12.1f} {antigo_mb:>12.2f} {novo_ms:>11.1f} {novo_mb:>11.2f}'
+        )
+
+    def _measure(self, func, repeat):
+        """Mediana do tempo (ms) e maior pico de memória alocada (MB)"""
+        tempos = []
+        picos = []
+        for _ in range(repeat):
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            func()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+            picos.append(tracemalloc.get_traced_memory()[1] / (1024 * 1024))
+            tracemalloc.stop()
+        return statistics.median(tempos), max(picos)
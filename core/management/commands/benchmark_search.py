@@ -0,0 +1,105 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from reports.models import Report
+from reports.search import icontains_filter, rebuild_search_index, search_filter
+
+User = get_user_model()
+
+VOCABULARIO = [
+    'vazamento', 'bomba', 'motor', 'painel', 'elétrico', 'hidráulica', 'vedação',
+    'óleo', 'compressor', 'rolamento', 'correia', 'superaquecimento', 'ruído',
+    'vibração', 'disjuntor', 'sensor', 'válvula', 'manutenção', 'preventiva',
+    'corretiva', 'troca', 'inspeção', 'lubrificação', 'alinhamento', 'pressão',
+    'temperatura', 'corrosão', 'trinca', 'solda', 'cabo', 'conector', 'fusível',
+]
+
+SILABAS = ['ba', 'ce', 'di', 'fo', 'gu', 'la', 'me', 'ni', 'po', 'ru', 'sa', 'te', 'vi', 'zo', 'cha', 'lhe']
+
+TERMOS = ['vazamento', 'hidraulica', 'motor eletrico', 'rolamentos', 'válvula pressão', 'solda']
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a latência da busca por índice textual com o encadeamento de '
+        'icontains, usando relatórios sintéticos descartados ao final'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[100000, 1000000],
+            help='Quantidades de relatórios a testar',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Execuções por termo de busca',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'🔎 Benchmark de busca ({connection.vendor})')
+        for rows in options['rows']:
+            with transaction.atomic():
+                self._run(rows, options['repeat'])
+                # Nada do que foi gerado permanece no banco
+                transaction.set_rollback(True)
+
+    def _run(self, rows, repeat):
+        usuario = User.objects.create(
+            username=f'benchmark_{rows}', email=f'benchmark_{rows}@example.com',
+            first_name='Benchmark', last_name='Busca'
+        )
+        rng = random.Random(rows)
+        agora = timezone.now()
+        # Texto de preenchimento para que cada termo técnico seja seletivo
+        preenchimento = [''.join(rng.choices(SILABAS, k=3)) for _ in range(5000)]
+
+        inicio = time.perf_counter()
+        batch = []
+        for i in range(rows):
+            batch.append(Report(
+                usuario=usuario,
+                data_ocorrencia=agora,
+                titulo=' '.join(rng.choices(preenchimento, k=3) + rng.choices(VOCABULARIO, k=1)),
+                descricao=' '.join(rng.choices(preenchimento, k=24) + rng.choices(VOCABULARIO, k=1)),
+            ))
+            if len(batch) == 5000:
+                Report.objects.bulk_create(batch)
+                batch = []
+        Report.objects.bulk_create(batch)
+        carga = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        rebuild_search_index(connection)
+        indexacao = time.perf_counter() - inicio
+
+        self.stdout.write(f'\n📊 {rows} relatórios (carga {carga:.1f}s, indexação {indexacao:.1f}s)')
+        self.stdout.write(f'{"termo":<20} {"icontains (ms)":>16} {"índice (ms)":>14} {"ganho":>8}')
+
+        for termo in TERMOS:
+            antigo = self._measure(icontains_filter(termo), repeat)
+            novo = self._measure(search_filter(termo), repeat)
+            self.stdout.write(
+                f'{termo:<20} {antigo:>16.1f} {novo:>14.1f} {antigo / max(novo, 0.001):>7.1f}x'
+            )
+
+    def _measure(self, filters, repeat):
+        """Mediana (ms) de contar os resultados e buscar a primeira página"""
+        tempos = []
+        for _ in range(repeat):
+            inicio = time.perf_counter()
+            queryset = Report.objects.filter(filters)
+            queryset.count()
+            list(queryset.order_by('-data_criacao')[:12])
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        return statistics.median(tempos)
@@ -0,0 +1,103 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from locations.models import Equipamento, Local
+from reports.cache import VERSION_KEYS, bump_version
+from reports.models import Report
+
+User = get_user_model()
+
+PAGINAS = [
+    ('Dashboard', 'dashboard:index'),
+    ('Perfil', 'core:profile'),
+    ('Listagem de relatórios', 'reports:list'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o tempo de resposta e as consultas das páginas com fragmentos em '
+        'cache, com o cache vazio (antes) e aquecido (depois), usando dados '
+        'sintéticos descartados ao final'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reports', type=int, default=500, help='Relatórios sintéticos')
+        parser.add_argument('--locals', type=int, default=50, help='Locais sintéticos (com 5 equipamentos cada)')
+        parser.add_argument('--repeat', type=int, default=20, help='Requisições por medição')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'⏱️  Páginas com fragmentos em cache ({connection.vendor})')
+        self.stdout.write(
+            f'{"página":<24} {"vazio (ms)":>11} {"consultas":>10} {"aquecido (ms)":>14} {"consultas":>10}'
+        )
+        try:
+            with transaction.atomic():
+                self._run(options)
+                # Nada do que foi gerado permanece no banco
+                transaction.set_rollback(True)
+        finally:
+            # Fragmentos renderizados com os dados descartados não podem ser reaproveitados
+            for name in VERSION_KEYS:
+                bump_version(name)
+
+    def _run(self, options):
+        usuario = User.objects.create_user(
+            username='benchmark_templates', email='benchmark_templates@example.com', password='x'
+        )
+        for i in range(options['locals']):
+            local = Local.objects.create(
+                nome=f'Local {i}', codigo=f'BT{i:04d}', tipo='fabrica',
+                cidade='Campinas', estado='SP', cep='13000-000'
+            )
+            Equipamento.objects.bulk_create([
+                Equipamento(local=local, nome=f'Equipamento {i}.{j}', codigo=f'BT{i:04d}-{j}', tipo='outro')
+                for j in range(5)
+            ])
+        agora = timezone.now()
+        for i in range(options['reports']):
+            Report.objects.create(
+                usuario=usuario, data_ocorrencia=agora, titulo=f'Relatório {i}',
+                descricao='Relatório sintético para benchmark',
+            )
+
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(usuario)
+
+        for label, url_name in PAGINAS:
+            url = reverse(url_name)
+            frio = self._measure(client, url, options['repeat'], invalidate=lambda: self._invalidate(usuario))
+            quente = self._measure(client, url, options['repeat'])
+            self.stdout.write(
+                f'{label:<24} {frio[0]:>11.1f} {frio[1]:>10} {quente[0]:>14.1f} {quente[1]:>10}'
+            )
+
+    def _invalidate(self, usuario):
+        """Invalida os fragmentos sem limpar o cache inteiro (que pode ser o Redis de produção)"""
+        for name in VERSION_KEYS:
+            bump_version(name)
+        # O fragmento do perfil varia com updated_at do usuário
+        usuario.save(update_fields=['updated_at'])
+
+    def _measure(self, client, url, repeat, invalidate=None):
+        """Mediana do tempo (ms) e consultas da última requisição"""
+        tempos = []
+        consultas = 0
+        client.get(url)
+        for _ in range(repeat):
+            if invalidate:
+                invalidate()
+            with CaptureQueriesContext(connection) as ctx:
+                inicio = time.perf_counter()
+                client.get(url)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            consultas = len(ctx)
+        return statistics.median(tempos), consultas
@@ -0,0 +1,78 @@
+import multiprocessing
+import resource
+import statistics
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from core.uploads import downscale_image
+
+
+def _measure(func, conn):
+    """Roda num processo filho: tempo (ms), pico de memória acima do início (KB) e bytes gerados"""
+    inicio_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    inicio = time.perf_counter()
+    result = func()
+    tempo = (time.perf_counter() - inicio) * 1000
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - inicio_rss
+    conn.send((tempo, pico, len(result[0].getvalue()) if result else None))
+    conn.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede tempo e memória do Pillow por upload de foto: redução decodificando '
+        'o original inteiro e em draft (como faz o ImageUploadHandler), com JPEGs sintéticos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[4032, 6000, 8000],
+            help='Larguras (px) das fotos sintéticas (4:3)',
+        )
+        parser.add_argument('--max-side', type=int, default=None, help='Lado maior gravado (UPLOAD_IMAGE_MAX_SIDE)')
+        parser.add_argument('--repeat', type=int, default=3, help='Execuções por medição')
+
+    def handle(self, *args, **options):
+        max_side = options['max_side'] or settings.UPLOAD_IMAGE_MAX_SIDE
+        # Cada medição roda num processo novo: o pico de RSS (ru_maxrss) não
+        # volta a cair, e o Pillow guarda blocos de memória entre imagens
+        context = multiprocessing.get_context('fork')
+        self.stdout.write(f'⏱️  Upload de fotos reduzidas para {max_side}px no lado maior')
+        self.stdout.write(
+            f'{"foto":<12} {"medição":<22} {"tempo (ms)":>11} {"pico (MB)":>10} {"original (KB)":>14} {"gravado (KB)":>13}'
+        )
+        for width in options['sizes']:
+            foto = self._foto(width)
+            for label, draft in (('Decodificação completa', False), ('Draft + redução', True)):
+                tempos, picos = [], []
+                for _ in range(options['repeat']):
+                    tempo, pico, gravado = self._run_in_child(
+                        context, lambda: downscale_image(BytesIO(foto), max_side=max_side, draft=draft)
+                    )
+                    tempos.append(tempo)
+                    picos.append(pico)
+                gravado = gravado if gravado is not None else len(foto)
+                self.stdout.write(
+                    f'{f"{width}x{width * 3 // 4}":<12} {label:<22} {statistics.median(tempos):>11.1f} '
+                    f'{statistics.median(picos) / 1024:>10.1f} {len(foto) / 1024:>14.0f} {gravado / 1024:>13.0f}'
+                )
+        self.stdout.write('💡 pico = memória residente máxima do processo acima da inicial (decodificação + redução)')
+
+    def _run_in_child(self, context, func):
+        parent, child = context.Pipe(duplex=False)
+        process = context.Process(target=_measure, args=(func, child))
+        process.start()
+        result = parent.recv()
+        process.join()
+        return result
+
+    def _foto(self, width):
+        """JPEG sintético com ruído (comprime como foto, não como cor chapada)"""
+        image = Image.effect_noise((width, width * 3 // 4), 40).convert('RGB')
+        output = BytesIO()
+        image.save(output, format='JPEG', quality=90)
+        return output.getvalue()
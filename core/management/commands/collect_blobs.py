@@ -0,0 +1,64 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from core.images import delete_source_variants
+from reports.chunked_upload import expire_uploads
+from reports.storage import blob_storage, collect_garbage, orphan_files, recount_references
+
+
+class Command(BaseCommand):
+    help = (
+        'Remove em lotes as fotos dos relatórios (blobs do storage por conteúdo) '
+        'que nenhum registro usa mais, com as variantes delas, e os uploads em partes expirados'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Blobs removidos por transação')
+        parser.add_argument(
+            '--grace-hours', type=float, default=None,
+            help='Carência desde o último upload/liberação (padrão: REPORTS_BLOB_GC_GRACE_HOURS)',
+        )
+        parser.add_argument('--recount', action='store_true', help='Recalcula as referências antes de coletar')
+        parser.add_argument(
+            '--scan-storage', action='store_true',
+            help='Também remove arquivos da pasta de blobs sem registro (ex.: uploads de transações desfeitas)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Só informa o que seria removido')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        horas = options['grace_hours']
+        if horas is None:
+            horas = settings.REPORTS_BLOB_GC_GRACE_HOURS
+        grace = timedelta(hours=horas)
+
+        if not options['dry_run']:
+            # Antes da coleta: o blob de um upload finalizado e nunca usado fica sem referências
+            expirados = expire_uploads()
+            self.stdout.write(f'📊 Uploads em partes expirados removidos: {expirados}')
+
+        if options['recount']:
+            corrigidos = recount_references(batch_size=options['batch_size'])
+            self.stdout.write(f'📊 Referências recontadas: {corrigidos} blobs corrigidos')
+
+        removidos, liberados = collect_garbage(
+            batch_size=options['batch_size'], grace=grace, dry_run=options['dry_run']
+        )
+        acao = 'seriam removidos' if options['dry_run'] else 'removidos'
+        self.stdout.write(f'📊 Blobs sem referências {acao}: {removidos} ({filesizeformat(liberados)})')
+
+        if options['scan_storage']:
+            storage = blob_storage()
+            orfaos = 0
+            for nome in orphan_files(grace=grace):
+                orfaos += 1
+                if not options['dry_run']:
+                    storage.delete(nome)
+                    delete_source_variants(nome, storage=storage)
+            self.stdout.write(f'📊 Arquivos sem registro {acao}: {orfaos}')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Coleta concluída em {time.perf_counter() - inicio:.1f}s'))
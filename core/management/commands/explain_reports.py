@@ -0,0 +1,189 @@
+import re
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from reports.analytics_simple import SimpleReportAnalytics
+from reports.models import Report
+from reports.pagination import KeysetPaginator
+from reports.queries import apply_ordering, build_report_filter, get_report_list_stats
+
+User = get_user_model()
+
+# Varredura completa da tabela de relatórios em cada banco
+FULL_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on reports_report\b'),
+    'sqlite': re.compile(r'\bSCAN reports_report\b(?! USING)'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Mostra o plano de execução (EXPLAIN) das consultas mais usadas sobre relatórios'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default='default',
+            help='Banco de dados a analisar',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Executa as consultas (EXPLAIN ANALYZE, apenas PostgreSQL)',
+        )
+        parser.add_argument(
+            '--disable-seqscan',
+            action='store_true',
+            help='Desliga o Seq Scan no PostgreSQL para ver se há índice utilizável em bases pequenas',
+        )
+        parser.add_argument(
+            '--user',
+            help='Usuário não staff usado nas consultas com permissão (padrão: o primeiro encontrado)',
+        )
+        parser.add_argument(
+            '--sql',
+            action='store_true',
+            help='Mostra também o SQL de cada consulta',
+        )
+
+    def handle(self, *args, **options):
+        self.database = options['database']
+        connection = connections[self.database]
+        self.vendor = connection.vendor
+
+        if options['analyze'] and self.vendor != 'postgresql':
+            raise CommandError('--analyze só é suportado no PostgreSQL')
+
+        if self.vendor == 'postgresql':
+            self.prefix = 'EXPLAIN (ANALYZE, BUFFERS)' if options['analyze'] else 'EXPLAIN'
+        else:
+            self.prefix = connection.ops.explain_query_prefix()
+
+        user = self._get_user(options['user'])
+        full_scans = 0
+        total = 0
+
+        with connection.cursor() as cursor:
+            if options['disable_seqscan']:
+                if self.vendor != 'postgresql':
+                    raise CommandError('--disable-seqscan só é suportado no PostgreSQL')
+                cursor.execute('SET enable_seqscan = off')
+
+            try:
+                for label, run in self._hot_queries(user):
+                    self.stdout.write(self.style.MIGRATE_HEADING(f'\n📌 {label}'))
+                    for sql in self._capture(run):
+                        total += 1
+                        if self._explain(cursor, sql, options['sql']):
+                            full_scans += 1
+            finally:
+                if options['disable_seqscan']:
+                    cursor.execute('RESET enable_seqscan')
+
+        self.stdout.write('\n' + '=' * 50)
+        summary = f'{total} consultas analisadas, {full_scans} com varredura completa de reports_report'
+        if full_scans:
+            self.stdout.write(self.style.WARNING(f'⚠️  {summary}'))
+            if self.vendor == 'postgresql' and not options['disable_seqscan']:
+                self.stdout.write(
+                    '💡 Em bases pequenas o planejador prefere Seq Scan; '
+                    'use --disable-seqscan para conferir os índices'
+                )
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ {summary}'))
+
+    def _get_user(self, username):
+        users = User.objects.using(self.database)
+        if username:
+            try:
+                return users.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Usuário "{username}" não encontrado')
+        # Sem usuários cadastrados o plano continua válido para um id qualquer
+        return users.filter(is_staff=False).first() or User(pk=0, is_staff=False)
+
+    def _hot_queries(self, user):
+        """Consultas de reports/views.py, analytics_simple.py e dashboard/views.py"""
+        reports = Report.objects.db_manager(self.database).ativos()
+        agora = timezone.now()
+
+        def listagem(cleaned_data, ordenar_por='-data_criacao'):
+            def run():
+                filters = build_report_filter(cleaned_data)
+                queryset, _ = apply_ordering(
+                    reports.select_related('local', 'equipamento', 'usuario').filter(filters),
+                    ordenar_por
+                )
+                get_report_list_stats(filters, queryset=reports)
+                list(queryset[:12])
+            return run
+
+        def cursor_page():
+            paginator = KeysetPaginator(reports.order_by(), 12, ordering='-data_criacao')
+            page = paginator.page()
+            if page.has_next():
+                paginator.page(page.next_cursor)
+
+        def analytics(analytics_user):
+            def run():
+                data = SimpleReportAnalytics(user=analytics_user)
+                data.get_overview_stats()
+                data.get_priority_distribution()
+                data.get_timeline_data()
+                data.get_resolution_time_stats()
+            return run
+
+        def dashboard():
+            reports.count()
+            list(reports.order_by('-data_criacao')[:5])
+            list(reports.values('status').order_by())
+            list(reports.filter(data_criacao__gte=agora - timedelta(days=30)).order_by('-data_criacao')[:10])
+            user_reports = reports.filter(usuario=user)
+            user_reports.filter(status='pendente').count()
+
+        def permissoes():
+            list(reports.filter(Q(usuario=user) | Q(atribuido_para=user)).order_by('-data_criacao')[:5])
+
+        return [
+            ('Listagem de relatórios (sem filtros)', listagem({})),
+            ('Listagem filtrada por status e prioridade', listagem({'status': 'pendente', 'prioridade': 'alta'})),
+            ('Listagem filtrada por período', listagem({'periodo': 'ultimo_mes'}, '-data_ocorrencia')),
+            ('Listagem paginada por cursor', cursor_page),
+            ('Analytics (staff)', analytics(None)),
+            ('Analytics (autor ou atribuído)', analytics(user)),
+            ('Dashboard', dashboard),
+            ('Relatórios do usuário (perfil)', permissoes),
+        ]
+
+    def _capture(self, run):
+        """Executa `run` e devolve o SQL distinto das consultas sobre reports_report"""
+        with CaptureQueriesContext(connections[self.database]) as ctx:
+            run()
+
+        seen = []
+        for query in ctx.captured_queries:
+            sql = query['sql']
+            if sql.lstrip().upper().startswith(('SELECT', 'WITH')) and 'reports_report' in sql and sql not in seen:
+                seen.append(sql)
+        return seen
+
+    def _explain(self, cursor, sql, show_sql):
+        """Imprime o plano e retorna True se houver varredura completa da tabela"""
+        cursor.execute(f'{self.prefix} {sql}')
+        plan = '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+        if show_sql:
+            self.stdout.write(self.style.SQL_KEYWORD(sql))
+        for line in plan.splitlines():
+            self.stdout.write(f'   {line}')
+
+        pattern = FULL_SCAN_PATTERNS.get(self.vendor)
+        if pattern and pattern.search(plan):
+            self.stdout.write(self.style.WARNING('   ⚠️  Varredura completa de reports_report'))
+            return True
+        return False
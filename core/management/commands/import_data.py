@@ -0,0 +1,57 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.importer import IMPORTERS, ImportFileError, import_file
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa locais, equipamentos ou relatórios de um arquivo CSV ou XLSX, em lotes, '
+        'gravando as linhas recusadas num relatório de erros'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(IMPORTERS), help='O que importar')
+        parser.add_argument('arquivo', help='Arquivo .csv ou .xlsx')
+        parser.add_argument('--batch-size', type=int, default=None, help='Linhas por bulk_create')
+        parser.add_argument(
+            '--erros',
+            default=None,
+            help='Relatório de erros (padrão: <arquivo>.erros.csv)',
+        )
+        parser.add_argument('--database', default=None, help='Banco de dados de destino')
+        parser.add_argument('--dry-run', action='store_true', help='Só valida, sem gravar')
+
+    def handle(self, *args, **options):
+        arquivo = options['arquivo']
+        if not os.path.exists(arquivo):
+            raise CommandError(f'Arquivo não encontrado: {arquivo}')
+        caminho_erros = options['erros'] or f'{os.path.splitext(arquivo)[0]}.erros.csv'
+
+        self.stdout.write(f'📥 Importando {options["tipo"]} de {arquivo}')
+        try:
+            with open(arquivo, 'rb') as file, open(caminho_erros, 'w', newline='', encoding='utf-8') as erros:
+                result = import_file(
+                    options['tipo'], file, arquivo, error_stream=erros,
+                    batch_size=options['batch_size'], using=options['database'], dry_run=options['dry_run'],
+                )
+        except ImportFileError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f'⏱️  {result.linhas} linhas em {result.segundos:.2f}s ({result.linhas_por_segundo:,.0f} linhas/s)'
+        )
+        if options['dry_run']:
+            self.stdout.write(f'💡 Simulação: {result.importados} linhas válidas, nada foi gravado')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ {result.importados} registros importados'))
+
+        if result.total_erros:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️  {result.total_erros} linhas recusadas; detalhes em {caminho_erros}'
+            ))
+            for numero, mensagem in result.erros[:10]:
+                self.stdout.write(f'   linha {numero}: {mensagem}')
+        else:
+            os.remove(caminho_erros)
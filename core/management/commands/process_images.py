@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.images import process_image, registered_fields
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera as variantes responsivas (WebP/JPEG) das imagens que ainda não '
+        'as têm, como as enviadas antes do pipeline ou perdidas num restart'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regera também as imagens já processadas')
+        parser.add_argument('--limit', type=int, default=None, help='Máximo de imagens por campo')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        total = 0
+        for model, field_name, info_field in registered_fields():
+            pendentes = model._default_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            pks = []
+            for pk, name, info in pendentes.values_list('pk', field_name, info_field).iterator():
+                if options['force'] or (info or {}).get('source') != name:
+                    pks.append(pk)
+            pks = pks[:options['limit']]
+
+            label = model._meta.label_lower
+            processadas = 0
+            for pk in pks:
+                if options['force']:
+                    model._default_manager.filter(pk=pk).update(**{info_field: {}})
+                if process_image(label, pk, field_name):
+                    processadas += 1
+            total += processadas
+            self.stdout.write(f'📊 {model._meta.verbose_name}.{field_name}: {processadas}/{len(pks)} processadas')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {total} imagens com variantes geradas em {time.perf_counter() - inicio:.1f}s'
+        ))
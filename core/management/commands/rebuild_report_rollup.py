@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from reports.rollup import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = 'Recria a tabela de fatos diária (ReportDailyRollup) a partir dos relatórios'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default='default',
+            help='Banco de dados a consolidar',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Linhas do rollup gravadas por lote',
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_rollup(using=options['database'], batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Rollup diário recriado: {total} linhas'
+        ))
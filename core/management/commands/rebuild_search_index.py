@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from reports.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Recria o índice de busca textual dos relatórios'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default='default',
+            help='Banco de dados a reindexar',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Relatórios processados por lote (SQLite)',
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+
+        with transaction.atomic(using=options['database']):
+            total = rebuild_search_index(connection, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Índice de busca recriado: {total} relatórios ({connection.vendor})'
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from reports.user_stats import reconcile_user_stats
+
+
+class Command(BaseCommand):
+    help = 'Confere os contadores por usuário (UserReportStats) com os relatórios e corrige as divergências'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default='default',
+            help='Banco de dados a conferir',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas lista as divergências, sem corrigir',
+        )
+
+    def handle(self, *args, **options):
+        drift = reconcile_user_stats(using=options['database'], dry_run=options['dry_run'])
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('✅ Contadores por usuário conferem com os relatórios'))
+            return
+
+        for user_id, stored, correct in drift:
+            gravado = 'sem linha' if stored is None else ', '.join(f'{k}={v}' for k, v in stored.items())
+            correto = ', '.join(f'{k}={v}' for k, v in correct.items())
+            self.stdout.write(f'   usuário {user_id}: {gravado} -> {correto}')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'⚠️  {len(drift)} usuários com divergência (nada foi alterado)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ {len(drift)} usuários corrigidos'))
@@ -0,0 +1,69 @@
+"""
+Tags das imagens responsivas (core.images)
+
+    {% load images %}
+    {% responsive_image report.imagem_principal 'thumb' sizes='(min-width: 992px) 33vw, 100vw' class='card-img-top' alt=report.titulo %}
+    <a href="{{ imagem.imagem|image_variant_url:'lightbox' }}">
+
+Sem variantes geradas (upload recente ou arquivo antigo) saem o ``<img>`` e a
+URL do original.
+"""
+
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from core.images import get_variants
+
+register = template.Library()
+
+
+def _attrs(attrs):
+    # data_bs_image=... vira data-bs-image="..."
+    return format_html_join('', ' {}="{}"', ((nome.replace('_', '-'), valor) for nome, valor in attrs.items()))
+
+
+def _srcset(variants, ext):
+    larguras = {}
+    for entry in variants.values():
+        larguras[entry['width']] = entry[ext]
+    return ', '.join(f'{default_storage.url(nome)} {largura}w' for largura, nome in sorted(larguras.items()))
+
+
+@register.simple_tag
+def responsive_image(fieldfile, variant='detail', sizes=None, **attrs):
+    """
+    ``<picture>`` com srcset WebP e JPEG das variantes; `variant` é a usada
+    no ``src`` (e nas dimensões width/height) e `sizes` vai para o navegador
+    escolher a largura. Demais argumentos viram atributos do ``<img>``.
+    """
+    if not fieldfile:
+        return ''
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+
+    info = get_variants(fieldfile)
+    if info is None:
+        return format_html('<img src="{}"{}>', fieldfile.url, _attrs(attrs))
+
+    variants = info['variants']
+    escolhida = variants.get(variant) or variants[max(variants, key=lambda nome: variants[nome]['width'])]
+    sizes = sizes or f'{escolhida["width"]}px'
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}"{}></picture>',
+        _srcset(variants, 'webp'), sizes,
+        default_storage.url(escolhida['jpeg']), _srcset(variants, 'jpeg'), sizes,
+        escolhida['width'], escolhida['height'], _attrs(attrs),
+    )
+
+
+@register.filter
+def image_variant_url(fieldfile, variant='lightbox'):
+    """URL (WebP) de uma variante, ou a do original se ainda não houver variantes"""
+    if not fieldfile:
+        return ''
+    info = get_variants(fieldfile)
+    if info is None or variant not in info['variants']:
+        return fieldfile.url
+    return default_storage.url(info['variants'][variant]['webp'])
@@ -0,0 +1,236 @@
+"""
+Upload de imagens: validação no streaming e redução antes de gravar
+
+``ImageUploadHandler`` (primeiro de FILE_UPLOAD_HANDLERS) recebe os arquivos
+de imagem da requisição em vez dos handlers padrão do Django:
+
+- confere a assinatura no primeiro chunk e o tamanho a cada chunk, e deixa de
+  guardar o resto do arquivo assim que um dos dois falha;
+- no fim do arquivo lê só o cabeçalho (dimensões, formato) e recusa
+  resoluções acima de UPLOAD_IMAGE_MAX_PIXELS antes de decodificar qualquer
+  pixel;
+- toda imagem aceita é orientada pelo EXIF e recomprimida sem os metadados
+  da câmera (GPS incluído); as com o lado maior acima de
+  UPLOAD_IMAGE_MAX_SIDE são antes decodificadas em draft (JPEG já em 1/2,
+  1/4 ou 1/8 da resolução) e reduzidas. É essa versão que os formulários
+  recebem e que vai para MEDIA_ROOT.
+
+Imagens recusadas chegam ao formulário como ``RejectedImageUpload``, e o
+``ImageUploadField`` transforma o motivo em erro de validação do campo.
+"""
+
+import os
+import tempfile
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+from PIL import Image, ImageOps
+
+# Assinaturas (prefixo do arquivo) dos formatos aceitos
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+
+# Formatos animados regravados quadro a quadro: (extensão, content type)
+ANIMATED_FORMATS = {
+    'GIF': ('.gif', 'image/gif'),
+    'PNG': ('.png', 'image/png'),
+    'WEBP': ('.webp', 'image/webp'),
+}
+
+NOT_AN_IMAGE = 'Envie uma imagem JPEG, PNG, WebP ou GIF.'
+
+
+def _max_bytes():
+    return getattr(settings, 'UPLOAD_IMAGE_MAX_BYTES', 20 * 1024 * 1024)
+
+
+def _max_side():
+    return getattr(settings, 'UPLOAD_IMAGE_MAX_SIDE', 2560)
+
+
+def _max_pixels():
+    return getattr(settings, 'UPLOAD_IMAGE_MAX_PIXELS', 80_000_000)
+
+
+def _quality():
+    return getattr(settings, 'UPLOAD_IMAGE_QUALITY', 85)
+
+
+class UploadRejected(ValueError):
+    """Imagem recusada; a mensagem vai para o usuário"""
+
+
+def sniff_image_format(header):
+    """Formato pela assinatura dos primeiros bytes, ou None se não for imagem aceita"""
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP'
+    for signature, formato in SIGNATURES:
+        if header.startswith(signature):
+            return formato
+    return None
+
+
+def _fit(size, max_side):
+    largura, altura = size
+    escala = max_side / max(largura, altura)
+    return max(round(largura * escala), 1), max(round(altura * escala), 1)
+
+
+def downscale_image(file, max_side=None, max_pixels=None, quality=None, draft=True):
+    """
+    Reduz a imagem para caber em `max_side` x `max_side` e a recomprime sem
+    metadados (EXIF, GPS, XMP, comentários). Retorna (BytesIO, extensão,
+    content type) da versão gravada; imagens que já cabem também são
+    recomprimidas, para que nenhum original chegue ao storage. `draft=False`
+    decodifica na resolução original (só para comparação no benchmark).
+
+    Levanta UploadRejected se o cabeçalho declara mais de `max_pixels` e
+    OSError se o arquivo não for uma imagem legível.
+    """
+    max_side = max_side or _max_side()
+    max_pixels = max_pixels or _max_pixels()
+    file.seek(0)
+    try:
+        image = Image.open(file)
+    except Image.DecompressionBombError:
+        raise UploadRejected(_too_many_pixels(max_pixels))
+
+    with image:
+        # Até aqui só o cabeçalho foi lido
+        largura, altura = image.size
+        if largura * altura > max_pixels:
+            raise UploadRejected(_too_many_pixels(max_pixels))
+        if getattr(image, 'is_animated', False) and image.format in ANIMATED_FORMATS:
+            return _strip_animation(image)
+
+        reduzir = max(largura, altura) > max_side
+        # PNG e GIF que não precisam de redução continuam sem perda
+        sem_perda = (
+            image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+            or (not reduzir and image.format in ('PNG', 'GIF'))
+        )
+        icc_profile = image.info.get('icc_profile')
+        # Só decodifica em escala reduzida quando o original tem 2x o alvo ou mais
+        if draft and reduzir:
+            image.draft('RGB', _fit(image.size, max_side))
+        reduced = ImageOps.exif_transpose(image)
+        reduced.thumbnail((max_side, max_side), Image.LANCZOS, reducing_gap=3.0)
+
+    output = BytesIO()
+    if sem_perda:
+        reduced.convert('RGBA').save(output, format='PNG', optimize=True)
+        return output, '.png', 'image/png'
+    if reduced.mode not in ('RGB', 'L'):
+        # O perfil ICC era do modo original (CMYK, paleta...)
+        icc_profile = None
+        reduced = reduced.convert('RGB')
+    # Sem exif=...: a orientação já foi aplicada e os metadados (GPS incluído) ficam
+    # de fora; o comentário (COM) o Pillow copiaria de reduced.info
+    reduced.save(
+        output, format='JPEG', quality=quality or _quality(), optimize=True, icc_profile=icc_profile, comment=b'',
+    )
+    return output, '.jpg', 'image/jpeg'
+
+
+def _strip_animation(image):
+    """Regrava todos os quadros da animação no mesmo formato, sem EXIF, XMP nem comentário"""
+    extensao, content_type = ANIMATED_FORMATS[image.format]
+    output = BytesIO()
+    image.save(output, format=image.format, save_all=True, comment=b'')
+    return output, extensao, content_type
+
+
+def _too_many_pixels(max_pixels):
+    return f'A resolução da imagem passa do limite de {max_pixels // 1_000_000} megapixels.'
+
+
+class RejectedImageUpload(InMemoryUploadedFile):
+    """Arquivo recusado no upload; o conteúdo foi descartado e `upload_error` diz o motivo"""
+
+    def __init__(self, field_name, name, content_type, size, upload_error):
+        super().__init__(BytesIO(), field_name, name, content_type, size, None)
+        self.upload_error = upload_error
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Recebe os arquivos de imagem da requisição (pelo content type ou pela
+    extensão); os demais seguem para os handlers seguintes. O conteúdo fica em
+    memória até FILE_UPLOAD_MAX_MEMORY_SIZE e depois em arquivo temporário.
+    """
+
+    def new_file(self, field_name, file_name, content_type, *args, **kwargs):
+        super().new_file(field_name, file_name, content_type, *args, **kwargs)
+        extensao = os.path.splitext(file_name)[1].lower()
+        self.active = content_type.startswith('image/') or extensao in IMAGE_EXTENSIONS
+        if not self.active:
+            return
+        self.received = 0
+        self.error = None
+        self.spool = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE, dir=settings.FILE_UPLOAD_TEMP_DIR
+        )
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+        if self.error:
+            return None
+        if start == 0 and not sniff_image_format(raw_data):
+            self.error = NOT_AN_IMAGE
+        self.received += len(raw_data)
+        if self.received > _max_bytes():
+            self.error = f'A imagem passa do limite de {_max_bytes() // (1024 * 1024)} MB.'
+        if self.error:
+            # O restante do arquivo é lido da requisição, mas não é guardado
+            self.spool.close()
+        else:
+            self.spool.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+        if self.error:
+            return RejectedImageUpload(self.field_name, self.file_name, self.content_type, self.received, self.error)
+
+        try:
+            reduced = downscale_image(self.spool)
+        except UploadRejected as e:
+            self.spool.close()
+            return RejectedImageUpload(self.field_name, self.file_name, self.content_type, self.received, str(e))
+        except (OSError, ValueError):
+            # Assinatura válida mas arquivo corrompido: o ImageField do formulário recusa
+            self.spool.seek(0)
+            return InMemoryUploadedFile(
+                self.spool, self.field_name, self.file_name, self.content_type, self.received,
+                self.charset, self.content_type_extra,
+            )
+
+        self.spool.close()
+        output, extensao, content_type = reduced
+        nome = os.path.splitext(self.file_name)[0] + extensao
+        size = output.getbuffer().nbytes
+        output.seek(0)
+        return InMemoryUploadedFile(output, self.field_name, nome, content_type, size, None)
+
+
+class ImageUploadField(forms.ImageField):
+    """ImageField que mostra o motivo das imagens recusadas pelo ImageUploadHandler"""
+
+    def to_python(self, data):
+        upload_error = getattr(data, 'upload_error', None)
+        if upload_error:
+            raise ValidationError(upload_error, code='invalid_image')
+        return super().to_python(data)
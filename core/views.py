@@ -2,6 +2,7 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q
+from django.utils.functional import SimpleLazyObject
 
 
 def home(request):
@@ -19,25 +20,22 @@ def about(request):
 @login_required
 def profile(request):
     """Perfil do usuário"""
-    from reports.models import Report
+    from reports.models import Report, UserReportStats
     
-    # Obter estatísticas do usuário
-    user_reports = Report.objects.filter(
-        Q(usuario=request.user) | Q(atribuido_para=request.user)
-    )
+    # Obter estatísticas do usuário (contadores mantidos em UserReportStats);
+    # só consultadas se o fragmento em cache do template precisar ser renderizado
+    def get_user_stats():
+        stats = UserReportStats.objects.filter(usuario=request.user).first()
+        return {
+            'total_reports': stats.criados if stats else 0,
+            'reports_resolvidos': stats.resolvidos if stats else 0,
+            'reports_atribuidos': stats.atribuidos if stats else 0,
+        }
     
-    user_stats = {
-        'total_reports': user_reports.filter(usuario=request.user).count(),
-        'reports_resolvidos': user_reports.filter(
-            usuario=request.user, status='resolvido'
-        ).count(),
-        'reports_atribuidos': user_reports.filter(
-            atribuido_para=request.user
-        ).count(),
-    }
+    user_stats = SimpleLazyObject(get_user_stats)
     
     # Atividade recente - últimos 5 relatórios
-    recent_reports = Report.objects.filter(
+    recent_reports = Report.objects.ativos().filter(
         Q(usuario=request.user) | Q(atribuido_para=request.user)
     ).order_by('-data_criacao')[:5]
     
@@ -10,6 +10,7 @@ urlpatterns = [
     
     # APIs para gráficos
     path('api/reports-by-status/', views.api_reports_by_status, name='api_reports_by_status'),
+    path('api/reports-series/', views.api_reports_series, name='api_reports_series'),
     path('api/reports-by-category/', views.api_reports_by_category, name='api_reports_by_category'),
     path('api/recent-activity/', views.api_recent_activity, name='api_recent_activity'),
 ] 
\ No newline at end of file
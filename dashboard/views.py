@@ -1,10 +1,12 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Q
+from django.db.models import Count, F
 from django.http import JsonResponse
+from django.utils import timezone
 from reports.models import Report, ReportCategory
-from datetime import datetime, timedelta
+from reports.queries import get_report_series, shift_months
+from datetime import date, datetime, timedelta
 import json
 
 User = get_user_model()
@@ -15,30 +17,31 @@ def index(request):
     """Dashboard principal"""
     user = request.user
     
-    # Estatísticas gerais
-    total_reports = Report.objects.count()
-    user_reports = Report.objects.filter(usuario=user).count()
-    total_users = User.objects.count()
-    recent_reports = Report.objects.order_by('-data_criacao')[:5]
+    # Estatísticas gerais: métodos e querysets só são avaliados pelo template
+    # quando o fragmento em cache ({% cache %}) precisa ser renderizado
+    total_reports = Report.objects.ativos().count
+    user_reports = Report.objects.ativos().filter(usuario=user).count
+    total_users = User.objects.count
+    recent_reports = Report.objects.ativos().select_related('usuario').order_by('-data_criacao')[:5]
     
     # Estatísticas por categoria (temporariamente desabilitado)
     categories_stats = []
     
     # Relatórios por status
-    status_stats = Report.objects.values('status').annotate(
+    status_stats = Report.objects.ativos().values('status').annotate(
         count=Count('id')
     ).order_by('-count')
     
     # Atividade recente (últimos 30 dias)
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    recent_activity = Report.objects.filter(
+    thirty_days_ago = timezone.now() - timedelta(days=30)
+    recent_activity = Report.objects.ativos().filter(
         data_criacao__gte=thirty_days_ago
     ).order_by('-data_criacao')[:10]
     
     # Top autores
-    top_authors = User.objects.annotate(
-        report_count=Count('reports')
-    ).filter(report_count__gt=0).order_by('-report_count')[:5]
+    top_authors = User.objects.filter(report_stats__criados__gt=0).annotate(
+        report_count=F('report_stats__criados')
+    ).order_by('-report_count')[:5]
     
     context = {
         'total_reports': total_reports,
@@ -58,37 +61,25 @@ def index(request):
 def analytics(request):
     """Página de analytics avançadas"""
     
-    # Dados para gráficos
-    # Relatórios por mês (últimos 12 meses)
-    reports_by_month = []
-    for i in range(12):
-        month_start = datetime.now().replace(day=1) - timedelta(days=30*i)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        count = Report.objects.filter(
-            data_criacao__gte=month_start,
-            data_criacao__lte=month_end
-        ).count()
-        
-        reports_by_month.append({
-            'month': month_start.strftime('%b %Y'),
-            'count': count
-        })
-    
-    reports_by_month.reverse()
+    # A série por período é carregada pelos gráficos via api_reports_series
     
     # Relatórios por categoria (temporariamente desabilitado)
     category_data = []
     
     # Usuários mais ativos
-    active_users = list(User.objects.annotate(
-        report_count=Count('reports')
-    ).filter(report_count__gt=0).order_by('-report_count')[:10].values(
+    active_users = list(User.objects.filter(report_stats__criados__gt=0).annotate(
+        report_count=F('report_stats__criados')
+    ).order_by('-report_count')[:10].values(
         'username', 'first_name', 'last_name', 'report_count'
     ))
     
     context = {
-        'reports_by_month': json.dumps(reports_by_month),
+        'granularities': [
+            ('day', 'Dia'),
+            ('week', 'Semana'),
+            ('month', 'Mês'),
+            ('quarter', 'Trimestre'),
+        ],
         'category_data': json.dumps(category_data),
         'active_users': active_users,
     }
@@ -99,7 +90,7 @@ def analytics(request):
 @login_required
 def api_reports_by_status(request):
     """API para dados de relatórios por status"""
-    data = list(Report.objects.values('status').annotate(
+    data = list(Report.objects.ativos().values('status').annotate(
         count=Count('id')
     ).values('status', 'count'))
     
@@ -116,6 +107,29 @@ def api_reports_by_status(request):
     return JsonResponse(data, safe=False)
 
 
+def _parse_date(value, default):
+    if not value:
+        return default
+    return date.fromisoformat(value)
+
+
+@login_required
+def api_reports_series(request):
+    """API com a série de relatórios por dia, semana, mês ou trimestre"""
+    hoje = timezone.localdate()
+    granularidade = request.GET.get('granularity', 'month')
+    
+    try:
+        # Padrão: os últimos 12 meses, incluindo o atual
+        fim = _parse_date(request.GET.get('end'), hoje)
+        inicio = _parse_date(request.GET.get('start'), shift_months(fim.replace(day=1), -11))
+        data = get_report_series(Report.objects.ativos(), inicio, fim, granularidade)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse(data, safe=False)
+
+
 @login_required
 def api_reports_by_category(request):
     """API para dados de relatórios por categoria"""
@@ -131,7 +145,7 @@ def api_recent_activity(request):
     days = int(request.GET.get('days', 7))
     start_date = datetime.now() - timedelta(days=days)
     
-    reports = Report.objects.filter(
+    reports = Report.objects.ativos().filter(
         data_criacao__gte=start_date
     ).select_related('usuario').order_by('-data_criacao')[:20]
     
@@ -154,7 +168,7 @@ def user_statistics(request):
     user = request.user
     
     # Relatórios do usuário
-    user_reports = Report.objects.filter(usuario=user)
+    user_reports = Report.objects.ativos().filter(usuario=user)
     
     # Estatísticas
     stats = {
@@ -1,6 +1,7 @@
 from django import forms
 from .models import Local, Equipamento, Motor
 from django.contrib.auth import get_user_model
+from core.autocomplete import AutocompleteSelect
 
 User = get_user_model()
 
@@ -51,7 +52,9 @@ class EquipamentoForm(forms.ModelForm):
             'modelo', 'numero_serie', 'data_instalacao', 'status_operacional', 'ativo'
         ]
         widgets = {
-            'local': forms.Select(attrs={'class': 'form-select'}),
+            'local': AutocompleteSelect(
+                'locations:api_locais_autocomplete', params='todos=1', attrs={'class': 'form-select'}
+            ),
             'nome': forms.TextInput(attrs={
                 'class': 'form-control',
                 'placeholder': 'Nome do equipamento'
@@ -133,7 +136,9 @@ class EquipamentoFilterForm(forms.Form):
         queryset=Local.objects.all(),
         required=False,
         empty_label='Todos os locais',
-        widget=forms.Select(attrs={'class': 'form-select'})
+        widget=AutocompleteSelect(
+            'locations:api_locais_autocomplete', params='todos=1', attrs={'class': 'form-select'}
+        )
     )
     
     tipo = forms.ChoiceField(
@@ -169,7 +174,9 @@ class MotorForm(forms.ModelForm):
             'status_operacional', 'responsavel', 'ativo'
         ]
         widgets = {
-            'local': forms.Select(attrs={'class': 'form-select'}),
+            'local': AutocompleteSelect(
+                'locations:api_locais_autocomplete', params='todos=1', attrs={'class': 'form-select'}
+            ),
             'nome': forms.TextInput(attrs={
                 'class': 'form-control',
                 'placeholder': 'Nome do motor'
@@ -220,7 +227,9 @@ class MotorForm(forms.ModelForm):
                 'type': 'date'
             }),
             'status_operacional': forms.Select(attrs={'class': 'form-select'}),
-            'responsavel': forms.Select(attrs={'class': 'form-select'}),
+            'responsavel': AutocompleteSelect(
+                'authentication:api_usuarios_autocomplete', attrs={'class': 'form-select'}
+            ),
             'ativo': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
 
@@ -238,7 +247,9 @@ class MotorFilterForm(forms.Form):
         queryset=Local.objects.all(),
         required=False,
         empty_label='Todos os locais',
-        widget=forms.Select(attrs={'class': 'form-select'})
+        widget=AutocompleteSelect(
+            'locations:api_locais_autocomplete', params='todos=1', attrs={'class': 'form-select'}
+        )
     )
     
     tipo = forms.ChoiceField(
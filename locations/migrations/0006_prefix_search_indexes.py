@@ -0,0 +1,19 @@
+from django.db import migrations
+
+from core.autocomplete import prefix_index_operations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0005_alter_motor_status_operacional'),
+    ]
+
+    # Busca por prefixo do autocomplete (nome ou código)
+    operations = prefix_index_operations('locations_local', [
+        ('local_nome_prefix_idx', 'nome'),
+        ('local_codigo_prefix_idx', 'codigo'),
+    ]) + prefix_index_operations('locations_equipamento', [
+        ('equipamento_nome_prefix_idx', 'nome'),
+        ('equipamento_codigo_prefix_idx', 'codigo'),
+    ])
@@ -27,4 +27,9 @@ urlpatterns = [
     path('motores/criar/', views.motor_create, name='motor_create'),
     path('motores/<int:pk>/editar/', views.motor_edit, name='motor_edit'),
     path('motores/<int:pk>/excluir/', views.motor_delete, name='motor_delete'),
+
+    # Autocomplete
+    path('api/locais/', views.api_locais_autocomplete, name='api_locais_autocomplete'),
+    path('api/equipamentos/', views.api_equipamentos_autocomplete, name='api_equipamentos_autocomplete'),
+    path('api/locais/<int:local_id>/equipamentos/', views.api_equipamentos_por_local, name='api_equipamentos_por_local'),
 ] 
\ No newline at end of file
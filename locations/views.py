@@ -3,7 +3,14 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db.models import Q, Count, Sum
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from core.autocomplete import autocomplete_response
+from reports.cache import get_version
+from reports.encoders import dumps
 from .models import Local, Equipamento, Motor
 from .forms import LocalForm, EquipamentoForm, LocalFilterForm, EquipamentoFilterForm, MotorForm, MotorFilterForm
 
@@ -284,21 +291,53 @@ def dashboard(request):
 
 
 # API Views para AJAX
+def _equipamentos_etag(request, local_id):
+    """ETag forte da lista: muda a cada save/delete de equipamento do local"""
+    return f'equipamentos-{local_id}-{get_version("equipamentos", scope=local_id)}'
+
+
+def _equipamentos_payload(local_id):
+    """JSON compacto (bytes) dos equipamentos ativos do local, ou None se o local não existe"""
+    if not Local.objects.filter(pk=local_id).exists():
+        return None
+    rows = list(
+        Equipamento.objects.filter(local_id=local_id, ativo=True)
+        .order_by('nome', 'id')
+        .values_list('id', 'nome', 'codigo', 'tipo')
+    )
+    # Rótulos uma vez por tipo presente, em vez de get_tipo_display() por linha
+    labels = dict(Equipamento.TIPO_CHOICES)
+    tipos = {row[3] for row in rows if row[3]}
+    return dumps({
+        'local': local_id,
+        'campos': ['id', 'nome', 'codigo', 'tipo'],
+        'equipamentos': rows,
+        'tipos': {tipo: labels.get(tipo, tipo) for tipo in sorted(tipos)},
+    })
+
+
 @login_required
+@condition(etag_func=_equipamentos_etag)
 def api_equipamentos_por_local(request, local_id):
-    """API para buscar equipamentos de um local específico"""
-    try:
-        local = Local.objects.get(pk=local_id)
-        equipamentos = local.equipamentos.values('id', 'nome', 'codigo', 'tipo', 'status')
-        return JsonResponse({
-            'success': True,
-            'equipamentos': list(equipamentos)
-        })
-    except Local.DoesNotExist:
-        return JsonResponse({
-            'success': False,
-            'error': 'Local não encontrado'
-        })
+    """
+    Equipamentos ativos de um local, como linhas na ordem de `campos`.
+
+    A resposta fica em cache até o próximo save/delete de equipamento do
+    local; o navegador revalida com If-None-Match e recebe 304 sem corpo.
+    """
+    version = get_version('equipamentos', scope=local_id)
+    key = f'equipamentos_por_local:{local_id}:v{version}'
+    payload = cache.get(key)
+    if payload is None:
+        payload = _equipamentos_payload(local_id)
+        if payload is None:
+            return JsonResponse({'error': 'Local não encontrado'}, status=404)
+        cache.set(key, payload, timeout=getattr(settings, 'EQUIPAMENTOS_CACHE_TIMEOUT', 3600))
+
+    response = HttpResponse(payload, content_type='application/json')
+    # Sempre revalidar: o ETag garante que a lista nunca fica desatualizada
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 @login_required
@@ -327,6 +366,29 @@ def api_stats_local(request, local_id):
         })
 
 
+@login_required
+def api_locais_autocomplete(request):
+    """Busca de locais por prefixo do nome ou código (widgets de autocomplete)"""
+    locais = Local.objects.only('id', 'nome', 'codigo').order_by('nome', 'id')
+    if request.GET.get('todos') != '1':
+        locais = locais.filter(status='ativo')
+    return autocomplete_response(request, locais, ['nome', 'codigo'], str)
+
+
+@login_required
+def api_equipamentos_autocomplete(request):
+    """Busca de equipamentos por prefixo, opcionalmente restrita a um local"""
+    equipamentos = Equipamento.objects.only('id', 'nome', 'codigo').order_by('nome', 'id')
+    if request.GET.get('todos') != '1':
+        equipamentos = equipamentos.filter(ativo=True)
+    local_id = request.GET.get('local')
+    if local_id:
+        if not local_id.isdigit():
+            return JsonResponse({'error': 'Local inválido'}, status=400)
+        equipamentos = equipamentos.filter(local_id=local_id)
+    return autocomplete_response(request, equipamentos, ['nome', 'codigo'], str)
+
+
 # Views para Motores
 @login_required
 def motor_list(request):
@@ -0,0 +1,179 @@
+"""
+Caixa de entrada unificada: notificações do django-notifications-hq e
+CustomNotification numa única consulta
+
+As duas fontes viram colunas iguais e são combinadas com UNION ALL. A ordem
+(mais recentes primeiro) e o limite da página ficam no banco, e a paginação é
+por cursor sobre (criada_em, tipo, item_id): o filtro do cursor entra em cada
+ramo, de modo que cada um percorre só o seu índice por destinatário e data.
+As contagens de não lidas vêm como subconsultas escalares na mesma
+consulta; só uma página vazia (fim da lista) precisa de uma consulta à parte.
+"""
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.db.models import BooleanField, CharField, Count, ExpressionWrapper, F, IntegerField, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_datetime
+from notifications.models import Notification
+
+from reports.pagination import InvalidCursor, KeysetPage
+
+from .models import CustomNotification
+
+CURSOR_SALT = 'notifications_app.inbox.cursor'
+
+# Colunas dos dois ramos do UNION ALL, na mesma ordem, e a chave do item na página
+COLUMNS = (
+    ('tipo', 'type'),
+    ('item_id', 'id'),
+    ('criada_em', 'created_at'),
+    ('titulo', 'title'),
+    ('mensagem', 'message'),
+    ('prioridade', 'priority'),
+    ('lida', 'is_read'),
+    ('nao_lidas_django', None),
+    ('nao_lidas_custom', None),
+)
+
+
+def _django_notifications(user):
+    # Com SOFT_DELETE, as excluídas ficam de fora como em user.notifications.active()
+    queryset = Notification.objects.filter(recipient=user)
+    if getattr(settings, 'DJANGO_NOTIFICATIONS_CONFIG', {}).get('SOFT_DELETE', False):
+        queryset = queryset.filter(deleted=False)
+    return queryset
+
+
+def _unread_counts(user):
+    """Subconsultas escalares com as não lidas de cada fonte"""
+    def contagem(queryset, campo):
+        return Coalesce(
+            Subquery(queryset.order_by().values(campo).annotate(total=Count('pk')).values('total')[:1]),
+            0, output_field=IntegerField(),
+        )
+    return {
+        'nao_lidas_django': contagem(_django_notifications(user).filter(unread=True), 'recipient'),
+        'nao_lidas_custom': contagem(CustomNotification.objects.filter(recipient=user, is_read=False), 'recipient'),
+    }
+
+
+def _after(ramo, cursor):
+    """
+    Filtro do ramo `ramo` para os itens depois de `cursor` na ordem
+    (criada_em, tipo, item_id) decrescente. O tipo é constante em cada ramo,
+    então a comparação dele se resolve aqui e não no SQL.
+    """
+    if cursor is None:
+        return Q()
+    criada_em, cursor_tipo, item_id = cursor
+    campo = 'timestamp' if ramo == 'django' else 'created_at'
+    if ramo < cursor_tipo:
+        return Q(**{f'{campo}__lte': criada_em})
+    if ramo > cursor_tipo:
+        return Q(**{f'{campo}__lt': criada_em})
+    return Q(**{f'{campo}__lt': criada_em}) | Q(**{campo: criada_em, 'pk__lt': item_id})
+
+
+def inbox_queryset(user, cursor=None, limit=None):
+    """
+    UNION ALL das duas fontes do usuário, ordenado do mais recente para o
+    mais antigo, a partir de `cursor` (criada_em, tipo, item_id) e com até
+    `limit` linhas. Cada linha traz também as contagens de não lidas.
+    """
+    counts = _unread_counts(user)
+    django = _django_notifications(user).filter(_after('django', cursor)).annotate(
+        tipo=Value('django', output_field=CharField()),
+        item_id=F('pk'),
+        criada_em=F('timestamp'),
+        titulo=F('verb'),
+        mensagem=Coalesce('description', Value(''), output_field=CharField()),
+        prioridade=Value('normal', output_field=CharField()),
+        lida=ExpressionWrapper(Q(unread=False), output_field=BooleanField()),
+        **counts,
+    ).values(*(coluna for coluna, _ in COLUMNS))
+    custom = CustomNotification.objects.filter(recipient=user).filter(_after('custom', cursor)).annotate(
+        tipo=Value('custom', output_field=CharField()),
+        item_id=F('pk'),
+        criada_em=F('created_at'),
+        titulo=F('title'),
+        mensagem=F('message'),
+        prioridade=F('priority'),
+        lida=F('is_read'),
+        **counts,
+    ).values(*(coluna for coluna, _ in COLUMNS))
+
+    if limit is not None and connections[custom.db].features.supports_slicing_ordering_in_compound:
+        # Cada ramo já para em `limit` linhas pelo índice (PostgreSQL)
+        django = django.order_by('-timestamp', '-pk')[:limit]
+        custom = custom.order_by('-created_at', '-pk')[:limit]
+    else:
+        django = django.order_by()
+        custom = custom.order_by()
+
+    combinado = django.union(custom, all=True).order_by('-criada_em', '-tipo', '-item_id')
+    return combinado[:limit] if limit is not None else combinado
+
+
+def unread_counts(user):
+    """{'django': n, 'custom': n, 'total': n} numa consulta só"""
+    counts = _unread_counts(user)
+    # As duas subconsultas na linha do próprio usuário
+    row = type(user)._default_manager.filter(pk=user.pk).annotate(**counts).values(*counts).first()
+    django_unread = row['nao_lidas_django'] if row else 0
+    custom_unread = row['nao_lidas_custom'] if row else 0
+    return {'django': django_unread, 'custom': custom_unread, 'total': django_unread + custom_unread}
+
+
+def _encode(item):
+    return signing.dumps(
+        {'t': item['created_at'].isoformat(), 'k': item['type'], 'id': item['id']},
+        salt=CURSOR_SALT, compress=True,
+    )
+
+
+def _decode(cursor):
+    try:
+        data = signing.loads(cursor, salt=CURSOR_SALT)
+        criada_em = parse_datetime(data['t'])
+        tipo, item_id = data['k'], int(data['id'])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidCursor(cursor)
+    if criada_em is None or tipo not in ('django', 'custom'):
+        raise InvalidCursor(cursor)
+    return criada_em, tipo, item_id
+
+
+class InboxPage(KeysetPage):
+    """Página da caixa de entrada com as contagens de não lidas"""
+
+    def __init__(self, object_list, next_cursor=None, unread=None):
+        super().__init__(object_list, next_cursor=next_cursor)
+        self.unread = unread
+
+
+def get_inbox_page(user, cursor=None, per_page=10):
+    """
+    Página da caixa de entrada a partir de `cursor` (ou a primeira se o cursor
+    for inválido). Os itens são dicts com type, id, title, message,
+    priority, is_read e created_at.
+    """
+    try:
+        posicao = _decode(cursor) if cursor else None
+    except InvalidCursor:
+        posicao = None
+
+    rows = list(inbox_queryset(user, posicao, limit=per_page + 1))
+    if rows:
+        unread = {'django': rows[0]['nao_lidas_django'], 'custom': rows[0]['nao_lidas_custom']}
+        unread['total'] = unread['django'] + unread['custom']
+    else:
+        unread = unread_counts(user)
+
+    has_next = len(rows) > per_page
+    items = [
+        {chave: row[coluna] for coluna, chave in COLUMNS if chave}
+        for row in rows[:per_page]
+    ]
+    return InboxPage(items, next_cursor=_encode(items[-1]) if has_next else None, unread=unread)
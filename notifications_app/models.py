@@ -113,6 +113,10 @@ class CustomNotification(models.Model):
         verbose_name = 'Notificação Personalizada'
         verbose_name_plural = 'Notificações Personalizadas'
         ordering = ['-created_at']
+        indexes = [
+            # Ramo da caixa de entrada (inbox.py): destinatário, mais recentes primeiro
+            models.Index(fields=['recipient', '-created_at', '-id'], name='customnotif_inbox_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.recipient.get_full_name()}"
@@ -2,9 +2,8 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from django.core.paginator import Paginator
-from django.db.models import Q
 from notifications.models import Notification
+from .inbox import get_inbox_page, unread_counts
 from .models import CustomNotification, UserNotificationSettings
 from .forms import CustomNotificationForm, NotificationSettingsForm
 from .utils import send_notification
@@ -12,55 +11,12 @@ from .utils import send_notification
 
 @login_required
 def notification_list(request):
-    """Lista de notificações do usuário"""
-    # Notificações do django-notifications-hq
-    django_notifications = request.user.notifications.all()
-    
-    # Notificações personalizadas
-    custom_notifications = CustomNotification.objects.filter(recipient=request.user)
-    
-    # Combinar e paginar
-    all_notifications = []
-    
-    # Adicionar notificações do django-notifications-hq
-    for notif in django_notifications:
-        all_notifications.append({
-            'type': 'django',
-            'id': notif.id,
-            'title': str(notif.verb),
-            'message': str(notif.description) if notif.description else '',
-            'is_read': notif.unread,
-            'created_at': notif.timestamp,
-            'priority': 'normal',
-        })
-    
-    # Adicionar notificações personalizadas
-    for notif in custom_notifications:
-        all_notifications.append({
-            'type': 'custom',
-            'id': notif.id,
-            'title': notif.title,
-            'message': notif.message,
-            'is_read': notif.is_read,
-            'created_at': notif.created_at,
-            'priority': notif.priority,
-        })
-    
-    # Ordenar por data
-    all_notifications.sort(key=lambda x: x['created_at'], reverse=True)
-    
-    # Paginação
-    paginator = Paginator(all_notifications, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Estatísticas
-    unread_count = request.user.notifications.unread().count() + \
-                   CustomNotification.objects.filter(recipient=request.user, is_read=False).count()
-    
+    """Lista de notificações do usuário (as duas fontes, paginadas por cursor)"""
+    page_obj = get_inbox_page(request.user, request.GET.get('cursor'), per_page=10)
+
     context = {
         'page_obj': page_obj,
-        'unread_count': unread_count,
+        'unread_count': page_obj.unread['total'],
     }
     
     return render(request, 'notifications_app/notification_list.html', context)
@@ -195,63 +151,34 @@ def notification_settings(request):
 @login_required
 def api_unread_count(request):
     """API para contar notificações não lidas"""
-    django_unread = request.user.notifications.unread().count()
-    custom_unread = CustomNotification.objects.filter(
-        recipient=request.user, 
-        is_read=False
-    ).count()
-    
-    total_unread = django_unread + custom_unread
+    unread = unread_counts(request.user)
     
     return JsonResponse({
-        'unread_count': total_unread,
-        'django_unread': django_unread,
-        'custom_unread': custom_unread,
+        'unread_count': unread['total'],
+        'django_unread': unread['django'],
+        'custom_unread': unread['custom'],
     })
 
 
 @login_required
 def api_recent_notifications(request):
     """API para notificações recentes"""
-    limit = int(request.GET.get('limit', 5))
-    
-    # Notificações do django-notifications-hq
-    django_notifications = request.user.notifications.all()[:limit]
-    
-    # Notificações personalizadas
-    custom_notifications = CustomNotification.objects.filter(
-        recipient=request.user
-    )[:limit]
+    try:
+        limit = min(max(int(request.GET.get('limit', 5)), 1), 50)
+    except ValueError:
+        limit = 5
     
+    page = get_inbox_page(request.user, per_page=limit)
     notifications = []
-    
-    # Adicionar notificações do django-notifications-hq
-    for notif in django_notifications:
-        notifications.append({
-            'type': 'django',
-            'id': notif.id,
-            'title': str(notif.verb),
-            'message': str(notif.description) if notif.description else '',
-            'is_read': not notif.unread,
-            'created_at': notif.timestamp.strftime('%d/%m/%Y %H:%M'),
-            'priority': 'normal',
-        })
-    
-    # Adicionar notificações personalizadas
-    for notif in custom_notifications:
-        notifications.append({
-            'type': 'custom',
-            'id': notif.id,
-            'title': notif.title,
-            'message': notif.message[:100] + '...' if len(notif.message) > 100 else notif.message,
-            'is_read': notif.is_read,
-            'created_at': notif.created_at.strftime('%d/%m/%Y %H:%M'),
-            'priority': notif.priority,
-        })
-    
-    # Ordenar por data
-    notifications.sort(key=lambda x: x['created_at'], reverse=True)
+    for notif in page:
+        message = notif['message']
+        notifications.append(dict(
+            notif,
+            message=message[:100] + '...' if len(message) > 100 else message,
+            created_at=notif['created_at'].strftime('%d/%m/%Y %H:%M'),
+        ))
     
     return JsonResponse({
-        'notifications': notifications[:limit]
-    }) 
\ No newline at end of file
+        'notifications': notifications,
+        'unread_count': page.unread['total'],
+    })
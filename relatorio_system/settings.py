@@ -72,11 +72,30 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'reports.context_processors.cache_versions',
             ],
         },
     },
 ]
 
+# Produção: templates compilados uma vez por processo (cached loader explícito)
+if ENVIRONMENT == 'production':
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
+# Validade (s) dos fragmentos de template em cache; as chaves já mudam com
+# os carimbos de versão, o timeout só limita o espaço ocupado
+TEMPLATE_FRAGMENT_TIMEOUT = config('TEMPLATE_FRAGMENT_TIMEOUT', default=600, cast=int)
+
+# Validade (s) da lista de equipamentos por local em cache (invalidada pelos
+# sinais de Equipamento; o ETag acompanha a mesma versão)
+EQUIPAMENTOS_CACHE_TIMEOUT = config('EQUIPAMENTOS_CACHE_TIMEOUT', default=3600, cast=int)
+
 WSGI_APPLICATION = 'relatorio_system.wsgi.application'
 
 # Configuração do banco de dados baseada no ambiente
@@ -189,6 +208,85 @@ CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 
+# Cache: Redis em produção (REDIS_URL), memória local no desenvolvimento
+if ENVIRONMENT == 'production' and config('REDIS_URL', default=''):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('REDIS_URL'),
+            'KEY_PREFIX': 'relatorios',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'relatorios',
+        }
+    }
+
+# Validade (s) dos payloads de analytics em cache; mudanças nos relatórios
+# invalidam antes disso pelo contador de versão
+ANALYTICS_CACHE_TIMEOUT = config('ANALYTICS_CACHE_TIMEOUT', default=300, cast=int)
+
+# Seções do dashboard de analytics em paralelo num pool compartilhado de
+# ANALYTICS_SECTION_WORKERS threads (uma conexão por thread), com prazo em
+# segundos por seção; depois dele o banco interrompe a consulta da seção
+ANALYTICS_PARALLEL_SECTIONS = config('ANALYTICS_PARALLEL_SECTIONS', default=True, cast=bool)
+ANALYTICS_SECTION_WORKERS = config('ANALYTICS_SECTION_WORKERS', default=4, cast=int)
+ANALYTICS_SECTION_TIMEOUT = config('ANALYTICS_SECTION_TIMEOUT', default=10, cast=float)
+
+# Criação de relatórios em lote: relatórios por transação/bulk_create e
+# limite de equipamentos por requisição da API
+REPORTS_BULK_BATCH_SIZE = config('REPORTS_BULK_BATCH_SIZE', default=500, cast=int)
+REPORTS_BULK_MAX_TARGETS = config('REPORTS_BULK_MAX_TARGETS', default=50000, cast=int)
+
+# Linhas por bulk_create na importação de CSV/XLSX (manage.py import_data e admin)
+IMPORT_BATCH_SIZE = config('IMPORT_BATCH_SIZE', default=2000, cast=int)
+
+# Linhas lidas por vez (cursor no servidor) na exportação CSV/XLSX da lista de relatórios
+REPORTS_EXPORT_CHUNK_SIZE = config('REPORTS_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# PDF dos relatórios: resolução das imagens embutidas (reduzidas ao tamanho em
+# que aparecem na página), pasta do storage onde ficam os PDFs renderizados
+# (um por versão do relatório) e idade, em segundos, a partir da qual as
+# versões anteriores são removidas (downloads em andamento ainda as leem)
+REPORTS_PDF_IMAGE_DPI = config('REPORTS_PDF_IMAGE_DPI', default=150, cast=int)
+REPORTS_PDF_STORAGE_DIR = 'reports/pdf'
+REPORTS_PDF_OLD_VERSION_AGE = config('REPORTS_PDF_OLD_VERSION_AGE', default=3600, cast=int)
+
+# Variantes responsivas das fotos (core.images): geradas depois do commit num
+# pool de threads do processo web; False processa na própria requisição
+IMAGE_VARIANTS_ASYNC = config('IMAGE_VARIANTS_ASYNC', default=True, cast=bool)
+IMAGE_VARIANTS_WORKERS = config('IMAGE_VARIANTS_WORKERS', default=2, cast=int)
+
+# Upload de imagens (core.uploads): tamanho máximo por arquivo, lado maior do
+# que é gravado em MEDIA_ROOT (fotos maiores são reduzidas no upload), limite
+# de resolução lido do cabeçalho e qualidade do JPEG recomprimido
+UPLOAD_IMAGE_MAX_BYTES = config('UPLOAD_IMAGE_MAX_BYTES', default=20 * 1024 * 1024, cast=int)
+UPLOAD_IMAGE_MAX_SIDE = config('UPLOAD_IMAGE_MAX_SIDE', default=2560, cast=int)
+UPLOAD_IMAGE_MAX_PIXELS = 80_000_000
+UPLOAD_IMAGE_QUALITY = 85
+
+FILE_UPLOAD_HANDLERS = [
+    'core.uploads.ImageUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Fotos dos relatórios gravadas uma vez por conteúdo (reports.storage) e
+# carência antes de o collect_blobs remover um blob sem referências
+REPORTS_BLOB_DIR = 'reports/blobs'
+REPORTS_BLOB_GC_GRACE_HOURS = config('REPORTS_BLOB_GC_GRACE_HOURS', default=24, cast=int)
+
+# Upload de fotos em partes (reports.chunked_upload): pasta das partes
+# recebidas (vazio = pasta temporária do sistema), tamanho de parte sugerido
+# ao cliente, maior parte aceita e validade de um upload parado
+CHUNKED_UPLOAD_DIR = config('CHUNKED_UPLOAD_DIR', default='')
+CHUNKED_UPLOAD_CHUNK_SIZE = config('CHUNKED_UPLOAD_CHUNK_SIZE', default=512 * 1024, cast=int)
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 8 * 1024 * 1024
+CHUNKED_UPLOAD_EXPIRY_HOURS = config('CHUNKED_UPLOAD_EXPIRY_HOURS', default=24, cast=int)
+
 # Security settings baseadas no ambiente
 if ENVIRONMENT == 'production' or not DEBUG:
     SECURE_BROWSER_XSS_FILTER = True
@@ -1,4 +1,15 @@
+import tempfile
+
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+
+from .forms import ImportForm
+from .importer import ImportFileError, import_file
 from .models import Report, ReportCategory, ReportData, ReportImage, ReportUpdate, ReportUpdateImage
 
 
@@ -65,6 +76,46 @@ class ReportAdmin(admin.ModelAdmin):
             obj.usuario = request.user
         super().save_model(request, obj, form, change)
 
+    change_list_template = 'admin/reports/report/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('importar/', self.admin_site.admin_view(self.import_view), name='reports_report_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """Importação de locais, equipamentos ou relatórios em massa (reports/importer.py)"""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        form = ImportForm(request.POST or None, request.FILES or None)
+        result = None
+        erros_url = None
+        if request.method == 'POST' and form.is_valid():
+            arquivo = form.cleaned_data['arquivo']
+            with tempfile.TemporaryFile(mode='w+', encoding='utf-8', newline='') as erros:
+                try:
+                    result = import_file(form.cleaned_data['tipo'], arquivo.file, arquivo.name, error_stream=erros)
+                except ImportFileError as e:
+                    form.add_error('arquivo', str(e))
+                else:
+                    if result.total_erros:
+                        erros.seek(0)
+                        nome = default_storage.save(
+                            f'imports/erros-{timezone.now():%Y%m%d-%H%M%S}.csv', File(erros)
+                        )
+                        erros_url = default_storage.url(nome)
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Importar equipamentos ou relatórios',
+            'opts': self.model._meta,
+            'form': form,
+            'result': result,
+            'erros_url': erros_url,
+        }
+        return TemplateResponse(request, 'admin/reports/report/import.html', context)
+
 
 @admin.register(ReportData)
 class ReportDataAdmin(admin.ModelAdmin):
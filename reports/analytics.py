@@ -7,10 +7,14 @@ from django.db.models import Count, Avg, Q, F, Sum, Max, Min
 from django.db.models.functions import TruncDate, TruncWeek, TruncMonth, TruncYear
 from django.utils import timezone
 from datetime import datetime, timedelta
-from collections import defaultdict
 import json
 
 from .models import Report, ReportUpdate
+from .sections import Section, run_sections
+from .queries import (
+    build_trends, comparison_windows, first_response_seconds, get_resolution_time_stats,
+    get_window_stats, resolution_seconds,
+)
 from locations.models import Local, Equipamento
 from django.contrib.auth import get_user_model
 
@@ -32,7 +36,7 @@ class ReportAnalytics:
     
     def get_overview_stats(self):
         """Estatísticas gerais do sistema"""
-        queryset = Report.objects.filter(
+        queryset = Report.objects.ativos().filter(
             data_criacao__range=self.date_range
         )
         
@@ -62,27 +66,20 @@ class ReportAnalytics:
             avg_progress = queryset.aggregate(avg=Avg('progresso'))['avg'] or 0
             stats['progresso_medio'] = round(avg_progress, 1)
             
-            # Tempo médio de resolução (em dias)
-            resolved_reports = queryset.filter(status='resolvido')
-            if resolved_reports.exists():
-                tempo_total = 0
-                count = 0
-                for report in resolved_reports:
-                    diff = report.data_atualizacao - report.data_criacao
-                    tempo_total += diff.total_seconds()
-                    count += 1
-                
-                if count > 0:
-                    tempo_medio_segundos = tempo_total / count
-                    stats['tempo_medio_resolucao'] = round(
-                        tempo_medio_segundos / (24 * 3600), 1  # Converter para dias
-                    )
+            # Tempo médio de resolução (em dias), calculado no banco
+            tempo_medio_segundos = queryset.filter(status='resolvido').aggregate(
+                media=Avg(resolution_seconds())
+            )['media']
+            if tempo_medio_segundos:
+                stats['tempo_medio_resolucao'] = round(
+                    float(tempo_medio_segundos) / (24 * 3600), 1  # Converter para dias
+                )
         
         return stats
     
     def get_priority_distribution(self):
         """Distribuição por prioridade"""
-        queryset = Report.objects.filter(data_criacao__range=self.date_range)
+        queryset = Report.objects.ativos().filter(data_criacao__range=self.date_range)
         
         if self.user and not self.user.is_staff:
             queryset = queryset.filter(
@@ -113,7 +110,7 @@ class ReportAnalytics:
     
     def get_location_performance(self):
         """Performance por local"""
-        queryset = Report.objects.filter(
+        queryset = Report.objects.ativos().filter(
             data_criacao__range=self.date_range,
             local__isnull=False
         )
@@ -159,7 +156,7 @@ class ReportAnalytics:
     
     def get_user_performance(self):
         """Performance por usuário"""
-        queryset = Report.objects.filter(data_criacao__range=self.date_range)
+        queryset = Report.objects.ativos().filter(data_criacao__range=self.date_range)
         
         # Performance dos autores
         author_performance = queryset.values(
@@ -212,7 +209,7 @@ class ReportAnalytics:
     
     def get_timeline_data(self, group_by='day'):
         """Dados da timeline de relatórios"""
-        queryset = Report.objects.filter(data_criacao__range=self.date_range)
+        queryset = Report.objects.ativos().filter(data_criacao__range=self.date_range)
         
         if self.user and not self.user.is_staff:
             queryset = queryset.filter(
@@ -242,7 +239,7 @@ class ReportAnalytics:
     
     def get_equipment_issues(self):
         """Equipamentos com mais problemas"""
-        queryset = Report.objects.filter(
+        queryset = Report.objects.ativos().filter(
             data_criacao__range=self.date_range,
             equipamento__isnull=False
         )
@@ -278,106 +275,71 @@ class ReportAnalytics:
         return list(equipment_stats)
     
     def get_response_time_analysis(self):
-        """Análise de tempo de resposta"""
-        updates = ReportUpdate.objects.filter(
-            report__data_criacao__range=self.date_range
-        ).select_related('report')
+        """Análise de tempo de resposta (até a primeira resposta, em horas)"""
+        queryset = Report.objects.ativos().filter(
+            data_criacao__range=self.date_range,
+            primeira_resposta_em__isnull=False
+        )
         
         if self.user and not self.user.is_staff:
-            updates = updates.filter(
-                Q(report__usuario=self.user) | Q(report__atribuido_para=self.user)
+            queryset = queryset.filter(
+                Q(usuario=self.user) | Q(atribuido_para=self.user)
             )
         
-        # Calcular tempo até primeira atualização
-        first_updates = []
-        for update in updates:
-            if update.progresso_anterior == 0:  # Primeira atualização
-                time_to_first = update.data_atualizacao - update.report.data_criacao
-                first_updates.append({
-                    'report_id': update.report.id,
-                    'tempo_primeira_resposta': time_to_first.total_seconds() / 3600,  # Em horas
-                    'prioridade': update.report.prioridade
-                })
-        
-        # Agrupar por prioridade
-        response_by_priority = defaultdict(list)
-        for update in first_updates:
-            response_by_priority[update['prioridade']].append(
-                update['tempo_primeira_resposta']
-            )
+        response_by_priority = queryset.values('prioridade').annotate(
+            total_reports=Count('id'),
+            tempo_medio=Avg(first_response_seconds()),
+            tempo_min=Min(first_response_seconds()),
+            tempo_max=Max(first_response_seconds())
+        ).order_by('prioridade')
         
         # Calcular estatísticas por prioridade
         priority_stats = {}
-        for priority, times in response_by_priority.items():
-            if times:
-                priority_stats[priority] = {
-                    'tempo_medio': round(sum(times) / len(times), 1),
-                    'tempo_min': round(min(times), 1),
-                    'tempo_max': round(max(times), 1),
-                    'total_reports': len(times)
-                }
+        for item in response_by_priority:
+            priority_stats[item['prioridade']] = {
+                'tempo_medio': round(float(item['tempo_medio']) / 3600, 1),
+                'tempo_min': round(float(item['tempo_min']) / 3600, 1),
+                'tempo_max': round(float(item['tempo_max']) / 3600, 1),
+                'total_reports': item['total_reports']
+            }
         
         return priority_stats
     
-    def get_trends_analysis(self):
-        """Análise de tendências"""
-        # Comparar período atual com período anterior
-        current_start, current_end = self.date_range
-        period_length = current_end - current_start
-        previous_start = current_start - period_length
-        previous_end = current_start
-        
-        # Estatísticas do período atual
-        current_stats = self._get_period_stats(current_start, current_end)
-        
-        # Estatísticas do período anterior
-        previous_stats = self._get_period_stats(previous_start, previous_end)
-        
-        # Calcular variações percentuais
-        trends = {}
-        for key in current_stats:
-            current_val = current_stats[key]
-            previous_val = previous_stats.get(key, 0)
-            
-            if previous_val > 0:
-                variation = ((current_val - previous_val) / previous_val) * 100
-            else:
-                variation = 100 if current_val > 0 else 0
-            
-            trends[key] = {
-                'atual': current_val,
-                'anterior': previous_val,
-                'variacao': round(variation, 1),
-                'tendencia': 'up' if variation > 0 else 'down' if variation < 0 else 'stable'
-            }
+    def get_resolution_time_stats(self):
+        """
+        Média, mediana e p90 do tempo de resolução por prioridade, local e
+        responsável, dos relatórios resolvidos no período (resolvido_em, pelo
+        índice report_ativo_resolvido_idx): um relatório aberto antes do
+        período e resolvido nele entra aqui.
+        """
+        queryset = Report.objects.ativos().filter(resolvido_em__range=self.date_range)
         
-        return trends
+        if self.user and not self.user.is_staff:
+            queryset = queryset.filter(
+                Q(usuario=self.user) | Q(atribuido_para=self.user)
+            )
+        
+        return get_resolution_time_stats(queryset)
     
-    def _get_period_stats(self, start_date, end_date):
-        """Estatísticas para um período específico"""
-        queryset = Report.objects.filter(
-            data_criacao__range=(start_date, end_date)
-        )
+    def get_trends_analysis(self, janelas=2, passo='period'):
+        """
+        Análise de tendências: compara o período atual com as `janelas` - 1
+        janelas anteriores (mesmo tamanho, ou semana/mês/ano com `passo`)
+        em uma única consulta agrupada.
+        """
+        queryset = Report.objects.ativos()
         
         if self.user and not self.user.is_staff:
             queryset = queryset.filter(
                 Q(usuario=self.user) | Q(atribuido_para=self.user)
             )
         
-        total = queryset.count()
-        
-        return {
-            'total_reports': total,
-            'resolvidos': queryset.filter(status='resolvido').count(),
-            'em_andamento': queryset.filter(status='em_andamento').count(),
-            'pendentes': queryset.filter(status='pendente').count(),
-            'criticos': queryset.filter(prioridade='critica').count(),
-            'alta_prioridade': queryset.filter(prioridade='alta').count(),
-        }
+        windows = comparison_windows(*self.date_range, janelas=janelas, passo=passo)
+        return build_trends(windows, get_window_stats(queryset, windows))
     
     def get_productivity_metrics(self):
         """Métricas de produtividade"""
-        queryset = Report.objects.filter(data_criacao__range=self.date_range)
+        queryset = Report.objects.ativos().filter(data_criacao__range=self.date_range)
         
         if self.user and not self.user.is_staff:
             queryset = queryset.filter(
@@ -393,26 +355,10 @@ class ReportAnalytics:
         completed_reports = queryset.filter(status='resolvido').count()
         completion_rate = (completed_reports / total_reports * 100) if total_reports > 0 else 0
         
-        # Tempo médio de resolução por prioridade
-        resolution_times = {}
-        for priority, _ in Report.PRIORIDADE_CHOICES:
-            priority_reports = queryset.filter(
-                prioridade=priority,
-                status='resolvido'
-            )
-            
-            if priority_reports.exists():
-                total_time = 0
-                count = 0
-                for report in priority_reports:
-                    time_diff = report.data_atualizacao - report.data_criacao
-                    total_time += time_diff.total_seconds()
-                    count += 1
-                
-                avg_time_hours = (total_time / count) / 3600 if count > 0 else 0
-                resolution_times[priority] = round(avg_time_hours, 1)
-            else:
-                resolution_times[priority] = 0
+        # Tempo médio de resolução por prioridade (em horas) dos resolvidos no período
+        resolution_times = {priority: 0 for priority, _ in Report.PRIORIDADE_CHOICES}
+        for item in self.get_resolution_time_stats()['prioridade']:
+            resolution_times[item['chave']] = item['media_horas']
         
         return {
             'reports_por_dia': round(reports_per_day, 1),
@@ -448,18 +394,25 @@ class DashboardData:
         
         return (start_date, end_date)
     
-    def get_complete_dashboard_data(self):
-        """Retorna todos os dados para o dashboard"""
-        return {
-            'overview': self.analytics.get_overview_stats(),
-            'priority_distribution': self.analytics.get_priority_distribution(),
-            'location_performance': self.analytics.get_location_performance(),
-            'user_performance': self.analytics.get_user_performance(),
-            'timeline': self.analytics.get_timeline_data(),
-            'equipment_issues': self.analytics.get_equipment_issues(),
-            'response_times': self.analytics.get_response_time_analysis(),
-            'trends': self.analytics.get_trends_analysis(),
-            'productivity': self.analytics.get_productivity_metrics(),
+    def get_complete_dashboard_data(self, parallel=None):
+        """Retorna todos os dados para o dashboard, com as seções em paralelo (ver reports.sections)"""
+        analytics = self.analytics
+        data, timings = run_sections({
+            'overview': Section(analytics.get_overview_stats, {}),
+            'priority_distribution': Section(analytics.get_priority_distribution, []),
+            'location_performance': Section(analytics.get_location_performance, []),
+            'user_performance': Section(analytics.get_user_performance, {}),
+            'timeline': Section(analytics.get_timeline_data, []),
+            'equipment_issues': Section(analytics.get_equipment_issues, []),
+            'response_times': Section(analytics.get_response_time_analysis, {}),
+            'trends': Section(analytics.get_trends_analysis, {}),
+            'productivity': Section(analytics.get_productivity_metrics, {}),
+            'resolution_times': Section(analytics.get_resolution_time_stats, {}),
+        }, parallel=parallel)
+        
+        data.update({
             'period': self.period,
-            'date_range': self.analytics.date_range,
-        } 
\ No newline at end of file
+            'date_range': analytics.date_range,
+            'sections': timings,
+        })
+        return data
@@ -1,14 +1,18 @@
 """
 Sistema de Analytics Simplificado para evitar referências circulares
+
+As métricas são lidas da tabela de fatos diária (ReportDailyRollup), então o
+custo depende do número de dias e combinações de dimensões, não de relatórios.
 """
 
-from django.db.models import Count, Avg, Q, F
-from django.db.models.functions import TruncDate
+from django.db.models import Q, Sum
 from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
 
-from .models import Report
+from .models import Report, ReportDailyRollup
+from .sections import Section, run_sections
+from .queries import build_trends, comparison_windows, get_resolution_time_stats, get_window_stats
 from locations.models import Local, Equipamento
 from django.contrib.auth import get_user_model
 
@@ -38,24 +42,54 @@ class SimpleReportAnalytics:
             return value.total_seconds()
         return value
     
-    def get_overview_stats(self):
-        """Estatísticas gerais do sistema"""
-        queryset = Report.objects.filter(
-            data_criacao__range=self.date_range
-        )
+    def _to_date(self, value):
+        """Converte um limite do período em data local"""
+        if isinstance(value, datetime):
+            return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+        return value
+
+    def _get_scoped_rollup(self):
+        """Linhas do rollup diário visíveis para o usuário"""
+        queryset = ReportDailyRollup.objects.all()
         
         if self.user and not self.user.is_staff:
             queryset = queryset.filter(
                 Q(usuario=self.user) | Q(atribuido_para=self.user)
             )
         
-        total_reports = queryset.count()
+        return queryset
+    
+    def _get_rollup_queryset(self):
+        """Linhas do rollup diário no período, respeitando as permissões do usuário"""
+        start, end = self.date_range
+        return self._get_scoped_rollup().filter(
+            data__range=(self._to_date(start), self._to_date(end))
+        )
+    
+    def _status_sums(self):
+        """Somas de relatórios por status para agregações do rollup"""
+        return {
+            'resolvidos': Sum('total', filter=Q(status='resolvido')),
+            'em_andamento': Sum('total', filter=Q(status='em_andamento')),
+            'pendentes': Sum('total', filter=Q(status='pendente')),
+        }
+    
+    def get_overview_stats(self):
+        """Estatísticas gerais do sistema"""
+        totals = self._get_rollup_queryset().aggregate(
+            total_reports=Sum('total'),
+            progresso=Sum('progresso_soma'),
+            resolucao=Sum('resolucao_segundos_soma'),
+            **self._status_sums()
+        )
+        
+        total_reports = totals['total_reports'] or 0
         
         stats = {
             'total_reports': total_reports,
-            'reports_pendentes': queryset.filter(status='pendente').count(),
-            'reports_em_andamento': queryset.filter(status='em_andamento').count(),
-            'reports_resolvidos': queryset.filter(status='resolvido').count(),
+            'reports_pendentes': totals['pendentes'] or 0,
+            'reports_em_andamento': totals['em_andamento'] or 0,
+            'reports_resolvidos': totals['resolvidos'] or 0,
             'taxa_resolucao': 0,
             'tempo_medio_resolucao': 0,
             'progresso_medio': 0,
@@ -67,51 +101,35 @@ class SimpleReportAnalytics:
             )
             
             # Progresso médio
-            avg_progress = queryset.aggregate(avg=Avg('progresso'))['avg'] or 0
-            stats['progresso_medio'] = round(float(avg_progress), 1)
+            stats['progresso_medio'] = round((totals['progresso'] or 0) / total_reports, 1)
             
             # Tempo médio de resolução (em dias)
-            resolved_reports = queryset.filter(status='resolvido')
-            if resolved_reports.exists():
-                tempo_total = 0
-                count = 0
-                for report in resolved_reports:
-                    diff = report.data_atualizacao - report.data_criacao
-                    tempo_total += diff.total_seconds()
-                    count += 1
-                
-                if count > 0:
-                    tempo_medio_segundos = tempo_total / count
-                    stats['tempo_medio_resolucao'] = round(
-                        tempo_medio_segundos / (24 * 3600), 1  # Converter para dias
-                    )
+            if stats['reports_resolvidos']:
+                tempo_medio_segundos = (totals['resolucao'] or 0) / stats['reports_resolvidos']
+                stats['tempo_medio_resolucao'] = round(
+                    tempo_medio_segundos / (24 * 3600), 1  # Converter para dias
+                )
         
         return stats
     
     def get_priority_distribution(self):
         """Distribuição por prioridade"""
-        queryset = Report.objects.filter(data_criacao__range=self.date_range)
-        
-        if self.user and not self.user.is_staff:
-            queryset = queryset.filter(
-                Q(usuario=self.user) | Q(atribuido_para=self.user)
-            )
-        
-        distribution = queryset.values('prioridade').annotate(
-            count=Count('id'),
-            resolvidos=Count('id', filter=Q(status='resolvido')),
-            progresso_medio=Avg('progresso')
-        ).order_by('prioridade')
+        distribution = list(self._get_rollup_queryset().values('prioridade').annotate(
+            count=Sum('total'),
+            resolvidos=Sum('total', filter=Q(status='resolvido')),
+            progresso_soma=Sum('progresso_soma')
+        ).order_by('prioridade'))
         
         # Calcular percentuais
-        total = queryset.count()
+        total = sum(item['count'] for item in distribution)
         result = []
         for item in distribution:
+            resolvidos = item['resolvidos'] or 0
             clean_item = {
                 'prioridade': item['prioridade'],
                 'count': item['count'],
-                'resolvidos': item['resolvidos'],
-                'progresso_medio': round(float(item['progresso_medio'] or 0), 1),
+                'resolvidos': resolvidos,
+                'progresso_medio': round(item['progresso_soma'] / item['count'], 1) if item['count'] else 0,
                 'percentual': 0,
                 'taxa_resolucao': 0
             }
@@ -119,7 +137,7 @@ class SimpleReportAnalytics:
             if total > 0:
                 clean_item['percentual'] = round((item['count'] / total) * 100, 1)
                 clean_item['taxa_resolucao'] = round(
-                    (item['resolvidos'] / item['count']) * 100, 1
+                    (resolvidos / item['count']) * 100, 1
                 ) if item['count'] > 0 else 0
             
             result.append(clean_item)
@@ -128,31 +146,20 @@ class SimpleReportAnalytics:
     
     def get_timeline_data(self, group_by='day'):
         """Dados da timeline de relatórios"""
-        queryset = Report.objects.filter(data_criacao__range=self.date_range)
-        
-        if self.user and not self.user.is_staff:
-            queryset = queryset.filter(
-                Q(usuario=self.user) | Q(atribuido_para=self.user)
-            )
-        
-        timeline = queryset.annotate(
-            periodo=TruncDate('data_criacao')
-        ).values('periodo').annotate(
-            criados=Count('id'),
-            resolvidos=Count('id', filter=Q(status='resolvido')),
-            em_andamento=Count('id', filter=Q(status='em_andamento')),
-            pendentes=Count('id', filter=Q(status='pendente'))
-        ).order_by('periodo')
+        timeline = self._get_rollup_queryset().values('data').annotate(
+            criados=Sum('total'),
+            **self._status_sums()
+        ).order_by('data')
         
         # Converter para formato serializable
         result = []
         for item in timeline:
             clean_item = {
-                'periodo': item['periodo'].isoformat(),
+                'periodo': item['data'].isoformat(),
                 'criados': item['criados'],
-                'resolvidos': item['resolvidos'],
-                'em_andamento': item['em_andamento'],
-                'pendentes': item['pendentes']
+                'resolvidos': item['resolvidos'] or 0,
+                'em_andamento': item['em_andamento'] or 0,
+                'pendentes': item['pendentes'] or 0
             }
             result.append(clean_item)
         
@@ -160,92 +167,112 @@ class SimpleReportAnalytics:
     
     def get_location_performance(self):
         """Performance por local"""
-        queryset = Report.objects.filter(
-            data_criacao__range=self.date_range,
+        performance = self._get_rollup_queryset().filter(
             local__isnull=False
-        )
-        
-        if self.user and not self.user.is_staff:
-            queryset = queryset.filter(
-                Q(usuario=self.user) | Q(atribuido_para=self.user)
-            )
-        
-        performance = queryset.values(
+        ).values(
             'local__nome', 'local__id'
         ).annotate(
-            total_reports=Count('id'),
-            resolvidos=Count('id', filter=Q(status='resolvido')),
-            em_andamento=Count('id', filter=Q(status='em_andamento')),
-            pendentes=Count('id', filter=Q(status='pendente')),
-            progresso_medio=Avg('progresso')
+            total_reports=Sum('total'),
+            progresso_soma=Sum('progresso_soma'),
+            resolucao_soma=Sum('resolucao_segundos_soma', filter=Q(status='resolvido')),
+            **self._status_sums()
         ).order_by('-total_reports')
         
         # Calcular métricas adicionais
         result = []
         for item in performance:
+            resolvidos = item['resolvidos'] or 0
             clean_item = {
                 'local__nome': item['local__nome'],
                 'local__id': item['local__id'],
                 'total_reports': item['total_reports'],
-                'resolvidos': item['resolvidos'],
-                'em_andamento': item['em_andamento'],
-                'pendentes': item['pendentes'],
-                'progresso_medio': round(float(item['progresso_medio'] or 0), 1),
+                'resolvidos': resolvidos,
+                'em_andamento': item['em_andamento'] or 0,
+                'pendentes': item['pendentes'] or 0,
+                'progresso_medio': round(item['progresso_soma'] / item['total_reports'], 1) if item['total_reports'] else 0,
                 'taxa_resolucao': 0,
                 'tempo_medio_dias': 0
             }
             
             if item['total_reports'] > 0:
                 clean_item['taxa_resolucao'] = round(
-                    (item['resolvidos'] / item['total_reports']) * 100, 1
+                    (resolvidos / item['total_reports']) * 100, 1
+                )
+            
+            if resolvidos:
+                clean_item['tempo_medio_dias'] = round(
+                    (item['resolucao_soma'] or 0) / resolvidos / (24 * 3600), 1
                 )
             
             result.append(clean_item)
         
         return result
     
-    def get_equipment_issues(self):
-        """Equipamentos com mais problemas"""
-        queryset = Report.objects.filter(
-            data_criacao__range=self.date_range,
-            equipamento__isnull=False
-        )
+    def get_resolution_time_stats(self):
+        """
+        Média, mediana e p90 do tempo de resolução por prioridade, local e
+        responsável. Percentis não saem de somas, então esta consulta lê os
+        relatórios resolvidos no período (resolvido_em, pelo índice
+        report_ativo_resolvido_idx), numa única consulta agrupada.
+        """
+        queryset = Report.objects.ativos().filter(resolvido_em__range=self.date_range)
         
         if self.user and not self.user.is_staff:
             queryset = queryset.filter(
                 Q(usuario=self.user) | Q(atribuido_para=self.user)
             )
         
-        equipment_stats = queryset.values(
+        return get_resolution_time_stats(queryset)
+    
+    def get_trends_analysis(self, janelas=2, passo='period'):
+        """
+        Compara o período atual com as janelas anteriores (mesmo tamanho, ou
+        semana/mês/ano com `passo`) em uma única consulta agrupada no rollup.
+        """
+        start, end = self.date_range
+        # O rollup é diário: janelas em datas locais, com o fim exclusivo
+        windows = comparison_windows(
+            self._to_date(start), self._to_date(end) + timedelta(days=1),
+            janelas=janelas, passo=passo
+        )
+        stats = get_window_stats(self._get_scoped_rollup(), windows, date_field='data', sum_field='total')
+        return build_trends(windows, stats)
+    
+    def get_equipment_issues(self):
+        """Equipamentos com mais problemas"""
+        equipment_stats = self._get_rollup_queryset().filter(
+            equipamento__isnull=False
+        ).values(
             'equipamento__nome', 
             'equipamento__codigo',
             'equipamento__tipo',
             'equipamento__local__nome'
         ).annotate(
-            total_issues=Count('id'),
-            issues_resolvidas=Count('id', filter=Q(status='resolvido')),
-            issues_pendentes=Count('id', filter=Q(status='pendente')),
-            progresso_medio=Avg('progresso')
+            total_issues=Sum('total'),
+            issues_resolvidas=Sum('total', filter=Q(status='resolvido')),
+            issues_pendentes=Sum('total', filter=Q(status='pendente')),
+            progresso_soma=Sum('progresso_soma')
         ).order_by('-total_issues')
         
         # Calcular métricas adicionais
         result = []
         for item in equipment_stats:
+            issues_resolvidas = item['issues_resolvidas'] or 0
             clean_item = {
                 'equipamento__nome': item['equipamento__nome'],
                 'equipamento__codigo': item['equipamento__codigo'],
                 'equipamento__tipo': item['equipamento__tipo'],
                 'equipamento__local__nome': item['equipamento__local__nome'],
                 'total_issues': item['total_issues'],
-                'issues_resolvidas': item['issues_resolvidas'],
-                'issues_pendentes': item['issues_pendentes'],
-                'progresso_medio': round(float(item['progresso_medio'] or 0), 1),
+                'issues_resolvidas': issues_resolvidas,
+                'issues_pendentes': item['issues_pendentes'] or 0,
+                'progresso_medio': round(item['progresso_soma'] / item['total_issues'], 1) if item['total_issues'] else 0,
                 'taxa_resolucao': 0
             }
             
             if item['total_issues'] > 0:
                 clean_item['taxa_resolucao'] = round(
-                    (item['issues_resolvidas'] / item['total_issues']) * 100, 1
+                    (issues_resolvidas / item['total_issues']) * 100, 1
                 )
             
             result.append(clean_item)
@@ -277,21 +304,30 @@ class SimpleDashboardData:
         
         return (start_date, end_date)
     
-    def get_complete_dashboard_data(self):
-        """Retorna todos os dados para o dashboard de forma serializable"""
-        return {
-            'overview': self.analytics.get_overview_stats(),
-            'priority_distribution': self.analytics.get_priority_distribution(),
-            'location_performance': self.analytics.get_location_performance(),
-            'timeline': self.analytics.get_timeline_data(),
-            'equipment_issues': self.analytics.get_equipment_issues(),
+    def get_complete_dashboard_data(self, parallel=None):
+        """
+        Retorna todos os dados para o dashboard de forma serializable.
+
+        As seções rodam em paralelo (ver reports.sections); a chave 'sections'
+        traz o status e o tempo de cada uma.
+        """
+        analytics = self.analytics
+        data, timings = run_sections({
+            'overview': Section(analytics.get_overview_stats, {}),
+            'priority_distribution': Section(analytics.get_priority_distribution, []),
+            'location_performance': Section(analytics.get_location_performance, []),
+            'timeline': Section(analytics.get_timeline_data, []),
+            'equipment_issues': Section(analytics.get_equipment_issues, []),
+            'resolution_times': Section(analytics.get_resolution_time_stats, {}),
+            'trends': Section(analytics.get_trends_analysis, {}),
+        }, parallel=parallel)
+        
+        data.update({
             'period': self.period,
             'date_range': [
-                self.analytics.date_range[0].isoformat(),
-                self.analytics.date_range[1].isoformat()
+                analytics.date_range[0].isoformat(),
+                analytics.date_range[1].isoformat()
             ],
-            'trends': {  # Dados básicos de tendências
-                'total_reports': {'variacao': 0, 'tendencia': 'stable'},
-                'resolvidos': {'variacao': 0, 'tendencia': 'stable'}
-            }
-        }
\ No newline at end of file
+            'sections': timings,
+        })
+        return data
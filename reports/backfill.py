@@ -0,0 +1,58 @@
+"""
+Preenchimento dos marcos de SLA dos relatórios a partir do histórico
+"""
+
+from django.db.models import Max, Min, Q
+
+MILESTONE_FIELDS = ['primeira_resposta_em', 'resolvido_em', 'tempo_resolucao_segundos']
+
+
+def backfill_report_milestones(report_model=None, using='default', batch_size=1000, progress=None):
+    """
+    Recalcula primeira_resposta_em, resolvido_em e tempo_resolucao_segundos
+    de todos os relatórios, em lotes por id.
+
+    A primeira resposta é a primeira ReportUpdate do relatório; a resolução é
+    a última ReportUpdate que levou o status a 'resolvido' (sem histórico,
+    data_atualizacao é a melhor aproximação disponível). Aceita o modelo
+    histórico para uso em migrações. Retorna o número de relatórios processados.
+    """
+    if report_model is None:
+        from .models import Report as report_model
+
+    reports = report_model._default_manager.using(using).only(
+        'id', 'status', 'data_criacao', 'data_atualizacao', *MILESTONE_FIELDS
+    ).annotate(
+        primeira_atualizacao=Min('atualizacoes__data_atualizacao'),
+        ultima_resolucao=Max(
+            'atualizacoes__data_atualizacao', filter=Q(atualizacoes__status_novo='resolvido')
+        ),
+    ).order_by('id')
+
+    total = 0
+    last_id = 0
+    while True:
+        batch = list(reports.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return total
+
+        for report in batch:
+            primeira = report.primeira_atualizacao
+            if report.status == 'resolvido':
+                resolvido = report.ultima_resolucao or report.data_atualizacao
+                if primeira is None or primeira > resolvido:
+                    primeira = resolvido
+                report.resolvido_em = resolvido
+                report.tempo_resolucao_segundos = max(
+                    int((resolvido - report.data_criacao).total_seconds()), 0
+                )
+            else:
+                report.resolvido_em = None
+                report.tempo_resolucao_segundos = None
+            report.primeira_resposta_em = primeira
+
+        report_model._default_manager.using(using).bulk_update(batch, MILESTONE_FIELDS)
+        total += len(batch)
+        last_id = batch[-1].id
+        if progress:
+            progress(total)
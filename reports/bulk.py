@@ -0,0 +1,118 @@
+"""
+Criação de relatórios em lote (um relatório por equipamento)
+
+Os equipamentos são buscados de uma vez com ``in_bulk`` e os relatórios
+gravados com ``bulk_create`` em lotes de REPORTS_BULK_BATCH_SIZE, cada lote
+na sua transação, para não segurar locks durante o job inteiro.
+
+O ``bulk_create`` não dispara os sinais de post_save, então os efeitos deles
+(índice de busca, rollup diário, contadores por usuário e versão do cache)
+são aplicados aqui, uma vez por lote.
+"""
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from locations.models import Equipamento
+
+from .cache import bump_data_version
+from .models import Report
+from .rollup import apply_rollup_batch, report_values
+from .search import update_search_index
+from .user_stats import apply_user_stats_batch
+
+
+def _batch_size():
+    return getattr(settings, 'REPORTS_BULK_BATCH_SIZE', 500)
+
+
+def parse_data_ocorrencia(value):
+    """Converte o valor do datetime-local (ou ISO 8601) em datetime com fuso; ValueError se inválido"""
+    data = parse_datetime(value or '')
+    if data is None:
+        raise ValueError('Data da ocorrência inválida')
+    if timezone.is_naive(data):
+        data = timezone.make_aware(data)
+    return data
+
+
+def load_equipamentos(local, equipamento_ids):
+    """
+    Busca os equipamentos pedidos numa só consulta (``in_bulk``).
+
+    Retorna ({id: Equipamento}, ids inválidos), sendo inválidos os que não
+    existem ou não pertencem ao local.
+    """
+    ids = []
+    invalidos = []
+    for value in equipamento_ids:
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            invalidos.append(value)
+
+    equipamentos = Equipamento.objects.filter(local=local).only('id', 'nome', 'local_id').in_bulk(ids)
+    invalidos.extend(pk for pk in dict.fromkeys(ids) if pk not in equipamentos)
+    return equipamentos, invalidos
+
+
+def build_reports(equipamentos, titulo_base, usuario, local, **campos):
+    """Instâncias (não salvas) de um relatório pendente por equipamento"""
+    reports = []
+    for equipamento in equipamentos:
+        report = Report(
+            titulo=f'{titulo_base} - {equipamento.nome}',
+            local=local,
+            equipamento=equipamento,
+            usuario=usuario,
+            status='pendente',
+            progresso=0,
+            editavel=True,
+            **campos
+        )
+        report.atualizar_marcos()
+        reports.append(report)
+    return reports
+
+
+def save_report_batch(batch, using=None):
+    """
+    Grava um lote de relatórios numa transação e aplica os efeitos dos sinais
+    uma vez para o lote todo.
+
+    Os marcos de SLA já devem vir calculados (``atualizar_marcos``); um
+    ``data_criacao`` preenchido (importação de histórico) vai no próprio INSERT.
+    """
+    using = using or router.db_for_write(Report)
+
+    with transaction.atomic(using=using):
+        if connections[using].features.can_return_rows_from_bulk_insert:
+            Report.objects.using(using).bulk_create(batch)
+            values = [report_values(report) for report in batch]
+            update_search_index([report.pk for report in batch], using=using)
+            apply_rollup_batch(values, using=using)
+            apply_user_stats_batch(values, using=using)
+        else:
+            # Sem RETURNING não há ids para indexar: os sinais fazem o trabalho
+            for report in batch:
+                report.save(using=using)
+        # Dentro de uma transação maior (formulário), só vale depois do commit
+        transaction.on_commit(bump_data_version, using=using)
+
+
+def bulk_create_reports(reports, batch_size=None, using=None):
+    """
+    Grava `reports` em lotes e gera (criados, total) ao fim de cada lote,
+    para quem quiser acompanhar o progresso.
+    """
+    batch_size = batch_size or _batch_size()
+    total = len(reports)
+    criados = 0
+
+    for inicio in range(0, total, batch_size):
+        batch = reports[inicio:inicio + batch_size]
+        save_report_batch(batch, using=using)
+        criados += len(batch)
+        yield criados, total
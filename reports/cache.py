@@ -0,0 +1,162 @@
+"""
+Cache dos payloads de analytics
+
+Cada entrada guarda o JSON já serializado (bytes) e a chave inclui o nome do
+payload, o período, o escopo (staff ou o usuário) e um contador de versão dos
+dados. Salvar ou excluir um Report/ReportUpdate incrementa a versão, o que
+invalida todas as entradas de uma vez sem precisar listá-las; as antigas
+expiram pelo timeout.
+
+Os mesmos carimbos de versão (``get_version``) compõem as chaves dos
+fragmentos de template em cache (``{% cache %}`` com ``cache_versions``).
+
+Quando uma chave muito acessada expira, só quem obtém o lock (``cache.add``,
+atômico no locmem e no Redis) recalcula; os demais aguardam o valor ficar
+pronto em vez de repetirem as mesmas consultas.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Carimbos de versão por conjunto de dados, incrementados pelos sinais;
+# 'reports' versiona o analytics e os fragmentos de template com relatórios
+VERSION_KEYS = {
+    'reports': 'analytics:data_version',
+    'locations': 'versions:locations',
+    'users': 'versions:users',
+    # Um carimbo por local (scope=local_id): ETag da lista de equipamentos
+    'equipamentos': 'versions:equipamentos',
+}
+STATS_KEYS = {
+    'hits': 'analytics:stats:hits',
+    'misses': 'analytics:stats:misses',
+    'lock_waits': 'analytics:stats:lock_waits',
+}
+
+# Tempo máximo (s) que o lock pode ficar preso se o processo morrer no meio
+LOCK_TIMEOUT = 30
+# Quanto (s) esperar o valor de quem está com o lock antes de calcular sem cache
+LOCK_WAIT = 10
+LOCK_POLL_INTERVAL = 0.05
+# Payloads incompletos (seção com timeout ou erro) ficam pouco tempo em cache
+PARTIAL_TIMEOUT = 15
+
+
+class PartialPayload(bytes):
+    """Bytes de um payload em que alguma seção caiu no valor padrão"""
+
+
+def _timeout():
+    return getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 300)
+
+
+def _incr(key, delta=1):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Chave ainda não existe (ou expirou); add evita sobrescrever outro processo
+        if cache.add(key, delta, timeout=None):
+            return delta
+        return cache.incr(key, delta)
+
+
+def _version_key(name, scope=None):
+    key = VERSION_KEYS[name]
+    return key if scope is None else f'{key}:{scope}'
+
+
+def get_version(name='reports', scope=None):
+    """Versão atual do conjunto de dados `name` (opcionalmente de um só `scope`)"""
+    key = _version_key(name, scope)
+    version = cache.get(key)
+    if version is None:
+        # Começa pelo relógio: se o Redis descartar a chave, a nova versão não
+        # coincide com a de entradas antigas que ainda estejam em cache
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name='reports', scope=None):
+    """Invalida tudo o que foi guardado com a versão atual de `name`"""
+    key = _version_key(name, scope)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        get_version(name, scope)
+        return cache.incr(key)
+
+
+def get_data_version():
+    """Versão atual dos dados de relatórios"""
+    return get_version('reports')
+
+
+def bump_data_version():
+    """Invalida todos os payloads em cache; chame depois do commit (os sinais usam bump_on_commit)"""
+    return bump_version('reports')
+
+
+def cache_scope(user):
+    """Staff vê todos os relatórios e compartilha o cache; os demais têm o seu"""
+    if user is None or user.is_staff:
+        return 'staff'
+    return f'user:{user.pk}'
+
+
+def cache_key(name, period, user, version=None):
+    if version is None:
+        version = get_data_version()
+    return f'analytics:v{version}:{name}:{period}:{cache_scope(user)}'
+
+
+def get_or_build(name, period, user, build):
+    """
+    Retorna os bytes JSON de `name` para o período e escopo do usuário,
+    chamando `build()` (que deve devolver bytes) só em caso de miss.
+    """
+    key = cache_key(name, period, user)
+    payload = cache.get(key)
+    if payload is not None:
+        _incr(STATS_KEYS['hits'])
+        return payload
+
+    _incr(STATS_KEYS['misses'])
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        try:
+            payload = build()
+            if isinstance(payload, PartialPayload):
+                cache.set(key, bytes(payload), timeout=PARTIAL_TIMEOUT)
+            else:
+                cache.set(key, payload, timeout=_timeout())
+        finally:
+            cache.delete(lock_key)
+        return payload
+
+    # Outro processo está calculando a mesma chave
+    _incr(STATS_KEYS['lock_waits'])
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        payload = cache.get(key)
+        if payload is not None:
+            return payload
+        if cache.get(lock_key) is None:
+            break
+    return build()
+
+
+def get_cache_stats():
+    """Contadores de acerto e erro do cache de analytics"""
+    stats = {name: cache.get(key, 0) for name, key in STATS_KEYS.items()}
+    consultas = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / consultas * 100, 1) if consultas else 0
+    stats['data_version'] = get_data_version()
+    return stats
+
+
+def reset_cache_stats():
+    cache.delete_many(list(STATS_KEYS.values()))
@@ -0,0 +1,217 @@
+"""
+Upload de fotos em partes, retomável, para equipes em conexões móveis
+
+    POST /reports/api/uploads/                    {"nome": "IMG_0001.jpg", "tamanho": 4183220}
+         -> 201 {"id", "offset": 0, "chunk_size", "url"}
+    PUT  /reports/api/uploads/<id>/               cabeçalho Upload-Offset; corpo = bytes a partir dele
+         -> 200 {"offset"} ou 409 {"offset"} quando o offset não é o que o servidor já tem
+    GET  /reports/api/uploads/<id>/               -> {"offset", "tamanho", "concluido"} para retomar
+    POST /reports/api/uploads/<id>/finalize/      -> {"id", "blob", "url"}
+
+Cada parte é lida do corpo da requisição em blocos, fora de transação, para
+um arquivo só daquela requisição em CHUNKED_UPLOAD_DIR, sem guardar a foto em
+memória. Depois, uma transação curta confere que o offset ainda é o esperado,
+renomeia o arquivo para ``<id>.part-<offset>`` e avança ``recebido``; um
+cliente lento não segura o lock da linha enquanto envia. Uma parte
+interrompida conta o que chegou: o cliente consulta o offset e continua dali,
+em vez de reenviar o lote inteiro.
+
+Ao finalizar, a foto passa pela mesma validação, redução e remoção de
+metadados do upload comum (core.uploads) e vai para o storage por conteúdo
+(reports.storage). O formulário de atualização referencia o upload pelo id (campo ``upload`` de
+ReportUpdateImageForm). Uploads sem uso por CHUNKED_UPLOAD_EXPIRY_HOURS são
+removidos pelo ``collect_blobs``.
+"""
+
+import glob
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from core.uploads import IMAGE_EXTENSIONS, NOT_AN_IMAGE, UploadRejected, downscale_image, sniff_image_format
+
+from .models import ChunkedUpload
+from .storage import blob_storage
+
+# Bloco de leitura do corpo da requisição
+READ_SIZE = 64 * 1024
+
+
+class OffsetMismatch(Exception):
+    """A parte não começa onde o servidor parou; `offset` é o que ele já tem"""
+
+    def __init__(self, offset):
+        super().__init__(f'Offset esperado: {offset}')
+        self.offset = offset
+
+
+def _upload_dir():
+    return getattr(settings, 'CHUNKED_UPLOAD_DIR', None) or os.path.join(tempfile.gettempdir(), 'relatorios-uploads')
+
+
+def chunk_size():
+    """Tamanho de parte sugerido ao cliente"""
+    return getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', 1024 * 1024)
+
+
+def max_chunk_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_MAX_CHUNK_SIZE', 8 * 1024 * 1024)
+
+
+def temp_path(upload):
+    """Arquivo montado com as partes na finalização"""
+    return os.path.join(_upload_dir(), f'{upload.pk}.part')
+
+
+def part_path(upload, offset):
+    return os.path.join(_upload_dir(), f'{upload.pk}.part-{offset}')
+
+
+def start_upload(usuario, nome_arquivo, tamanho):
+    """Registra o upload e cria o arquivo temporário vazio"""
+    nome_arquivo = os.path.basename(str(nome_arquivo or '').strip())
+    if os.path.splitext(nome_arquivo)[1].lower() not in IMAGE_EXTENSIONS:
+        raise UploadRejected(NOT_AN_IMAGE)
+    limite = getattr(settings, 'UPLOAD_IMAGE_MAX_BYTES', 20 * 1024 * 1024)
+    if not isinstance(tamanho, int) or tamanho <= 0:
+        raise UploadRejected('Informe o tamanho do arquivo em bytes.')
+    if tamanho > limite:
+        raise UploadRejected(f'A imagem passa do limite de {limite // (1024 * 1024)} MB.')
+
+    upload = ChunkedUpload.objects.create(usuario=usuario, nome_arquivo=nome_arquivo[:255], tamanho=tamanho)
+    os.makedirs(_upload_dir(), exist_ok=True)
+    return upload
+
+
+def _check_chunk(upload, offset, length):
+    if upload.status != 'recebendo':
+        raise UploadRejected('O upload já foi finalizado.')
+    if offset != upload.recebido:
+        raise OffsetMismatch(upload.recebido)
+    if offset + length > upload.tamanho:
+        raise UploadRejected('A parte passa do tamanho declarado do arquivo.')
+
+
+def _read_chunk(stream, length, output, inicio_do_arquivo):
+    """Copia até `length` bytes de `stream` para `output`; retorna quantos chegaram"""
+    recebidos = 0
+    while recebidos < length:
+        try:
+            data = stream.read(min(READ_SIZE, length - recebidos))
+        except OSError:
+            # A conexão caiu no meio da parte: fica valendo o que já chegou
+            break
+        if not data:
+            break
+        if inicio_do_arquivo and recebidos == 0 and not sniff_image_format(data):
+            raise UploadRejected(NOT_AN_IMAGE)
+        output.write(data)
+        recebidos += len(data)
+    return recebidos
+
+
+def append_chunk(upload, offset, stream, length):
+    """
+    Grava `length` bytes lidos de `stream` como a parte do upload que começa
+    em `offset`. Retorna o novo offset (o que de fato chegou, se a conexão
+    cair no meio da parte).
+    """
+    if length > max_chunk_size():
+        raise UploadRejected(f'Cada parte pode ter no máximo {max_chunk_size()} bytes.')
+    # Recusa cedo, sem ler o corpo; a conferência que vale é a da transação
+    _check_chunk(upload, offset, length)
+
+    os.makedirs(_upload_dir(), exist_ok=True)
+    fd, recebendo = tempfile.mkstemp(dir=_upload_dir(), prefix=f'{upload.pk}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            recebidos = _read_chunk(stream, length, output, offset == 0)
+
+        with transaction.atomic():
+            # Retentativas da mesma parte em paralelo: só a primeira avança o offset
+            upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+            _check_chunk(upload, offset, length)
+            if recebidos:
+                # Se o commit falhar, a próxima parte neste offset substitui o arquivo
+                os.replace(recebendo, part_path(upload, offset))
+                upload.recebido = offset + recebidos
+                upload.save(update_fields=['recebido', 'atualizado_em'])
+    finally:
+        _remove_temp(recebendo)
+    return upload.recebido
+
+
+def _assemble(upload):
+    """Junta as partes, na ordem dos offsets, no arquivo temporário do upload"""
+    path = temp_path(upload)
+    with open(path, 'wb') as output:
+        while output.tell() < upload.recebido:
+            try:
+                with open(part_path(upload, output.tell()), 'rb') as part:
+                    shutil.copyfileobj(part, output)
+            except FileNotFoundError:
+                raise UploadRejected('Partes do arquivo não encontradas; reinicie o upload.')
+    return path
+
+
+def finish_upload(upload):
+    """
+    Valida a foto recebida, reduz se for grande, remove os metadados e grava
+    no storage por conteúdo. Idempotente: um upload já concluído só é devolvido.
+    """
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status == 'concluido':
+            return upload
+        if upload.recebido != upload.tamanho:
+            raise UploadRejected(f'Faltam {upload.tamanho - upload.recebido} bytes do arquivo.')
+
+        path = _assemble(upload)
+        with open(path, 'rb') as file:
+            try:
+                # Sempre recomprimida: o original (EXIF, GPS) não vai para o storage
+                output, extensao, _ = downscale_image(file)
+            except UploadRejected:
+                raise
+            except (OSError, SyntaxError, ValueError):
+                raise UploadRejected('Imagem inválida ou corrompida.')
+
+            content = ContentFile(output.getvalue(), name=os.path.splitext(upload.nome_arquivo)[0] + extensao)
+            upload.blob = blob_storage().save(content.name, content)
+
+        upload.status = 'concluido'
+        upload.save(update_fields=['blob', 'status', 'atualizado_em'])
+    _remove_files(upload)
+    return upload
+
+
+def _remove_temp(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _remove_files(upload):
+    """Partes, partes em recebimento e o arquivo montado do upload"""
+    for path in glob.glob(os.path.join(glob.escape(_upload_dir()), f'{upload.pk}.*')):
+        _remove_temp(path)
+
+
+def expire_uploads(horas=None):
+    """Remove uploads (e arquivos temporários) sem atividade há mais de `horas`; retorna quantos"""
+    if horas is None:
+        horas = getattr(settings, 'CHUNKED_UPLOAD_EXPIRY_HOURS', 24)
+    expirados = ChunkedUpload.objects.filter(atualizado_em__lt=timezone.now() - timedelta(hours=horas))
+    total = 0
+    for upload in expirados.iterator():
+        _remove_files(upload)
+        total += 1
+    expirados.delete()
+    return total
@@ -0,0 +1,29 @@
+"""
+Context processors do app de relatórios
+"""
+
+from django.conf import settings
+
+from .cache import VERSION_KEYS, get_version
+
+
+class CacheVersions:
+    """Carimbos de versão lidos do cache só quando um template os usa"""
+
+    def __init__(self):
+        self._versions = {}
+
+    def __getitem__(self, name):
+        if name not in VERSION_KEYS:
+            raise KeyError(name)
+        if name not in self._versions:
+            self._versions[name] = get_version(name)
+        return self._versions[name]
+
+
+def cache_versions(request):
+    """Disponibiliza ``cache_versions.<dados>`` e o timeout para os blocos ``{% cache %}``"""
+    return {
+        'cache_versions': CacheVersions(),
+        'fragment_timeout': getattr(settings, 'TEMPLATE_FRAGMENT_TIMEOUT', 600),
+    }
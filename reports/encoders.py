@@ -0,0 +1,52 @@
+"""
+Serialização JSON dos payloads de analytics
+
+Decimal, datetime, date, time e timedelta são convertidos numa única passada
+pelo ``default`` do encoder, sem reconstruir os dicionários antes. Com o
+orjson instalado ele é usado no lugar do módulo json da biblioteca padrão;
+a saída é compacta (sem indentação) e sempre em bytes UTF-8.
+"""
+
+import datetime
+import json
+from decimal import Decimal
+from uuid import UUID
+
+from django.utils.functional import Promise
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+
+def encode_value(obj):
+    """Converte os tipos que o JSON não conhece; usado como `default` do encoder"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        # Duração em segundos, pronta para os gráficos
+        return obj.total_seconds()
+    if isinstance(obj, (UUID, Promise)):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f'Objeto do tipo {type(obj).__name__} não é serializável em JSON')
+
+
+def _dumps_stdlib(data):
+    return json.dumps(
+        data, default=encode_value, ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(data):
+        """Serializa `data` para bytes JSON"""
+        return orjson.dumps(data, default=encode_value, option=_ORJSON_OPTIONS)
+else:
+    dumps = _dumps_stdlib
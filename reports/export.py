@@ -0,0 +1,269 @@
+"""
+Exportação da lista de relatórios em CSV e XLSX por streaming
+
+As linhas saem de ``values_list(...).iterator(chunk_size=...)`` (cursor no
+servidor no PostgreSQL), e cada bloco vira bytes e segue para o cliente antes
+do próximo ser lido: a memória fica constante seja qual for o tamanho do
+resultado, e o cabeçalho é enviado antes mesmo da consulta rodar.
+
+O XLSX é montado aqui mesmo (SpreadsheetML mínimo com strings inline) sobre um
+``zipfile`` que escreve num destino sem seek, então o arquivo também sai em
+pedaços, sem arquivo temporário. As colunas usam os nomes aceitos pelo
+``importer``, de modo que uma exportação pode ser reimportada.
+"""
+
+import csv
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Report
+
+# (cabeçalho, campo em values_list)
+EXPORT_COLUMNS = [
+    ('ID', 'id'),
+    ('Título', 'titulo'),
+    ('Descrição', 'descricao'),
+    ('Usuário', 'usuario__username'),
+    ('Data Ocorrência', 'data_ocorrencia'),
+    ('Local', 'local__codigo'),
+    ('Equipamento', 'equipamento__codigo'),
+    ('Atribuído para', 'atribuido_para__username'),
+    ('Status', 'status'),
+    ('Prioridade', 'prioridade'),
+    ('Progresso', 'progresso'),
+    ('Data Criação', 'data_criacao'),
+    ('Resolvido em', 'resolvido_em'),
+]
+
+DATETIME_FORMAT = '%d/%m/%Y %H:%M'
+
+# Inícios de célula que o Excel/LibreOffice interpretam como fórmula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Limites do Excel: linhas por planilha (com o cabeçalho) e caracteres por célula
+XLSX_MAX_ROWS = 1048575
+XLSX_MAX_CELL_CHARS = 32767
+
+# Linhas acumuladas antes de cada envio ao cliente
+FLUSH_ROWS = 500
+
+
+def _chunk_size():
+    return getattr(settings, 'REPORTS_EXPORT_CHUNK_SIZE', 2000)
+
+
+def export_headers():
+    return [header for header, _ in EXPORT_COLUMNS]
+
+
+def export_rows(queryset):
+    """Gera as linhas da exportação com os rótulos de status/prioridade e datas locais"""
+    status = dict(Report.STATUS_CHOICES)
+    prioridade = dict(Report.PRIORIDADE_CHOICES)
+    campos = [campo for _, campo in EXPORT_COLUMNS]
+    i_status = campos.index('status')
+    i_prioridade = campos.index('prioridade')
+
+    for values in queryset.values_list(*campos).iterator(chunk_size=_chunk_size()):
+        row = list(values)
+        row[i_status] = status.get(row[i_status], row[i_status])
+        row[i_prioridade] = prioridade.get(row[i_prioridade], row[i_prioridade])
+        for i, value in enumerate(row):
+            if isinstance(value, datetime):
+                row[i] = timezone.localtime(value).replace(tzinfo=None)
+        yield row
+
+
+class _Echo:
+    """Destino do csv.writer que devolve a linha em vez de guardá-la"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.strftime(DATETIME_FORMAT)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Texto digitado pelo usuário não vira fórmula ao abrir o CSV; o
+        # apóstrofo é removido de volta pelo importer
+        return "'" + value
+    return value
+
+
+def stream_csv(rows, headers):
+    """CSV separado por ';' com BOM (o Excel em pt-BR abre direto)"""
+    writer = csv.writer(_Echo(), delimiter=';')
+    yield ('\ufeff' + writer.writerow(headers)).encode('utf-8')
+
+    linhas = []
+    for row in rows:
+        linhas.append(writer.writerow([_csv_value(value) for value in row]))
+        if len(linhas) >= FLUSH_ROWS:
+            yield ''.join(linhas).encode('utf-8')
+            linhas = []
+    if linhas:
+        yield ''.join(linhas).encode('utf-8')
+
+
+class _ZipSink:
+    """Destino só-escrita do zipfile: acumula os bytes até o próximo `drain`"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def write(self, data):
+        self.buffer += data
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{nome}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Estilo 1: data e hora (formato embutido 22); estilo 2: cabeçalho em negrito
+XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+XLSX_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" '
+    'activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>'
+    '<sheetData>'
+)
+
+XLSX_SHEET_END = '</sheetData></worksheet>'
+
+EXCEL_EPOCH = datetime(1899, 12, 30)
+
+
+def _xlsx_cell(value, style=0):
+    if value is None or value == '':
+        return '<c/>'
+    estilo = f' s="{style}"' if style else ''
+    if isinstance(value, bool):
+        return f'<c t="b"{estilo}><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c{estilo}><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        serial = (value - EXCEL_EPOCH).total_seconds() / 86400
+        return f'<c s="1"><v>{serial:.8f}</v></c>'
+    # Caracteres de controle não são válidos em XML 1.0
+    texto = ''.join(ch for ch in str(value)[:XLSX_MAX_CELL_CHARS] if ch >= ' ' or ch in '\t\n\r')
+    return f'<c t="inlineStr"{estilo}><is><t xml:space="preserve">{escape(texto)}</t></is></c>'
+
+
+def stream_xlsx(rows, headers, sheet_name='Relatórios'):
+    """
+    Planilha XLSX escrita e enviada em pedaços.
+
+    Sem destino com seek, o zipfile grava tamanhos e CRC em data descriptors
+    depois de cada arquivo, o que permite mandar a planilha enquanto é gerada.
+    Passando de XLSX_MAX_ROWS linhas, as excedentes são descartadas (quem
+    chama deve checar antes; ver ``exceeds_xlsx_limit``).
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', XLSX_CONTENT_TYPES)
+        zf.writestr('_rels/.rels', XLSX_ROOT_RELS)
+        zf.writestr('xl/workbook.xml', XLSX_WORKBOOK.format(nome=escape(sheet_name, {'"': '&quot;'})))
+        zf.writestr('xl/_rels/workbook.xml.rels', XLSX_WORKBOOK_RELS)
+        zf.writestr('xl/styles.xml', XLSX_STYLES)
+
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            cabecalho = ''.join(_xlsx_cell(header, style=2) for header in headers)
+            sheet.write(f'{XLSX_SHEET_START}<row>{cabecalho}</row>'.encode('utf-8'))
+            yield sink.drain()
+
+            linhas = []
+            for numero, row in enumerate(rows, start=1):
+                if numero > XLSX_MAX_ROWS:
+                    break
+                linhas.append('<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>')
+                if len(linhas) >= FLUSH_ROWS:
+                    sheet.write(''.join(linhas).encode('utf-8'))
+                    linhas = []
+                    yield sink.drain()
+            sheet.write((''.join(linhas) + XLSX_SHEET_END).encode('utf-8'))
+    yield sink.drain()
+
+
+def exceeds_xlsx_limit(queryset):
+    """Se o resultado não cabe numa planilha (consulta só até a linha do limite)"""
+    return queryset.order_by().values('id')[XLSX_MAX_ROWS:XLSX_MAX_ROWS + 1].exists()
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (stream_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
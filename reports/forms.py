@@ -1,7 +1,9 @@
 from django import forms
-from .models import Report, ReportCategory, ReportData, ReportImage, ReportUpdate, ReportUpdateImage
+from .models import ChunkedUpload, Report, ReportCategory, ReportData, ReportImage, ReportUpdate, ReportUpdateImage
 from locations.models import Local, Equipamento
 from django.contrib.auth import get_user_model
+from core.autocomplete import AutocompleteSelect
+from core.uploads import ImageUploadField
 
 User = get_user_model()
 
@@ -15,6 +17,7 @@ class ReportForm(forms.ModelForm):
             'titulo', 'descricao', 'local', 'equipamento', 'atribuido_para',
             'data_ocorrencia', 'status', 'prioridade', 'progresso', 'editavel', 'imagem_principal'
         ]
+        field_classes = {'imagem_principal': ImageUploadField}
         widgets = {
             'titulo': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -25,15 +28,19 @@ class ReportForm(forms.ModelForm):
                 'rows': 4,
                 'placeholder': 'Descrição do relatório'
             }),
-            'local': forms.Select(attrs={
+            # Opções carregadas sob demanda (core.autocomplete)
+            'local': AutocompleteSelect('locations:api_locais_autocomplete', attrs={
                 'class': 'form-select',
                 'id': 'id_local'
             }),
-            'equipamento': forms.Select(attrs={
-                'class': 'form-select',
-                'id': 'id_equipamento'
-            }),
-            'atribuido_para': forms.Select(attrs={
+            'equipamento': AutocompleteSelect(
+                'locations:api_equipamentos_autocomplete', forward='id_local',
+                scoped_url='locations:api_equipamentos_por_local', attrs={
+                    'class': 'form-select',
+                    'id': 'id_equipamento'
+                }
+            ),
+            'atribuido_para': AutocompleteSelect('authentication:api_usuarios_autocomplete', attrs={
                 'class': 'form-select',
                 'id': 'id_atribuido_para'
             }),
@@ -90,6 +97,7 @@ class ReportImageForm(forms.ModelForm):
     class Meta:
         model = ReportImage
         fields = ['imagem', 'descricao']
+        field_classes = {'imagem': ImageUploadField}
         widgets = {
             'imagem': forms.FileInput(attrs={
                 'class': 'form-control',
@@ -228,7 +236,7 @@ class ReportFilterForm(forms.Form):
         queryset=Local.objects.filter(status='ativo').order_by('nome'),
         required=False,
         empty_label='Todos os locais',
-        widget=forms.Select(attrs={'class': 'form-select'}),
+        widget=AutocompleteSelect('locations:api_locais_autocomplete', attrs={'class': 'form-select'}),
         label='Local'
     )
     
@@ -236,7 +244,10 @@ class ReportFilterForm(forms.Form):
         queryset=Equipamento.objects.filter(ativo=True).order_by('nome'),
         required=False,
         empty_label='Todos os equipamentos',
-        widget=forms.Select(attrs={'class': 'form-select'}),
+        widget=AutocompleteSelect(
+            'locations:api_equipamentos_autocomplete', forward='id_local',
+            scoped_url='locations:api_equipamentos_por_local', attrs={'class': 'form-select'}
+        ),
         label='Equipamento'
     )
     
@@ -260,6 +271,7 @@ class ReportFilterForm(forms.Form):
         ('-titulo', 'Título (Z-A)'),
         ('status', 'Status'),
         ('-prioridade', 'Prioridade (alta primeiro)'),
+        ('relevancia', 'Relevância da busca'),
     ]
     
     ordenar_por = forms.ChoiceField(
@@ -321,6 +333,7 @@ class ReportUpdateImageForm(forms.ModelForm):
     class Meta:
         model = ReportUpdateImage
         fields = ['imagem', 'descricao']
+        field_classes = {'imagem': ImageUploadField}
         widgets = {
             'imagem': forms.FileInput(attrs={
                 'class': 'form-control',
@@ -332,6 +345,38 @@ class ReportUpdateImageForm(forms.ModelForm):
             })
         }
 
+    # Foto já enviada pela API em partes (reports.chunked_upload), no lugar do arquivo
+    upload = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
+    def __init__(self, *args, usuario=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.usuario = usuario
+        self.chunked_upload = None
+        # Obrigatório só quando não vem o id de um upload em partes (ver clean)
+        self.fields['imagem'].required = False
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload_id = cleaned_data.get('upload')
+        if upload_id:
+            self.chunked_upload = ChunkedUpload.objects.filter(
+                pk=upload_id, usuario=self.usuario, status='concluido'
+            ).first()
+            if self.chunked_upload is None:
+                self.add_error('upload', 'Envio da foto não encontrado ou não finalizado. Envie a foto novamente.')
+            else:
+                self.instance.imagem = self.chunked_upload.blob
+        elif not cleaned_data.get('imagem') and not self.instance.imagem and 'imagem' not in self.errors:
+            self.add_error('imagem', self.fields['imagem'].error_messages['required'])
+        return cleaned_data
+
+    def save(self, commit=True):
+        instance = super().save(commit=commit)
+        if commit and self.chunked_upload:
+            # A foto agora pertence à atualização; o upload não pode ser usado de novo
+            self.chunked_upload.delete()
+        return instance
+
 
 # Formset para múltiplas imagens da atualização
 ReportUpdateImageFormSet = forms.inlineformset_factory(
@@ -341,4 +386,27 @@ ReportUpdateImageFormSet = forms.inlineformset_factory(
     extra=2,  # 2 campos extras por padrão
     can_delete=False,
     fields=['imagem', 'descricao']
-) 
\ No newline at end of file
+) 
+
+
+class ImportForm(forms.Form):
+    """Upload de CSV/XLSX para a importação em massa (admin)"""
+
+    TIPO_CHOICES = [
+        ('locais', 'Locais'),
+        ('equipamentos', 'Equipamentos'),
+        ('relatorios', 'Relatórios'),
+    ]
+
+    tipo = forms.ChoiceField(choices=TIPO_CHOICES, label='Importar')
+    arquivo = forms.FileField(
+        label='Arquivo',
+        help_text='CSV (separado por vírgula ou ponto e vírgula) ou XLSX, com os nomes das colunas na primeira linha',
+        widget=forms.ClearableFileInput(attrs={'accept': '.csv,.xlsx'}),
+    )
+
+    def clean_arquivo(self):
+        arquivo = self.cleaned_data['arquivo']
+        if not arquivo.name.lower().endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError('Envie um arquivo .csv ou .xlsx')
+        return arquivo
@@ -0,0 +1,496 @@
+"""
+Importação em massa de locais, equipamentos e relatórios (CSV ou XLSX)
+
+O arquivo é lido linha a linha (módulo csv ou openpyxl em modo
+read_only), sem carregar tudo na memória. As linhas são validadas contra
+mapas pré-carregados (código do local -> id, (local, código do equipamento)
+-> id, username -> id), sem consultas por linha, e gravadas com
+``bulk_create`` em lotes de IMPORT_BATCH_SIZE. Nos relatórios, o índice de
+busca, o rollup diário e os contadores por usuário são refeitos uma vez ao
+final, e não a cada lote; ``manage.py benchmark_import`` mede a vazão.
+
+Cada linha rejeitada vai para o relatório de erros (CSV com o número da
+linha, o motivo e os valores originais), que pode ser corrigido e
+reimportado.
+"""
+
+import csv
+import io
+import os
+import time
+from datetime import date, datetime
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import connections, router
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from locations.models import Equipamento, Local
+
+from .cache import bump_data_version, bump_version
+from .export import FORMULA_PREFIXES
+from .models import Report
+from .rollup import rebuild_rollup
+from .search import rebuild_search_index, strip_accents, update_search_index
+from .user_stats import reconcile_user_stats
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover - openpyxl só é necessário para XLSX
+    openpyxl = None
+
+User = get_user_model()
+
+# Quantos erros ficam em memória para exibição; o relatório completo vai para o arquivo
+MAX_ERRORS_KEPT = 100
+
+TRUE_VALUES = {'1', 'sim', 's', 'true', 'x', 'yes', 'ativo'}
+FALSE_VALUES = {'0', 'nao', 'n', 'false', 'no', 'inativo'}
+
+DATETIME_FORMATS = ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y')
+
+
+class ImportFileError(ValueError):
+    """Arquivo que não pode ser importado (formato ou colunas)"""
+
+
+class RowError(ValueError):
+    """Linha rejeitada; a mensagem vai para o relatório de erros"""
+
+
+def normalize_header(value):
+    return strip_accents(str(value or '')).strip().lower().replace(' ', '_')
+
+
+def read_rows(file, filename):
+    """Gera (número da linha, {coluna: valor}) de um CSV ou XLSX aberto em modo binário"""
+    if os.path.splitext(filename)[1].lower() == '.xlsx':
+        return _read_xlsx(file)
+    return _read_csv(file)
+
+
+def _unescape_formula(value):
+    """Desfaz o apóstrofo que a exportação CSV põe antes de texto com cara de fórmula"""
+    if value[:1] == "'" and value[1:].startswith(FORMULA_PREFIXES):
+        return value[1:]
+    return value
+
+
+def _read_csv(file):
+    texto = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    amostra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(amostra, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(texto, dialect)
+    try:
+        headers = [normalize_header(h) for h in next(reader, [])]
+        for numero, valores in enumerate(reader, start=2):
+            if any(valores):
+                yield numero, dict(zip(headers, map(_unescape_formula, valores)))
+    finally:
+        # Não fecha o arquivo de quem chamou junto com o wrapper
+        texto.detach()
+
+
+def _read_xlsx(file):
+    if openpyxl is None:
+        raise ImportFileError('Instale o openpyxl para importar arquivos XLSX')
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = [normalize_header(h) for h in next(rows, ())]
+        for numero, valores in enumerate(rows, start=2):
+            if any(v not in (None, '') for v in valores):
+                yield numero, dict(zip(headers, valores))
+    finally:
+        workbook.close()
+
+
+def _text(row, column, max_length=None, required=False):
+    value = row.get(column)
+    if isinstance(value, float) and value.is_integer():
+        # Códigos numéricos do Excel chegam como float
+        value = int(value)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f'{column}: campo obrigatório')
+    if max_length and len(value) > max_length:
+        raise RowError(f'{column}: mais de {max_length} caracteres')
+    return value
+
+
+@lru_cache(maxsize=4096)
+def _choice_code(choices, value):
+    """Código da opção cujo código ou rótulo é `value` (sem acentos/caixa), ou None"""
+    chave = strip_accents(value).lower()
+    for codigo, label in choices:
+        if chave in (codigo, strip_accents(str(label)).lower()):
+            return codigo
+    return None
+
+
+def _choice(row, column, choices, default):
+    value = _text(row, column)
+    if not value:
+        return default
+    # Os mesmos poucos valores se repetem em todas as linhas do arquivo
+    codigo = _choice_code(tuple(choices), value)
+    if codigo is None:
+        raise RowError(f'{column}: valor inválido "{value}"')
+    return codigo
+
+
+def _bool(row, column, default):
+    value = strip_accents(_text(row, column)).lower()
+    if not value:
+        return default
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise RowError(f'{column}: use sim ou não')
+
+
+def _int(row, column, default, minimo=None, maximo=None):
+    value = row.get(column)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(float(str(value).replace(',', '.')))
+    except (ValueError, OverflowError):
+        # "inf" e "1e400" não cabem em int (OverflowError)
+        raise RowError(f'{column}: número inválido')
+    if (minimo is not None and value < minimo) or (maximo is not None and value > maximo):
+        raise RowError(f'{column}: fora do intervalo {minimo}-{maximo}')
+    return value
+
+
+def _datetime(row, column, required=False, tz=None):
+    value = row.get(column)
+    if value in (None, ''):
+        if required:
+            raise RowError(f'{column}: campo obrigatório')
+        return None
+    if isinstance(value, datetime):
+        data = value
+    elif isinstance(value, date):
+        data = datetime.combine(value, datetime.min.time())
+    else:
+        texto = str(value).strip()
+        data = parse_datetime(texto)
+        if data is None and parse_date(texto):
+            data = datetime.combine(parse_date(texto), datetime.min.time())
+        for formato in DATETIME_FORMATS:
+            if data is not None:
+                break
+            try:
+                data = datetime.strptime(texto, formato)
+            except ValueError:
+                pass
+        if data is None:
+            raise RowError(f'{column}: data inválida "{texto}"')
+    return timezone.make_aware(data, tz) if timezone.is_naive(data) else data
+
+
+class ImportResult:
+    """Totais da importação e os primeiros erros"""
+
+    def __init__(self):
+        self.linhas = 0
+        self.importados = 0
+        self.total_erros = 0
+        self.erros = []
+        self.segundos = 0.0
+
+    @property
+    def linhas_por_segundo(self):
+        return self.linhas / self.segundos if self.segundos else 0
+
+
+class BaseImporter:
+    """Lê, valida em lotes contra os mapas pré-carregados e grava em bulk"""
+
+    model = None
+    required_columns = ()
+
+    def __init__(self, batch_size=None, using=None, error_writer=None, dry_run=False):
+        self.batch_size = batch_size or getattr(settings, 'IMPORT_BATCH_SIZE', 2000)
+        self.using = using or router.db_for_write(self.model)
+        self.error_writer = error_writer
+        self.dry_run = dry_run
+
+    def prefetch(self):
+        """Carrega os mapas de busca usados pela validação"""
+
+    def build(self, row):
+        """Instância não salva da linha; RowError se inválida"""
+        raise NotImplementedError
+
+    def write(self, batch):
+        """Grava o lote (sem sinais)"""
+        self.model._default_manager.using(self.using).bulk_create(batch)
+
+    def finish(self):
+        """Chamado uma vez ao final, também se a importação parar no meio (derivados e cache)"""
+
+    def run(self, rows):
+        result = ImportResult()
+        inicio = time.perf_counter()
+        self.prefetch()
+        batch = []
+        try:
+            for numero, row in rows:
+                if not result.linhas:
+                    ausentes = [c for c in self.required_columns if c not in row]
+                    if ausentes:
+                        raise ImportFileError(f'Colunas obrigatórias ausentes: {", ".join(ausentes)}')
+                result.linhas += 1
+                try:
+                    batch.append(self.build(row))
+                except RowError as e:
+                    self._error(result, numero, str(e), row)
+                    continue
+                if len(batch) >= self.batch_size:
+                    result.importados += self._flush(batch)
+                    batch = []
+            if batch:
+                result.importados += self._flush(batch)
+        finally:
+            # Os lotes já gravados ficam; os derivados precisam refleti-los
+            if result.importados and not self.dry_run:
+                self.finish()
+        result.segundos = time.perf_counter() - inicio
+        return result
+
+    def _flush(self, batch):
+        if not self.dry_run:
+            self.write(batch)
+        return len(batch)
+
+    def _error(self, result, numero, mensagem, row):
+        result.total_erros += 1
+        if len(result.erros) < MAX_ERRORS_KEPT:
+            result.erros.append((numero, mensagem))
+        if self.error_writer is not None:
+            self.error_writer.write(numero, mensagem, row)
+
+
+class LocalImporter(BaseImporter):
+    """
+    Colunas: codigo, nome, tipo, endereco, cidade, estado (UF), cep, telefone,
+    email, responsavel (username), status, observacoes
+    """
+
+    model = Local
+    required_columns = ('codigo', 'nome', 'cidade', 'estado')
+
+    def prefetch(self):
+        self.existentes = set(Local.objects.using(self.using).values_list('codigo', flat=True))
+        self.usuarios = dict(User.objects.using(self.using).values_list('username', 'id'))
+
+    def build(self, row):
+        codigo = _text(row, 'codigo', max_length=50, required=True)
+        if codigo in self.existentes:
+            raise RowError(f'codigo: local "{codigo}" já existe')
+        estado = _text(row, 'estado', max_length=2, required=True).upper()
+        email = _text(row, 'email', max_length=254)
+        if email:
+            try:
+                validate_email(email)
+            except ValidationError:
+                raise RowError(f'email: endereço inválido "{email}"')
+        responsavel = _text(row, 'responsavel')
+        if responsavel and responsavel not in self.usuarios:
+            raise RowError(f'responsavel: usuário "{responsavel}" não encontrado')
+
+        local = Local(
+            codigo=codigo,
+            nome=_text(row, 'nome', max_length=200, required=True),
+            tipo=_choice(row, 'tipo', Local.TIPO_CHOICES, 'outro'),
+            endereco=_text(row, 'endereco'),
+            cidade=_text(row, 'cidade', max_length=100, required=True),
+            estado=estado,
+            cep=_text(row, 'cep', max_length=10),
+            telefone=_text(row, 'telefone', max_length=20),
+            email=email,
+            responsavel_id=self.usuarios.get(responsavel),
+            status=_choice(row, 'status', Local.STATUS_CHOICES, 'ativo'),
+            observacoes=_text(row, 'observacoes'),
+        )
+        # Repetições dentro do próprio arquivo também são recusadas
+        self.existentes.add(codigo)
+        return local
+
+    def finish(self):
+        # bulk_create não dispara o sinal que invalida os filtros de local em cache
+        bump_version('locations')
+
+
+class EquipamentoImporter(BaseImporter):
+    """Colunas: local (código), nome, codigo, tipo, fabricante, modelo, numero_serie, status_operacional, ativo"""
+
+    model = Equipamento
+    required_columns = ('local', 'nome', 'codigo')
+
+    def prefetch(self):
+        self.locais = dict(Local.objects.using(self.using).values_list('codigo', 'id'))
+        self.existentes = set(Equipamento.objects.using(self.using).values_list('local_id', 'codigo'))
+        self.locais_alterados = set()
+
+    def build(self, row):
+        codigo_local = _text(row, 'local', required=True)
+        local_id = self.locais.get(codigo_local)
+        if local_id is None:
+            raise RowError(f'local: código "{codigo_local}" não encontrado')
+        codigo = _text(row, 'codigo', max_length=50, required=True)
+        if (local_id, codigo) in self.existentes:
+            raise RowError(f'codigo: equipamento "{codigo}" já existe neste local')
+
+        equipamento = Equipamento(
+            local_id=local_id,
+            nome=_text(row, 'nome', max_length=100, required=True),
+            codigo=codigo,
+            tipo=_choice(row, 'tipo', Equipamento.TIPO_CHOICES, None),
+            fabricante=_text(row, 'fabricante', max_length=100) or None,
+            modelo=_text(row, 'modelo', max_length=100) or None,
+            numero_serie=_text(row, 'numero_serie', max_length=100) or None,
+            status_operacional=_choice(row, 'status_operacional', Equipamento.STATUS_CHOICES, 'operando'),
+            ativo=_bool(row, 'ativo', True),
+        )
+        # Repetições dentro do próprio arquivo também são recusadas
+        self.existentes.add((local_id, codigo))
+        return equipamento
+
+    def write(self, batch):
+        super().write(batch)
+        self.locais_alterados.update(equipamento.local_id for equipamento in batch)
+
+    def finish(self):
+        # bulk_create não dispara os sinais que invalidam filtros e listas por local
+        bump_version('locations')
+        for local_id in self.locais_alterados:
+            bump_version('equipamentos', scope=local_id)
+
+
+class ReportImporter(BaseImporter):
+    """
+    Colunas: titulo, descricao, usuario (username), data_ocorrencia, local
+    (código), equipamento (código no local), atribuido_para (username),
+    status, prioridade, progresso, data_criacao e resolvido_em (histórico;
+    obrigatório para relatórios resolvidos)
+    """
+
+    model = Report
+    required_columns = ('titulo', 'descricao', 'usuario', 'data_ocorrencia')
+
+    def prefetch(self):
+        self.locais = dict(Local.objects.using(self.using).values_list('codigo', 'id'))
+        self.equipamentos = {
+            (local_id, codigo): pk
+            for pk, local_id, codigo in Equipamento.objects.using(self.using).values_list('id', 'local_id', 'codigo')
+        }
+        self.usuarios = dict(User.objects.using(self.using).values_list('username', 'id'))
+        self.ids = []
+        # Fuso das datas sem fuso, resolvido uma vez e não a cada célula
+        self.tz = timezone.get_current_timezone()
+
+    def _usuario(self, row, column, required=False):
+        username = _text(row, column, required=required)
+        if not username:
+            return None
+        if username not in self.usuarios:
+            raise RowError(f'{column}: usuário "{username}" não encontrado')
+        return self.usuarios[username]
+
+    def build(self, row):
+        local_id = None
+        equipamento_id = None
+        codigo_local = _text(row, 'local')
+        if codigo_local:
+            local_id = self.locais.get(codigo_local)
+            if local_id is None:
+                raise RowError(f'local: código "{codigo_local}" não encontrado')
+        codigo_equipamento = _text(row, 'equipamento')
+        if codigo_equipamento:
+            if local_id is None:
+                raise RowError('equipamento: informe também o local')
+            equipamento_id = self.equipamentos.get((local_id, codigo_equipamento))
+            if equipamento_id is None:
+                raise RowError(f'equipamento: código "{codigo_equipamento}" não encontrado no local')
+
+        report = Report(
+            titulo=_text(row, 'titulo', max_length=200, required=True),
+            descricao=_text(row, 'descricao', required=True),
+            usuario_id=self._usuario(row, 'usuario', required=True),
+            atribuido_para_id=self._usuario(row, 'atribuido_para'),
+            local_id=local_id,
+            equipamento_id=equipamento_id,
+            data_ocorrencia=_datetime(row, 'data_ocorrencia', required=True, tz=self.tz),
+            status=_choice(row, 'status', Report.STATUS_CHOICES, 'pendente'),
+            prioridade=_choice(row, 'prioridade', Report.PRIORIDADE_CHOICES, 'media'),
+            progresso=_int(row, 'progresso', 0, minimo=0, maximo=100),
+            data_criacao=_datetime(row, 'data_criacao', tz=self.tz) or timezone.now(),
+            resolvido_em=_datetime(row, 'resolvido_em', tz=self.tz),
+        )
+        if report.status == 'resolvido':
+            # Sem a data real a resolução entraria com 0 s nas médias de SLA
+            if report.resolvido_em is None:
+                raise RowError('resolvido_em: obrigatório quando o status é resolvido')
+            if report.resolvido_em < report.data_criacao:
+                raise RowError('resolvido_em: anterior à data_criacao')
+        # No histórico os marcos contam a partir da data_criacao informada
+        report.atualizar_marcos(agora=report.resolvido_em or report.data_criacao)
+        return report
+
+    def write(self, batch):
+        super().write(batch)
+        self.ids.extend(report.pk for report in batch)
+
+    def finish(self):
+        # bulk_create não passa pelos sinais: índice de busca, rollup e
+        # contadores são refeitos aqui, uma vez para a importação inteira
+        if None in self.ids:
+            # Banco sem RETURNING no INSERT em lote: sem os ids, reindexa tudo
+            rebuild_search_index(connections[self.using])
+        else:
+            update_search_index(self.ids, using=self.using)
+        rebuild_rollup(using=self.using)
+        reconcile_user_stats(using=self.using)
+        bump_data_version()
+
+
+IMPORTERS = {
+    'locais': LocalImporter,
+    'equipamentos': EquipamentoImporter,
+    'relatorios': ReportImporter,
+}
+
+
+class ErrorReportWriter:
+    """Relatório de erros em CSV: linha, erro e os valores originais"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.writer = None
+
+    def write(self, numero, mensagem, row):
+        if self.writer is None:
+            self.writer = csv.writer(self.stream, delimiter=';')
+            self.writer.writerow(['linha', 'erro'] + list(row))
+        self.writer.writerow([numero, mensagem] + ['' if v is None else v for v in row.values()])
+
+
+def import_file(kind, file, filename, error_stream=None, **options):
+    """Importa `file` (binário) com o importador de `kind` e retorna o ImportResult"""
+    importer = IMPORTERS[kind](
+        error_writer=ErrorReportWriter(error_stream) if error_stream is not None else None,
+        **options
+    )
+    return importer.run(read_rows(file, filename))
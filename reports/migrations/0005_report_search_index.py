@@ -0,0 +1,53 @@
+from django.db import migrations
+
+from reports.search import FTS_TABLE, rebuild_search_index
+
+
+POSTGRES_FORWARD = """
+ALTER TABLE reports_report ADD COLUMN IF NOT EXISTS search_vector tsvector;
+CREATE INDEX IF NOT EXISTS reports_report_search_gin ON reports_report USING gin (search_vector);
+"""
+
+POSTGRES_BACKWARD = """
+DROP INDEX IF EXISTS reports_report_search_gin;
+ALTER TABLE reports_report DROP COLUMN IF EXISTS search_vector;
+"""
+
+SQLITE_FORWARD = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    "USING fts5(titulo, descricao, autor, tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+SQLITE_BACKWARD = f"DROP TABLE IF EXISTS {FTS_TABLE}"
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_FORWARD)
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(SQLITE_FORWARD)
+    else:
+        return
+    rebuild_search_index(connection)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_BACKWARD)
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(SQLITE_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0004_report_atribuido_para_alter_report_usuario_and_more'),
+        # O índice lê o nome do autor em auth_user (tabela renomeada nesta migração)
+        ('authentication', '0002_user_ativo_user_nome_user_password_hash_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
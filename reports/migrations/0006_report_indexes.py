@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0005_report_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['data_criacao', 'id'], name='report_ativo_criacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['data_ocorrencia', 'id'], name='report_ativo_ocorrencia_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['status', 'data_criacao'], name='report_ativo_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['prioridade', 'data_criacao'], name='report_ativo_prioridade_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['usuario', 'data_criacao'], name='report_ativo_usuario_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), ('atribuido_para__isnull', False)), fields=['atribuido_para', 'data_criacao'], name='report_ativo_atribuido_idx'),
+        ),
+    ]
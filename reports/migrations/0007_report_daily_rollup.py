@@ -0,0 +1,85 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:50
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+# Cópia do reports.rollup desta versão: a migração não importa o código atual
+DIMENSIONS = ('local_id', 'equipamento_id', 'prioridade', 'status', 'usuario_id', 'atribuido_para_id')
+BATCH_SIZE = 2000
+
+
+def rollup_key(data, dimensions):
+    return '|'.join([data.isoformat()] + ['' if dimensions[d] is None else str(dimensions[d]) for d in DIMENSIONS])
+
+
+def backfill_rollup(apps, schema_editor):
+    using = schema_editor.connection.alias
+    Report = apps.get_model('reports', 'Report')
+    ReportDailyRollup = apps.get_model('reports', 'ReportDailyRollup')
+    reports = Report.objects.using(using).filter(deleted_at__isnull=True)
+    # Banco novo: nada a consolidar
+    if not reports.exists():
+        return
+
+    grouped = reports.order_by().annotate(
+        dia=TruncDate('data_criacao')
+    ).values('dia', *DIMENSIONS).annotate(
+        total=Count('id'),
+        progresso_soma=Sum('progresso'),
+        resolucao=Sum(F('data_atualizacao') - F('data_criacao'), filter=Q(status='resolvido')),
+    )
+
+    batch = []
+    for item in grouped.iterator(chunk_size=BATCH_SIZE):
+        dimensions = {d: item[d] for d in DIMENSIONS}
+        batch.append(ReportDailyRollup(
+            chave=rollup_key(item['dia'], dimensions),
+            data=item['dia'],
+            total=item['total'],
+            progresso_soma=item['progresso_soma'] or 0,
+            resolucao_segundos_soma=int(item['resolucao'].total_seconds()) if item['resolucao'] else 0,
+            **dimensions
+        ))
+        if len(batch) >= BATCH_SIZE:
+            ReportDailyRollup.objects.using(using).bulk_create(batch)
+            batch = []
+    ReportDailyRollup.objects.using(using).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0005_alter_motor_status_operacional'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reports', '0006_report_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=100, unique=True, verbose_name='Chave')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('prioridade', models.CharField(choices=[('baixa', 'Baixa'), ('media', 'Média'), ('alta', 'Alta'), ('critica', 'Crítica')], max_length=20, verbose_name='Prioridade')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('em_andamento', 'Em Andamento'), ('resolvido', 'Resolvido')], max_length=20, verbose_name='Status')),
+                ('total', models.IntegerField(default=0, verbose_name='Relatórios')),
+                ('progresso_soma', models.BigIntegerField(default=0, verbose_name='Soma do Progresso')),
+                ('resolucao_segundos_soma', models.BigIntegerField(default=0, verbose_name='Soma do Tempo de Resolução (s)')),
+                ('atribuido_para', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Atribuído Para')),
+                ('equipamento', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='locations.equipamento', verbose_name='Equipamento')),
+                ('local', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='locations.local', verbose_name='Local')),
+                ('usuario', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Autor')),
+            ],
+            options={
+                'verbose_name': 'Consolidado Diário de Relatórios',
+                'verbose_name_plural': 'Consolidados Diários de Relatórios',
+                'ordering': ['data'],
+                'indexes': [models.Index(fields=['data', 'status'], name='rollup_data_status_idx'), models.Index(fields=['usuario', 'data'], name='rollup_usuario_data_idx'), models.Index(fields=['atribuido_para', 'data'], name='rollup_atribuido_data_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
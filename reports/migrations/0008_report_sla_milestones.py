@@ -0,0 +1,118 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:57
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+
+# Cópias de reports.backfill e reports.rollup desta versão: a migração usa
+# só os modelos históricos e não importa o código atual
+MILESTONE_FIELDS = ['primeira_resposta_em', 'resolvido_em', 'tempo_resolucao_segundos']
+DIMENSIONS = ('local_id', 'equipamento_id', 'prioridade', 'status', 'usuario_id', 'atribuido_para_id')
+BATCH_SIZE = 1000
+
+
+def rollup_key(data, dimensions):
+    return '|'.join([data.isoformat()] + ['' if dimensions[d] is None else str(dimensions[d]) for d in DIMENSIONS])
+
+
+def backfill_milestones(Report, using):
+    """Marcos de SLA a partir do histórico de ReportUpdate, em lotes por id"""
+    reports = Report.objects.using(using).only(
+        'id', 'status', 'data_criacao', 'data_atualizacao', *MILESTONE_FIELDS
+    ).annotate(
+        primeira_atualizacao=Min('atualizacoes__data_atualizacao'),
+        ultima_resolucao=Max(
+            'atualizacoes__data_atualizacao', filter=Q(atualizacoes__status_novo='resolvido')
+        ),
+    ).order_by('id')
+
+    last_id = 0
+    while True:
+        batch = list(reports.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            return
+        for report in batch:
+            primeira = report.primeira_atualizacao
+            if report.status == 'resolvido':
+                resolvido = report.ultima_resolucao or report.data_atualizacao
+                if primeira is None or primeira > resolvido:
+                    primeira = resolvido
+                report.resolvido_em = resolvido
+                report.tempo_resolucao_segundos = max(
+                    int((resolvido - report.data_criacao).total_seconds()), 0
+                )
+            else:
+                report.resolvido_em = None
+                report.tempo_resolucao_segundos = None
+            report.primeira_resposta_em = primeira
+        Report.objects.using(using).bulk_update(batch, MILESTONE_FIELDS)
+        last_id = batch[-1].id
+
+
+def rebuild_rollup(Report, ReportDailyRollup, using):
+    """O rollup passa a somar tempo_resolucao_segundos"""
+    grouped = Report.objects.using(using).filter(deleted_at__isnull=True).order_by().annotate(
+        dia=TruncDate('data_criacao')
+    ).values('dia', *DIMENSIONS).annotate(
+        total=Count('id'),
+        progresso_soma=Sum('progresso'),
+        resolucao=Sum('tempo_resolucao_segundos', filter=Q(status='resolvido')),
+    )
+
+    rollups = ReportDailyRollup.objects.using(using)
+    rollups.all().delete()
+    batch = []
+    for item in grouped.iterator(chunk_size=BATCH_SIZE):
+        dimensions = {d: item[d] for d in DIMENSIONS}
+        batch.append(ReportDailyRollup(
+            chave=rollup_key(item['dia'], dimensions),
+            data=item['dia'],
+            total=item['total'],
+            progresso_soma=item['progresso_soma'] or 0,
+            resolucao_segundos_soma=item['resolucao'] or 0,
+            **dimensions
+        ))
+        if len(batch) >= BATCH_SIZE:
+            rollups.bulk_create(batch)
+            batch = []
+    rollups.bulk_create(batch)
+
+
+def backfill(apps, schema_editor):
+    using = schema_editor.connection.alias
+    Report = apps.get_model('reports', 'Report')
+    # Banco novo: nada a preencher
+    if not Report.objects.using(using).exists():
+        return
+    backfill_milestones(Report, using)
+    rebuild_rollup(Report, apps.get_model('reports', 'ReportDailyRollup'), using)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0007_report_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='primeira_resposta_em',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Primeira Resposta em'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='resolvido_em',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Resolvido em'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='tempo_resolucao_segundos',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Tempo de Resolução (s)'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), ('resolvido_em__isnull', False)), fields=['resolvido_em', 'prioridade'], name='report_ativo_resolvido_idx'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
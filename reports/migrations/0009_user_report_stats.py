@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from reports.user_stats import reconcile_user_stats
+
+
+def populate(apps, schema_editor):
+    using = schema_editor.connection.alias
+    Report = apps.get_model('reports', 'Report')
+    if not Report.objects.using(using).exists():
+        return
+    reconcile_user_stats(Report, apps.get_model('reports', 'UserReportStats'), using=using)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0003_perfil_setor_unidade_alter_user_perfil_id_and_more'),
+        ('reports', '0008_report_sla_milestones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserReportStats',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='report_stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+                ('criados', models.IntegerField(default=0, verbose_name='Relatórios Criados')),
+                ('resolvidos', models.IntegerField(default=0, verbose_name='Criados e Resolvidos')),
+                ('atribuidos', models.IntegerField(default=0, verbose_name='Relatórios Atribuídos')),
+                ('abertos', models.IntegerField(default=0, verbose_name='Atribuídos em Aberto')),
+            ],
+            options={
+                'verbose_name': 'Estatística de Relatórios do Usuário',
+                'verbose_name_plural': 'Estatísticas de Relatórios dos Usuários',
+                'indexes': [models.Index(fields=['-criados'], name='user_stats_criados_idx'), models.Index(fields=['-atribuidos'], name='user_stats_atribuidos_idx')],
+            },
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
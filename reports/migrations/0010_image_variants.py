@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0009_user_report_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='imagem_principal_info',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Variantes da Imagem Principal'),
+        ),
+        migrations.AddField(
+            model_name='reportimage',
+            name='imagem_info',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Variantes da Imagem'),
+        ),
+        migrations.AddField(
+            model_name='reportupdateimage',
+            name='imagem_info',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Variantes da Imagem'),
+        ),
+    ]
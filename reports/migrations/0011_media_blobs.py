@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:56
+
+from django.db import migrations, models
+import django.utils.timezone
+import reports.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0010_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='report',
+            name='imagem_principal',
+            field=models.ImageField(blank=True, null=True, storage=reports.storage.blob_storage, upload_to='reports/images/', verbose_name='Imagem Principal'),
+        ),
+        migrations.AlterField(
+            model_name='reportimage',
+            name='imagem',
+            field=models.ImageField(storage=reports.storage.blob_storage, upload_to='reports/anexos/', verbose_name='Imagem'),
+        ),
+        migrations.AlterField(
+            model_name='reportupdateimage',
+            name='imagem',
+            field=models.ImageField(storage=reports.storage.blob_storage, upload_to='reports/updates/', verbose_name='Imagem da Atualização'),
+        ),
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=255, unique=True, verbose_name='Arquivo')),
+                ('tamanho', models.BigIntegerField(default=0, verbose_name='Tamanho (bytes)')),
+                ('referencias', models.IntegerField(default=0, verbose_name='Referências')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('atualizado_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Arquivo Compartilhado',
+                'verbose_name_plural': 'Arquivos Compartilhados',
+                'indexes': [models.Index(fields=['referencias', 'atualizado_em'], name='mediablob_coleta_idx')],
+            },
+        ),
+    ]
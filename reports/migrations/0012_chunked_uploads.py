@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reports', '0011_media_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChunkedUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nome_arquivo', models.CharField(max_length=255, verbose_name='Nome do Arquivo')),
+                ('tamanho', models.BigIntegerField(verbose_name='Tamanho (bytes)')),
+                ('recebido', models.BigIntegerField(default=0, verbose_name='Recebido (bytes)')),
+                ('status', models.CharField(choices=[('recebendo', 'Recebendo'), ('concluido', 'Concluído')], default='recebendo', max_length=20, verbose_name='Status')),
+                ('blob', models.CharField(blank=True, max_length=255, verbose_name='Arquivo no Storage')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, db_index=True, verbose_name='Atualizado em')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads_em_partes', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Upload em Partes',
+                'verbose_name_plural': 'Uploads em Partes',
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:33
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0012_chunked_uploads'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='report',
+            name='data_criacao',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Data de Criação'),
+        ),
+    ]
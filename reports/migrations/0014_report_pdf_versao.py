@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0013_report_data_criacao_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='pdf_versao',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Versão do PDF'),
+        ),
+    ]
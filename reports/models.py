@@ -1,6 +1,12 @@
+import uuid
+
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
+
+from .storage import blob_storage
 
 User = get_user_model()
 
@@ -13,6 +19,19 @@ except ImportError:
     Equipamento = None
 
 
+class ReportQuerySet(models.QuerySet):
+    """QuerySet de relatórios"""
+
+    def ativos(self):
+        """Exclui os relatórios removidos logicamente (deleted_at preenchido)"""
+        return self.filter(deleted_at__isnull=True)
+
+
+# Os índices parciais só cobrem relatórios ativos; as consultas precisam
+# repetir este predicado (via ReportQuerySet.ativos) para usá-los
+ATIVOS = Q(deleted_at__isnull=True)
+
+
 class Report(models.Model):
     """Modelo de relatórios baseado na estrutura de banco desejada"""
     
@@ -63,20 +82,58 @@ class Report(models.Model):
     # Campo para upload de imagem principal
     imagem_principal = models.ImageField(
         upload_to='reports/images/', 
+        storage=blob_storage,
         null=True, 
         blank=True, 
         verbose_name='Imagem Principal'
     )
-    data_criacao = models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')
+    # Variantes responsivas geradas depois do upload (core.images)
+    imagem_principal_info = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Variantes da Imagem Principal')
+    # default em vez de auto_now_add: a importação de histórico grava a data
+    # original já no INSERT
+    data_criacao = models.DateTimeField(default=timezone.now, editable=False, verbose_name='Data de Criação')
     data_atualizacao = models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')
+    # Avançada pelos sinais quando anexos, dados ou atualizações mudam; com
+    # data_atualizacao forma a versão do PDF em cache (reports.pdf)
+    pdf_versao = models.PositiveIntegerField(default=0, editable=False, verbose_name='Versão do PDF')
+    # Marcos de SLA; data_atualizacao muda a cada save e não serve para medir resolução
+    primeira_resposta_em = models.DateTimeField(null=True, blank=True, verbose_name='Primeira Resposta em')
+    resolvido_em = models.DateTimeField(null=True, blank=True, verbose_name='Resolvido em')
+    tempo_resolucao_segundos = models.IntegerField(null=True, blank=True, verbose_name='Tempo de Resolução (s)')
     tenant_id = models.IntegerField(default=1, verbose_name='Tenant ID')
     deleted_at = models.DateTimeField(null=True, blank=True, verbose_name='Deletado em')
 
+    objects = ReportQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Relatório'
         verbose_name_plural = 'Relatórios'
         ordering = ['-data_criacao']
         db_table = 'reports_report'
+        # Derivados das consultas de reports/views.py, analytics_simple.py e
+        # dashboard/views.py; conferir os planos com `manage.py explain_reports`
+        indexes = [
+            # Listagem padrão, paginação por cursor e intervalos do dashboard
+            models.Index(fields=['data_criacao', 'id'], condition=ATIVOS, name='report_ativo_criacao_idx'),
+            # Filtro de período da listagem
+            models.Index(fields=['data_ocorrencia', 'id'], condition=ATIVOS, name='report_ativo_ocorrencia_idx'),
+            # Filtros/contagens por status e prioridade dentro de um intervalo
+            models.Index(fields=['status', 'data_criacao'], condition=ATIVOS, name='report_ativo_status_idx'),
+            models.Index(fields=['prioridade', 'data_criacao'], condition=ATIVOS, name='report_ativo_prioridade_idx'),
+            # Os dois ramos do OR usuario/atribuido_para de quem não é staff
+            models.Index(fields=['usuario', 'data_criacao'], condition=ATIVOS, name='report_ativo_usuario_idx'),
+            models.Index(
+                fields=['atribuido_para', 'data_criacao'],
+                condition=ATIVOS & Q(atribuido_para__isnull=False),
+                name='report_ativo_atribuido_idx'
+            ),
+            # Agregações de SLA por período de resolução
+            models.Index(
+                fields=['resolvido_em', 'prioridade'],
+                condition=ATIVOS & Q(resolvido_em__isnull=False),
+                name='report_ativo_resolvido_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.titulo
@@ -89,6 +146,27 @@ class Report(models.Model):
         """Propriedade para compatibilidade com código existente"""
         return self.usuario
 
+    def atualizar_marcos(self, resposta=False, agora=None):
+        """
+        Atualiza primeira_resposta_em, resolvido_em e tempo_resolucao_segundos
+        conforme o status atual. Chamar antes do save sempre que o status ou o
+        progresso mudar; `resposta` indica que houve atuação no relatório.
+        """
+        agora = agora or timezone.now()
+
+        if (resposta or self.status == 'resolvido') and self.primeira_resposta_em is None:
+            self.primeira_resposta_em = agora
+
+        if self.status == 'resolvido':
+            if self.resolvido_em is None:
+                self.resolvido_em = agora
+            inicio = self.data_criacao or agora
+            self.tempo_resolucao_segundos = max(int((self.resolvido_em - inicio).total_seconds()), 0)
+        else:
+            # Reaberto: a próxima resolução conta do zero
+            self.resolvido_em = None
+            self.tempo_resolucao_segundos = None
+
     def is_completed(self):
         """Verifica se o relatório está concluído"""
         return self.status == 'resolvido'
@@ -147,7 +225,8 @@ class Report(models.Model):
 class ReportImage(models.Model):
     """Modelo para múltiplas imagens anexadas ao relatório"""
     report = models.ForeignKey(Report, on_delete=models.CASCADE, related_name='imagens', verbose_name='Relatório')
-    imagem = models.ImageField(upload_to='reports/anexos/', verbose_name='Imagem')
+    imagem = models.ImageField(upload_to='reports/anexos/', storage=blob_storage, verbose_name='Imagem')
+    imagem_info = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Variantes da Imagem')
     descricao = models.CharField(max_length=200, blank=True, verbose_name='Descrição da Imagem')
     data_upload = models.DateTimeField(auto_now_add=True, verbose_name='Data do Upload')
     ordem = models.PositiveIntegerField(default=0, verbose_name='Ordem de Exibição')
@@ -281,8 +360,10 @@ class ReportUpdateImage(models.Model):
     )
     imagem = models.ImageField(
         upload_to='reports/updates/', 
+        storage=blob_storage,
         verbose_name='Imagem da Atualização'
     )
+    imagem_info = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Variantes da Imagem')
     descricao = models.CharField(
         max_length=200, 
         blank=True, 
@@ -296,4 +377,145 @@ class ReportUpdateImage(models.Model):
         ordering = ['data_upload']
     
     def __str__(self):
-        return f"Imagem - {self.update.report.titulo}" 
\ No newline at end of file
+        return f"Imagem - {self.update.report.titulo}" 
+
+class ReportDailyRollup(models.Model):
+    """
+    Tabela de fatos diária dos relatórios ativos, lida pelo dashboard de analytics.
+
+    Cada linha soma os relatórios criados em um dia (fuso local) com a mesma
+    combinação de local, equipamento, prioridade, status, autor e responsável.
+    É mantida pelos sinais de ``reports.signals`` e recriada pelo comando
+    ``rebuild_report_rollup``.
+    """
+
+    chave = models.CharField(max_length=100, unique=True, verbose_name='Chave')
+    data = models.DateField(verbose_name='Data')
+    # Dimensões sem constraint no banco: a linha guarda o id mesmo que o
+    # registro seja removido antes do próximo rebuild
+    local = models.ForeignKey(
+        'locations.Local', on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='+', verbose_name='Local'
+    )
+    equipamento = models.ForeignKey(
+        'locations.Equipamento', on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='+', verbose_name='Equipamento'
+    )
+    prioridade = models.CharField(max_length=20, choices=Report.PRIORIDADE_CHOICES, verbose_name='Prioridade')
+    status = models.CharField(max_length=20, choices=Report.STATUS_CHOICES, verbose_name='Status')
+    usuario = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+        null=True, blank=True, related_name='+', verbose_name='Autor'
+    )
+    atribuido_para = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+        null=True, blank=True, related_name='+', verbose_name='Atribuído Para'
+    )
+    total = models.IntegerField(default=0, verbose_name='Relatórios')
+    progresso_soma = models.BigIntegerField(default=0, verbose_name='Soma do Progresso')
+    resolucao_segundos_soma = models.BigIntegerField(default=0, verbose_name='Soma do Tempo de Resolução (s)')
+
+    class Meta:
+        verbose_name = 'Consolidado Diário de Relatórios'
+        verbose_name_plural = 'Consolidados Diários de Relatórios'
+        ordering = ['data']
+        indexes = [
+            models.Index(fields=['data', 'status'], name='rollup_data_status_idx'),
+            # Ramos do filtro autor/responsável de quem não é staff
+            models.Index(fields=['usuario', 'data'], name='rollup_usuario_data_idx'),
+            models.Index(fields=['atribuido_para', 'data'], name='rollup_atribuido_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.data} - {self.get_status_display()} ({self.total})"
+
+
+class UserReportStats(models.Model):
+    """
+    Contadores de relatórios ativos por usuário, lidos pelos rankings do
+    dashboard e pelo perfil no lugar de Count('reports').
+
+    Mantidos pelos sinais de ``reports.signals``; o comando
+    ``reconcile_user_stats`` corrige divergências (ex.: ``QuerySet.update()``).
+    """
+
+    usuario = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True,
+        related_name='report_stats', verbose_name='Usuário'
+    )
+    criados = models.IntegerField(default=0, verbose_name='Relatórios Criados')
+    resolvidos = models.IntegerField(default=0, verbose_name='Criados e Resolvidos')
+    atribuidos = models.IntegerField(default=0, verbose_name='Relatórios Atribuídos')
+    abertos = models.IntegerField(default=0, verbose_name='Atribuídos em Aberto')
+
+    class Meta:
+        verbose_name = 'Estatística de Relatórios do Usuário'
+        verbose_name_plural = 'Estatísticas de Relatórios dos Usuários'
+        indexes = [
+            # Rankings: top-N por criados e por atribuídos
+            models.Index(fields=['-criados'], name='user_stats_criados_idx'),
+            models.Index(fields=['-atribuidos'], name='user_stats_atribuidos_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario} ({self.criados} criados)"
+
+
+class MediaBlob(models.Model):
+    """
+    Arquivo do storage por conteúdo (``reports.storage``), compartilhado pelos
+    campos de foto que têm o mesmo conteúdo.
+
+    ``referencias`` é mantido pelos sinais de ``reports.signals``; o comando
+    ``collect_blobs`` remove os blobs sem referências e pode recontá-las.
+    """
+
+    nome = models.CharField(max_length=255, unique=True, verbose_name='Arquivo')
+    tamanho = models.BigIntegerField(default=0, verbose_name='Tamanho (bytes)')
+    referencias = models.IntegerField(default=0, verbose_name='Referências')
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    # Último upload ou referência liberada: a coleta espera a carência a partir daqui
+    atualizado_em = models.DateTimeField(default=timezone.now, verbose_name='Atualizado em')
+
+    class Meta:
+        verbose_name = 'Arquivo Compartilhado'
+        verbose_name_plural = 'Arquivos Compartilhados'
+        indexes = [
+            # Candidatos da coleta: sem referências, mais antigos primeiro
+            models.Index(fields=['referencias', 'atualizado_em'], name='mediablob_coleta_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nome} ({self.referencias} referências)"
+
+
+class ChunkedUpload(models.Model):
+    """
+    Foto enviada em partes pela API retomável (``reports.chunked_upload``).
+
+    As partes vão para um arquivo temporário; ao finalizar, a foto é gravada no
+    storage por conteúdo e ``blob`` guarda o nome dela, que o formulário de
+    atualização usa no lugar de um novo upload.
+    """
+
+    STATUS_CHOICES = [
+        ('recebendo', 'Recebendo'),
+        ('concluido', 'Concluído'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploads_em_partes', verbose_name='Usuário')
+    nome_arquivo = models.CharField(max_length=255, verbose_name='Nome do Arquivo')
+    tamanho = models.BigIntegerField(verbose_name='Tamanho (bytes)')
+    recebido = models.BigIntegerField(default=0, verbose_name='Recebido (bytes)')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='recebendo', verbose_name='Status')
+    blob = models.CharField(max_length=255, blank=True, verbose_name='Arquivo no Storage')
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Atualizado em')
+
+    class Meta:
+        verbose_name = 'Upload em Partes'
+        verbose_name_plural = 'Uploads em Partes'
+
+    def __str__(self):
+        return f"{self.nome_arquivo} ({self.recebido}/{self.tamanho} bytes)"
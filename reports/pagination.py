@@ -0,0 +1,195 @@
+"""
+Paginação da listagem de relatórios
+"""
+
+import json
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+
+
+# Acima deste número de linhas o total passa a ser estimado
+EXACT_COUNT_LIMIT = getattr(settings, 'REPORTS_EXACT_COUNT_LIMIT', 10000)
+
+CURSOR_SALT = 'reports.pagination.cursor'
+
+
+class CountedPaginator(Paginator):
+    """Paginator que reaproveita uma contagem já calculada em vez de emitir o próprio COUNT"""
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            # Sobrescreve o cached_property do Paginator
+            self.__dict__['count'] = count
+
+
+class InvalidCursor(Exception):
+    """Cursor adulterado, expirado ou gerado para outra ordenação"""
+    pass
+
+
+class KeysetPage:
+    """Página obtida por cursor; imita a interface usada pelos templates"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginação por cursor (keyset) sobre (campo de ordenação, id).
+
+    Em vez de OFFSET, cada página filtra a partir da última linha vista,
+    o que mantém o custo constante em páginas profundas e dispensa o COUNT.
+    Os cursores são opacos e assinados para que não possam ser adulterados.
+    """
+
+    def __init__(self, queryset, per_page, ordering='-data_criacao'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.field = ordering.lstrip('-')
+        self.descending = ordering.startswith('-')
+        try:
+            self.model_field = queryset.model._meta.get_field(self.field)
+        except FieldDoesNotExist:
+            # Ordenação por anotação (ex.: search_rank); o valor já é serializável
+            self.model_field = None
+
+    def _order_by(self, descending):
+        prefix = '-' if descending else ''
+        return (f'{prefix}{self.field}', f'{prefix}id')
+
+    def _after(self, value, pk, descending):
+        """Filtro das linhas que vêm depois de (value, pk) na ordem dada"""
+        op = 'lt' if descending else 'gt'
+        return (
+            Q(**{f'{self.field}__{op}': value}) |
+            Q(**{self.field: value, f'id__{op}': pk})
+        )
+
+    def _encode(self, obj, direction):
+        if self.model_field is None:
+            value = getattr(obj, self.field)
+        else:
+            value = self.model_field.value_to_string(obj)
+        return signing.dumps(
+            {'o': self.ordering, 'v': value, 'id': obj.pk, 'd': direction},
+            salt=CURSOR_SALT, compress=True
+        )
+
+    def _decode(self, cursor):
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            raise InvalidCursor(cursor)
+        if data.get('o') != self.ordering or data.get('d') not in ('next', 'prev'):
+            raise InvalidCursor(cursor)
+        value = data['v']
+        if self.model_field is not None:
+            value = self.model_field.to_python(value)
+        return value, data['id'], data['d']
+
+    def page(self, cursor=None):
+        """Retorna a KeysetPage indicada pelo cursor (ou a primeira)"""
+        if not cursor:
+            return self._forward(None, None, first=True)
+
+        value, pk, direction = self._decode(cursor)
+        if direction == 'prev':
+            return self._backward(value, pk)
+        return self._forward(value, pk)
+
+    def get_page(self, cursor=None):
+        """Como page(), mas volta à primeira página se o cursor for inválido"""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+    def _forward(self, value, pk, first=False):
+        queryset = self.queryset.order_by(*self._order_by(self.descending))
+        if not first:
+            queryset = queryset.filter(self._after(value, pk, self.descending))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        return KeysetPage(
+            rows,
+            next_cursor=self._encode(rows[-1], 'next') if has_next else None,
+            previous_cursor=self._encode(rows[0], 'prev') if rows and not first else None,
+        )
+
+    def _backward(self, value, pk):
+        # Percorre na ordem inversa e desvira o resultado
+        queryset = self.queryset.order_by(
+            *self._order_by(not self.descending)
+        ).filter(self._after(value, pk, not self.descending))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+
+        return KeysetPage(
+            rows,
+            next_cursor=self._encode(rows[-1], 'next') if rows else None,
+            previous_cursor=self._encode(rows[0], 'prev') if has_previous else None,
+        )
+
+
+def estimate_count(queryset, limit=None):
+    """
+    Conta até `limit` linhas; acima disso devolve uma estimativa.
+
+    Retorna (total, exato). A contagem limitada roda sobre um subselect
+    com LIMIT, então nunca varre mais do que `limit + 1` linhas. No
+    PostgreSQL a estimativa vem do planejador (EXPLAIN); nos demais
+    bancos o próprio limite é devolvido como piso.
+    """
+    limit = EXACT_COUNT_LIMIT if limit is None else limit
+    queryset = queryset.order_by()
+
+    capped = queryset[:limit + 1].count()
+    if capped <= limit:
+        return capped, True
+
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimated = int(plan[0]['Plan']['Plan Rows'])
+        return max(estimated, capped), False
+
+    return capped, False
@@ -0,0 +1,319 @@
+"""
+PDF do relatório (reportlab) com cache em storage
+
+O PDF traz os dados do relatório, a imagem principal, os anexos
+(ReportImage) e a linha do tempo das atualizações (ReportUpdate) com as
+imagens de cada uma. Fica gravado no storage com a chave
+(report.id, data_atualizacao, pdf_versao): downloads seguintes saem do
+arquivo, e qualquer mudança no relatório (data_atualizacao) ou nos anexos,
+atualizações e dados (cujos sinais avançam pdf_versao) gera uma chave nova.
+
+As imagens são reduzidas antes de entrar no PDF para o tamanho em que
+aparecem na página, a REPORTS_PDF_IMAGE_DPI, e recomprimidas em JPEG. Fotos de
+celular têm 12+ megapixels; embutidas como estão, o arquivo e o tempo de
+renderização crescem com a resolução original e não com o que cabe na página.
+Quando já existe uma variante responsiva (core.images) grande o bastante, é
+ela que é lida, e não o original.
+"""
+
+import logging
+import math
+from datetime import timedelta
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image as PILImage, ImageOps
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm, inch
+from reportlab.platypus import Image, KeepTogether, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from core.images import get_variants
+
+from .models import Report
+
+logger = logging.getLogger(__name__)
+
+# Streams binários: o ASCII85 (padrão do reportlab) aumenta as imagens em 25%
+# e, sem a extensão em C, o codificador em Python puro dominava a renderização
+rl_config.useA85 = 0
+
+DATETIME_FORMAT = '%d/%m/%Y %H:%M'
+
+PAGE_WIDTH = A4[0] - 4 * cm
+# Largura de cada imagem nas grades de anexos e da linha do tempo
+ANEXO_WIDTH = (PAGE_WIDTH - 0.5 * cm) / 2
+UPDATE_IMAGE_WIDTH = (PAGE_WIDTH - 1 * cm) / 3
+
+JPEG_QUALITY = 75
+
+
+def _image_dpi():
+    return getattr(settings, 'REPORTS_PDF_IMAGE_DPI', 150)
+
+
+def _storage_dir():
+    return getattr(settings, 'REPORTS_PDF_STORAGE_DIR', 'reports/pdf')
+
+
+def _old_version_age():
+    return getattr(settings, 'REPORTS_PDF_OLD_VERSION_AGE', 3600)
+
+
+def pdf_path(report):
+    """
+    Caminho do PDF no storage para a versão atual do relatório. Um save com
+    a instância desatualizada pode regravar um pdf_versao antigo, mas sempre
+    com um data_atualizacao novo, então o par não se repete.
+    """
+    editado = int(report.data_atualizacao.timestamp() * 1_000_000)
+    return f'{_storage_dir()}/{report.pk}/{editado}-{report.pdf_versao}.pdf'
+
+
+def _data(value):
+    return timezone.localtime(value).strftime(DATETIME_FORMAT) if value else '-'
+
+
+def _texto(value):
+    """Texto livre para um Paragraph (que interpreta marcação)"""
+    return escape(str(value or '')).replace('\n', '<br/>')
+
+
+def prepare_image(field, box=None):
+    """
+    Lê a imagem do campo e devolve (JPEG reduzido para caber em `box`
+    (largura, altura) em pixels, largura, altura), ou None se o arquivo não
+    existir ou não for uma imagem válida. Sem `box` a imagem vai sem redução.
+    """
+    try:
+        with field.open('rb') as file, PILImage.open(file) as image:
+            if box:
+                # Em JPEG o draft decodifica já em escala reduzida (1/2, 1/4, 1/8)
+                image.draft('RGB', box)
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            if box:
+                image.thumbnail(box, PILImage.LANCZOS)
+            output = BytesIO()
+            image.save(output, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+            output.seek(0)
+            return output, image.width, image.height
+    except (OSError, ValueError) as e:
+        logger.warning('Imagem %s ignorada no PDF: %s', field.name, e)
+        return None
+
+
+class _StoredFile:
+    """Arquivo do storage com a interface de FieldFile que prepare_image usa"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def open(self, mode='rb'):
+        return default_storage.open(self.name, mode)
+
+
+def _smallest_source(field, box):
+    """A menor variante responsiva que cobre `box`, se houver; senão o original"""
+    info = get_variants(field) if box else None
+    if info:
+        for entry in sorted(info['variants'].values(), key=lambda entry: entry['width']):
+            if entry['width'] >= box[0]:
+                return _StoredFile(entry['jpeg'])
+    return field
+
+
+def _flowable_image(field, width, max_height, dpi):
+    box = (math.ceil(width / inch * dpi), math.ceil(max_height / inch * dpi)) if dpi else None
+    prepared = prepare_image(_smallest_source(field, box), box) if field else None
+    if not prepared:
+        return None
+    data, largura, altura = prepared
+    # Imagens muito altas (retrato, panorâmicas) não podem passar da página
+    escala = min(width / largura, max_height / altura)
+    return Image(data, width=largura * escala, height=altura * escala)
+
+
+def _grid(cells, columns, width):
+    rows = [cells[i:i + columns] for i in range(0, len(cells), columns)]
+    rows[-1] += [''] * (columns - len(rows[-1]))
+    table = Table(rows, colWidths=[width / columns] * columns)
+    table.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ]))
+    return table
+
+
+class ReportPdfBuilder:
+    """Monta os flowables do PDF de um relatório"""
+
+    def __init__(self, report, data=None, image_dpi=None):
+        self.report = report
+        self.data = data or {}
+        # 0 embute as imagens originais (só para comparação no benchmark)
+        self.image_dpi = _image_dpi() if image_dpi is None else image_dpi
+        styles = getSampleStyleSheet()
+        self.title = styles['Title']
+        self.heading = styles['Heading2']
+        self.body = styles['BodyText']
+        self.small = ParagraphStyle('small', parent=self.body, fontSize=8, leading=10, textColor=colors.grey)
+
+    def _image(self, field, width, max_height=12 * cm):
+        return _flowable_image(field, width, max_height, self.image_dpi)
+
+    def _info_table(self, rows):
+        table = Table(
+            [[Paragraph(f'<b>{_texto(label)}</b>', self.body), Paragraph(_texto(value), self.body)] for label, value in rows],
+            colWidths=[4.5 * cm, PAGE_WIDTH - 4.5 * cm],
+        )
+        table.setStyle(TableStyle([
+            ('GRID', (0, 0), (-1, -1), 0.25, colors.lightgrey),
+            ('BACKGROUND', (0, 0), (0, -1), colors.whitesmoke),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]))
+        return table
+
+    def _cabecalho(self):
+        report = self.report
+        yield Paragraph(_texto(report.titulo), self.title)
+        yield self._info_table([
+            ('Relatório', f'#{report.pk}'),
+            ('Local', report.local or '-'),
+            ('Equipamento', report.equipamento or '-'),
+            ('Status', report.get_status_display()),
+            ('Prioridade', report.get_prioridade_display()),
+            ('Progresso', f'{report.progresso}%'),
+            ('Autor', report.usuario.get_full_name() or report.usuario.username),
+            ('Atribuído para', report.atribuido_para or '-'),
+            ('Data da ocorrência', _data(report.data_ocorrencia)),
+            ('Criado em', _data(report.data_criacao)),
+            ('Resolvido em', _data(report.resolvido_em)),
+        ])
+        yield Spacer(1, 0.5 * cm)
+        yield Paragraph('Descrição', self.heading)
+        yield Paragraph(_texto(report.descricao), self.body)
+
+        if self.data:
+            yield Paragraph('Dados', self.heading)
+            yield self._info_table(list(self.data.items()))
+
+        imagem = self._image(report.imagem_principal, PAGE_WIDTH * 0.75, max_height=18 * cm)
+        if imagem:
+            yield Paragraph('Imagem principal', self.heading)
+            yield imagem
+
+    def _anexos(self):
+        cells = []
+        for anexo in self.report.imagens.all():
+            imagem = self._image(anexo.imagem, ANEXO_WIDTH - 0.3 * cm)
+            if imagem:
+                cells.append([imagem, Paragraph(_texto(anexo.descricao), self.small)])
+        if cells:
+            yield Paragraph(f'Anexos ({len(cells)})', self.heading)
+            yield _grid(cells, 2, PAGE_WIDTH)
+
+    def _linha_do_tempo(self):
+        # O Meta.ordering é decrescente; no PDF a leitura é cronológica
+        atualizacoes = sorted(self.report.atualizacoes.all(), key=lambda u: (u.data_atualizacao, u.pk))
+        if not atualizacoes:
+            return
+        status = dict(Report.STATUS_CHOICES)
+        yield Paragraph(f'Linha do tempo ({len(atualizacoes)} atualizações)', self.heading)
+        for update in atualizacoes:
+            autor = update.usuario.get_full_name() or update.usuario.username
+            bloco = [
+                Paragraph(
+                    f'<b>{_data(update.data_atualizacao)}</b> · {_texto(autor)} · '
+                    f'{_texto(status.get(update.status_anterior, update.status_anterior))} » '
+                    f'{_texto(status.get(update.status_novo, update.status_novo))} '
+                    f'({update.progresso_anterior}% » {update.progresso_novo}%)',
+                    self.body,
+                ),
+                Paragraph(_texto(update.descricao_atualizacao), self.body),
+            ]
+            cells = []
+            for imagem in update.imagens.all():
+                flowable = self._image(imagem.imagem, UPDATE_IMAGE_WIDTH - 0.3 * cm, max_height=7 * cm)
+                if flowable:
+                    cells.append([flowable, Paragraph(_texto(imagem.descricao), self.small)])
+            if cells:
+                bloco.append(_grid(cells, 3, PAGE_WIDTH))
+            bloco.append(Spacer(1, 0.3 * cm))
+            yield KeepTogether(bloco)
+
+    def _rodape(self, canvas, doc):
+        canvas.saveState()
+        canvas.setFont('Helvetica', 8)
+        canvas.setFillColor(colors.grey)
+        canvas.drawString(2 * cm, 1.2 * cm, f'Relatório #{self.report.pk} · gerado em {_data(timezone.now())}')
+        canvas.drawRightString(A4[0] - 2 * cm, 1.2 * cm, f'Página {doc.page}')
+        canvas.restoreState()
+
+    def build(self):
+        output = BytesIO()
+        doc = SimpleDocTemplate(
+            output, pagesize=A4, leftMargin=2 * cm, rightMargin=2 * cm, topMargin=2 * cm, bottomMargin=2 * cm,
+            title=self.report.titulo, author=self.report.usuario.username,
+        )
+        story = [*self._cabecalho(), *self._anexos(), *self._linha_do_tempo()]
+        doc.build(story, onFirstPage=self._rodape, onLaterPages=self._rodape)
+        return output.getvalue()
+
+
+def load_report(pk):
+    """Relatório com tudo o que o PDF lê, em consultas fixas"""
+    return Report.objects.select_related('local', 'equipamento', 'usuario', 'atribuido_para').prefetch_related(
+        'imagens', 'atualizacoes__usuario', 'atualizacoes__imagens'
+    ).get(pk=pk)
+
+
+def render_report_pdf(report, data=None, image_dpi=None):
+    """Bytes do PDF do relatório (sem cache)"""
+    return ReportPdfBuilder(report, data, image_dpi=image_dpi).build()
+
+
+def get_report_pdf(report, data=None):
+    """
+    Caminho no storage do PDF da versão atual do relatório, renderizando-o
+    só se ainda não existir. PDFs de versões anteriores são removidos quando
+    passam de REPORTS_PDF_OLD_VERSION_AGE: uma requisição concorrente pode
+    ter acabado de receber o caminho de um deles e ainda não o abriu.
+    """
+    path = pdf_path(report)
+    if default_storage.exists(path):
+        return path
+
+    content = render_report_pdf(load_report(report.pk), data)
+    saved = default_storage.save(path, ContentFile(content))
+    if saved != path:
+        # Outra requisição gravou a mesma versão primeiro
+        default_storage.delete(saved)
+    _remove_old_versions(report, keep=path)
+    return path
+
+
+def _remove_old_versions(report, keep):
+    pasta = f'{_storage_dir()}/{report.pk}'
+    try:
+        _, arquivos = default_storage.listdir(pasta)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    limite = timezone.now() - timedelta(seconds=_old_version_age())
+    for nome in arquivos:
+        caminho = f'{pasta}/{nome}'
+        if caminho == keep:
+            continue
+        try:
+            if default_storage.get_modified_time(caminho) < limite:
+                default_storage.delete(caminho)
+        except (FileNotFoundError, NotImplementedError):
+            # Removido por outra requisição, ou storage sem data de modificação
+            continue
@@ -0,0 +1,413 @@
+"""
+Consultas compartilhadas da listagem de relatórios
+"""
+
+import calendar
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import Case, Count, DateField, F, FloatField, Func, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import TruncDay, TruncMonth, TruncQuarter, TruncWeek
+from django.utils import timezone
+from datetime import datetime, timedelta
+
+from locations.models import Local
+from .models import Report
+from .search import annotate_rank, search_filter
+
+
+def resolve_periodo(periodo, data_inicio=None, data_fim=None):
+    """Converte um período predefinido em (data_inicio, data_fim)"""
+    today = timezone.localdate()
+
+    if periodo == 'hoje':
+        return today, today
+    elif periodo == 'ontem':
+        yesterday = today - timedelta(days=1)
+        return yesterday, yesterday
+    elif periodo == 'ultima_semana':
+        return today - timedelta(days=7), today
+    elif periodo == 'ultimo_mes':
+        return today - timedelta(days=30), today
+    elif periodo == 'ultimos_3_meses':
+        return today - timedelta(days=90), today
+    elif periodo == 'este_ano':
+        return today.replace(month=1, day=1), today
+
+    return data_inicio, data_fim
+
+
+def build_report_filter(cleaned_data):
+    """
+    Monta um único Q a partir dos dados limpos do ReportFilterForm.
+
+    Manter os filtros como Q (e não como .filter() encadeados) permite
+    reutilizá-los dentro de agregações condicionais.
+    """
+    q = Q()
+
+    status = cleaned_data.get('status')
+    prioridade = cleaned_data.get('prioridade')
+    search = cleaned_data.get('search')
+    local = cleaned_data.get('local')
+    equipamento = cleaned_data.get('equipamento')
+    usuario = cleaned_data.get('usuario')
+
+    if status:
+        q &= Q(status=status)
+
+    if prioridade:
+        q &= Q(prioridade=prioridade)
+
+    if search:
+        q &= search_filter(search)
+
+    if local:
+        q &= Q(local=local)
+
+    if equipamento:
+        q &= Q(equipamento=equipamento)
+
+    if usuario:
+        q &= (
+            Q(usuario__first_name__icontains=usuario) |
+            Q(usuario__last_name__icontains=usuario) |
+            Q(usuario__username__icontains=usuario)
+        )
+
+    data_inicio, data_fim = resolve_periodo(
+        cleaned_data.get('periodo'),
+        cleaned_data.get('data_inicio'),
+        cleaned_data.get('data_fim'),
+    )
+
+    if data_inicio:
+        # Converter para datetime para incluir todo o dia
+        q &= Q(data_ocorrencia__gte=timezone.make_aware(
+            datetime.combine(data_inicio, datetime.min.time())
+        ))
+
+    if data_fim:
+        q &= Q(data_ocorrencia__lte=timezone.make_aware(
+            datetime.combine(data_fim, datetime.max.time())
+        ))
+
+    return q
+
+
+def apply_ordering(queryset, ordenar_por, search=None):
+    """
+    Aplica a ordenação escolhida e retorna (queryset, ordenação efetiva).
+
+    'relevancia' ordena pelo rank da busca textual; sem termo de busca
+    volta para os mais recentes primeiro.
+    """
+    if ordenar_por == 'relevancia':
+        if not search:
+            ordenar_por = '-data_criacao'
+        else:
+            queryset = annotate_rank(queryset, search)
+            ordenar_por = '-search_rank'
+
+    return queryset.order_by(ordenar_por), ordenar_por
+
+
+def get_report_list_stats(filters=None, queryset=None):
+    """
+    Retorna, em uma única consulta, o total sem filtros, o total filtrado
+    e a distribuição por status dos relatórios filtrados.
+    """
+    if queryset is None:
+        queryset = Report.objects.ativos()
+    filters = filters if filters is not None else Q()
+
+    aggregates = {
+        'total_reports': Count('id'),
+        'filtered_count': Count('id', filter=filters),
+    }
+    for status, _ in Report.STATUS_CHOICES:
+        aggregates[status] = Count('id', filter=filters & Q(status=status))
+
+    result = queryset.order_by().aggregate(**aggregates)
+
+    return {
+        'total_reports': result['total_reports'],
+        'filtered_count': result['filtered_count'],
+        'status_stats': {
+            status: result[status] for status, _ in Report.STATUS_CHOICES
+        },
+    }
+
+
+class DurationSeconds(Func):
+    """Diferença em segundos entre dois DateTimeField (fim - início)"""
+
+    template = 'EXTRACT(EPOCH FROM (%(expressions)s))'
+    arg_joiner = ' - '
+    arity = 2
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='((julianday(%(expressions)s)) * 86400.0)',
+            arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+
+def resolution_seconds():
+    """Tempo de resolução (s) de um relatório resolvido, mantido em tempo_resolucao_segundos"""
+    return F('tempo_resolucao_segundos')
+
+
+def first_response_seconds():
+    """Tempo (s) entre a criação e a primeira resposta"""
+    return DurationSeconds('primeira_resposta_em', 'data_criacao')
+
+
+# Percentis por posição (nearest-rank) com funções de janela, que funcionam
+# igual no PostgreSQL e no SQLite (que não tem percentile_cont)
+_RESOLUTION_STATS_SQL = """
+WITH base (prioridade, local_id, atribuido_para_id, segundos) AS ({base}),
+dims AS (
+    SELECT 'prioridade' AS dimensao, prioridade AS chave, prioridade AS rotulo, segundos
+    FROM base
+    UNION ALL
+    SELECT 'local', CAST(b.local_id AS TEXT), l.nome, b.segundos
+    FROM base b INNER JOIN {local_table} l ON l.id = b.local_id
+    UNION ALL
+    SELECT 'atribuido_para', CAST(b.atribuido_para_id AS TEXT),
+           COALESCE(NULLIF(TRIM(u.first_name || ' ' || u.last_name), ''), u.username), b.segundos
+    FROM base b INNER JOIN {user_table} u ON u.id = b.atribuido_para_id
+),
+ranked AS (
+    SELECT dimensao, chave, rotulo, segundos,
+           ROW_NUMBER() OVER (PARTITION BY dimensao, chave ORDER BY segundos) AS posicao,
+           COUNT(*) OVER (PARTITION BY dimensao, chave) AS n
+    FROM dims
+)
+SELECT dimensao, chave, rotulo, COUNT(*), AVG(segundos),
+       MIN(CASE WHEN posicao >= 0.5 * n THEN segundos END),
+       MIN(CASE WHEN posicao >= 0.9 * n THEN segundos END)
+FROM ranked
+GROUP BY dimensao, chave, rotulo
+ORDER BY dimensao, COUNT(*) DESC, chave
+"""
+
+RESOLUTION_DIMENSIONS = ('prioridade', 'local', 'atribuido_para')
+
+
+def get_resolution_time_stats(queryset):
+    """
+    Média, mediana e p90 do tempo de resolução (em horas) por prioridade,
+    local e responsável, em uma única consulta agrupada.
+
+    `queryset` define o universo (período, permissões); só os relatórios
+    resolvidos entram no cálculo. Nenhuma instância é carregada em memória.
+    """
+    base = queryset.filter(status='resolvido', tempo_resolucao_segundos__isnull=False).order_by().annotate(
+        segundos=resolution_seconds()
+    ).values('prioridade', 'local_id', 'atribuido_para_id', 'segundos')
+    base_sql, params = base.query.sql_with_params()
+
+    sql = _RESOLUTION_STATS_SQL.format(
+        base=base_sql,
+        local_table=Local._meta.db_table,
+        user_table=get_user_model()._meta.db_table,
+    )
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    prioridades = dict(Report.PRIORIDADE_CHOICES)
+    result = {dimensao: [] for dimensao in RESOLUTION_DIMENSIONS}
+    for dimensao, chave, rotulo, total, media, mediana, p90 in rows:
+        result[dimensao].append({
+            'chave': chave,
+            'rotulo': prioridades.get(rotulo, rotulo) if dimensao == 'prioridade' else rotulo,
+            'resolvidos': total,
+            'media_horas': round(float(media) / 3600, 1),
+            'mediana_horas': round(float(mediana) / 3600, 1),
+            'p90_horas': round(float(p90) / 3600, 1),
+        })
+    return result
+
+
+# Contagens comparadas entre janelas (None = todos os relatórios da janela)
+TREND_METRICS = {
+    'total_reports': None,
+    'resolvidos': Q(status='resolvido'),
+    'em_andamento': Q(status='em_andamento'),
+    'pendentes': Q(status='pendente'),
+    'criticos': Q(prioridade='critica'),
+    'alta_prioridade': Q(prioridade='alta'),
+}
+
+# Tamanho de cada janela de comparação; 'period' repete o tamanho do período atual
+COMPARISON_STEPS = ('period', 'week', 'month', 'year')
+
+
+def shift_months(value, months):
+    """Desloca uma data/datetime em meses, limitando o dia ao fim do mês"""
+    month_index = value.year * 12 + value.month - 1 + months
+    year, month = divmod(month_index, 12)
+    day = min(value.day, calendar.monthrange(year, month + 1)[1])
+    return value.replace(year=year, month=month + 1, day=day)
+
+
+def comparison_windows(inicio, fim, janelas=2, passo='period'):
+    """
+    Limites (início, fim) de `janelas` intervalos consecutivos terminando em
+    `fim`, do mais recente para o mais antigo. O fim de cada janela é exclusivo.
+    """
+    if passo not in COMPARISON_STEPS:
+        raise ValueError(f'Passo de comparação inválido: {passo}')
+
+    limites = [fim]
+    for i in range(1, janelas + 1):
+        if passo == 'period':
+            limites.append(fim - (fim - inicio) * i)
+        elif passo == 'week':
+            limites.append(fim - timedelta(weeks=i))
+        else:
+            limites.append(shift_months(fim, -i * (1 if passo == 'month' else 12)))
+    return [(limites[i + 1], limites[i]) for i in range(janelas)]
+
+
+def get_window_stats(queryset, windows, date_field='data_criacao', sum_field=None):
+    """
+    Conta TREND_METRICS em cada janela com uma única consulta agrupada: cada
+    linha recebe o índice da sua janela (CASE) e as métricas são agregações
+    condicionais. Com `sum_field` soma esse campo em vez de contar linhas
+    (ex.: 'total' do rollup diário).
+    """
+    janela = Case(
+        *[
+            When(**{f'{date_field}__gte': inicio, f'{date_field}__lt': fim}, then=Value(i))
+            for i, (inicio, fim) in enumerate(windows)
+        ],
+        output_field=IntegerField(),
+    )
+
+    def aggregate(q):
+        if sum_field:
+            return Sum(sum_field, filter=q)
+        return Count('id', filter=q)
+
+    rows = queryset.filter(**{
+        f'{date_field}__gte': windows[-1][0], f'{date_field}__lt': windows[0][1]
+    }).order_by().annotate(janela=janela).values('janela').annotate(
+        **{metric: aggregate(q) for metric, q in TREND_METRICS.items()}
+    )
+
+    stats = [dict.fromkeys(TREND_METRICS, 0) for _ in windows]
+    for row in rows:
+        if row['janela'] is not None:
+            stats[row['janela']].update({metric: row[metric] or 0 for metric in TREND_METRICS})
+    return stats
+
+
+def build_trends(windows, stats):
+    """Variação da janela mais recente sobre a anterior, com a série completa de cada métrica"""
+    trends = {}
+    for key in TREND_METRICS:
+        serie = [window_stats[key] for window_stats in stats]
+        current_val = serie[0]
+        previous_val = serie[1] if len(serie) > 1 else 0
+
+        if previous_val > 0:
+            variation = ((current_val - previous_val) / previous_val) * 100
+        else:
+            variation = 100 if current_val > 0 else 0
+
+        trends[key] = {
+            'atual': current_val,
+            'anterior': previous_val,
+            'variacao': round(variation, 1),
+            'tendencia': 'up' if variation > 0 else 'down' if variation < 0 else 'stable',
+            'serie': serie,
+        }
+
+    trends['janelas'] = [{'inicio': inicio, 'fim': fim} for inicio, fim in windows]
+    return trends
+
+
+# Funções de truncamento e rótulos de cada granularidade da série temporal
+SERIES_GRANULARITIES = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+}
+MAX_SERIES_BUCKETS = 1000
+
+_MESES = ['jan', 'fev', 'mar', 'abr', 'mai', 'jun', 'jul', 'ago', 'set', 'out', 'nov', 'dez']
+
+
+def _bucket_start(value, granularidade):
+    """Início do intervalo da série que contém a data `value`"""
+    if granularidade == 'week':
+        return value - timedelta(days=value.weekday())
+    if granularidade == 'month':
+        return value.replace(day=1)
+    if granularidade == 'quarter':
+        return value.replace(month=(value.month - 1) // 3 * 3 + 1, day=1)
+    return value
+
+
+def _next_bucket(value, granularidade):
+    if granularidade == 'day':
+        return value + timedelta(days=1)
+    if granularidade == 'week':
+        return value + timedelta(weeks=1)
+    return shift_months(value, 1 if granularidade == 'month' else 3)
+
+
+def series_label(value, granularidade):
+    """Rótulo em português do intervalo que começa em `value`"""
+    if granularidade == 'day':
+        return value.strftime('%d/%m/%Y')
+    if granularidade == 'week':
+        return f'Sem. {value.strftime("%d/%m/%Y")}'
+    if granularidade == 'quarter':
+        return f'{(value.month - 1) // 3 + 1}º tri {value.year}'
+    return f'{_MESES[value.month - 1]} {value.year}'
+
+
+def get_report_series(queryset, inicio, fim, granularidade='month', date_field='data_criacao'):
+    """
+    Contagem de relatórios por dia, semana, mês ou trimestre entre as datas
+    `inicio` e `fim` (inclusive), em uma única consulta agrupada. O primeiro
+    intervalo é alinhado ao início da semana/mês/trimestre de `inicio`.
+
+    Os intervalos seguem o fuso atual (America/Sao_Paulo) e os que não têm
+    relatórios aparecem com zero.
+    """
+    if granularidade not in SERIES_GRANULARITIES:
+        raise ValueError(f'Granularidade inválida: {granularidade}')
+    if inicio > fim:
+        raise ValueError('A data inicial deve ser anterior à final')
+
+    buckets = []
+    bucket = _bucket_start(inicio, granularidade)
+    while bucket <= fim:
+        buckets.append(bucket)
+        if len(buckets) > MAX_SERIES_BUCKETS:
+            raise ValueError(f'O intervalo gera mais de {MAX_SERIES_BUCKETS} pontos')
+        bucket = _next_bucket(bucket, granularidade)
+
+    tz = timezone.get_current_timezone()
+    trunc = SERIES_GRANULARITIES[granularidade]
+    rows = queryset.filter(**{
+        f'{date_field}__gte': timezone.make_aware(datetime.combine(buckets[0], datetime.min.time()), tz),
+        f'{date_field}__lt': timezone.make_aware(datetime.combine(fim + timedelta(days=1), datetime.min.time()), tz),
+    }).order_by().annotate(
+        periodo=trunc(date_field, output_field=DateField(), tzinfo=tz)
+    ).values('periodo').annotate(count=Count('id'))
+
+    counts = {row['periodo']: row['count'] for row in rows}
+    return [
+        {'periodo': bucket, 'label': series_label(bucket, granularidade), 'count': counts.get(bucket, 0)}
+        for bucket in buckets
+    ]
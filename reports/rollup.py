@@ -0,0 +1,166 @@
+"""
+Manutenção da tabela de fatos diária (ReportDailyRollup)
+
+Cada relatório ativo contribui com uma unidade para a linha do seu dia e
+dimensões. Ao salvar ou excluir um relatório a contribuição anterior é
+subtraída e a nova somada (``apply_rollup_delta``); alterações feitas com
+``QuerySet.update()`` ou por cascata SET_NULL não passam pelos sinais e só
+são refletidas pelo ``rebuild_rollup``.
+"""
+
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Report, ReportDailyRollup
+
+# Dimensões copiadas do relatório para a linha do rollup
+DIMENSIONS = ('local_id', 'equipamento_id', 'prioridade', 'status', 'usuario_id', 'atribuido_para_id')
+METRICS = ('total', 'progresso_soma', 'resolucao_segundos_soma')
+
+# Campos do relatório necessários para calcular a contribuição
+CONTRIBUTION_FIELDS = DIMENSIONS + ('data_criacao', 'deleted_at', 'progresso', 'tempo_resolucao_segundos')
+
+_TABLE = ReportDailyRollup._meta.db_table
+_COLUMNS = ('chave', 'data') + DIMENSIONS + METRICS
+_UPSERT_ROW = f'({", ".join(["%s"] * len(_COLUMNS))})'
+_UPSERT_CONFLICT = (
+    ' ON CONFLICT (chave) DO UPDATE SET '
+    + ', '.join(f'{m} = {_TABLE}.{m} + excluded.{m}' for m in METRICS)
+)
+
+
+def _upsert_sql(linhas):
+    """INSERT de `linhas` chaves distintas somando as métricas das que já existem"""
+    return f'INSERT INTO {_TABLE} ({", ".join(_COLUMNS)}) VALUES {", ".join([_UPSERT_ROW] * linhas)}{_UPSERT_CONFLICT}'
+
+
+def rollup_key(data, dimensions):
+    """Chave textual única da linha (as dimensões podem ser nulas)"""
+    return '|'.join([data.isoformat()] + ['' if dimensions[d] is None else str(dimensions[d]) for d in DIMENSIONS])
+
+
+def report_values(report):
+    """Valores de CONTRIBUTION_FIELDS de uma instância em memória"""
+    return {field: getattr(report, field) for field in CONTRIBUTION_FIELDS}
+
+
+def report_contribution(values, tz=None):
+    """Linha com que o relatório entra no rollup, ou None se ele não conta"""
+    if values is None or values['deleted_at'] is not None or values['data_criacao'] is None:
+        return None
+
+    data = timezone.localdate(values['data_criacao'], tz)
+    resolucao = 0
+    if values['status'] == 'resolvido':
+        resolucao = values['tempo_resolucao_segundos'] or 0
+
+    row = {d: values[d] for d in DIMENSIONS}
+    row.update({
+        'chave': rollup_key(data, row),
+        'data': data,
+        'total': 1,
+        'progresso_soma': values['progresso'] or 0,
+        'resolucao_segundos_soma': resolucao,
+    })
+    return row
+
+
+def apply_rollup_delta(anterior=None, atual=None, using=None):
+    """Subtrai a contribuição `anterior` e soma a `atual` (valores do relatório)"""
+    _apply_deltas(((anterior, -1), (atual, 1)), using)
+
+
+def apply_rollup_batch(novos, using=None):
+    """Soma a contribuição de vários relatórios recém-criados (criação em lote)"""
+    _apply_deltas(((values, 1) for values in novos), using)
+
+
+def _apply_deltas(contribuicoes, using):
+    deltas = {}
+    # Fuso do dia de cada relatório, resolvido uma vez para o lote
+    tz = timezone.get_current_timezone()
+    for values, sign in contribuicoes:
+        row = report_contribution(values, tz)
+        if row is None:
+            continue
+        delta = deltas.setdefault(row['chave'], dict(row, **{m: 0 for m in METRICS}))
+        for metric in METRICS:
+            delta[metric] += sign * row[metric]
+
+    # Salvar sem mudar nenhuma dimensão ou métrica não toca a tabela
+    deltas = [d for d in deltas.values() if any(d[m] for m in METRICS)]
+    if not deltas:
+        return
+
+    using = using or router.db_for_write(ReportDailyRollup)
+    connection = connections[using]
+
+    with transaction.atomic(using=using):
+        if connection.vendor in ('postgresql', 'sqlite'):
+            # Um lote de relatórios (importação de histórico) gera milhares de
+            # chaves; várias por comando em vez de uma ida ao banco por chave
+            batch_size = connection.ops.bulk_batch_size(_COLUMNS, deltas)
+            with connection.cursor() as cursor:
+                for inicio in range(0, len(deltas), batch_size):
+                    lote = deltas[inicio:inicio + batch_size]
+                    params = []
+                    for delta in lote:
+                        row = [delta[c] for c in _COLUMNS]
+                        row[1] = connection.ops.adapt_datefield_value(delta['data'])
+                        params.extend(row)
+                    cursor.execute(_upsert_sql(len(lote)), params)
+        else:
+            rollups = ReportDailyRollup.objects.using(using)
+            for delta in deltas:
+                updated = rollups.filter(chave=delta['chave']).update(
+                    **{m: F(m) + delta[m] for m in METRICS}
+                )
+                if not updated:
+                    rollups.create(**delta)
+
+        # Linhas zeradas não precisam existir
+        ReportDailyRollup.objects.using(using).filter(
+            chave__in=[d['chave'] for d in deltas], total__lte=0
+        ).delete()
+
+
+def rebuild_rollup(using=None, batch_size=2000):
+    """Recria o rollup inteiro agregando os relatórios no banco; retorna o número de linhas"""
+    using = using or router.db_for_write(ReportDailyRollup)
+
+    grouped = Report.objects.using(using).ativos().order_by().annotate(
+        dia=TruncDate('data_criacao')
+    ).values('dia', *DIMENSIONS).annotate(
+        total=Count('id'),
+        progresso_soma=Sum('progresso'),
+        resolucao=Sum('tempo_resolucao_segundos', filter=Q(status='resolvido')),
+    )
+
+    rollups = ReportDailyRollup.objects.using(using)
+    total = 0
+    with transaction.atomic(using=using):
+        rollups.all().delete()
+
+        batch = []
+        for item in grouped.iterator(chunk_size=batch_size):
+            dimensions = {d: item[d] for d in DIMENSIONS}
+            batch.append(ReportDailyRollup(
+                chave=rollup_key(item['dia'], dimensions),
+                data=item['dia'],
+                total=item['total'],
+                progresso_soma=item['progresso_soma'] or 0,
+                resolucao_segundos_soma=item['resolucao'] or 0,
+                **dimensions
+            ))
+            if len(batch) >= batch_size:
+                rollups.bulk_create(batch)
+                total += len(batch)
+                batch = []
+
+        if batch:
+            rollups.bulk_create(batch)
+            total += len(batch)
+
+    return total
@@ -0,0 +1,252 @@
+"""
+Índice de busca textual dos relatórios
+
+No PostgreSQL o índice é a coluna ``search_vector`` (tsvector) com índice
+GIN, gerada com a configuração ``portuguese`` sobre o texto sem acentos
+(``translate``, sem depender da extensão unaccent). No SQLite é a tabela FTS5
+``reports_report_fts`` (tokenizer unicode61 sem diacríticos), alimentada
+com o texto já reduzido pelo stemmer leve deste módulo, já que o FTS5 só
+traz o stemmer Porter em inglês.
+
+O índice é mantido pelos sinais de ``reports.signals``; em outros bancos a
+busca volta ao encadeamento de ``icontains``.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+from django.db import connections, router
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Report
+
+SEARCH_CONFIG = 'portuguese'
+FTS_TABLE = 'reports_report_fts'
+
+# Pesos: título (A) > descrição (B) > autor (C)
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# (sufixo, substituição) para reduzir plurais, na ordem em que são testados
+_PLURAL_SUFFIXES = [
+    ('oes', 'ao'),
+    ('aes', 'ao'),
+    ('ais', 'al'),
+    ('eis', 'el'),
+    ('ois', 'ol'),
+    ('ns', 'm'),
+    ('res', 'r'),
+]
+
+_REPORT_ROWS_SQL = (
+    'SELECT r.id, r.titulo, r.descricao, u.first_name, u.last_name, u.username '
+    'FROM reports_report r INNER JOIN auth_user u ON u.id = r.usuario_id'
+)
+
+_ACCENTED = 'ÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑáàâãäéèêëíìîïóòôõöúùûüçñ'
+_UNACCENTED = 'AAAAAEEEEIIIIOOOOOUUUUCNaaaaaeeeeiiiiooooouuuucn'
+
+
+def _pg_document(expression, weight):
+    return (
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', "
+        f"translate({expression}, '{_ACCENTED}', '{_UNACCENTED}')), '{weight}')"
+    )
+
+
+_PG_VECTOR_SQL = ' || '.join([
+    _pg_document("coalesce(r.titulo, '')", 'A'),
+    _pg_document("coalesce(r.descricao, '')", 'B'),
+    _pg_document(
+        "coalesce(u.first_name, '') || ' ' || coalesce(u.last_name, '') || ' ' || coalesce(u.username, '')",
+        'C'
+    ),
+])
+
+
+def strip_accents(text):
+    """Remove acentos mantendo as letras base (ç -> c, ã -> a)"""
+    if text.isascii():
+        return text
+    normalized = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in normalized if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=65536)
+def stem_pt(word):
+    """
+    Stemmer leve para português (plural e vogal temática), no espírito do
+    "light stemmer" de Savoy. Espera a palavra já minúscula e sem acentos.
+    """
+    if len(word) <= 3:
+        return word
+
+    for suffix, replacement in _PLURAL_SUFFIXES:
+        if word.endswith(suffix):
+            word = word[:-len(suffix)] + replacement
+            break
+    else:
+        if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+            word = word[:-1]
+
+    if len(word) > 3 and word[-1] in 'aeo' and not word.endswith('ao'):
+        word = word[:-1]
+
+    return word
+
+
+def tokenize(text):
+    """Quebra o texto em termos minúsculos e sem acentos"""
+    return _TOKEN_RE.findall(strip_accents(text or '').lower())
+
+
+def _stemmed_text(*parts):
+    return ' '.join(stem_pt(token) for part in parts for token in tokenize(part))
+
+
+def _pg_tsquery(text):
+    """Consulta por prefixo de cada termo, com AND entre eles"""
+    return ' & '.join(f'{token}:*' for token in tokenize(text))
+
+
+def _fts_match(text):
+    return ' '.join(f'"{stem_pt(token)}"*' for token in tokenize(text))
+
+
+def _connection(using=None):
+    return connections[using or router.db_for_write(Report)]
+
+
+def icontains_filter(text):
+    """Filtro antigo, usado quando o banco não tem índice de busca"""
+    return (
+        Q(titulo__icontains=text) |
+        Q(descricao__icontains=text) |
+        Q(usuario__first_name__icontains=text) |
+        Q(usuario__last_name__icontains=text) |
+        Q(usuario__username__icontains=text)
+    )
+
+
+def search_filter(text, using=None):
+    """Q que restringe os relatórios aos que casam com a busca"""
+    if not tokenize(text):
+        return Q()
+
+    vendor = _connection(using).vendor
+    if vendor == 'postgresql':
+        return Q(id__in=RawSQL(
+            f"SELECT id FROM reports_report WHERE search_vector @@ to_tsquery('{SEARCH_CONFIG}', %s)",
+            [_pg_tsquery(text)]
+        ))
+    if vendor == 'sqlite':
+        return Q(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [_fts_match(text)]
+        ))
+    return icontains_filter(text)
+
+
+def annotate_rank(queryset, text):
+    """Anota ``search_rank`` (maior é mais relevante) no queryset"""
+    vendor = connections[queryset.db].vendor
+
+    if vendor == 'postgresql':
+        rank = RawSQL(
+            f"ts_rank_cd(reports_report.search_vector, to_tsquery('{SEARCH_CONFIG}', %s))",
+            [_pg_tsquery(text)], output_field=FloatField()
+        )
+    elif vendor == 'sqlite':
+        weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+        rank = RawSQL(
+            f'(SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = reports_report.id)',
+            [_fts_match(text)], output_field=FloatField()
+        )
+    else:
+        rank = RawSQL('0', [], output_field=FloatField())
+
+    return queryset.annotate(search_rank=rank)
+
+
+def update_search_index(report_ids, using=None):
+    """Reindexa os relatórios informados"""
+    report_ids = [int(pk) for pk in report_ids]
+    connection = _connection(using)
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql' and report_ids:
+            cursor.execute(
+                f'UPDATE reports_report r SET search_vector = {_PG_VECTOR_SQL} '
+                'FROM auth_user u WHERE u.id = r.usuario_id AND r.id = ANY(%s)',
+                [report_ids]
+            )
+        elif connection.vendor == 'sqlite':
+            for chunk in _chunks(report_ids):
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(f'{_REPORT_ROWS_SQL} WHERE r.id IN ({placeholders})', chunk)
+                rows = cursor.fetchall()
+                cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', chunk)
+                _insert_fts_rows(cursor, rows)
+
+
+def remove_from_search_index(report_ids, using=None):
+    """Remove relatórios excluídos do índice (no PostgreSQL a coluna some com a linha)"""
+    report_ids = [int(pk) for pk in report_ids]
+    connection = _connection(using)
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        for chunk in _chunks(report_ids):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', chunk)
+
+
+def rebuild_search_index(connection, batch_size=2000):
+    """Recria o índice inteiro; usado pela migração e pelo comando rebuild_search_index"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f'UPDATE reports_report r SET search_vector = {_PG_VECTOR_SQL} '
+                'FROM auth_user u WHERE u.id = r.usuario_id'
+            )
+            return cursor.rowcount
+
+        if connection.vendor != 'sqlite':
+            return 0
+
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        total = 0
+        last_id = 0
+        while True:
+            cursor.execute(
+                f'{_REPORT_ROWS_SQL} WHERE r.id > %s ORDER BY r.id LIMIT %s',
+                [last_id, batch_size]
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return total
+            _insert_fts_rows(cursor, rows)
+            total += len(rows)
+            last_id = rows[-1][0]
+
+
+def _chunks(ids, size=500):
+    # Mantém o número de parâmetros abaixo do limite do SQLite
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _insert_fts_rows(cursor, rows):
+    cursor.executemany(
+        f'INSERT INTO {FTS_TABLE} (rowid, titulo, descricao, autor) VALUES (%s, %s, %s, %s)',
+        [
+            (pk, _stemmed_text(titulo), _stemmed_text(descricao),
+             _stemmed_text(first_name, last_name, username))
+            for pk, titulo, descricao, first_name, last_name, username in rows
+        ]
+    )
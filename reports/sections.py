@@ -0,0 +1,170 @@
+"""
+Execução das seções do dashboard de analytics
+
+As seções são independentes entre si, então podem rodar ao mesmo tempo em
+um pool de threads; cada thread usa a sua própria conexão com o banco (as
+conexões do Django são por thread) e a fecha ao terminar. Uma seção que
+estoura o tempo ou falha recebe o valor padrão e só o seu card fica vazio.
+
+O pool é um só para o processo (ANALYTICS_SECTION_WORKERS threads), então o
+número de conexões abertas pelas seções não cresce com as requisições. Uma
+seção que estoura o prazo não fica rodando em segundo plano: o banco
+interrompe a consulta em andamento (statement_timeout no PostgreSQL,
+progress handler no SQLite) e nenhuma consulta nova começa depois do prazo.
+
+Dentro de uma transação aberta as seções rodam em sequência: as conexões
+das threads não enxergariam os dados ainda não confirmados.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.db import DatabaseError, connection, connections
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class SectionDeadline(Exception):
+    """O prazo da seção acabou; as consultas seguintes não são executadas"""
+
+
+class Section:
+    """Seção do dashboard: função sem argumentos e valor usado se ela não responder"""
+
+    def __init__(self, func, default=None, timeout=None):
+        self.func = func
+        self.default = default
+        self.timeout = timeout
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_setting('ANALYTICS_SECTION_WORKERS', 4), thread_name_prefix='dashboard-section'
+            )
+        return _executor
+
+
+def _deadline_guard(prazo):
+    """execute_wrapper que recusa consultas iniciadas depois de `prazo` (perf_counter)"""
+    def guard(execute, sql, params, many, context):
+        if time.perf_counter() >= prazo:
+            raise SectionDeadline()
+        return execute(sql, params, many, context)
+    return guard
+
+
+def _limit_statements(prazo):
+    """Faz o banco interromper a consulta que passar de `prazo`"""
+    restante = prazo - time.perf_counter()
+    if restante <= 0:
+        raise SectionDeadline()
+    connection.ensure_connection()
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET statement_timeout = %s', [max(int(restante * 1000), 1)])
+    elif connection.vendor == 'sqlite':
+        # Chamado a cada N instruções da VM; retornar True aborta a consulta
+        connection.connection.set_progress_handler(lambda: time.perf_counter() >= prazo, 1000)
+
+
+def _timed(func, prazo):
+    """Executa `func` numa thread do pool até `prazo` e fecha a conexão dessa thread"""
+    inicio = time.perf_counter()
+    try:
+        _limit_statements(prazo)
+        with connection.execute_wrapper(_deadline_guard(prazo)):
+            return func(), (time.perf_counter() - inicio) * 1000
+    except DatabaseError:
+        if time.perf_counter() >= prazo:
+            # Consulta interrompida pelo banco no fim do prazo
+            raise SectionDeadline()
+        raise
+    finally:
+        if connection.vendor == 'sqlite' and connection.connection is not None:
+            # O banco em memória dos testes não é fechado pelo close_all
+            connection.connection.set_progress_handler(None, 0)
+        connections.close_all()
+
+
+def run_sections(sections, parallel=None, timeout=None):
+    """
+    Executa {nome: Section} e retorna (dados, timings).
+
+    `timings` tem, por seção, o status ('ok', 'timeout' ou 'error') e a
+    duração em ms. `parallel=None` segue ANALYTICS_PARALLEL_SECTIONS.
+    """
+    if parallel is None:
+        parallel = _setting('ANALYTICS_PARALLEL_SECTIONS', True) and not connection.in_atomic_block
+    timeout = timeout if timeout is not None else _setting('ANALYTICS_SECTION_TIMEOUT', 10)
+
+    if not parallel:
+        return _run_sequential(sections)
+
+    data = {}
+    timings = {}
+    executor = _get_executor()
+    # O prazo conta a partir do envio de todas as seções
+    inicio = time.perf_counter()
+    limites = {
+        name: section.timeout if section.timeout is not None else timeout
+        for name, section in sections.items()
+    }
+    futures = {
+        name: executor.submit(_timed, section.func, inicio + limites[name])
+        for name, section in sections.items()
+    }
+
+    for name, future in futures.items():
+        section = sections[name]
+        limite = limites[name]
+        restante = max(limite - (time.perf_counter() - inicio), 0)
+        try:
+            data[name], ms = future.result(timeout=restante)
+            timings[name] = {'status': 'ok', 'ms': round(ms, 1)}
+        except (FutureTimeoutError, SectionDeadline):
+            # Se ainda estiver na fila, nem começa; se estiver rodando, o banco a interrompe
+            future.cancel()
+            data[name] = section.default
+            timings[name] = {'status': 'timeout', 'ms': round(limite * 1000, 1)}
+            logger.warning('Seção %s do dashboard excedeu %ss', name, limite)
+        except Exception:
+            data[name] = section.default
+            timings[name] = {'status': 'error', 'ms': round((time.perf_counter() - inicio) * 1000, 1)}
+            logger.exception('Falha na seção %s do dashboard', name)
+
+    return data, timings
+
+
+def _run_sequential(sections):
+    data = {}
+    timings = {}
+    for name, section in sections.items():
+        inicio = time.perf_counter()
+        try:
+            data[name] = section.func()
+            status = 'ok'
+        except Exception:
+            data[name] = section.default
+            status = 'error'
+            logger.exception('Falha na seção %s do dashboard', name)
+        timings[name] = {'status': status, 'ms': round((time.perf_counter() - inicio) * 1000, 1)}
+    return data, timings
+
+
+def is_partial(timings):
+    """True se alguma seção caiu no valor padrão"""
+    return any(timing['status'] != 'ok' for timing in timings.values())
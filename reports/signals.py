@@ -0,0 +1,200 @@
+"""
+Sinais que mantêm estruturas derivadas dos relatórios atualizadas
+(índice de busca, rollup diário, contadores por usuário, referências dos
+arquivos compartilhados e versões do cache)
+"""
+
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.images import register_image_field
+from locations.models import Equipamento, Local
+
+from .cache import bump_version
+from .models import Report, ReportData, ReportImage, ReportUpdate, ReportUpdateImage
+from .rollup import CONTRIBUTION_FIELDS, apply_rollup_delta, report_values
+from .search import remove_from_search_index, update_search_index
+from .storage import change_references
+from .user_stats import apply_user_stats_delta
+
+User = get_user_model()
+
+# Fotos que ganham variantes responsivas depois do upload
+register_image_field(Report, 'imagem_principal')
+register_image_field(ReportImage, 'imagem')
+register_image_field(ReportUpdateImage, 'imagem')
+
+# Campos de foto no storage por conteúdo (reports.storage); as referências
+# aos blobs são contadas aqui
+PHOTO_FIELDS = {
+    Report: 'imagem_principal',
+    ReportImage: 'imagem',
+    ReportUpdateImage: 'imagem',
+}
+
+# Campos do usuário que fazem parte do índice de busca
+USER_SEARCH_FIELDS = {'first_name', 'last_name', 'username'}
+
+
+def bump_on_commit(name, scope=None, using=None):
+    """
+    Avança a versão do cache só depois do commit. Dentro da transação, um
+    leitor concorrente ainda vê os dados antigos e guardaria o payload
+    reconstruído com eles sob a versão nova.
+    """
+    transaction.on_commit(partial(bump_version, name, scope), using=using)
+
+
+@receiver(pre_save, sender=Report)
+def report_saving(sender, instance, using, **kwargs):
+    """Guarda os valores gravados antes do save para descontá-los do rollup"""
+    if instance._state.adding or instance.pk is None:
+        instance._rollup_anterior = None
+        instance._foto_anterior = None
+        return
+    # A imagem gravada vem na mesma consulta, para as referências do blob
+    anterior = Report.objects.using(using).filter(
+        pk=instance.pk
+    ).values(*CONTRIBUTION_FIELDS, 'imagem_principal').first()
+    instance._foto_anterior = anterior.pop('imagem_principal') if anterior else None
+    instance._rollup_anterior = anterior
+
+
+@receiver(post_save, sender=Report)
+def report_saved(sender, instance, using, **kwargs):
+    """Reindexa o relatório salvo, atualiza rollup e contadores por usuário e invalida o cache"""
+    update_search_index([instance.pk], using=using)
+    anterior = getattr(instance, '_rollup_anterior', None)
+    atual = report_values(instance)
+    apply_rollup_delta(anterior, atual, using=using)
+    apply_user_stats_delta(anterior, atual, using=using)
+    instance._rollup_anterior = None
+    bump_on_commit('reports', using=using)
+
+
+@receiver(post_delete, sender=Report)
+def report_deleted(sender, instance, using, **kwargs):
+    """Remove o relatório excluído do índice de busca, do rollup e dos contadores por usuário"""
+    remove_from_search_index([instance.pk], using=using)
+    apply_rollup_delta(report_values(instance), using=using)
+    apply_user_stats_delta(report_values(instance), using=using)
+    bump_on_commit('reports', using=using)
+
+
+@receiver(pre_save, sender=ReportImage)
+@receiver(pre_save, sender=ReportUpdateImage)
+def photo_saving(sender, instance, using, update_fields=None, **kwargs):
+    """Guarda o arquivo gravado antes do save para acertar as referências dos blobs"""
+    field_name = PHOTO_FIELDS[sender]
+    if instance._state.adding or instance.pk is None:
+        instance._foto_anterior = None
+    elif update_fields is not None and field_name not in update_fields:
+        instance._foto_anterior = getattr(instance, field_name).name
+    else:
+        instance._foto_anterior = sender.objects.using(using).filter(
+            pk=instance.pk
+        ).values_list(field_name, flat=True).first()
+
+
+@receiver(post_save, sender=Report)
+@receiver(post_save, sender=ReportImage)
+@receiver(post_save, sender=ReportUpdateImage)
+def photo_saved(sender, instance, using, **kwargs):
+    """Conta a referência ao blob novo e desconta a do anterior quando a foto muda"""
+    atual = getattr(instance, PHOTO_FIELDS[sender]).name or None
+    change_references(getattr(instance, '_foto_anterior', None) or None, atual, using=using)
+    instance._foto_anterior = atual
+
+
+@receiver(post_delete, sender=Report)
+@receiver(post_delete, sender=ReportImage)
+@receiver(post_delete, sender=ReportUpdateImage)
+def photo_deleted(sender, instance, using, **kwargs):
+    change_references(getattr(instance, PHOTO_FIELDS[sender]).name or None, None, using=using)
+
+
+@receiver(post_save, sender=ReportUpdate)
+@receiver(post_delete, sender=ReportUpdate)
+def report_update_changed(sender, using, **kwargs):
+    """Atualizações entram no tempo de resposta; invalida o cache de analytics"""
+    bump_on_commit('reports', using=using)
+
+
+@receiver(post_save, sender=ReportImage)
+@receiver(post_delete, sender=ReportImage)
+@receiver(post_save, sender=ReportData)
+@receiver(post_delete, sender=ReportData)
+@receiver(post_save, sender=ReportUpdate)
+@receiver(post_delete, sender=ReportUpdate)
+def report_content_changed(sender, instance, using, **kwargs):
+    """
+    Anexos, dados e atualizações entram no PDF: avança só pdf_versao, sem
+    mexer em data_atualizacao (a edição do próprio relatório)
+    """
+    Report.objects.using(using).filter(pk=instance.report_id).update(pdf_versao=F('pdf_versao') + 1)
+
+
+@receiver(post_save, sender=ReportUpdateImage)
+@receiver(post_delete, sender=ReportUpdateImage)
+def report_update_image_changed(sender, instance, using, **kwargs):
+    Report.objects.using(using).filter(atualizacoes__pk=instance.update_id).update(pdf_versao=F('pdf_versao') + 1)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, using, update_fields=None, **kwargs):
+    """Reindexa os relatórios do autor quando o nome dele muda"""
+    if created:
+        return
+    if update_fields is not None and not USER_SEARCH_FIELDS.intersection(update_fields):
+        # Ex.: login só atualiza last_login
+        return
+    report_ids = list(Report.objects.using(using).filter(usuario=instance).values_list('id', flat=True))
+    update_search_index(report_ids, using=using)
+
+
+@receiver(post_save, sender=Local)
+@receiver(post_delete, sender=Local)
+@receiver(post_save, sender=Equipamento)
+@receiver(post_delete, sender=Equipamento)
+def location_changed(sender, using, **kwargs):
+    """Locais e equipamentos aparecem nos filtros em cache da listagem"""
+    bump_on_commit('locations', using=using)
+
+
+@receiver(pre_save, sender=Equipamento)
+def equipamento_saving(sender, instance, using, **kwargs):
+    """Guarda o local anterior: mover o equipamento muda a lista dos dois locais"""
+    if instance._state.adding or instance.pk is None:
+        instance._local_anterior = None
+        return
+    instance._local_anterior = Equipamento.objects.using(using).filter(
+        pk=instance.pk
+    ).values_list('local_id', flat=True).first()
+
+
+@receiver(post_save, sender=Equipamento)
+@receiver(post_delete, sender=Equipamento)
+def equipamento_changed(sender, instance, using, **kwargs):
+    """Invalida a lista em cache (e o ETag) dos equipamentos do local"""
+    locais = {instance.local_id, getattr(instance, '_local_anterior', None)}
+    for local_id in locais - {None}:
+        bump_on_commit('equipamentos', scope=local_id, using=using)
+
+
+@receiver(post_delete, sender=Local)
+def local_deleted(sender, instance, using, **kwargs):
+    """Local sem equipamentos também precisa de novo ETag (a resposta vira 404)"""
+    bump_on_commit('equipamentos', scope=instance.pk, using=using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_count_changed(sender, using, created=True, **kwargs):
+    """O total de usuários do dashboard só muda ao criar ou excluir (post_delete não envia `created`)"""
+    if created:
+        bump_on_commit('users', using=using)
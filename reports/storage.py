@@ -0,0 +1,239 @@
+"""
+Storage por conteúdo (content-addressed) das fotos dos relatórios
+
+A imagem principal, os anexos (ReportImage) e as imagens das atualizações
+(ReportUpdateImage) usam ``ContentAddressedStorage``: o arquivo é gravado uma
+vez só, com o SHA-256 do conteúdo como nome, em
+``REPORTS_BLOB_DIR/ab/cd/<sha256>.<ext>``. A mesma foto anexada ao relatório,
+às cópias dele e às atualizações vira um único arquivo (blob).
+
+Cada blob tem uma linha em ``MediaBlob`` com o número de registros que o
+usam, mantido pelos sinais de ``reports.signals``. Blobs sem referências são
+removidos (arquivo, variantes e linha) pelo comando ``collect_blobs`` depois
+de REPORTS_BLOB_GC_GRACE_HOURS, para não apagar o blob de um upload cujo
+registro ainda não foi salvo.
+"""
+
+import hashlib
+import os
+import tempfile
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from core.images import delete_source_variants
+
+
+def _blob_dir():
+    return getattr(settings, 'REPORTS_BLOB_DIR', 'reports/blobs')
+
+
+def blob_name(digest, ext):
+    """Nome do blob no storage: <dir>/ab/cd/<sha256><ext>"""
+    return f'{_blob_dir()}/{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage que nomeia os arquivos pelo SHA-256 do conteúdo. O hash
+    é calculado enquanto o upload é copiado para um arquivo temporário na
+    mesma pasta, que então é renomeado para o nome definitivo ou descartado
+    se o blob já existir. Do nome enviado só se aproveita a extensão.
+    """
+
+    @property
+    def _temp_dir(self):
+        return self.path(f'{_blob_dir()}/.tmp')
+
+    def get_available_name(self, name, max_length=None):
+        # O nome definitivo só é conhecido depois de ler o conteúdo (_save)
+        return name
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1].lower()
+        os.makedirs(self._temp_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self._temp_dir, suffix=ext)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    output.write(chunk)
+                    size += len(chunk)
+
+            name = blob_name(digest.hexdigest(), ext)
+            # A linha vem antes do arquivo: se o collect_blobs estiver
+            # removendo o mesmo blob, este save espera o commit dele
+            touch_blob(name, size)
+            path = self.path(name)
+            if os.path.exists(path):
+                os.unlink(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.chmod(temp_path, self.file_permissions_mode or 0o644)
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return name
+
+
+_storage = ContentAddressedStorage()
+
+
+def blob_storage():
+    """Storage dos campos de foto dos relatórios (callable, para não fixar a pasta nas migrations)"""
+    return _storage
+
+
+def blob_fields():
+    """[(modelo, campo)] dos campos que gravam no storage por conteúdo"""
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(getattr(field, 'storage', None), ContentAddressedStorage)
+    ]
+
+
+def _is_blob(name):
+    return bool(name) and name.startswith(f'{_blob_dir()}/')
+
+
+def touch_blob(name, size=0, using=None):
+    """Cria a linha do blob ou renova atualizado_em, adiando a coleta"""
+    MediaBlob = apps.get_model('reports', 'MediaBlob')
+    manager = MediaBlob.objects.using(using)
+    if manager.filter(nome=name).update(atualizado_em=timezone.now()):
+        return
+    try:
+        with transaction.atomic(using=using):
+            manager.create(nome=name, tamanho=size)
+    except IntegrityError:
+        # Outro upload do mesmo conteúdo criou a linha primeiro
+        manager.filter(nome=name).update(atualizado_em=timezone.now())
+
+
+def change_references(anterior, atual, using=None):
+    """Conta uma referência a `atual` e desconta uma de `anterior` (nomes do storage; None ignora)"""
+    if anterior == atual:
+        return
+    MediaBlob = apps.get_model('reports', 'MediaBlob')
+    manager = MediaBlob.objects.using(using)
+    agora = timezone.now()
+    if _is_blob(atual):
+        if not manager.filter(nome=atual).update(referencias=F('referencias') + 1, atualizado_em=agora):
+            # Blob gravado fora do storage (ex.: fixture); a recontagem acerta o tamanho
+            touch_blob(atual, using=using)
+            manager.filter(nome=atual).update(referencias=F('referencias') + 1)
+    if _is_blob(anterior):
+        manager.filter(nome=anterior).update(referencias=F('referencias') - 1, atualizado_em=agora)
+
+
+def recount_references(batch_size=1000, using=None):
+    """
+    Recalcula as referências de todos os blobs a partir dos campos de foto e
+    corrige as linhas divergentes. Retorna quantas linhas foram corrigidas.
+    """
+    MediaBlob = apps.get_model('reports', 'MediaBlob')
+    contagem = Counter()
+    for model, field_name in blob_fields():
+        linhas = (
+            model._default_manager.using(using)
+            .filter(**{f'{field_name}__startswith': f'{_blob_dir()}/'})
+            .values_list(field_name)
+            .annotate(total=Count('pk'))
+            .order_by()
+        )
+        for nome, total in linhas.iterator():
+            contagem[nome] += total
+
+    corrigidas = []
+    existentes = set()
+    for blob in MediaBlob.objects.using(using).only('pk', 'nome', 'referencias').iterator(chunk_size=batch_size):
+        existentes.add(blob.nome)
+        esperado = contagem.get(blob.nome, 0)
+        if blob.referencias != esperado:
+            blob.referencias = esperado
+            corrigidas.append(blob)
+    MediaBlob.objects.using(using).bulk_update(corrigidas, ['referencias'], batch_size=batch_size)
+
+    faltando = [
+        MediaBlob(nome=nome, tamanho=_storage.size(nome) if _storage.exists(nome) else 0, referencias=total)
+        for nome, total in contagem.items() if nome not in existentes
+    ]
+    MediaBlob.objects.using(using).bulk_create(faltando, batch_size=batch_size, ignore_conflicts=True)
+    return len(corrigidas) + len(faltando)
+
+
+def collect_garbage(batch_size=500, grace=None, dry_run=False, using=None):
+    """
+    Remove, em lotes de `batch_size`, os blobs sem referências e sem
+    atividade há mais de `grace` (timedelta). Cada lote trava as linhas,
+    apaga os arquivos e as variantes e só então exclui as linhas, de modo que
+    um upload do mesmo conteúdo em paralelo espera e grava o arquivo de novo.
+    Retorna (blobs removidos, bytes liberados).
+    """
+    MediaBlob = apps.get_model('reports', 'MediaBlob')
+    if grace is None:
+        grace = timedelta(hours=getattr(settings, 'REPORTS_BLOB_GC_GRACE_HOURS', 24))
+    limite = timezone.now() - grace
+    candidatos = MediaBlob.objects.using(using).filter(referencias__lte=0, atualizado_em__lt=limite)
+
+    removidos = liberados = 0
+    ultimo_pk = 0
+    while True:
+        lote = list(candidatos.filter(pk__gt=ultimo_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not lote:
+            break
+        ultimo_pk = lote[-1]
+        if dry_run:
+            removidos += len(lote)
+            liberados += sum(candidatos.filter(pk__in=lote).values_list('tamanho', flat=True))
+            continue
+        with transaction.atomic(using=using):
+            # Revalida com a linha travada: pode ter ganho referência desde a leitura
+            blobs = list(
+                candidatos.select_for_update().filter(pk__in=lote).values_list('pk', 'nome', 'tamanho')
+            )
+            for _, nome, _ in blobs:
+                _storage.delete(nome)
+                delete_source_variants(nome, storage=_storage)
+            MediaBlob.objects.using(using).filter(pk__in=[pk for pk, _, _ in blobs]).delete()
+        removidos += len(blobs)
+        liberados += sum(tamanho for _, _, tamanho in blobs)
+    return removidos, liberados
+
+
+def orphan_files(grace=None):
+    """Arquivos da pasta de blobs sem linha em MediaBlob (ex.: upload de uma transação desfeita)"""
+    MediaBlob = apps.get_model('reports', 'MediaBlob')
+    if grace is None:
+        grace = timedelta(hours=getattr(settings, 'REPORTS_BLOB_GC_GRACE_HOURS', 24))
+    limite = timezone.now() - grace
+    raiz = _blob_dir()
+    try:
+        prefixos, _ = _storage.listdir(raiz)
+    except FileNotFoundError:
+        return
+    for a in sorted(prefixos):
+        if a.startswith('.'):
+            continue
+        subpastas, _ = _storage.listdir(f'{raiz}/{a}')
+        for b in sorted(subpastas):
+            _, arquivos = _storage.listdir(f'{raiz}/{a}/{b}')
+            nomes = [f'{raiz}/{a}/{b}/{arquivo}' for arquivo in arquivos]
+            registrados = set(MediaBlob.objects.filter(nome__in=nomes).values_list('nome', flat=True))
+            for nome in nomes:
+                if nome not in registrados and _storage.get_modified_time(nome) < limite:
+                    yield nome
@@ -0,0 +1,2276 @@
+import csv
+import json
+import threading
+import time
+import os
+import tempfile
+import re
+import zipfile
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template import Context, Template
+from django.core.cache import cache
+from django.core import signing
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from PIL import Image, PngImagePlugin
+
+from core.images import process_image, strip_source_metadata
+from core.uploads import NOT_AN_IMAGE, downscale_image
+from locations.models import Local, Equipamento
+from .forms import ReportFilterForm, ReportForm
+from . import bulk, cache as analytics_cache, encoders
+from .analytics import ReportAnalytics
+from .chunked_upload import OffsetMismatch, append_chunk, start_upload
+from .analytics_simple import SimpleDashboardData, SimpleReportAnalytics
+from .backfill import backfill_report_milestones
+from .cache import get_cache_stats
+from .export import export_headers, export_rows, stream_xlsx
+from .importer import ImportFileError, ReportImporter, import_file
+from .models import (
+    ChunkedUpload, MediaBlob, Report, ReportDailyRollup, ReportData, ReportImage, ReportUpdate, ReportUpdateImage,
+    UserReportStats,
+)
+from .pdf import pdf_path
+from .pagination import KeysetPaginator, InvalidCursor, estimate_count
+from .queries import apply_ordering, get_report_series, get_resolution_time_stats
+from .rollup import rebuild_rollup
+from .search import search_filter, stem_pt, tokenize
+from .storage import blob_storage, collect_garbage, recount_references
+from . import sections
+from .sections import Section, is_partial, run_sections
+from .user_stats import reconcile_user_stats
+
+User = get_user_model()
+
+
+class ReportListQueryCountTest(TestCase):
+    """Garante que a listagem não volte a emitir um COUNT por estatística"""
+
+    # sessão, usuário, agregação única, página, prefetch de imagens e o save
+    # da sessão (com savepoint); local e equipamento vêm do autocomplete
+    EXPECTED_QUERIES = 8
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='tecnico', email='tecnico@example.com', password='senha123',
+            first_name='Ana', last_name='Souza', is_staff=True
+        )
+        cls.local = Local.objects.create(
+            nome='Fábrica Norte', codigo='FN', tipo='fabrica',
+            cidade='Campinas', estado='SP', cep='13000-000'
+        )
+        cls.equipamento = Equipamento.objects.create(
+            local=cls.local, nome='Compressor', codigo='CP-01', tipo='outro'
+        )
+        agora = timezone.now()
+        for i, (status, prioridade) in enumerate([
+            ('pendente', 'alta'),
+            ('pendente', 'media'),
+            ('em_andamento', 'alta'),
+            ('resolvido', 'baixa'),
+        ]):
+            Report.objects.create(
+                usuario=cls.user,
+                local=cls.local,
+                equipamento=cls.equipamento,
+                data_ocorrencia=agora,
+                titulo=f'Vazamento {i}',
+                descricao='Vazamento de óleo no compressor',
+                status=status,
+                prioridade=prioridade,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def _count_queries(self, params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('reports:list'), params)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx), response
+
+    def test_query_count_is_fixed_across_filters(self):
+        baseline, _ = self._count_queries({})
+        self.assertEqual(baseline, self.EXPECTED_QUERIES)
+        filter_sets = [
+            {'status': 'pendente'},
+            {'prioridade': 'alta'},
+            {'search': 'vazamento'},
+            {'usuario': 'ana'},
+            {'periodo': 'hoje'},
+            {'status': 'pendente', 'prioridade': 'alta', 'search': 'óleo', 'ordenar_por': 'titulo'},
+        ]
+        for params in filter_sets:
+            with self.subTest(params=params):
+                count, _ = self._count_queries(params)
+                self.assertEqual(count, baseline)
+
+    def test_model_choice_filters_only_add_their_own_lookup(self):
+        baseline, _ = self._count_queries({})
+        # Cada ModelChoiceField válido busca o objeto selecionado na validação e
+        # o widget do autocomplete, na renderização, só a opção selecionada
+        count, _ = self._count_queries({'local': self.local.pk, 'equipamento': self.equipamento.pk})
+        self.assertEqual(count, baseline + 4)
+
+    def test_single_aggregate_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('reports:list'), {'status': 'pendente'})
+        counts = [q['sql'] for q in ctx.captured_queries if 'COUNT(' in q['sql'].upper()]
+        self.assertEqual(len(counts), 1)
+
+    def test_stats_reflect_filters(self):
+        _, response = self._count_queries({'prioridade': 'alta'})
+        self.assertEqual(response.context['total_reports'], 4)
+        self.assertEqual(response.context['filtered_count'], 2)
+        self.assertEqual(response.context['status_stats'], {
+            'pendente': 1,
+            'em_andamento': 1,
+            'resolvido': 0,
+        })
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+
+    def test_invalid_filters_fall_back_to_unfiltered_list(self):
+        _, response = self._count_queries({'status': 'inexistente'})
+        self.assertEqual(response.context['filtered_count'], 4)
+
+    def test_soft_deleted_reports_are_hidden(self):
+        Report.objects.filter(status='resolvido').update(deleted_at=timezone.now())
+        _, response = self._count_queries({})
+        self.assertEqual(response.context['total_reports'], 3)
+        self.assertEqual(response.context['status_stats']['resolvido'], 0)
+
+    def test_explain_command_covers_hot_queries(self):
+        out = StringIO()
+        call_command('explain_reports', stdout=out)
+        output = out.getvalue()
+        self.assertIn('Analytics (autor ou atribuído)', output)
+        if connection.vendor == 'sqlite':
+            # Com os índices parciais nenhuma consulta varre a tabela inteira
+            self.assertIn('0 com varredura completa', output)
+
+
+class KeysetPaginationTest(TestCase):
+    """Cursor deve percorrer as mesmas linhas que a paginação por OFFSET"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='paginador', email='paginador@example.com', password='senha123'
+        )
+        agora = timezone.now()
+        status_cycle = ['pendente', 'em_andamento', 'resolvido']
+        prioridade_cycle = ['baixa', 'media', 'alta', 'critica']
+        for i in range(23):
+            Report.objects.create(
+                usuario=cls.user,
+                # Datas repetidas forçam o desempate por id
+                data_ocorrencia=agora - timedelta(days=i // 3),
+                titulo=f'Relatório {i % 5}',
+                descricao='Teste',
+                status=status_cycle[i % 3],
+                prioridade=prioridade_cycle[i % 4],
+            )
+
+    def _walk(self, ordering, per_page=5):
+        paginator = KeysetPaginator(Report.objects.all(), per_page, ordering=ordering)
+        page = paginator.page()
+        forward = [page]
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            forward.append(page)
+
+        backward = [page]
+        while page.has_previous():
+            page = paginator.page(page.previous_cursor)
+            backward.append(page)
+        return forward, backward
+
+    def test_every_ordering_matches_offset_order(self):
+        for ordering, _ in ReportFilterForm.ORDENACAO_CHOICES:
+            if ordering == 'relevancia':
+                # Depende de um termo de busca; coberto em ReportSearchTest
+                continue
+            with self.subTest(ordering=ordering):
+                tiebreak = '-id' if ordering.startswith('-') else 'id'
+                expected = list(
+                    Report.objects.order_by(ordering, tiebreak).values_list('id', flat=True)
+                )
+                forward, backward = self._walk(ordering)
+
+                walked = [r.id for page in forward for r in page]
+                self.assertEqual(walked, expected)
+
+                # Voltando pelos cursores "prev" as páginas se repetem na ordem inversa
+                self.assertEqual(
+                    [[r.id for r in page] for page in reversed(backward)],
+                    [[r.id for r in page] for page in forward]
+                )
+                self.assertFalse(forward[0].has_previous())
+
+    def test_tampered_cursor_is_rejected(self):
+        paginator = KeysetPaginator(Report.objects.all(), 5)
+        with self.assertRaises(InvalidCursor):
+            paginator.page('nao-e-um-cursor')
+        # Cursor de outra ordenação também é recusado
+        cursor = KeysetPaginator(Report.objects.all(), 5, ordering='titulo').page().next_cursor
+        with self.assertRaises(InvalidCursor):
+            paginator.page(cursor)
+
+    def test_api_returns_cursors_and_estimated_total(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('reports:api_list'), {'per_page': 10, 'total': 'estimado'})
+        data = response.json()
+        self.assertEqual(len(data['reports']), 10)
+        self.assertEqual(data['total'], 23)
+        self.assertFalse(data['total_estimado'])
+        self.assertIsNone(data['previous_cursor'])
+
+        response = self.client.get(reverse('reports:api_list'), {'per_page': 10, 'cursor': data['next_cursor']})
+        self.assertEqual(len(response.json()['reports']), 10)
+
+        response = self.client.get(reverse('reports:api_list'), {'cursor': 'invalido'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_estimate_count_caps_the_scan(self):
+        total, exact = estimate_count(Report.objects.all(), limit=10)
+        self.assertFalse(exact)
+        self.assertGreaterEqual(total, 11)
+
+    def test_report_list_cursor_mode(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('reports:list'), {'paginacao': 'cursor', 'per_page': 6})
+        self.assertTrue(response.context['cursor_mode'])
+        page = response.context['page_obj']
+        self.assertEqual(len(page), 6)
+        response = self.client.get(reverse('reports:list'), {'paginacao': 'cursor', 'per_page': 6, 'cursor': page.next_cursor})
+        self.assertEqual(len(response.context['page_obj']), 6)
+
+
+class ReportSearchTest(TestCase):
+    """Busca pelo índice textual (FTS5 no SQLite, tsvector no PostgreSQL)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.autor = User.objects.create_user(
+            username='jsilva', email='jsilva@example.com', password='senha123',
+            first_name='João', last_name='Silva'
+        )
+        agora = timezone.now()
+        cls.bomba = Report.objects.create(
+            usuario=cls.autor, data_ocorrencia=agora,
+            titulo='Vazamento na bomba hidráulica',
+            descricao='Vedação danificada, óleo no piso',
+        )
+        cls.motor = Report.objects.create(
+            usuario=cls.autor, data_ocorrencia=agora,
+            titulo='Motor superaquecendo',
+            descricao='Verificar vazamentos de ar comprimido',
+        )
+        cls.painel = Report.objects.create(
+            usuario=cls.autor, data_ocorrencia=agora,
+            titulo='Painel elétrico',
+            descricao='Troca de disjuntores',
+        )
+
+    def _search(self, text):
+        return set(Report.objects.filter(search_filter(text)).values_list('id', flat=True))
+
+    def test_accent_and_plural_folding(self):
+        self.assertEqual(tokenize('Vedação Hidráulica'), ['vedacao', 'hidraulica'])
+        self.assertEqual(stem_pt('vazamentos'), stem_pt('vazamento'))
+        self.assertEqual(stem_pt('motores'), stem_pt('motor'))
+        self.assertEqual(self._search('hidraulica'), {self.bomba.id})
+        self.assertEqual(self._search('disjuntor'), {self.painel.id})
+
+    def test_prefix_and_multiple_terms(self):
+        self.assertEqual(self._search('vazam'), {self.bomba.id, self.motor.id})
+        self.assertEqual(self._search('vazamento óleo'), {self.bomba.id})
+
+    def test_author_name_is_indexed_and_kept_current(self):
+        self.assertEqual(self._search('silva'), {self.bomba.id, self.motor.id, self.painel.id})
+        self.autor.last_name = 'Pereira'
+        self.autor.save()
+        self.assertEqual(self._search('silva'), set())
+        self.assertEqual(len(self._search('pereira')), 3)
+
+    def test_index_follows_save_and_delete(self):
+        self.painel.titulo = 'Painel com curto-circuito'
+        self.painel.save()
+        self.assertEqual(self._search('curto'), {self.painel.id})
+        self.painel.delete()
+        self.assertEqual(self._search('curto'), set())
+
+    def test_relevance_ordering_prefers_title_matches(self):
+        queryset, ordering = apply_ordering(
+            Report.objects.filter(search_filter('vazamento')), 'relevancia', 'vazamento'
+        )
+        self.assertEqual(ordering, '-search_rank')
+        self.assertEqual([r.id for r in queryset], [self.bomba.id, self.motor.id])
+
+        # A paginação por cursor funciona sobre o rank anotado
+        paginator = KeysetPaginator(queryset, 1, ordering=ordering)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        self.assertEqual([r.id for r in first] + [r.id for r in second], [self.bomba.id, self.motor.id])
+
+    def test_blank_search_does_not_filter(self):
+        self.assertEqual(len(self._search('  !! ')), 3)
+
+
+class ReportRollupTest(TestCase):
+    """O rollup diário mantido pelos sinais deve bater com o rebuild completo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.autor = User.objects.create_user(
+            username='autor', email='autor@example.com', password='senha123'
+        )
+        cls.tecnico = User.objects.create_user(
+            username='responsavel', email='responsavel@example.com', password='senha123'
+        )
+        cls.local = Local.objects.create(
+            nome='Fábrica Sul', codigo='FS', tipo='fabrica',
+            cidade='Curitiba', estado='PR', cep='80000-000'
+        )
+        cls.equipamento = Equipamento.objects.create(
+            local=cls.local, nome='Caldeira', codigo='CD-01', tipo='outro'
+        )
+
+    def _create(self, **kwargs):
+        defaults = {
+            'usuario': self.autor, 'local': self.local, 'equipamento': self.equipamento,
+            'data_ocorrencia': timezone.now(), 'titulo': 'Relatório', 'descricao': 'Teste',
+        }
+        defaults.update(kwargs)
+        return Report.objects.create(**defaults)
+
+    def _snapshot(self):
+        return sorted(ReportDailyRollup.objects.values_list('chave', 'total', 'progresso_soma'))
+
+    def test_signals_match_full_rebuild(self):
+        pendente = self._create(prioridade='alta')
+        andamento = self._create(atribuido_para=self.tecnico, progresso=40, status='em_andamento')
+        resolvido = self._create(progresso=100, status='resolvido')
+
+        andamento.progresso = 70
+        andamento.prioridade = 'critica'
+        andamento.save()
+        resolvido.deleted_at = timezone.now()
+        resolvido.save()
+        pendente.delete()
+        self._create(status='resolvido', progresso=100)
+
+        incremental = self._snapshot()
+        self.assertEqual(sum(total for _, total, _ in incremental), 2)
+        rebuild_rollup()
+        self.assertEqual(self._snapshot(), incremental)
+
+    def test_analytics_reads_from_rollup(self):
+        self._create(progresso=20)
+        self._create(progresso=100, status='resolvido', atribuido_para=self.tecnico)
+        self._create(progresso=60, status='em_andamento', usuario=self.tecnico)
+
+        analytics = SimpleReportAnalytics()
+        with CaptureQueriesContext(connection) as ctx:
+            overview = analytics.get_overview_stats()
+        self.assertEqual(len(ctx), 1)
+        self.assertNotIn('"reports_report"', ctx.captured_queries[0]['sql'])
+        self.assertEqual(overview['total_reports'], 3)
+        self.assertEqual(overview['reports_resolvidos'], 1)
+        self.assertEqual(overview['progresso_medio'], 60.0)
+
+        locais = analytics.get_location_performance()
+        self.assertEqual(locais[0]['total_reports'], 3)
+        self.assertEqual(sum(item['criados'] for item in analytics.get_timeline_data()), 3)
+
+        # Quem não é staff só vê o que criou ou recebeu
+        overview = SimpleReportAnalytics(user=self.tecnico).get_overview_stats()
+        self.assertEqual(overview['total_reports'], 2)
+
+
+class ResolutionTimeStatsTest(TestCase):
+    """Média, mediana e p90 do tempo de resolução calculados no banco"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tecnico = User.objects.create_user(
+            username='resolvedor', email='resolvedor@example.com', password='senha123',
+            first_name='Rita', last_name='Lima'
+        )
+        cls.local = Local.objects.create(
+            nome='Usina Leste', codigo='UL', tipo='fabrica',
+            cidade='Santos', estado='SP', cep='11000-000'
+        )
+        for horas in [1, 2, 3, 4, 10]:
+            report = Report.objects.create(
+                usuario=cls.tecnico, atribuido_para=cls.tecnico, local=cls.local,
+                data_ocorrencia=timezone.now(), titulo='Resolvido', descricao='Teste',
+                status='resolvido', progresso=100, prioridade='alta',
+            )
+            Report.objects.filter(pk=report.pk).update(
+                tempo_resolucao_segundos=horas * 3600
+            )
+        # Pendentes não entram no cálculo
+        Report.objects.create(
+            usuario=cls.tecnico, data_ocorrencia=timezone.now(),
+            titulo='Pendente', descricao='Teste', prioridade='alta',
+        )
+
+    def test_grouped_stats_in_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            stats = get_resolution_time_stats(Report.objects.all())
+        self.assertEqual(len(ctx), 1)
+
+        esperado = {'resolvidos': 5, 'media_horas': 4.0, 'mediana_horas': 3.0, 'p90_horas': 10.0}
+        for dimensao, rotulo in [('prioridade', 'Alta'), ('local', 'Usina Leste'), ('atribuido_para', 'Rita Lima')]:
+            with self.subTest(dimensao=dimensao):
+                item = stats[dimensao][0]
+                self.assertEqual(item['rotulo'], rotulo)
+                self.assertEqual({k: item[k] for k in esperado}, esperado)
+
+
+    def test_analytics_window_is_the_resolution_date(self):
+        agora = timezone.now()
+        casos = {
+            # Aberto antes do período e resolvido nele: entra
+            'antigo': (agora - timedelta(days=60), agora - timedelta(days=1)),
+            # Aberto no período e resolvido depois dele: fica de fora
+            'depois': (agora - timedelta(days=10), agora + timedelta(days=2)),
+        }
+        for titulo, (criado, resolvido) in casos.items():
+            report = Report.objects.create(
+                usuario=self.tecnico, data_ocorrencia=criado, titulo=titulo, descricao='Teste',
+                status='resolvido', progresso=100, prioridade='baixa',
+            )
+            Report.objects.filter(pk=report.pk).update(
+                data_criacao=criado, resolvido_em=resolvido,
+                tempo_resolucao_segundos=int((resolvido - criado).total_seconds()),
+            )
+
+        periodo = (agora - timedelta(days=30), agora)
+        for analytics in (ReportAnalytics(date_range=periodo), SimpleReportAnalytics(date_range=periodo)):
+            with self.subTest(analytics=type(analytics).__name__):
+                prioridades = analytics.get_resolution_time_stats()['prioridade']
+                self.assertEqual(
+                    [(item['chave'], item['resolvidos'], item['media_horas']) for item in prioridades],
+                    [('baixa', 1, 59 * 24.0)],
+                )
+        produtividade = ReportAnalytics(date_range=periodo).get_productivity_metrics()
+        self.assertEqual(produtividade['tempo_resolucao_por_prioridade']['baixa'], 59 * 24.0)
+
+
+class ReportMilestonesTest(TestCase):
+    """Marcos de SLA mantidos pelas views e preenchidos a partir do histórico"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='sla', email='sla@example.com', password='senha123'
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.report = Report.objects.create(
+            usuario=self.user, data_ocorrencia=timezone.now(),
+            titulo='Bomba parada', descricao='Sem pressão',
+        )
+
+    def _update_status(self, progresso):
+        response = self.client.post(reverse('reports:update_status', args=[self.report.pk]), {
+            'progresso_novo': progresso,
+            'descricao_atualizacao': 'Atualização',
+            'imagens-TOTAL_FORMS': 0,
+            'imagens-INITIAL_FORMS': 0,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.report.refresh_from_db()
+
+    def test_update_status_records_milestones(self):
+        self._update_status(40)
+        self.assertIsNotNone(self.report.primeira_resposta_em)
+        self.assertIsNone(self.report.resolvido_em)
+        primeira_resposta = self.report.primeira_resposta_em
+
+        self._update_status(100)
+        self.assertEqual(self.report.status, 'resolvido')
+        self.assertEqual(self.report.primeira_resposta_em, primeira_resposta)
+        resolvido_em = self.report.resolvido_em
+        self.assertIsNotNone(resolvido_em)
+        self.assertGreaterEqual(self.report.tempo_resolucao_segundos, 0)
+
+        # Editar depois de resolvido não altera a resolução
+        self.report.titulo = 'Bomba parada (revisado)'
+        self.report.atualizar_marcos()
+        self.report.save()
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.resolvido_em, resolvido_em)
+
+    def test_backfill_uses_update_history(self):
+        criacao = self.report.data_criacao
+        for horas, progresso, status in [(2, 50, 'em_andamento'), (30, 100, 'resolvido')]:
+            update = ReportUpdate.objects.create(
+                report=self.report, usuario=self.user,
+                progresso_anterior=0, progresso_novo=progresso,
+                status_anterior='pendente', status_novo=status,
+                descricao_atualizacao='Histórico',
+            )
+            ReportUpdate.objects.filter(pk=update.pk).update(
+                data_atualizacao=criacao + timedelta(hours=horas)
+            )
+        # Edição posterior que "corromperia" data_atualizacao
+        Report.objects.filter(pk=self.report.pk).update(
+            status='resolvido', progresso=100, data_atualizacao=criacao + timedelta(days=10)
+        )
+
+        self.assertEqual(backfill_report_milestones(batch_size=1), 1)
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.primeira_resposta_em, criacao + timedelta(hours=2))
+        self.assertEqual(self.report.resolvido_em, criacao + timedelta(hours=30))
+        self.assertEqual(self.report.tempo_resolucao_segundos, 30 * 3600)
+
+
+class AnalyticsCacheTest(TestCase):
+    """Cache versionado dos payloads de analytics"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            username='gestor', email='gestor@example.com', password='senha123', is_staff=True
+        )
+        cls.tecnico = User.objects.create_user(
+            username='campo', email='campo@example.com', password='senha123'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _create_report(self, usuario):
+        return Report.objects.create(
+            usuario=usuario, data_ocorrencia=timezone.now(),
+            titulo='Motor aquecido', descricao='Temperatura acima do normal',
+        )
+
+    def test_report_write_invalidates_dashboard(self):
+        self.client.force_login(self.staff)
+        url = reverse('reports:analytics_api') + '?chart=overview&period=30d'
+
+        self.assertEqual(self.client.get(url).json()['total_reports'], 0)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url).json()['total_reports'], 0)
+        # O payload vem do cache: nenhuma consulta aos relatórios
+        self.assertFalse([q for q in ctx.captured_queries if 'reports_' in q['sql']])
+
+        version = analytics_cache.get_data_version()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self._create_report(self.tecnico)
+            # A versão só avança no commit: antes dele nada é reconstruído
+            self.assertEqual(self.client.get(url).json()['total_reports'], 0)
+            self.assertEqual(analytics_cache.get_data_version(), version)
+        self.assertTrue(callbacks)
+        self.assertEqual(self.client.get(url).json()['total_reports'], 1)
+
+        stats = get_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+
+    def test_scope_separates_staff_and_user(self):
+        self._create_report(self.staff)
+        staff_key = analytics_cache.cache_key('dashboard', '30d', self.staff)
+        self.assertNotEqual(staff_key, analytics_cache.cache_key('dashboard', '30d', self.tecnico))
+
+        self.client.force_login(self.tecnico)
+        response = self.client.get(reverse('reports:analytics_api') + '?chart=overview')
+        self.assertEqual(response.json()['total_reports'], 0)
+        self.assertEqual(self.client.get(reverse('reports:analytics_cache_stats')).status_code, 403)
+
+    def test_dashboard_and_export_share_payload(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('reports:analytics')).status_code, 200)
+        response = self.client.get(reverse('reports:export_analytics'))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('overview', json.loads(response.content))
+        self.assertEqual(get_cache_stats()['hits'], 1)
+
+    def test_unknown_params_fall_back_to_defaults(self):
+        self.client.force_login(self.staff)
+        self.client.get(reverse('reports:analytics_api'), {'chart': 'timeline', 'period': '30d'})
+        for extra in ('1d', 'x' * 200, '30d"\r\nX-Injetado: 1'):
+            self.client.get(reverse('reports:analytics_api'), {'chart': 'timeline', 'period': extra, 'group_by': extra})
+        # Valores desconhecidos usam o período e o agrupamento padrão: mesma chave
+        self.assertEqual(get_cache_stats()['misses'], 1)
+
+        response = self.client.get(reverse('reports:export_analytics'), {'period': '../../x'})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="analytics_30d.json"')
+
+    def test_lock_prevents_duplicate_builds(self):
+        builds = []
+        started = threading.Event()
+
+        def slow_build():
+            builds.append(1)
+            started.set()
+            time.sleep(0.2)
+            return b'{}'
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(
+            analytics_cache.get_or_build('dashboard', '7d', self.staff, slow_build)
+        ))
+        first.start()
+        started.wait()
+        results.append(analytics_cache.get_or_build('dashboard', '7d', self.staff, slow_build))
+        first.join()
+
+        self.assertEqual(results, [b'{}', b'{}'])
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(get_cache_stats()['lock_waits'], 1)
+
+
+class AnalyticsEncoderTest(TestCase):
+    """Encoder compartilhado pelas views de analytics"""
+
+    def test_encodes_analytics_types(self):
+        data = {
+            'periodo': date(2024, 3, 1),
+            'gerado_em': datetime(2024, 3, 1, 8, 30),
+            'taxa': Decimal('12.50'),
+            'tempo_medio': timedelta(hours=2),
+            'date_range': (date(2024, 1, 1), date(2024, 3, 1)),
+            'local': 'Fábrica São José',
+        }
+        expected = {
+            'periodo': '2024-03-01',
+            'gerado_em': '2024-03-01T08:30:00',
+            'taxa': 12.5,
+            'tempo_medio': 7200.0,
+            'date_range': ['2024-01-01', '2024-03-01'],
+            'local': 'Fábrica São José',
+        }
+        self.assertEqual(json.loads(encoders._dumps_stdlib(data)), expected)
+        self.assertEqual(json.loads(encoders.dumps(data)), expected)
+        self.assertNotIn(b'\n', encoders.dumps(data))
+
+        with self.assertRaises(TypeError):
+            encoders.dumps({'usuario': object()})
+
+
+class TrendsAnalysisTest(TestCase):
+    """Comparação entre janelas consecutivas em uma única consulta"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='tendencias', email='tendencias@example.com', password='senha123', is_staff=True
+        )
+        agora = timezone.now()
+        # (dias atrás, status, prioridade)
+        for dias, status, prioridade in [
+            (1, 'resolvido', 'critica'),
+            (2, 'pendente', 'alta'),
+            (3, 'pendente', 'media'),
+            (9, 'resolvido', 'alta'),
+            (16, 'em_andamento', 'baixa'),
+        ]:
+            report = Report.objects.create(
+                usuario=cls.user, data_ocorrencia=agora, titulo='Ruído', descricao='Ruído no eixo',
+                status=status, prioridade=prioridade,
+            )
+            Report.objects.filter(pk=report.pk).update(data_criacao=agora - timedelta(days=dias))
+        rebuild_rollup()
+
+    def test_report_windows_in_one_query(self):
+        agora = timezone.now()
+        analytics = ReportAnalytics(user=self.user, date_range=(agora - timedelta(days=7), agora))
+        with self.assertNumQueries(1):
+            trends = analytics.get_trends_analysis(janelas=3)
+
+        self.assertEqual(trends['total_reports']['serie'], [3, 1, 1])
+        self.assertEqual(trends['resolvidos']['serie'], [1, 1, 0])
+        self.assertEqual(trends['criticos']['atual'], 1)
+        self.assertEqual(trends['total_reports']['variacao'], 200.0)
+        self.assertEqual(trends['total_reports']['tendencia'], 'up')
+        self.assertEqual(len(trends['janelas']), 3)
+
+    def test_report_analytics_skips_deleted_reports(self):
+        agora = timezone.now()
+        Report.objects.filter(prioridade='critica').update(deleted_at=agora)
+        analytics = ReportAnalytics(user=self.user, date_range=(agora - timedelta(days=7), agora))
+
+        self.assertEqual(analytics.get_overview_stats()['total_reports'], 2)
+        self.assertEqual(
+            [item['prioridade'] for item in analytics.get_priority_distribution()], ['alta', 'media']
+        )
+        self.assertEqual(analytics.get_trends_analysis(janelas=3)['total_reports']['serie'], [2, 1, 1])
+        self.assertEqual(analytics.get_productivity_metrics()['taxa_conclusao'], 0)
+
+    def test_api_trends_from_rollup(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('reports:analytics_api'), {
+            'chart': 'trends', 'period': '7d', 'windows': 3, 'step': 'week',
+        })
+        trends = response.json()
+        self.assertEqual(trends['total_reports']['serie'], [3, 1, 1])
+        self.assertEqual(trends['pendentes']['serie'], [2, 0, 0])
+
+        response = self.client.get(reverse('reports:analytics_api'), {'chart': 'trends', 'step': 'dia'})
+        self.assertEqual(response.status_code, 400)
+
+
+class DashboardSectionsTest(TestCase):
+    """Seções do dashboard em paralelo, com prazo e valor padrão por seção"""
+
+    def test_slow_and_failing_sections_degrade_alone(self):
+        def lenta():
+            time.sleep(1)
+            return {'total': 1}
+
+        def falha():
+            raise RuntimeError('consulta cancelada')
+
+        inicio = time.perf_counter()
+        with self.assertLogs('reports.sections', 'WARNING'):
+            data, timings = run_sections({
+                'overview': Section(lambda: {'total': 3}, {}),
+                'response_times': Section(lenta, {}, timeout=0.1),
+                'equipment_issues': Section(falha, []),
+            }, parallel=True)
+
+        self.assertLess(time.perf_counter() - inicio, 0.9)
+        self.assertEqual(data, {'overview': {'total': 3}, 'response_times': {}, 'equipment_issues': []})
+        self.assertEqual(
+            {name: timing['status'] for name, timing in timings.items()},
+            {'overview': 'ok', 'response_times': 'timeout', 'equipment_issues': 'error'},
+        )
+        self.assertTrue(is_partial(timings))
+
+    def test_dashboard_reports_section_timings(self):
+        # Dentro da transação do teste as seções rodam em sequência
+        data = SimpleDashboardData(period='7d').get_complete_dashboard_data()
+        self.assertEqual(data['overview']['total_reports'], 0)
+        self.assertFalse(is_partial(data['sections']))
+        self.assertIn('trends', data['sections'])
+
+
+class DashboardParallelSectionsTest(TransactionTestCase):
+    """Threads do pool leem o banco com conexões próprias"""
+
+    def test_parallel_dashboard_matches_sequential(self):
+        user = User.objects.create_user(username='paralelo', email='paralelo@example.com', password='senha123')
+        Report.objects.create(
+            usuario=user, data_ocorrencia=timezone.now(), titulo='Vibração', descricao='Vibração no motor',
+        )
+        dashboard = SimpleDashboardData(period='30d')
+        paralelo = dashboard.get_complete_dashboard_data(parallel=True)
+        sequencial = dashboard.get_complete_dashboard_data(parallel=False)
+
+        self.assertFalse(is_partial(paralelo['sections']))
+        for secao in ('overview', 'priority_distribution', 'timeline', 'trends'):
+            self.assertEqual(paralelo[secao], sequencial[secao])
+        self.assertEqual(paralelo['overview']['total_reports'], 1)
+
+    def test_timed_out_section_is_stopped_by_the_database(self):
+        terminou = threading.Event()
+        resultado = []
+
+        def consulta_longa():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 500000000) '
+                        'SELECT COUNT(*) FROM n'
+                    )
+                    resultado.append(cursor.fetchone())
+            finally:
+                terminou.set()
+
+        laco_parou = threading.Event()
+
+        def consultas_em_laco():
+            try:
+                while True:
+                    Report.objects.count()
+            finally:
+                laco_parou.set()
+
+        with self.assertLogs('reports.sections', 'WARNING'):
+            data, timings = run_sections({
+                'longa': Section(consulta_longa, {}, timeout=0.2),
+                'laco': Section(consultas_em_laco, [], timeout=0.2),
+            }, parallel=True)
+
+        self.assertEqual(data, {'longa': {}, 'laco': []})
+        self.assertEqual({timing['status'] for timing in timings.values()}, {'timeout'})
+        # A consulta abandonada não segue rodando com a conexão da thread
+        self.assertTrue(terminou.wait(2))
+        self.assertEqual(resultado, [])
+        # Nenhuma consulta nova começa depois do prazo
+        self.assertTrue(laco_parou.wait(2))
+        data, timings = run_sections({'rapida': Section(lambda: 1, None, timeout=2)}, parallel=True)
+        self.assertEqual(data, {'rapida': 1})
+        self.assertIs(sections._get_executor(), sections._get_executor())
+
+
+class ReportSeriesTest(TestCase):
+    """Série por período agrupada no banco, no fuso de São Paulo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='serie', email='serie@example.com', password='senha123'
+        )
+        tz = timezone.get_current_timezone()
+        for momento in [
+            datetime(2026, 1, 15, 10, 0),
+            # 23h30 em São Paulo já é março em UTC
+            datetime(2026, 2, 28, 23, 30),
+            datetime(2026, 3, 1, 1, 0),
+            datetime(2026, 5, 20, 12, 0),
+        ]:
+            report = Report.objects.create(
+                usuario=cls.user, data_ocorrencia=timezone.now(), titulo='Falha', descricao='Falha elétrica',
+            )
+            Report.objects.filter(pk=report.pk).update(data_criacao=timezone.make_aware(momento, tz))
+
+    def test_month_buckets_are_zero_filled_and_local(self):
+        with self.assertNumQueries(1):
+            series = get_report_series(Report.objects.ativos(), date(2026, 1, 10), date(2026, 5, 31))
+        self.assertEqual(
+            [(item['periodo'], item['count']) for item in series],
+            [(date(2026, 1, 1), 1), (date(2026, 2, 1), 1), (date(2026, 3, 1), 1),
+             (date(2026, 4, 1), 0), (date(2026, 5, 1), 1)],
+        )
+        self.assertEqual(series[1]['label'], 'fev 2026')
+
+    def test_quarter_and_week_granularities(self):
+        quarters = get_report_series(Report.objects.all(), date(2026, 1, 1), date(2026, 6, 30), 'quarter')
+        self.assertEqual([(item['label'], item['count']) for item in quarters], [('1º tri 2026', 3), ('2º tri 2026', 1)])
+
+        weeks = get_report_series(Report.objects.all(), date(2026, 2, 23), date(2026, 3, 8), 'week')
+        # 23/02 e 02/03 são segundas-feiras
+        self.assertEqual([(item['periodo'], item['count']) for item in weeks], [(date(2026, 2, 23), 2), (date(2026, 3, 2), 0)])
+
+    def test_series_endpoint(self):
+        self.client.force_login(self.user)
+        url = reverse('dashboard:api_reports_series')
+        response = self.client.get(url, {'granularity': 'day', 'start': '2026-02-28', 'end': '2026-03-01'})
+        self.assertEqual([item['count'] for item in response.json()], [1, 1])
+        self.assertEqual(response.json()[0]['periodo'], '2026-02-28')
+
+        self.assertEqual(self.client.get(url, {'granularity': 'hora'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2026-13-01'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('dashboard:analytics')).status_code, 200)
+
+
+class UserReportStatsTest(TestCase):
+    """Contadores por usuário mantidos pelos sinais e reconciliados pelo comando"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.autor = User.objects.create_user(username='autor', email='autor@example.com', password='senha123')
+        cls.tecnico = User.objects.create_user(username='resp', email='resp@example.com', password='senha123')
+        cls.outro = User.objects.create_user(username='outro', email='outro@example.com', password='senha123')
+
+    def _stats(self, user):
+        stats = UserReportStats.objects.filter(usuario=user).first()
+        return stats and (stats.criados, stats.resolvidos, stats.atribuidos, stats.abertos)
+
+    def test_counters_follow_report_lifecycle(self):
+        report = Report.objects.create(
+            usuario=self.autor, atribuido_para=self.tecnico, data_ocorrencia=timezone.now(),
+            titulo='Painel', descricao='Disjuntor desarmando',
+        )
+        self.assertEqual(self._stats(self.autor), (1, 0, 0, 0))
+        self.assertEqual(self._stats(self.tecnico), (0, 0, 1, 1))
+
+        report.atribuido_para = self.outro
+        report.status = 'resolvido'
+        report.save()
+        self.assertEqual(self._stats(self.autor), (1, 1, 0, 0))
+        self.assertEqual(self._stats(self.tecnico), (0, 0, 0, 0))
+        self.assertEqual(self._stats(self.outro), (0, 0, 1, 0))
+
+        report.deleted_at = timezone.now()
+        report.save()
+        self.assertEqual(self._stats(self.autor), (0, 0, 0, 0))
+        self.assertEqual(self._stats(self.outro), (0, 0, 0, 0))
+
+        # Excluir o usuário apaga os relatórios em cascata sem recriar a linha dele
+        Report.objects.create(
+            usuario=self.autor, data_ocorrencia=timezone.now(), titulo='Painel', descricao='Outro defeito',
+        )
+        self.autor.delete()
+        self.assertFalse(UserReportStats.objects.filter(usuario_id=self.autor.pk).exists())
+
+    def test_reconcile_repairs_drift_and_ranks_authors(self):
+        for _ in range(2):
+            Report.objects.create(
+                usuario=self.outro, data_ocorrencia=timezone.now(), titulo='Bomba', descricao='Vazamento',
+            )
+        # update() não passa pelos sinais
+        Report.objects.filter(usuario=self.outro).update(status='resolvido', atribuido_para=self.tecnico)
+        UserReportStats.objects.filter(usuario=self.outro).delete()
+
+        out = StringIO()
+        call_command('reconcile_user_stats', '--dry-run', stdout=out)
+        self.assertIn('2 usuários com divergência', out.getvalue())
+        self.assertIsNone(self._stats(self.outro))
+
+        call_command('reconcile_user_stats', stdout=StringIO())
+        self.assertEqual(self._stats(self.outro), (2, 2, 0, 0))
+        self.assertEqual(self._stats(self.tecnico), (0, 0, 2, 0))
+        self.assertEqual(reconcile_user_stats(), [])
+
+        self.client.force_login(self.autor)
+        response = self.client.get(reverse('dashboard:index'))
+        self.assertEqual([user.username for user in response.context['top_authors']], ['outro'])
+        response = self.client.get(reverse('core:profile'))
+        self.assertEqual(response.context['user_stats']['total_reports'], 0)
+
+
+class TemplateFragmentCacheTest(TestCase):
+    """Fragmentos de template em cache, invalidados pelos carimbos de versão"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='fragmento', email='fragmento@example.com', password='senha123')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def _report_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        return response, [q for q in ctx.captured_queries if 'reports_report' in q['sql']]
+
+    def test_dashboard_fragments_follow_report_version(self):
+        url = reverse('dashboard:index')
+        Report.objects.create(
+            usuario=self.user, data_ocorrencia=timezone.now(), titulo='Compressor ruidoso', descricao='Ruído',
+        )
+        response, queries = self._report_queries(url)
+        self.assertContains(response, 'Compressor ruidoso')
+        self.assertTrue(queries)
+
+        response, queries = self._report_queries(url)
+        self.assertContains(response, 'Compressor ruidoso')
+        self.assertEqual(queries, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Report.objects.create(
+                usuario=self.user, data_ocorrencia=timezone.now(), titulo='Esteira parada', descricao='Motor',
+            )
+        response, queries = self._report_queries(url)
+        self.assertContains(response, 'Esteira parada')
+
+    def test_filter_panel_follows_location_version(self):
+        local = Local.objects.create(
+            nome='Galpão Sul', codigo='GS', tipo='fabrica', cidade='Campinas', estado='SP', cep='13000-000'
+        )
+        url = reverse('reports:list')
+        self.assertContains(self.client.get(url, {'local': local.pk}), 'Galpão Sul')
+        local.nome = 'Galpão Leste'
+        with self.captureOnCommitCallbacks(execute=True):
+            local.save()
+        self.assertContains(self.client.get(url, {'local': local.pk}), 'Galpão Leste')
+
+
+class AutocompleteTest(TestCase):
+    """Selects de local, equipamento e usuário carregados sob demanda"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='tecnico', email='tecnico@example.com', password='senha123',
+            first_name='Ana', last_name='Souza'
+        )
+        User.objects.create_user(username='bruno', email='bruno@example.com', password='x', first_name='Bruno')
+        User.objects.create_user(username='inativo', email='inativo@example.com', password='x', ativo=False)
+        cls.norte = Local.objects.create(
+            nome='Fábrica Norte', codigo='FN', tipo='fabrica',
+            cidade='Campinas', estado='SP', cep='13000-000'
+        )
+        cls.sul = Local.objects.create(
+            nome='Fábrica Sul', codigo='FS', tipo='fabrica',
+            cidade='Campinas', estado='SP', cep='13000-000'
+        )
+        Local.objects.create(
+            nome='Galpão Antigo', codigo='GA', tipo='deposito', status='inativo',
+            cidade='Campinas', estado='SP', cep='13000-000'
+        )
+        cls.compressores = [
+            Equipamento.objects.create(local=cls.norte, nome=f'Compressor {i}', codigo=f'CP-{i:02d}', tipo='outro')
+            for i in range(25)
+        ]
+        Equipamento.objects.create(local=cls.sul, nome='Compressor Sul', codigo='CS-01', tipo='outro')
+        Equipamento.objects.create(local=cls.norte, nome='Caldeira', codigo='CA-01', tipo='outro', ativo=False)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _get(self, url_name, **params):
+        response = self.client.get(reverse(url_name), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_locais_prefix_search_ignores_case_and_inactive(self):
+        data = self._get('locations:api_locais_autocomplete', q='fáb')
+        self.assertEqual([item['text'] for item in data['results']], ['Fábrica Norte (FN)', 'Fábrica Sul (FS)'])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(self._get('locations:api_locais_autocomplete', q='ga')['results'], [])
+        todos = self._get('locations:api_locais_autocomplete', q='ga', todos='1')
+        self.assertEqual(len(todos['results']), 1)
+
+    def test_equipamentos_are_scoped_by_local_and_paginated(self):
+        primeira = self._get('locations:api_equipamentos_autocomplete', local=self.norte.pk, q='comp')
+        self.assertEqual(len(primeira['results']), 20)
+        self.assertTrue(primeira['has_more'])
+        segunda = self._get('locations:api_equipamentos_autocomplete', local=self.norte.pk, q='comp', page=2)
+        self.assertEqual(len(segunda['results']), 5)
+        self.assertFalse(segunda['has_more'])
+        ids = {item['id'] for item in primeira['results'] + segunda['results']}
+        self.assertEqual(ids, {eq.pk for eq in self.compressores})
+
+        por_codigo = self._get('locations:api_equipamentos_autocomplete', local=self.sul.pk, q='cs')
+        self.assertEqual([item['text'] for item in por_codigo['results']], ['Compressor Sul (CS-01)'])
+
+        response = self.client.get(reverse('locations:api_equipamentos_autocomplete'), {'local': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_usuarios_search_active_users_by_name_or_username(self):
+        data = self._get('authentication:api_usuarios_autocomplete', q='an')
+        self.assertEqual([item['text'] for item in data['results']], ['Ana Souza'])
+        data = self._get('authentication:api_usuarios_autocomplete', q='bru')
+        self.assertEqual([item['text'] for item in data['results']], ['Bruno'])
+        self.assertEqual(self._get('authentication:api_usuarios_autocomplete', q='inat')['results'], [])
+
+    def test_form_renders_only_selected_choices(self):
+        equipamento = self.compressores[3]
+        report = Report.objects.create(
+            usuario=self.user, local=self.norte, equipamento=equipamento,
+            data_ocorrencia=timezone.now(), titulo='Vazamento', descricao='Vazamento de óleo'
+        )
+        html = str(ReportForm(instance=report)['equipamento'])
+        self.assertIn('data-autocomplete-url="%s"' % reverse('locations:api_equipamentos_autocomplete'), html)
+        self.assertIn('data-autocomplete-forward="id_local"', html)
+        self.assertIn(f'value="{equipamento.pk}" selected', html)
+        self.assertEqual(html.count('<option'), 2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            str(ReportForm()['local'])
+        self.assertEqual(len(ctx), 0)
+
+    def test_validation_loads_only_the_selected_row(self):
+        form = ReportFilterForm(data={'local': self.norte.pk, 'equipamento': self.compressores[0].pk})
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(form.is_valid())
+        self.assertEqual(len(ctx), 2)
+        self.assertEqual(form.cleaned_data['local'], self.norte)
+
+        form = ReportFilterForm(data={'equipamento': 'abc'})
+        self.assertFalse(form.is_valid())
+        str(form['equipamento'])
+
+
+class EquipamentosPorLocalTest(TestCase):
+    """Lista de equipamentos por local com ETag e cache invalidado pelos sinais"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tecnico', email='tecnico@example.com', password='x')
+        cls.local = Local.objects.create(
+            nome='Fábrica Norte', codigo='FN', tipo='fabrica',
+            cidade='Campinas', estado='SP', cep='13000-000'
+        )
+        cls.outro = Local.objects.create(
+            nome='Fábrica Sul', codigo='FS', tipo='fabrica',
+            cidade='Campinas', estado='SP', cep='13000-000'
+        )
+        cls.bomba = Equipamento.objects.create(local=cls.local, nome='Bomba', codigo='BB-01', tipo='servidor')
+        Equipamento.objects.create(local=cls.local, nome='Compressor', codigo='CP-01')
+        Equipamento.objects.create(local=cls.local, nome='Caldeira', codigo='CA-01', ativo=False)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse('locations:api_equipamentos_por_local', args=[self.local.pk])
+
+    def test_compact_payload(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        data = response.json()
+        self.assertEqual(data['campos'], ['id', 'nome', 'codigo', 'tipo'])
+        self.assertEqual([row[1] for row in data['equipamentos']], ['Bomba', 'Compressor'])
+        self.assertEqual(data['tipos'], {'servidor': 'Servidor'})
+
+    def test_legacy_url_keeps_original_payload(self):
+        legado = self.client.get(reverse('reports:api_equipamentos_por_local', args=[self.local.pk])).json()
+        self.assertTrue(legado['success'])
+        self.assertEqual(
+            [(eq['nome'], eq['codigo'], eq['tipo']) for eq in legado['equipamentos']],
+            [('Bomba', 'BB-01', 'Servidor'), ('Compressor', 'CP-01', 'Não informado')],
+        )
+        self.assertEqual(set(legado['equipamentos'][0]), {'id', 'nome', 'codigo', 'tipo'})
+
+        response = self.client.get(reverse('reports:api_equipamentos_por_local', args=[999999]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'success': False, 'error': 'Local não encontrado'})
+
+    def test_if_none_match_returns_304_without_queries(self):
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertFalse([q for q in ctx.captured_queries if 'locations_' in q['sql']])
+
+    def test_cached_until_equipment_changes(self):
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        self.assertFalse([q for q in ctx.captured_queries if 'locations_' in q['sql']])
+
+        # Mudanças em outro local não invalidam esta lista
+        with self.captureOnCommitCallbacks(execute=True):
+            Equipamento.objects.create(local=self.outro, nome='Esteira', codigo='ES-01')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Mover o equipamento muda a lista dos dois locais
+        self.bomba.local = self.outro
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bomba.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([row[1] for row in response.json()['equipamentos']], ['Compressor'])
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Equipamento.objects.filter(local=self.local, nome='Compressor').get().delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['equipamentos'], [])
+
+    def test_unknown_local(self):
+        response = self.client.get(reverse('locations:api_equipamentos_por_local', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkCreateReportsTest(TestCase):
+    """Criação em lote: in_bulk, bulk_create por lotes e efeitos dos sinais por lote"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tecnico', email='tecnico@example.com', password='x')
+        cls.local = Local.objects.create(
+            nome='Fábrica Norte', codigo='FN', tipo='fabrica',
+            cidade='Campinas', estado='SP', cep='13000-000'
+        )
+        cls.outro = Local.objects.create(
+            nome='Fábrica Sul', codigo='FS', tipo='fabrica',
+            cidade='Campinas', estado='SP', cep='13000-000'
+        )
+        Equipamento.objects.bulk_create([
+            Equipamento(local=cls.local, nome=f'Bomba {i}', codigo=f'BB-{i:02d}', tipo='outro')
+            for i in range(25)
+        ])
+        cls.ids = list(Equipamento.objects.filter(local=cls.local).values_list('id', flat=True))
+        cls.estranho = Equipamento.objects.create(local=cls.outro, nome='Esteira', codigo='ES-01')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _post_form(self, ids):
+        return self.client.post(reverse('reports:bulk_create'), {
+            'titulo_base': 'Inspeção', 'descricao': 'Inspeção trimestral', 'local': self.local.pk,
+            'prioridade': 'alta', 'data_ocorrencia': '2026-10-01T08:30', 'equipamentos': ids,
+        })
+
+    def _post_api(self, **dados):
+        body = {
+            'titulo_base': 'Inspeção', 'descricao': 'Inspeção trimestral', 'local': self.local.pk,
+            'prioridade': 'media', 'data_ocorrencia': '2026-10-01T08:30', 'equipamentos': self.ids,
+        }
+        body.update(dados)
+        return self.client.post(
+            reverse('reports:api_bulk_create'), json.dumps(body), content_type='application/json'
+        )
+
+    def test_form_applies_side_effects_once_per_batch(self):
+        version = analytics_cache.get_data_version()
+        with override_settings(REPORTS_BULK_BATCH_SIZE=10), self.captureOnCommitCallbacks(execute=True):
+            response = self._post_form(self.ids)
+        self.assertRedirects(response, reverse('reports:list'), fetch_redirect_response=False)
+
+        reports = Report.objects.filter(titulo__startswith='Inspeção')
+        self.assertEqual(reports.count(), 25)
+        self.assertTrue(all(r.data_ocorrencia.tzinfo for r in reports))
+        self.assertEqual(reports.filter(search_filter('trimestral')).count(), 25)
+        self.assertEqual(UserReportStats.objects.get(usuario=self.user).criados, 25)
+        self.assertEqual(
+            sum(ReportDailyRollup.objects.values_list('total', flat=True)), 25
+        )
+        # Uma versão nova por lote
+        self.assertEqual(analytics_cache.get_data_version(), version + 3)
+
+    def test_form_is_all_or_nothing(self):
+        real = bulk.apply_user_stats_batch
+        chamadas = []
+
+        def falha_no_segundo_lote(*args, **kwargs):
+            chamadas.append(args)
+            if len(chamadas) == 2:
+                raise IntegrityError('lote 2')
+            return real(*args, **kwargs)
+
+        version = analytics_cache.get_data_version()
+        with override_settings(REPORTS_BULK_BATCH_SIZE=10), self.captureOnCommitCallbacks(execute=True):
+            with patch.object(bulk, 'apply_user_stats_batch', falha_no_segundo_lote):
+                response = self._post_form(self.ids)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Erro ao criar relatórios: lote 2')
+        # O primeiro lote também foi desfeito
+        self.assertFalse(Report.objects.exists())
+        self.assertFalse(ReportDailyRollup.objects.exists())
+        self.assertEqual(analytics_cache.get_data_version(), version)
+
+    def test_query_count_does_not_grow_with_targets(self):
+        with override_settings(REPORTS_BULK_BATCH_SIZE=100):
+            with CaptureQueriesContext(connection) as poucos:
+                self._post_form(self.ids[:3])
+            with CaptureQueriesContext(connection) as muitos:
+                self._post_form(self.ids)
+        self.assertEqual(len(muitos), len(poucos))
+
+    def test_api_streams_progress(self):
+        with override_settings(REPORTS_BULK_BATCH_SIZE=10):
+            response = self._post_api()
+            linhas = [json.loads(linha) for linha in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([linha.get('criados') for linha in linhas], [10, 20, 25, 25])
+        self.assertEqual(linhas[0]['total'], 25)
+        self.assertTrue(linhas[-1]['concluido'])
+        self.assertEqual(Report.objects.count(), 25)
+
+    def test_api_rejects_invalid_targets_before_writing(self):
+        response = self._post_api(equipamentos=self.ids + [self.estranho.pk, 'x'])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['invalidos'], ['x', self.estranho.pk])
+
+        response = self._post_api(prioridade='urgente', data_ocorrencia='ontem')
+        self.assertEqual(set(response.json()['errors']), {'prioridade', 'data_ocorrencia'})
+
+        response = self._post_api(titulo_base=123, descricao=['x'])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'titulo_base', 'descricao'})
+        self.assertFalse(Report.objects.exists())
+
+    def test_same_equipment_in_different_forms_creates_one_report(self):
+        pk = self.ids[0]
+        response = self._post_api(equipamentos=[pk, str(pk), f'0{pk}', self.ids[1]])
+        b''.join(response.streaming_content)
+        self.assertEqual(
+            sorted(Report.objects.values_list('equipamento_id', flat=True)), sorted([pk, self.ids[1]])
+        )
+
+        self._post_form([str(pk), f'0{pk}'])
+        self.assertEqual(Report.objects.filter(equipamento_id=pk).count(), 2)
+
+
+class ImportDataTest(TestCase):
+    """Importação em massa de CSV validada contra mapas pré-carregados"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='tecnico', email='tecnico@example.com', password='x', is_staff=True, is_superuser=True
+        )
+        cls.local = Local.objects.create(
+            nome='Fábrica Norte', codigo='FN', tipo='fabrica',
+            cidade='Campinas', estado='SP', cep='13000-000'
+        )
+        Equipamento.objects.create(local=cls.local, nome='Bomba', codigo='BB-01', tipo='outro')
+
+    def _import(self, kind, conteudo, **options):
+        erros = StringIO()
+        result = import_file(kind, BytesIO(conteudo.encode('utf-8')), f'{kind}.csv', error_stream=erros, **options)
+        return result, erros.getvalue()
+
+    def test_equipamentos_with_errors_report(self):
+        linhas = ['local;nome;codigo;tipo;ativo']
+        linhas += [f'FN;Compressor {i};CP-{i:03d};Servidor;sim' for i in range(30)]
+        linhas += ['FN;Bomba;BB-01;;', 'XX;Esteira;ES-01;;', 'FN;Duplicado;CP-000;;', 'FN;Motor;MT-01;foguete;']
+        version = analytics_cache.get_version('equipamentos', scope=self.local.pk)
+
+        result, erros = self._import('equipamentos', '\n'.join(linhas), batch_size=8)
+
+        self.assertEqual((result.linhas, result.importados, result.total_erros), (34, 30, 4))
+        self.assertEqual(Equipamento.objects.filter(local=self.local, tipo='servidor').count(), 30)
+        self.assertEqual([numero for numero, _ in result.erros], [32, 33, 34, 35])
+        self.assertIn('já existe', result.erros[0][1])
+        self.assertTrue(erros.startswith('linha;erro;local;nome;codigo;tipo;ativo'))
+        self.assertIn('35;"tipo: valor inválido ""foguete""";FN;Motor;MT-01;foguete;', erros)
+        # bulk_create não passa pelos sinais; o importador invalida as listas
+        self.assertGreater(analytics_cache.get_version('equipamentos', scope=self.local.pk), version)
+
+    def test_locais_dedupe_by_codigo_and_bump_version(self):
+        conteudo = '\n'.join([
+            'Código;Nome;Tipo;Cidade;Estado;CEP;Email;Responsável',
+            'GS;Galpão Sul;Depósito;Campinas;sp;13000-000;;tecnico',
+            'LJ-1;Loja Centro;;São Paulo;SP;;loja@example.com;',
+            'FN;Fábrica Norte;fabrica;Campinas;SP;;;',
+            'GS;Galpão Repetido;deposito;Campinas;SP;;;',
+            'EX;Externo;;Campinas;SP;;sem-arroba;',
+            'UF;Estado longo;;Campinas;SPX;;;',
+        ])
+        version = analytics_cache.get_version('locations')
+
+        result, erros = self._import('locais', conteudo, batch_size=1)
+
+        self.assertEqual((result.importados, result.total_erros), (2, 4))
+        self.assertEqual([numero for numero, _ in result.erros], [4, 5, 6, 7])
+        self.assertIn('"FN" já existe', result.erros[0][1])
+        self.assertIn('"GS" já existe', result.erros[1][1])
+        galpao = Local.objects.get(codigo='GS')
+        self.assertEqual((galpao.tipo, galpao.estado, galpao.responsavel), ('deposito', 'SP', self.user))
+        self.assertEqual(Local.objects.get(codigo='LJ-1').tipo, 'outro')
+        self.assertGreater(analytics_cache.get_version('locations'), version)
+
+        # Os equipamentos encontram os locais recém-importados pelo código
+        result, _ = self._import('equipamentos', 'local,nome,codigo\nGS,Empilhadeira,EP-01')
+        self.assertEqual(result.importados, 1)
+
+    def test_historical_reports_keep_dates_and_derived_tables(self):
+        conteudo = '\n'.join([
+            'Título,Descrição,Usuário,Data Ocorrência,Local,Equipamento,Status,Prioridade,Progresso,Data Criação,Resolvido em',
+            'Vazamento,Óleo no piso,tecnico,15/03/2024 08:00,FN,BB-01,Resolvido,alta,100,15/03/2024 08:00,16/03/2024 08:00',
+            'Ruído,Rolamento,tecnico,2024-04-01T10:00,FN,,pendente,media,0,2024-04-01,',
+            'Sem autor,Teste,fantasma,2024-04-01,,,,,,,',
+            'Equipamento sem local,Teste,tecnico,2024-04-01,,BB-01,,,,,',
+        ])
+        with CaptureQueriesContext(connection) as ctx:
+            result, _ = self._import('relatorios', conteudo)
+        self.assertEqual((result.importados, result.total_erros), (2, 2))
+        # Mapas carregados uma vez; nenhuma consulta por linha
+        self.assertLess(len(ctx), 20)
+        # data_criacao e marcos vão no INSERT, sem segunda escrita das linhas
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "reports_report"')])
+
+        vazamento = Report.objects.get(titulo='Vazamento')
+        self.assertEqual(timezone.localtime(vazamento.data_criacao).date(), date(2024, 3, 15))
+        self.assertEqual(vazamento.tempo_resolucao_segundos, 86400)
+        self.assertEqual(vazamento.primeira_resposta_em, vazamento.resolvido_em)
+        self.assertEqual(vazamento.equipamento.codigo, 'BB-01')
+        self.assertEqual(Report.objects.filter(search_filter('rolamento')).count(), 1)
+        self.assertEqual(UserReportStats.objects.get(usuario=self.user).resolvidos, 1)
+
+        importado = sorted(ReportDailyRollup.objects.values_list('chave', 'total'))
+        self.assertEqual(sum(total for _, total in importado), 2)
+        rebuild_rollup()
+        self.assertEqual(importado, sorted(ReportDailyRollup.objects.values_list('chave', 'total')))
+
+    def test_derived_tables_rebuilt_once_even_if_import_stops(self):
+        def linhas():
+            for i in range(5):
+                yield i + 2, {
+                    'titulo': f'Lote {i}', 'descricao': 'Correia gasta', 'usuario': 'tecnico',
+                    'data_ocorrencia': '2024-04-01',
+                }
+            raise ImportFileError('conexão perdida')
+
+        with CaptureQueriesContext(connection) as ctx:
+            with self.assertRaises(ImportFileError):
+                ReportImporter(batch_size=2).run(linhas())
+        # Os dois lotes gravados entram nos derivados, refeitos uma única vez
+        self.assertEqual(Report.objects.count(), 4)
+        self.assertEqual(Report.objects.filter(search_filter('correia')).count(), 4)
+        self.assertEqual(UserReportStats.objects.get(usuario=self.user).criados, 4)
+        self.assertEqual(ReportDailyRollup.objects.aggregate(total=Sum('total'))['total'], 4)
+        apagados = [q for q in ctx.captured_queries if q['sql'].startswith('DELETE FROM "reports_reportdailyrollup"')]
+        self.assertEqual(len(apagados), 1)
+
+    def test_resolved_reports_need_a_resolution_date(self):
+        conteudo = '\n'.join([
+            'titulo,descricao,usuario,data_ocorrencia,status,data_criacao,resolvido_em',
+            'Sem data,Teste,tecnico,2024-04-01,resolvido,2024-04-01,',
+            'Invertido,Teste,tecnico,2024-04-01,resolvido,2024-04-02,2024-04-01',
+            'Resolvido,Teste,tecnico,2024-04-01,resolvido,2024-04-01 08:00,2024-04-01 10:00',
+            'Pendente,Teste,tecnico,2024-04-01,pendente,2024-04-01,',
+        ])
+        result, _ = self._import('relatorios', conteudo)
+
+        self.assertEqual((result.importados, result.total_erros), (2, 2))
+        self.assertEqual(result.erros, [
+            (2, 'resolvido_em: obrigatório quando o status é resolvido'),
+            (3, 'resolvido_em: anterior à data_criacao'),
+        ])
+        # Nenhuma resolução de 0 s entra nas médias de SLA
+        self.assertEqual(
+            list(Report.objects.filter(status='resolvido').values_list('titulo', 'tempo_resolucao_segundos')),
+            [('Resolvido', 7200)],
+        )
+        pendente = Report.objects.get(titulo='Pendente')
+        self.assertIsNone(pendente.resolvido_em)
+        self.assertIsNone(pendente.primeira_resposta_em)
+
+    def test_overflowing_numbers_are_row_errors(self):
+        conteudo = '\n'.join([
+            'titulo,descricao,usuario,data_ocorrencia,progresso',
+            'Infinito,Teste,tecnico,2024-04-01,inf',
+            'Enorme,Teste,tecnico,2024-04-01,1e400',
+            'Normal,Teste,tecnico,2024-04-01,"42,0"',
+        ])
+        result, _ = self._import('relatorios', conteudo)
+
+        self.assertEqual((result.importados, result.total_erros), (1, 2))
+        self.assertEqual(result.erros, [(2, 'progresso: número inválido'), (3, 'progresso: número inválido')])
+        self.assertEqual(Report.objects.get().progresso, 42)
+
+    def test_missing_columns_and_command(self):
+        with self.assertRaisesMessage(ValueError, 'Colunas obrigatórias ausentes: codigo'):
+            self._import('equipamentos', 'local,nome\nFN,Bomba')
+
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'equipamentos.csv')
+            with open(caminho, 'w', encoding='utf-8') as f:
+                f.write('local,nome,codigo\nFN,Caldeira,CA-01\nFN,Bomba,BB-01\n')
+            out = StringIO()
+            call_command('import_data', 'equipamentos', caminho, stdout=out)
+            self.assertIn('1 registros importados', out.getvalue())
+            self.assertTrue(os.path.exists(os.path.join(pasta, 'equipamentos.erros.csv')))
+
+    def test_admin_upload_page(self):
+        self.client.force_login(self.user)
+        url = reverse('admin:reports_report_import')
+        self.assertContains(self.client.get(url), 'Importar')
+        arquivo = BytesIO('local,nome,codigo\nFN,Caldeira,CA-01\n'.encode('utf-8'))
+        arquivo.name = 'equipamentos.csv'
+        response = self.client.post(url, {'tipo': 'equipamentos', 'arquivo': arquivo})
+        self.assertContains(response, '1 importadas')
+        self.assertTrue(Equipamento.objects.filter(codigo='CA-01').exists())
+
+
+class ReportExportTest(TestCase):
+    """Exportação CSV/XLSX da lista filtrada, por streaming"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tecnico', email='tecnico@example.com', password='x')
+        cls.local = Local.objects.create(
+            nome='Fábrica Norte', codigo='FN', tipo='fabrica',
+            cidade='Campinas', estado='SP', cep='13000-000'
+        )
+        cls.equipamento = Equipamento.objects.create(local=cls.local, nome='Bomba', codigo='BB-01', tipo='outro')
+        ocorrencia = timezone.make_aware(datetime(2026, 3, 15, 8, 30))
+        Report.objects.bulk_create([
+            Report(
+                usuario=cls.user, local=cls.local, equipamento=cls.equipamento, data_ocorrencia=ocorrencia,
+                titulo=f'Vazamento {i}', descricao='Óleo; "no piso"\nsegunda linha',
+                status='pendente' if i % 3 else 'em_andamento', prioridade='alta',
+            )
+            for i in range(30)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _export(self, formato, **params):
+        response = self.client.get(reverse('reports:export', args=[formato]), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        chunks = list(response.streaming_content)
+        return response, chunks
+
+    @override_settings(REPORTS_EXPORT_CHUNK_SIZE=7)
+    def test_csv_follows_list_filters(self):
+        response, chunks = self._export('csv', status='em_andamento')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="relatorios_', response['Content-Disposition'])
+        # O cabeçalho é o primeiro bloco, antes das linhas
+        self.assertTrue(chunks[0].startswith('\ufeffID;Título;Descrição'.encode('utf-8')))
+
+        conteudo = b''.join(chunks)
+        linhas = list(csv.reader(StringIO(conteudo.decode('utf-8-sig')), delimiter=';'))
+        self.assertEqual(len(linhas), 1 + 10)
+        self.assertEqual(linhas[1][2], 'Óleo; "no piso"\nsegunda linha')
+        self.assertEqual(linhas[1][4], '15/03/2026 08:30')
+        self.assertEqual({linha[8] for linha in linhas[1:]}, {'Em Andamento'})
+
+    def test_csv_escapes_formula_like_text(self):
+        Report.objects.filter(titulo='Vazamento 0').update(titulo='=HYPERLINK("http://x";"abrir")')
+        Report.objects.filter(titulo='Vazamento 1').update(titulo='-5 graus', descricao='@SUM(A1)')
+        Report.objects.filter(titulo='Vazamento 2').update(titulo='\tTab', descricao='+55 19 9999')
+
+        _, chunks = self._export('csv')
+        linhas = list(csv.reader(StringIO(b''.join(chunks).decode('utf-8-sig')), delimiter=';'))
+        celulas = {celula for linha in linhas[1:] for celula in linha[1:3]}
+        self.assertTrue({
+            '\'=HYPERLINK("http://x";"abrir")', "'-5 graus", "'@SUM(A1)", "'\tTab", "'+55 19 9999",
+        } <= celulas)
+        self.assertFalse([c for c in celulas if c[:1] in ('=', '+', '-', '@', '\t', '\r')])
+
+        # A reimportação devolve o texto original
+        Report.objects.all().delete()
+        result = import_file('relatorios', BytesIO(b''.join(chunks)), 'relatorios.csv')
+        self.assertEqual(result.total_erros, 0)
+        self.assertTrue(Report.objects.filter(titulo='-5 graus', descricao='@SUM(A1)').exists())
+        self.assertTrue(Report.objects.filter(titulo='=HYPERLINK("http://x";"abrir")').exists())
+
+    def test_csv_round_trips_through_importer(self):
+        _, chunks = self._export('csv')
+        result = import_file('relatorios', BytesIO(b''.join(chunks)), 'relatorios.csv')
+        self.assertEqual((result.importados, result.total_erros), (30, 0))
+        self.assertEqual(Report.objects.filter(equipamento=self.equipamento).count(), 60)
+
+    def test_xlsx_is_a_valid_workbook(self):
+        response, chunks = self._export('xlsx', status='pendente')
+        self.assertGreater(len(chunks), 1)
+        with zipfile.ZipFile(BytesIO(b''.join(chunks))) as zf:
+            self.assertIsNone(zf.testzip())
+            sheet = zf.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertEqual(sheet.count('<row>'), 1 + 20)
+        self.assertIn('Óleo; "no piso"\nsegunda linha</t>', sheet)
+        self.assertIn('<c s="1"><v>46096.35416667</v></c>', sheet)
+        self.assertTrue(sheet.endswith('</sheetData></worksheet>'))
+
+    def test_unknown_format_and_single_report_excel(self):
+        response = self.client.get(reverse('reports:export', args=['pdf']))
+        self.assertEqual(response.status_code, 400)
+
+        report = Report.objects.first()
+        response = self.client.get(reverse('reports:generate_excel', args=[report.pk]))
+        self.assertEqual(response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        with zipfile.ZipFile(BytesIO(response.content)) as zf:
+            sheet = zf.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertIn('BB-01', sheet)
+        self.assertEqual(sheet.count('<row>'), 1 + len(export_headers()))
+
+    def test_rows_are_read_with_a_bounded_iterator(self):
+        with CaptureQueriesContext(connection) as ctx:
+            gerador = stream_xlsx(export_rows(Report.objects.all()), export_headers())
+            primeiro = next(gerador)
+            self.assertEqual(len(ctx), 0)
+            self.assertTrue(primeiro.startswith(b'PK'))
+            list(gerador)
+        self.assertEqual(len(ctx), 1)
+
+
+def _jpeg(nome, size=(2400, 1800), cor=(200, 80, 40), exif=None):
+    output = BytesIO()
+    Image.new('RGB', size, cor).save(output, format='JPEG', exif=exif or b'')
+    return ContentFile(output.getvalue(), name=nome)
+
+
+class ReportPdfTest(TestCase):
+    """PDF com imagens reduzidas, linha do tempo e cache por (id, data_atualizacao, pdf_versao)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tecnico', email='tecnico@example.com', password='x')
+
+    def setUp(self):
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.client.force_login(self.user)
+
+        self.report = Report.objects.create(
+            usuario=self.user, data_ocorrencia=timezone.now(), titulo='Vazamento <urgente>',
+            descricao='Óleo no piso\nperto da bomba', imagem_principal=_jpeg('principal.jpg'),
+        )
+        for i in range(2):
+            ReportImage.objects.create(report=self.report, imagem=_jpeg(f'anexo{i}.jpg', (1800, 2400), (i * 100, 0, 0)))
+        for progresso in (10, 50, 100):
+            update = ReportUpdate.objects.create(
+                report=self.report, usuario=self.user, progresso_anterior=progresso - 10, progresso_novo=progresso,
+                status_anterior='em_andamento', status_novo='em_andamento', descricao_atualizacao=f'Passo {progresso}',
+            )
+        ReportUpdateImage.objects.create(update=update, imagem=_jpeg('update.jpg', cor=(0, 0, 255)))
+        self.report.refresh_from_db()
+
+    def _download(self):
+        response = self.client.get(reverse('reports:generate_pdf', args=[self.report.pk]))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        # Consumir o conteúdo fecha o arquivo (e a resposta)
+        return b''.join(response.streaming_content)
+
+    def test_pdf_embeds_downscaled_images(self):
+        content = self._download()
+        self.assertTrue(content.startswith(b'%PDF'))
+        larguras = [int(w) for w in re.findall(rb'/Subtype /Image .*?/Width (\d+)', content, re.S)]
+        self.assertEqual(len(larguras), 4)
+        # Nenhuma imagem entra com a resolução original (2400 px)
+        self.assertLess(max(larguras), 1000)
+
+    def test_repeated_downloads_are_served_from_storage(self):
+        primeiro = self._download()
+        self.assertTrue(default_storage.exists(pdf_path(self.report)))
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._download(), primeiro)
+        # Só o relatório e os dados extras; anexos e atualizações ficam no PDF gravado
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertIn('reports_report', sql)
+        self.assertNotIn('reports_reportimage', sql)
+        self.assertNotIn('reports_reportupdate', sql)
+
+    def test_changes_render_a_new_version(self):
+        self._download()
+        antigo = pdf_path(self.report)
+
+        ReportImage.objects.create(report=self.report, imagem=_jpeg('novo.jpg'))
+        self.report.refresh_from_db()
+        self.assertNotEqual(pdf_path(self.report), antigo)
+
+        self._download()
+        self.assertTrue(default_storage.exists(pdf_path(self.report)))
+        # Uma requisição concorrente pode ter recebido o caminho antigo e ainda não o abriu
+        self.assertTrue(default_storage.exists(antigo))
+
+        # Passada a idade limite, a próxima versão gravada remove as anteriores
+        ReportImage.objects.create(report=self.report, imagem=_jpeg('outro.jpg'))
+        self.report.refresh_from_db()
+        with override_settings(REPORTS_PDF_OLD_VERSION_AGE=0):
+            self._download()
+        pasta, atual = pdf_path(self.report).rsplit('/', 1)
+        self.assertEqual(default_storage.listdir(pasta)[1], [atual])
+
+    def test_content_changes_bump_only_the_pdf_version(self):
+        editado = self.report.data_atualizacao
+        versao = self.report.pdf_versao
+
+        ReportData.objects.create(report=self.report, field_name='pressao', field_value='3 bar')
+        ReportUpdateImage.objects.create(update=self.report.atualizacoes.first(), imagem=_jpeg('extra.jpg'))
+        self.report.refresh_from_db()
+
+        # data_atualizacao continua sendo a última edição do próprio relatório
+        self.assertEqual(self.report.data_atualizacao, editado)
+        self.assertEqual(self.report.pdf_versao, versao + 2)
+
+    def test_missing_image_file_is_skipped(self):
+        default_storage.delete(self.report.imagem_principal.name)
+        content = self._download()
+        self.assertEqual(len(re.findall(rb'/Subtype /Image', content)), 3)
+
+
+@override_settings(IMAGE_VARIANTS_ASYNC=False)
+class ImageVariantsTest(TestCase):
+    """Variantes WebP/JPEG geradas depois do commit, sem EXIF, e srcset nos templates"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tecnico', email='tecnico@example.com', password='x')
+
+    def setUp(self):
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def _foto_do_celular(self, nome='celular.jpg'):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # girada 90°: a foto em pé é gravada deitada
+        exif[0x010F] = 'Fabricante da câmera'
+        return _jpeg(nome, (2400, 1800), exif=exif.tobytes())
+
+    def _create_report(self, imagem):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Report.objects.create(
+                usuario=self.user, data_ocorrencia=timezone.now(), titulo='Vazamento', descricao='Teste',
+                imagem_principal=imagem,
+            )
+
+    def _render(self, report):
+        template = Template("{% load images %}{% responsive_image report.imagem_principal 'thumb' alt='Foto' %}")
+        return template.render(Context({'report': report}))
+
+    def test_variants_are_oriented_and_stripped(self):
+        report = self._create_report(self._foto_do_celular())
+        report.refresh_from_db()
+        info = report.imagem_principal_info
+
+        self.assertEqual(info['source'], report.imagem_principal.name)
+        self.assertEqual((info['width'], info['height']), (1800, 2400))
+        self.assertEqual(
+            {nome: (v['width'], v['height']) for nome, v in info['variants'].items()},
+            {'thumb': (320, 427), 'detail': (960, 1280), 'lightbox': (1800, 2400)},
+        )
+        for ext, formato in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+            with default_storage.open(info['variants']['detail'][ext]) as file, Image.open(file) as image:
+                self.assertEqual((image.format, image.size), (formato, (960, 1280)))
+                self.assertEqual(len(image.getexif()), 0)
+
+    def test_original_is_stripped_in_place(self):
+        report = self._create_report(self._foto_do_celular())
+        report.refresh_from_db()
+        self.assertEqual(report.imagem_principal_info['source'], report.imagem_principal.name)
+        with report.imagem_principal.open('rb') as file, Image.open(file) as image:
+            # Orientação aplicada nos pixels, já que o EXIF saiu
+            self.assertEqual((image.format, image.size), ('JPEG', (1800, 2400)))
+            self.assertEqual(dict(image.getexif()), {})
+        self.assertFalse(strip_source_metadata(report.imagem_principal))
+
+        info = PngImagePlugin.PngInfo()
+        info.add_text('Location', '-22.9,-47.0')
+        output = BytesIO()
+        Image.new('RGB', (300, 200), (0, 120, 200)).save(output, format='PNG', pnginfo=info)
+        report = self._create_report(ContentFile(output.getvalue(), name='planta.png'))
+        with report.imagem_principal.open('rb') as file, Image.open(file) as image:
+            self.assertEqual((image.format, image.size, image.text), ('PNG', (300, 200), {}))
+
+    def test_small_images_are_not_upscaled(self):
+        report = self._create_report(_jpeg('pequena.jpg', (200, 100)))
+        report.refresh_from_db()
+        variants = report.imagem_principal_info['variants']
+        self.assertEqual({v['width'] for v in variants.values()}, {200})
+        self.assertEqual(len({v['webp'] for v in variants.values()}), 1)
+
+    def test_template_falls_back_to_original_until_processed(self):
+        report = Report.objects.create(
+            usuario=self.user, data_ocorrencia=timezone.now(), titulo='Vazamento', descricao='Teste',
+            imagem_principal=_jpeg('foto.jpg'),
+        )
+        html = self._render(report)
+        self.assertTrue(html.startswith(f'<img src="{report.imagem_principal.url}"'))
+        self.assertIn('loading="lazy"', html)
+
+        process_image('reports.report', report.pk, 'imagem_principal')
+        report.refresh_from_db()
+        html = self._render(report)
+        self.assertTrue(html.startswith('<picture><source type="image/webp" srcset="'))
+        self.assertIn('320w', html)
+        self.assertIn('1920w', html)
+        self.assertIn('width="320" height="240"', html)
+        self.assertNotIn(report.imagem_principal.url + '"', html)
+
+        self.client.force_login(self.user)
+        for url in (reverse('reports:list'), reverse('reports:detail', args=[report.pk])):
+            self.assertContains(self.client.get(url), '<picture><source type="image/webp"')
+
+    def test_replaced_image_gets_new_variants(self):
+        report = self._create_report(_jpeg('antiga.jpg'))
+        report.refresh_from_db()
+        antigas = [v['webp'] for v in report.imagem_principal_info['variants'].values()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            report.imagem_principal = _jpeg('nova.jpg', cor=(0, 0, 255))
+            report.save()
+        report.refresh_from_db()
+        self.assertEqual(report.imagem_principal_info['source'], report.imagem_principal.name)
+        self.assertFalse(any(default_storage.exists(nome) for nome in antigas))
+        # Variantes já geradas para o arquivo atual não são refeitas
+        self.assertIsNone(process_image('reports.report', report.pk, 'imagem_principal'))
+
+    def test_command_processes_pending_images(self):
+        Report.objects.create(
+            usuario=self.user, data_ocorrencia=timezone.now(), titulo='Antigo', descricao='Teste',
+            imagem_principal=_jpeg('antiga.jpg'),
+        )
+        self.user.foto_perfil = _jpeg('perfil.jpg', (600, 600))
+        self.user.save()
+
+        out = StringIO()
+        call_command('process_images', stdout=out)
+        self.assertIn('✅ 2 imagens', out.getvalue())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.foto_perfil_info['variants']['thumb']['width'], 320)
+
+
+@override_settings(UPLOAD_IMAGE_MAX_SIDE=2560)
+class ImageUploadTest(TestCase):
+    """Imagens validadas no upload e reduzidas antes de irem para MEDIA_ROOT"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tecnico', email='tecnico@example.com', password='x')
+
+    def setUp(self):
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.client.force_login(self.user)
+        self.report = Report.objects.create(
+            usuario=self.user, data_ocorrencia=timezone.now(), titulo='Vazamento', descricao='Teste',
+        )
+
+    def _upload(self, arquivo):
+        return self.client.post(reverse('reports:update_status', args=[self.report.pk]), {
+            'progresso_novo': 30,
+            'descricao_atualizacao': 'Foto do local',
+            'imagens-TOTAL_FORMS': 1,
+            'imagens-INITIAL_FORMS': 0,
+            'imagens-0-imagem': arquivo,
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def test_large_photo_is_downscaled_and_stripped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # girada 90°
+        exif[0x010F] = 'Fabricante da câmera'
+        foto = _jpeg('celular.jpeg', (6000, 4500), exif=exif.tobytes())
+
+        self.assertTrue(self._upload(foto).json()['success'])
+        imagem = ReportUpdateImage.objects.get()
+        self.assertTrue(imagem.imagem.name.endswith('.jpg'))
+        with imagem.imagem.open('rb') as file, Image.open(file) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (1920, 2560))
+            self.assertEqual(dict(image.getexif()), {})
+
+    def test_image_within_limit_is_stripped_without_resize(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # girada 90°
+        exif[0x010F] = 'Fabricante da câmera'
+        output = BytesIO()
+        Image.new('RGB', (800, 600), (200, 80, 40)).save(
+            output, format='JPEG', exif=exif.tobytes(), comment=b'-22.9,-47.0',
+        )
+        self.assertTrue(self._upload(ContentFile(output.getvalue(), name='pequena.jpg')).json()['success'])
+        with ReportUpdateImage.objects.get().imagem.open('rb') as file, Image.open(file) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (600, 800)))
+            self.assertEqual(dict(image.getexif()), {})
+            self.assertNotIn('comment', image.info)
+
+    def test_png_within_limit_stays_lossless_without_metadata(self):
+        original = Image.new('RGBA', (800, 600), (0, 120, 200, 128))
+        info = PngImagePlugin.PngInfo()
+        info.add_text('Comment', 'Casa do técnico')
+        output = BytesIO()
+        original.save(output, format='PNG', pnginfo=info)
+        reduced, extensao, _ = downscale_image(BytesIO(output.getvalue()))
+        self.assertEqual(extensao, '.png')
+        with Image.open(reduced) as image:
+            self.assertNotIn('Comment', image.info)
+            self.assertEqual(image.tobytes(), original.tobytes())
+
+    def test_animation_keeps_frames_without_comment(self):
+        quadros = [Image.new('RGB', (40, 30), cor) for cor in ('red', 'green', 'blue')]
+        output = BytesIO()
+        quadros[0].save(output, format='GIF', save_all=True, append_images=quadros[1:], comment=b'-22.9,-47.0')
+        reduced, extensao, content_type = downscale_image(BytesIO(output.getvalue()))
+        self.assertEqual((extensao, content_type), ('.gif', 'image/gif'))
+        with Image.open(reduced) as image:
+            self.assertEqual(image.n_frames, 3)
+            self.assertNotIn('comment', image.info)
+
+    def test_rejected_uploads_are_form_errors(self):
+        casos = [
+            ('assinatura', ContentFile(b'%PDF-1.7 ' * 100, name='foto.jpg'), {}, NOT_AN_IMAGE),
+            ('tamanho', _jpeg('grande.jpg', (600, 400)), {'UPLOAD_IMAGE_MAX_BYTES': 1024}, 'A imagem passa do limite de'),
+            ('resolução', _jpeg('panorama.jpg', (3000, 1000)), {'UPLOAD_IMAGE_MAX_PIXELS': 2_000_000},
+             'limite de 2 megapixels'),
+        ]
+        for caso, arquivo, limites, mensagem in casos:
+            with self.subTest(caso=caso), override_settings(**limites):
+                data = self._upload(arquivo).json()
+                self.assertFalse(data['success'])
+                self.assertIn(mensagem, data['errors']['images'][0]['imagem'][0])
+        self.assertFalse(ReportUpdateImage.objects.exists())
+        self.assertFalse(ReportUpdate.objects.exists())
+
+    def test_transparent_image_stays_png(self):
+        output = BytesIO()
+        Image.new('RGBA', (4000, 1000), (0, 120, 200, 128)).save(output, format='PNG')
+        reduced, extensao, content_type = downscale_image(BytesIO(output.getvalue()), max_side=1000)
+        self.assertEqual((extensao, content_type), ('.png', 'image/png'))
+        with Image.open(reduced) as image:
+            self.assertEqual((image.size, image.mode), ((1000, 250), 'RGBA'))
+
+
+@override_settings(IMAGE_VARIANTS_ASYNC=False)
+class ContentAddressedStorageTest(TestCase):
+    """Fotos gravadas uma vez por conteúdo, referências contadas e coleta dos blobs órfãos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tecnico', email='tecnico@example.com', password='x')
+
+    def setUp(self):
+        self.media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+        self.report = Report.objects.create(
+            usuario=self.user, data_ocorrencia=timezone.now(), titulo='Vazamento', descricao='Teste',
+        )
+        self.update = ReportUpdate.objects.create(
+            report=self.report, usuario=self.user, progresso_anterior=0, progresso_novo=30,
+            status_anterior='pendente', status_novo='em_andamento', descricao_atualizacao='Foto do local',
+        )
+
+    def _blobs(self):
+        return dict(MediaBlob.objects.values_list('nome', 'referencias'))
+
+    def _arquivos(self):
+        return sorted(
+            os.path.relpath(os.path.join(pasta, nome), self.media_root)
+            for pasta, _, nomes in os.walk(self.media_root) for nome in nomes
+        )
+
+    def test_same_photo_is_stored_once(self):
+        foto = _jpeg('IMG_0001.JPG', (800, 600)).read()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.report.imagem_principal.save('capa.jpg', ContentFile(foto))
+            anexo = ReportImage.objects.create(report=self.report, imagem=ContentFile(foto, name='anexo.jpg'))
+            ReportUpdateImage.objects.create(update=self.update, imagem=ContentFile(foto, name='update.jpg'))
+
+        nome = self.report.imagem_principal.name
+        self.assertRegex(nome, r'^reports/blobs/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(ReportImage.objects.get().imagem.name, nome)
+        self.assertEqual(ReportUpdateImage.objects.get().imagem.name, nome)
+        self.assertEqual(self._blobs(), {nome: 3})
+        self.assertEqual([arquivo for arquivo in self._arquivos() if '/variants/' not in arquivo], [nome])
+
+        # Variantes geradas uma vez e compartilhadas; excluir um registro não as apaga
+        anexo.refresh_from_db()
+        self.assertEqual(anexo.imagem_info, Report.objects.get().imagem_principal_info)
+        anexo.delete()
+        self.assertEqual(self._blobs(), {nome: 2})
+        for ext in ('webp', 'jpeg'):
+            self.assertTrue(blob_storage().exists(anexo.imagem_info['variants']['thumb'][ext]))
+
+    def test_references_follow_replacements_and_deletes(self):
+        self.report.imagem_principal.save('a.jpg', _jpeg('a.jpg', (40, 30), cor=(255, 0, 0)))
+        primeira = self.report.imagem_principal.name
+        self.report.imagem_principal.save('b.jpg', _jpeg('b.jpg', (40, 30), cor=(0, 0, 255)))
+        segunda = self.report.imagem_principal.name
+        self.assertEqual(self._blobs(), {primeira: 0, segunda: 1})
+
+        # Salvar só outros campos não mexe nas referências
+        self.report.titulo = 'Vazamento (revisado)'
+        self.report.save(update_fields=['titulo'])
+        ReportUpdateImage.objects.create(update=self.update, imagem=_jpeg('c.jpg', (40, 30), cor=(255, 0, 0)))
+        self.assertEqual(self._blobs(), {primeira: 1, segunda: 1})
+
+        # Excluir o relatório libera a imagem principal e, em cascata, as das atualizações
+        self.report.delete()
+        self.assertEqual(self._blobs(), {primeira: 0, segunda: 0})
+
+    def test_garbage_collection_removes_orphans_in_batches(self):
+        nomes = []
+        for i in range(5):
+            imagem = ReportImage.objects.create(report=self.report, imagem=_jpeg(f'{i}.jpg', (40, 30), cor=(i * 40, 0, 0)))
+            nomes.append(imagem.imagem.name)
+        mantida = nomes.pop()
+        ReportImage.objects.filter(imagem__in=nomes).delete()
+
+        # Dentro da carência nada é removido
+        self.assertEqual(collect_garbage(batch_size=2)[0], 0)
+        with CaptureQueriesContext(connection) as ctx:
+            removidos, liberados = collect_garbage(batch_size=2, grace=timedelta(0))
+        self.assertEqual(removidos, 4)
+        self.assertGreater(liberados, 0)
+        # 4 blobs em lotes de 2
+        self.assertEqual(sum('DELETE FROM "reports_mediablob"' in q['sql'] for q in ctx.captured_queries), 2)
+        self.assertEqual(self._blobs(), {mantida: 1})
+        self.assertEqual(self._arquivos(), [mantida])
+
+    def test_recount_fixes_drift(self):
+        imagem = ReportImage.objects.create(report=self.report, imagem=_jpeg('a.jpg', (40, 30)))
+        nome = imagem.imagem.name
+        # QuerySet.update() não dispara sinais
+        ReportUpdateImage.objects.bulk_create([ReportUpdateImage(update=self.update, imagem=nome)])
+        MediaBlob.objects.filter(nome=nome).update(referencias=7)
+        self.assertEqual(recount_references(), 1)
+        self.assertEqual(self._blobs(), {nome: 2})
+
+        call_command('collect_blobs', '--recount', '--grace-hours', '0', stdout=StringIO())
+        self.assertEqual(self._blobs(), {nome: 2})
+
+
+class ChunkedUploadTest(TestCase):
+    """Upload de fotos em partes, retomável, e uso do id no formulário de atualização"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tecnico', email='tecnico@example.com', password='x')
+        cls.outro = User.objects.create_user(username='outro', email='outro@example.com', password='x')
+
+    def setUp(self):
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.upload_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root, CHUNKED_UPLOAD_DIR=self.upload_dir))
+        self.client.force_login(self.user)
+        self.report = Report.objects.create(
+            usuario=self.user, data_ocorrencia=timezone.now(), titulo='Vazamento', descricao='Teste',
+        )
+
+    def _start(self, nome, tamanho):
+        return self.client.post(
+            reverse('reports:upload_start'), json.dumps({'nome': nome, 'tamanho': tamanho}),
+            content_type='application/json',
+        )
+
+    def _put(self, url, offset, data):
+        return self.client.put(url, data, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset))
+
+    def _upload(self, foto, tamanho_parte=4096):
+        inicio = self._start(foto.name, foto.size).json()
+        conteudo = foto.read()
+        for offset in range(0, len(conteudo), tamanho_parte):
+            self.assertEqual(self._put(inicio['url'], offset, conteudo[offset:offset + tamanho_parte]).status_code, 200)
+        return inicio, self.client.post(reverse('reports:upload_finish', args=[inicio['id']]))
+
+    def test_resumes_from_server_offset_and_attaches_to_update(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # girada 90°
+        exif[0x010F] = 'Fabricante da câmera'
+        conteudo = _jpeg('IMG_0001.JPG', (600, 400), exif=exif.tobytes()).read()
+        inicio = self._start('IMG_0001.JPG', len(conteudo))
+        self.assertEqual(inicio.status_code, 201)
+        url = inicio.json()['url']
+
+        self.assertEqual(self._put(url, 0, conteudo[:1000]).json()['offset'], 1000)
+        # Retentativa de uma parte que já chegou: o servidor diz onde parou
+        repetida = self._put(url, 0, conteudo[:1000])
+        self.assertEqual((repetida.status_code, repetida.json()['offset']), (409, 1000))
+        self.assertEqual(self.client.get(url).json(), {'offset': 1000, 'tamanho': len(conteudo), 'concluido': False})
+
+        self.assertEqual(self._put(url, 1000, conteudo[1000:]).json()['offset'], len(conteudo))
+        fim = self.client.post(reverse('reports:upload_finish', args=[inicio.json()['id']])).json()
+        self.assertTrue(fim['blob'].startswith('reports/blobs/'))
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+        response = self.client.post(reverse('reports:update_status', args=[self.report.pk]), {
+            'progresso_novo': 30,
+            'descricao_atualizacao': 'Fotos do local',
+            'imagens-TOTAL_FORMS': 1,
+            'imagens-INITIAL_FORMS': 0,
+            'imagens-0-upload': fim['id'],
+            'imagens-0-descricao': 'Antes',
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertTrue(response.json()['success'])
+        imagem = ReportUpdateImage.objects.get()
+        self.assertEqual((imagem.imagem.name, imagem.descricao), (fim['blob'], 'Antes'))
+        # Mesmo sem redução a foto é recomprimida: orientada e sem EXIF
+        with imagem.imagem.open('rb') as file:
+            self.assertEqual(file.read(), downscale_image(BytesIO(conteudo))[0].getvalue())
+            file.seek(0)
+            with Image.open(file) as image:
+                self.assertEqual((image.size, dict(image.getexif())), ((400, 600), {}))
+        self.assertEqual(MediaBlob.objects.get(nome=fim['blob']).referencias, 1)
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_finalize_downscales_large_photo(self):
+        inicio, fim = self._upload(_jpeg('grande.jpg', (6000, 4500)))
+        self.assertEqual(fim.status_code, 200)
+        with blob_storage().open(fim.json()['blob']) as file, Image.open(file) as image:
+            self.assertEqual(image.size, (2560, 1920))
+
+    def test_rejections(self):
+        self.assertEqual(self._start('planilha.xlsx', 100).status_code, 400)
+        with override_settings(UPLOAD_IMAGE_MAX_BYTES=1024):
+            self.assertEqual(self._start('foto.jpg', 2048).status_code, 400)
+
+        url = self._start('foto.jpg', 2000).json()['url']
+        self.assertEqual(self._put(url, 0, b'%PDF-1.7' + b' ' * 992).status_code, 400)
+        self.assertEqual(self._put(url, 0, b'\xff\xd8\xff' + b'\0' * 2100).status_code, 400)
+        self.assertEqual(self._put(url, 0, b'\xff\xd8\xff' + b'\0' * 997).json()['offset'], 1000)
+        upload_id = url.rstrip('/').split('/')[-1]
+        # Incompleto, e depois corrompido
+        self.assertIn('Faltam 1000 bytes', self.client.post(reverse('reports:upload_finish', args=[upload_id])).json()['error'])
+        self._put(url, 1000, b'\0' * 1000)
+        self.assertEqual(self.client.post(reverse('reports:upload_finish', args=[upload_id])).status_code, 400)
+
+        # Upload de outro usuário não é visível nem pode ser anexado
+        self.client.force_login(self.outro)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(self.user)
+        inicio, fim = self._upload(_jpeg('a.jpg', (60, 40)))
+        self.client.force_login(self.outro)
+        Report.objects.filter(pk=self.report.pk).update(usuario=self.outro)
+        response = self.client.post(reverse('reports:update_status', args=[self.report.pk]), {
+            'progresso_novo': 30,
+            'descricao_atualizacao': 'Fotos',
+            'imagens-TOTAL_FORMS': 1,
+            'imagens-INITIAL_FORMS': 0,
+            'imagens-0-upload': inicio['id'],
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertIn('upload', response.json()['errors']['images'][0])
+        self.assertFalse(ReportUpdateImage.objects.exists())
+
+    def test_interrupted_chunk_keeps_received_bytes(self):
+        class ConexaoCaiu(BytesIO):
+            def read(self, size=-1):
+                if self.tell() >= 3000:
+                    raise OSError('conexão encerrada')
+                return super().read(min(size, 1000))
+
+        upload = start_upload(self.user, 'a.jpg', 10000)
+        self.assertEqual(append_chunk(upload, 0, ConexaoCaiu(b'\xff\xd8\xff' + b'\0' * 4997), 5000), 3000)
+        upload.refresh_from_db()
+        self.assertEqual(upload.recebido, 3000)
+
+    def test_body_is_read_outside_the_transaction(self):
+        conteudo = _jpeg('IMG_0002.JPG', (60, 40)).read()
+        upload = start_upload(self.user, 'IMG_0002.JPG', len(conteudo))
+        profundidade = len(connection.atomic_blocks)
+        teste = self
+
+        class ClienteLento(BytesIO):
+            def read(self, size=-1):
+                # Nenhuma transação (nem lock da linha) aberta durante a leitura
+                teste.assertEqual(len(connection.atomic_blocks), profundidade)
+                if not self.tell():
+                    # Retentativa da mesma parte chega antes desta terminar
+                    teste.assertEqual(append_chunk(upload, 0, BytesIO(conteudo), len(conteudo)), len(conteudo))
+                return super().read(size)
+
+        with self.assertRaises(OffsetMismatch) as ctx:
+            append_chunk(upload, 0, ClienteLento(b'\xff\xd8\xff' + b'\0' * (len(conteudo) - 3)), len(conteudo))
+        self.assertEqual(ctx.exception.offset, len(conteudo))
+        # Só a parte que avançou o offset ficou na pasta
+        self.assertEqual(os.listdir(self.upload_dir), [f'{upload.pk}.part-0'])
+
+        fim = self.client.post(reverse('reports:upload_finish', args=[upload.pk])).json()
+        with blob_storage().open(fim['blob']) as file:
+            self.assertEqual(file.read(), downscale_image(BytesIO(conteudo))[0].getvalue())
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+
+class InboxTest(TestCase):
+    """Caixa de entrada unificada (notifications_app.inbox) com as duas fontes instaladas"""
+
+    @classmethod
+    def setUpClass(cls):
+        # Os apps de notificação estão fora de INSTALLED_APPS; as tabelas são
+        # criadas antes da transação do TestCase (o SQLite não altera o schema dentro dela)
+        apps = modify_settings(INSTALLED_APPS={'append': ['notifications', 'notifications_app']})
+        apps.enable()
+        cls.addClassCleanup(apps.disable)
+        from notifications.models import Notification
+        from notifications_app import inbox
+        from notifications_app.models import CustomNotification
+        cls.Notification, cls.CustomNotification, cls.inbox = Notification, CustomNotification, inbox
+        with connection.schema_editor() as editor:
+            editor.create_model(Notification)
+            editor.create_model(CustomNotification)
+        cls.addClassCleanup(cls._drop_tables)
+        super().setUpClass()
+
+    @classmethod
+    def _drop_tables(cls):
+        with connection.schema_editor() as editor:
+            editor.delete_model(cls.CustomNotification)
+            editor.delete_model(cls.Notification)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='inbox', email='inbox@example.com', password='x')
+        cls.outro = User.objects.create_user(username='outro', email='outro@example.com', password='x')
+        cls.agora = timezone.now().replace(microsecond=0)
+
+    def _django(self, criada_em, lida=False, user=None):
+        item = self.Notification.objects.create(
+            recipient=user or self.user, actor=self.outro, verb='Relatório atualizado',
+            timestamp=criada_em, unread=not lida,
+        )
+        return criada_em, 'django', item.pk
+
+    def _custom(self, criada_em, lida=False, user=None):
+        item = self.CustomNotification.objects.create(
+            recipient=user or self.user, title='Aviso', message='Manutenção programada', is_read=lida,
+        )
+        # created_at é auto_now_add
+        self.CustomNotification.objects.filter(pk=item.pk).update(created_at=criada_em)
+        return criada_em, 'custom', item.pk
+
+    def _walk(self, per_page):
+        chaves, cursor = [], None
+        while True:
+            page = self.inbox.get_inbox_page(self.user, cursor, per_page=per_page)
+            self.assertLessEqual(len(page.object_list), per_page)
+            chaves += [(item['created_at'], item['type'], item['id']) for item in page.object_list]
+            cursor = page.next_cursor
+            if cursor is None:
+                return chaves
+
+    def test_pages_follow_python_sort(self):
+        esperado = []
+        for i in range(7):
+            esperado.append(self._django(self.agora - timedelta(minutes=3 * i), lida=i % 2 == 0))
+        for i in range(8):
+            esperado.append(self._custom(self.agora - timedelta(minutes=2 * i + 1), lida=i % 3 == 0))
+        # Notificações de outro usuário não aparecem
+        self._django(self.agora, user=self.outro)
+        self._custom(self.agora, user=self.outro)
+
+        esperado.sort(reverse=True)
+        for per_page in (1, 3, 4, 15, 20):
+            with self.subTest(per_page=per_page):
+                self.assertEqual(self._walk(per_page), esperado)
+
+        item = self.inbox.get_inbox_page(self.user, per_page=1).object_list[0]
+        self.assertEqual(set(item), {'type', 'id', 'title', 'message', 'priority', 'is_read', 'created_at'})
+
+    def test_equal_timestamps_across_sources(self):
+        mesmo = self.agora - timedelta(hours=1)
+        esperado = [self._django(mesmo) for _ in range(3)] + [self._custom(mesmo) for _ in range(3)]
+        esperado += [self._django(self.agora), self._custom(self.agora - timedelta(hours=2))]
+        esperado.sort(reverse=True)
+
+        for per_page in (1, 2, 3, 4):
+            with self.subTest(per_page=per_page):
+                chaves = self._walk(per_page)
+                self.assertEqual(chaves, esperado)
+                self.assertEqual(len(set(chaves)), len(esperado))
+        # No mesmo instante: django antes de custom, cada uma por id decrescente
+        empatados = [(tipo, pk) for criada_em, tipo, pk in esperado if criada_em == mesmo]
+        self.assertEqual([tipo for tipo, _ in empatados], ['django'] * 3 + ['custom'] * 3)
+
+    def test_invalid_cursor_returns_first_page(self):
+        for i in range(5):
+            self._django(self.agora - timedelta(minutes=i))
+            self._custom(self.agora - timedelta(minutes=i, seconds=30))
+        primeira = self.inbox.get_inbox_page(self.user, per_page=3)
+        segunda = self.inbox.get_inbox_page(self.user, primeira.next_cursor, per_page=3)
+        self.assertNotEqual(segunda.object_list, primeira.object_list)
+
+        adulterado = primeira.next_cursor[:-2] + ('AA' if not primeira.next_cursor.endswith('AA') else 'BB')
+        de_outro_salt = signing.dumps({'t': self.agora.isoformat(), 'k': 'django', 'id': 1}, compress=True)
+        tipo_invalido = signing.dumps(
+            {'t': self.agora.isoformat(), 'k': 'outro', 'id': 1}, salt=self.inbox.CURSOR_SALT, compress=True,
+        )
+        sem_data = signing.dumps({'t': 'ontem', 'k': 'django', 'id': 1}, salt=self.inbox.CURSOR_SALT)
+        for cursor in ('lixo', adulterado, de_outro_salt, tipo_invalido, sem_data):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(InvalidCursor):
+                    self.inbox._decode(cursor)
+                page = self.inbox.get_inbox_page(self.user, cursor, per_page=3)
+                self.assertEqual(page.object_list, primeira.object_list)
+                # O cursor assinado leva a hora da assinatura; compara a posição
+                self.assertEqual(self.inbox._decode(page.next_cursor), self.inbox._decode(primeira.next_cursor))
+
+    def test_unread_counts_come_from_the_page_query(self):
+        for i in range(4):
+            self._django(self.agora - timedelta(minutes=i), lida=i == 0)
+        for i in range(5):
+            self._custom(self.agora - timedelta(minutes=i, seconds=30), lida=i < 2)
+        self._django(self.agora, user=self.outro)
+        self._custom(self.agora, user=self.outro)
+        esperado = {'django': 3, 'custom': 3, 'total': 6}
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.inbox.unread_counts(self.user), esperado)
+        with self.assertNumQueries(1):
+            page = self.inbox.get_inbox_page(self.user, per_page=4)
+        self.assertEqual(page.unread, esperado)
+        # Páginas seguintes, inclusive a última (incompleta), trazem as mesmas contagens
+        with self.assertNumQueries(1):
+            ultima = self.inbox.get_inbox_page(self.user, page.next_cursor, per_page=5)
+        self.assertIsNone(ultima.next_cursor)
+        self.assertEqual(ultima.unread, esperado)
+
+        # Caixa vazia: a contagem vem da consulta à parte
+        vazio = User.objects.create_user(username='vazio', email='vazio@example.com')
+        with self.assertNumQueries(2):
+            vazia = self.inbox.get_inbox_page(vazio)
+        self.assertEqual(vazia.object_list, [])
+        self.assertEqual(vazia.unread, {'django': 0, 'custom': 0, 'total': 0})
@@ -6,6 +6,7 @@ app_name = 'reports'
 urlpatterns = [
     # Lista e visualização
     path('', views.report_list, name='list'),
+    path('export/<str:formato>/', views.report_export, name='export'),
     path('<int:pk>/', views.report_detail, name='detail'),
     
     # CRUD de relatórios
@@ -30,8 +31,15 @@ urlpatterns = [
     # Analytics
     path('analytics/', views.analytics_dashboard, name='analytics'),
     path('analytics/api/', views.analytics_api, name='analytics_api'),
+    path('analytics/cache/', views.analytics_cache_stats, name='analytics_cache_stats'),
     path('analytics/export/', views.export_analytics, name='export_analytics'),
     
     # APIs
+    path('api/reports/', views.api_report_list, name='api_list'),
+    path('api/reports/bulk-create/', views.api_report_bulk_create, name='api_bulk_create'),
+    path('api/uploads/', views.api_upload_start, name='upload_start'),
+    path('api/uploads/<uuid:upload_id>/', views.api_upload_chunk, name='upload_chunk'),
+    path('api/uploads/<uuid:upload_id>/finalize/', views.api_upload_finish, name='upload_finish'),
+    # Formato antigo, para clientes externos; as telas usam locations:api_equipamentos_por_local
     path('api/equipamentos-por-local/<int:local_id>/', views.api_equipamentos_por_local, name='api_equipamentos_por_local'),
 ] 
\ No newline at end of file
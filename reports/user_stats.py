@@ -0,0 +1,132 @@
+"""
+Manutenção dos contadores por usuário (UserReportStats)
+
+Um relatório ativo conta em ``criados`` (e ``resolvidos``, se resolvido)
+para o autor e em ``atribuidos`` (e ``abertos``, se não resolvido) para o
+responsável. Como no rollup diário, cada save subtrai a contribuição
+anterior e soma a nova dentro de uma transação.
+"""
+
+from django.db import router, transaction
+from django.db.models import Count, F, Q
+
+COUNTERS = ('criados', 'resolvidos', 'atribuidos', 'abertos')
+
+
+def report_contribution(values):
+    """{usuario_id: {contador: n}} com que o relatório entra nas estatísticas"""
+    if values is None or values['deleted_at'] is not None:
+        return {}
+
+    resolvido = values['status'] == 'resolvido'
+    contribution = {}
+    if values['usuario_id'] is not None:
+        contribution[values['usuario_id']] = {'criados': 1, 'resolvidos': int(resolvido)}
+    if values['atribuido_para_id'] is not None:
+        counters = contribution.setdefault(values['atribuido_para_id'], {})
+        counters.update({'atribuidos': 1, 'abertos': int(not resolvido)})
+    return contribution
+
+
+def apply_user_stats_delta(anterior=None, atual=None, using=None):
+    """Subtrai a contribuição `anterior` e soma a `atual` (valores do relatório)"""
+    _apply_deltas(((anterior, -1), (atual, 1)), using)
+
+
+def apply_user_stats_batch(novos, using=None):
+    """Soma a contribuição de vários relatórios recém-criados (criação em lote)"""
+    _apply_deltas(((values, 1) for values in novos), using)
+
+
+def _apply_deltas(contribuicoes, using):
+    from .models import UserReportStats
+
+    deltas = {}
+    for values, sign in contribuicoes:
+        for user_id, counters in report_contribution(values).items():
+            delta = deltas.setdefault(user_id, dict.fromkeys(COUNTERS, 0))
+            for counter, value in counters.items():
+                delta[counter] += sign * value
+
+    deltas = {user_id: delta for user_id, delta in deltas.items() if any(delta.values())}
+    if not deltas:
+        return
+
+    using = using or router.db_for_write(UserReportStats)
+    stats = UserReportStats.objects.using(using)
+    with transaction.atomic(using=using):
+        # Só cria a linha quando algo é somado: exclusões em cascata de um
+        # usuário não recriam as estatísticas dele
+        novos = [user_id for user_id, delta in deltas.items() if any(v > 0 for v in delta.values())]
+        if novos:
+            stats.bulk_create(
+                [UserReportStats(usuario_id=user_id) for user_id in novos], ignore_conflicts=True
+            )
+        for user_id, delta in deltas.items():
+            stats.filter(usuario_id=user_id).update(
+                **{counter: F(counter) + value for counter, value in delta.items() if value}
+            )
+
+
+def compute_user_stats(report_model=None, using='default'):
+    """Contadores corretos calculados a partir dos relatórios, em duas consultas agrupadas"""
+    if report_model is None:
+        from .models import Report as report_model
+
+    reports = report_model._default_manager.using(using).filter(deleted_at__isnull=True).order_by()
+    resolvido = Q(status='resolvido')
+    expected = {}
+
+    for row in reports.filter(usuario__isnull=False).values('usuario_id').annotate(
+        criados=Count('id'), resolvidos=Count('id', filter=resolvido)
+    ):
+        expected.setdefault(row['usuario_id'], dict.fromkeys(COUNTERS, 0)).update(
+            criados=row['criados'], resolvidos=row['resolvidos']
+        )
+
+    for row in reports.filter(atribuido_para__isnull=False).values('atribuido_para_id').annotate(
+        atribuidos=Count('id'), abertos=Count('id', filter=~resolvido)
+    ):
+        expected.setdefault(row['atribuido_para_id'], dict.fromkeys(COUNTERS, 0)).update(
+            atribuidos=row['atribuidos'], abertos=row['abertos']
+        )
+
+    return expected
+
+
+def reconcile_user_stats(report_model=None, stats_model=None, using='default', dry_run=False):
+    """
+    Compara os contadores gravados com os calculados e corrige as diferenças.
+    Aceita os modelos históricos para uso em migrações. Retorna a lista de
+    (usuario_id, gravado, correto) das linhas divergentes.
+    """
+    if stats_model is None:
+        from .models import UserReportStats as stats_model
+
+    expected = compute_user_stats(report_model, using)
+    stats = stats_model._default_manager.using(using)
+    zero = dict.fromkeys(COUNTERS, 0)
+
+    drift = []
+    to_update = []
+    for row in stats.all():
+        stored = {counter: getattr(row, counter) for counter in COUNTERS}
+        correct = expected.pop(row.usuario_id, zero)
+        if stored != correct:
+            drift.append((row.usuario_id, stored, correct))
+            for counter, value in correct.items():
+                setattr(row, counter, value)
+            to_update.append(row)
+
+    # Usuários com relatórios mas ainda sem linha
+    to_create = []
+    for user_id, correct in expected.items():
+        drift.append((user_id, None, correct))
+        to_create.append(stats_model(usuario_id=user_id, **correct))
+
+    if not dry_run:
+        with transaction.atomic(using=using):
+            stats.bulk_update(to_update, COUNTERS, batch_size=1000)
+            stats.bulk_create(to_create, batch_size=1000, ignore_conflicts=True)
+
+    return drift
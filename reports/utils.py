@@ -1,25 +1,35 @@
-from django.http import HttpResponse
-# from reportlab.pdfgen import canvas
-# from reportlab.lib.pagesizes import A4
-# from reportlab.lib import colors
-# from reportlab.lib.styles import getSampleStyleSheet
-# from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse
 from datetime import datetime
 from io import BytesIO
 # import pandas as pd
 
+from .export import EXPORT_FORMATS, export_headers, export_rows, stream_xlsx
+from .models import Report
+from .pdf import get_report_pdf
+
 
 def generate_pdf_report(report_instance, data=None):
-    """Gera um relatório em PDF básico - TEMPORARIAMENTE DESABILITADO"""
-    response = HttpResponse(content_type='text/plain')
-    response['Content-Disposition'] = f'attachment; filename="{report_instance.title}.txt"'
-    response.write("Funcionalidade PDF temporariamente desabilitada")
-    return response
+    """Gera o PDF do relatório, servido do storage se a versão atual já foi renderizada"""
+    path = get_report_pdf(report_instance, data)
+    return FileResponse(
+        default_storage.open(path, 'rb'),
+        as_attachment=True,
+        filename=f'relatorio_{report_instance.pk}.pdf',
+        content_type='application/pdf',
+    )
 
 
 def generate_excel_report(report_instance, data=None):
-    """Gera um relatório em Excel - TEMPORARIAMENTE DESABILITADO"""
-    response = HttpResponse(content_type='text/plain')
-    response['Content-Disposition'] = f'attachment; filename="{report_instance.title}.txt"'
-    response.write("Funcionalidade Excel temporariamente desabilitada")
-    return response 
\ No newline at end of file
+    """Gera um relatório em Excel: uma linha por campo (os da exportação da lista e os dados extras)"""
+    queryset = Report.objects.filter(pk=report_instance.pk)
+    valores = next(export_rows(queryset), [])
+    rows = list(zip(export_headers(), valores))
+    rows.extend((data or {}).items())
+
+    response = HttpResponse(
+        b''.join(stream_xlsx(rows, ['Campo', 'Valor'], sheet_name='Relatório')),
+        content_type=EXPORT_FORMATS['xlsx'][1],
+    )
+    response['Content-Disposition'] = f'attachment; filename="relatorio_{report_instance.pk}.xlsx"'
+    return response
@@ -1,128 +1,68 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from locations.models import Local, Equipamento
 from django.core.paginator import Paginator
 from django.db.models import Q
-from .models import Report, ReportCategory, ReportData, ReportImage, ReportUpdate
+from .models import ChunkedUpload, Report, ReportCategory, ReportData, ReportImage, ReportUpdate
 from .forms import ReportForm, ReportDataForm, ReportImageFormSet, ReportFilterForm, ReportUpdateForm, ReportUpdateImageFormSet
 from .utils import generate_pdf_report, generate_excel_report
+from .pagination import CountedPaginator, KeysetPaginator, InvalidCursor, estimate_count
+from .queries import COMPARISON_STEPS, apply_ordering, build_report_filter, get_report_list_stats
 import json
 from django.db import transaction
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_http_methods, require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Count, Avg
 from django.utils import timezone
-from datetime import timedelta
+from .bulk import build_reports, bulk_create_reports, load_equipamentos, parse_data_ocorrencia
 from .analytics_simple import SimpleDashboardData, SimpleReportAnalytics
+from .encoders import dumps
+from .export import EXPORT_FORMATS, exceeds_xlsx_limit, export_headers, export_rows
+from .sections import is_partial
+from . import cache as analytics_cache
+from .storage import blob_storage
+from .chunked_upload import OffsetMismatch, append_chunk, chunk_size, finish_upload, start_upload
+from core.uploads import UploadRejected
 
 
-@login_required
-def report_list(request):
-    """Lista de relatórios com paginação e filtros avançados"""
-    from datetime import datetime, timedelta
-    from django.utils import timezone
-    
-    # Query base com otimizações
-    reports = Report.objects.select_related('local', 'equipamento', 'usuario').prefetch_related('imagens')
-    
-    # Filtros usando o formulário
+def _get_report_filters(request):
+    """Valida o ReportFilterForm e retorna (form, filtros Q, ordenação, busca)"""
     filter_form = ReportFilterForm(request.GET)
-    
-    # Estatísticas para exibir
-    total_reports = reports.count()
-    
+
     if filter_form.is_valid():
-        status = filter_form.cleaned_data.get('status')
-        prioridade = filter_form.cleaned_data.get('prioridade')
-        search = filter_form.cleaned_data.get('search')
-        data_inicio = filter_form.cleaned_data.get('data_inicio')
-        data_fim = filter_form.cleaned_data.get('data_fim')
-        periodo = filter_form.cleaned_data.get('periodo')
-        local = filter_form.cleaned_data.get('local')
-        equipamento = filter_form.cleaned_data.get('equipamento')
-        usuario = filter_form.cleaned_data.get('usuario')
+        filters = build_report_filter(filter_form.cleaned_data)
         ordenar_por = filter_form.cleaned_data.get('ordenar_por') or '-data_criacao'
-        
-        # Filtros básicos
-    if status:
-        reports = reports.filter(status=status)
-    
-        if prioridade:
-            reports = reports.filter(prioridade=prioridade)
-        
-    if search:
-        reports = reports.filter(
-                Q(titulo__icontains=search) | 
-                Q(descricao__icontains=search) |
-                Q(usuario__first_name__icontains=search) |
-                Q(usuario__last_name__icontains=search) |
-                Q(usuario__username__icontains=search)
-            )
-        
-        if local:
-            reports = reports.filter(local=local)
-        
-        if equipamento:
-            reports = reports.filter(equipamento=equipamento)
-        
-        if usuario:
-            reports = reports.filter(
-                Q(usuario__first_name__icontains=usuario) |
-                Q(usuario__last_name__icontains=usuario) |
-                Q(usuario__username__icontains=usuario)
-            )
-        
-        # Lógica de filtros por data
-        now = timezone.now()
-        today = now.date()
-        
-        if periodo:
-            if periodo == 'hoje':
-                data_inicio = today
-                data_fim = today
-            elif periodo == 'ontem':
-                yesterday = today - timedelta(days=1)
-                data_inicio = yesterday
-                data_fim = yesterday
-            elif periodo == 'ultima_semana':
-                data_inicio = today - timedelta(days=7)
-                data_fim = today
-            elif periodo == 'ultimo_mes':
-                data_inicio = today - timedelta(days=30)
-                data_fim = today
-            elif periodo == 'ultimos_3_meses':
-                data_inicio = today - timedelta(days=90)
-                data_fim = today
-            elif periodo == 'este_ano':
-                data_inicio = today.replace(month=1, day=1)
-                data_fim = today
-        
-        # Aplicar filtros de data
-        if data_inicio:
-            # Converter para datetime para incluir todo o dia
-            data_inicio_dt = timezone.make_aware(
-                datetime.combine(data_inicio, datetime.min.time())
-            )
-            reports = reports.filter(data_ocorrencia__gte=data_inicio_dt)
-        
-        if data_fim:
-            # Converter para datetime para incluir todo o dia
-            data_fim_dt = timezone.make_aware(
-                datetime.combine(data_fim, datetime.max.time())
-            )
-            reports = reports.filter(data_ocorrencia__lte=data_fim_dt)
-        
-        # Aplicar ordenação
-        reports = reports.order_by(ordenar_por)
+        search = filter_form.cleaned_data.get('search')
     else:
         # Ordenação padrão se não há filtros
-        reports = reports.order_by('-data_criacao')
-    
-    # Estatísticas após filtros
-    filtered_count = reports.count()
-    
+        filters = Q()
+        ordenar_por = '-data_criacao'
+        search = ''
+
+    return filter_form, filters, ordenar_por, search
+
+
+@login_required
+def report_list(request):
+    """Lista de relatórios com paginação e filtros avançados"""
+    # Query base com otimizações
+    reports = Report.objects.ativos().select_related('local', 'equipamento', 'usuario').prefetch_related('imagens')
+
+    # Filtros usando o formulário
+    filter_form, filters, ordenar_por, search = _get_report_filters(request)
+
+    reports, ordenar_por = apply_ordering(reports.filter(filters), ordenar_por, search)
+
+    # Total geral, total filtrado e distribuição por status em uma única consulta
+    stats = get_report_list_stats(filters)
+    total_reports = stats['total_reports']
+    filtered_count = stats['filtered_count']
+    status_stats = stats['status_stats']
+
     # Paginação configurável
     items_per_page = request.GET.get('per_page', 12)
     try:
@@ -132,21 +72,22 @@ def report_list(request):
     except (ValueError, TypeError):
         items_per_page = 12
     
-    paginator = Paginator(reports, items_per_page)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Estatísticas por status (para exibir gráficos)
-    status_stats = {
-        'pendente': reports.filter(status='pendente').count(),
-        'em_andamento': reports.filter(status='em_andamento').count(),
-        'resolvido': reports.filter(status='resolvido').count(),
-    }
-    
+    # Paginação por cursor (keyset) quando solicitada; OFFSET caso contrário
+    cursor = request.GET.get('cursor')
+    cursor_mode = request.GET.get('paginacao') == 'cursor' or bool(cursor)
+
+    if cursor_mode:
+        page_obj = KeysetPaginator(reports, items_per_page, ordering=ordenar_por).get_page(cursor)
+    else:
+        paginator = CountedPaginator(reports, items_per_page, count=filtered_count)
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
+
     # Preservar parâmetros de filtro na paginação
     filter_params = request.GET.copy()
-    if 'page' in filter_params:
-        del filter_params['page']
+    for param in ('page', 'cursor'):
+        if param in filter_params:
+            del filter_params[param]
     
     context = {
         'page_obj': page_obj,
@@ -156,6 +97,7 @@ def report_list(request):
         'status_stats': status_stats,
         'filter_params': filter_params.urlencode(),
         'items_per_page': items_per_page,
+        'cursor_mode': cursor_mode,
         'current_filters': {
             'status': filter_form.cleaned_data.get('status') if filter_form.is_valid() else '',
             'search': filter_form.cleaned_data.get('search') if filter_form.is_valid() else '',
@@ -166,6 +108,28 @@ def report_list(request):
     return render(request, 'reports/report_list.html', context)
 
 
+@login_required
+def report_export(request, formato):
+    """Exporta a lista filtrada (mesmos parâmetros da report_list) em CSV ou XLSX, por streaming"""
+    if formato not in EXPORT_FORMATS:
+        return JsonResponse({'error': 'Formato não suportado'}, status=400)
+
+    _, filters, ordenar_por, search = _get_report_filters(request)
+    reports, _ = apply_ordering(Report.objects.ativos().filter(filters), ordenar_por, search)
+
+    if formato == 'xlsx' and exceeds_xlsx_limit(reports):
+        messages.error(request, 'O resultado passa do limite de linhas do Excel; exporte em CSV ou refine os filtros.')
+        return redirect(f"{reverse('reports:list')}?{request.GET.urlencode()}")
+
+    stream, content_type = EXPORT_FORMATS[formato]
+    response = StreamingHttpResponse(stream(export_rows(reports), export_headers()), content_type=content_type)
+    timestamp = timezone.localtime().strftime('%Y%m%d_%H%M')
+    response['Content-Disposition'] = f'attachment; filename="relatorios_{timestamp}.{formato}"'
+    # Sem buffer no proxy: o download começa com o primeiro bloco
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 def report_detail(request, pk):
     """Detalhes do relatório"""
@@ -223,6 +187,7 @@ def report_create(request):
                     # Tem fotos e progresso intermediário = em andamento
                     report.status = 'em_andamento'
             
+            report.atualizar_marcos(resposta=report.progresso > 0)
             report.save()
             
             # Salvar imagens adicionais
@@ -273,6 +238,9 @@ def report_edit(request, pk):
                 elif updated_report.progresso > 0 and updated_report.status == 'pendente':
                     updated_report.status = 'em_andamento'
             
+            updated_report.atualizar_marcos(
+                resposta=updated_report.progresso > 0 or updated_report.status != 'pendente'
+            )
             updated_report.save()
             image_formset.save()
             messages.success(request, 'Relatório atualizado com sucesso!')
@@ -415,34 +383,92 @@ def dashboard_reports(request):
 
 @login_required
 def api_equipamentos_por_local(request, local_id):
-    """API para retornar equipamentos de um local específico"""
-    try:
-        local = get_object_or_404(Local, pk=local_id)
-        equipamentos = Equipamento.objects.filter(
-            local=local, 
-            ativo=True
-        ).order_by('nome')
-        
-        equipamentos_data = [
+    """
+    API antiga de equipamentos de um local, mantida com o formato original
+    para clientes externos. As telas do sistema usam o endpoint compacto
+    com ETag (locations:api_equipamentos_por_local).
+    """
+    if not Local.objects.filter(pk=local_id).exists():
+        return JsonResponse({
+            'success': False,
+            'error': 'Local não encontrado'
+        })
+    
+    labels = dict(Equipamento.TIPO_CHOICES)
+    equipamentos = Equipamento.objects.filter(
+        local_id=local_id,
+        ativo=True
+    ).order_by('nome').values_list('id', 'nome', 'codigo', 'tipo')
+    
+    return JsonResponse({
+        'success': True,
+        'equipamentos': [
             {
-                'id': eq.id,
-                'nome': eq.nome,
-                'codigo': eq.codigo,
-                'tipo': eq.get_tipo_display() if eq.tipo else 'Não informado'
+                'id': pk,
+                'nome': nome,
+                'codigo': codigo,
+                'tipo': labels.get(tipo, tipo) if tipo else 'Não informado'
             }
-            for eq in equipamentos
+            for pk, nome, codigo, tipo in equipamentos
         ]
-        
-        return JsonResponse({
-            'success': True,
-            'equipamentos': equipamentos_data
-        })
-        
-    except Exception as e:
+    })
+
+
+@login_required
+def api_report_list(request):
+    """API de relatórios paginada por cursor, com os mesmos filtros da listagem"""
+    _, filters, ordenar_por, search = _get_report_filters(request)
+    reports = Report.objects.ativos().select_related('local', 'equipamento', 'usuario').filter(filters)
+    reports, ordenar_por = apply_ordering(reports, ordenar_por, search)
+
+    try:
+        per_page = min(max(int(request.GET.get('per_page', 20)), 1), 100)
+    except (ValueError, TypeError):
+        per_page = 20
+
+    paginator = KeysetPaginator(reports, per_page, ordering=ordenar_por)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
         return JsonResponse({
             'success': False,
-            'error': str(e)
-        })
+            'error': 'Cursor inválido'
+        }, status=400)
+
+    data = {
+        'success': True,
+        'reports': [
+            {
+                'id': report.id,
+                'titulo': report.titulo,
+                'status': report.status,
+                'status_display': report.get_status_display(),
+                'prioridade': report.prioridade,
+                'progresso': report.progresso,
+                'local': report.local.nome if report.local else None,
+                'equipamento': report.equipamento.nome if report.equipamento else None,
+                'autor': report.usuario.get_full_name(),
+                'data_ocorrencia': report.data_ocorrencia.isoformat(),
+                'data_criacao': report.data_criacao.isoformat(),
+                'url': report.get_absolute_url(),
+            }
+            for report in page
+        ],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }
+
+    # Total opcional: exato (COUNT completo) ou estimado (COUNT limitado + planejador)
+    total_mode = request.GET.get('total')
+    if total_mode == 'exato':
+        data['total'] = reports.count()
+        data['total_estimado'] = False
+    elif total_mode == 'estimado':
+        total, exact = estimate_count(reports)
+        data['total'] = total
+        data['total_estimado'] = not exact
+
+    return JsonResponse(data)
 
 
 @login_required
@@ -496,7 +522,6 @@ def report_bulk_create(request):
         descricao = request.POST.get('descricao')
         local_id = request.POST.get('local')
         prioridade = request.POST.get('prioridade')
-        data_ocorrencia = request.POST.get('data_ocorrencia')
         
         # Lista de equipamentos selecionados
         equipamentos_ids = request.POST.getlist('equipamentos')
@@ -510,30 +535,26 @@ def report_bulk_create(request):
         
         try:
             local = Local.objects.get(id=local_id)
-            created_reports = []
-            
+            data_ocorrencia = parse_data_ocorrencia(request.POST.get('data_ocorrencia'))
+            equipamentos, invalidos = load_equipamentos(local, equipamentos_ids)
+            if invalidos:
+                raise ValueError(f'{len(invalidos)} equipamentos não pertencem ao local selecionado')
+
+            reports = build_reports(
+                # Sem repetir equipamento: "5" e "05" são o mesmo id
+                [equipamentos[pk] for pk in dict.fromkeys(map(int, equipamentos_ids))],
+                titulo_base, request.user, local,
+                descricao=descricao, prioridade=prioridade, data_ocorrencia=data_ocorrencia,
+            )
+            criados = 0
+            # Tudo ou nada: um lote com erro desfaz os anteriores
             with transaction.atomic():
-                for equipamento_id in equipamentos_ids:
-                    equipamento = Equipamento.objects.get(id=equipamento_id)
-                    
-                    # Criar relatório individual
-                    report = Report.objects.create(
-                        titulo=f"{titulo_base} - {equipamento.nome}",
-                        descricao=descricao,
-                        local=local,
-                        equipamento=equipamento,
-                        usuario=request.user,
-                        prioridade=prioridade,
-                        data_ocorrencia=data_ocorrencia,
-                        status='pendente',
-                        progresso=0,
-                        editavel=True
-                    )
-                    created_reports.append(report)
+                for criados, _ in bulk_create_reports(reports):
+                    pass
             
             messages.success(
                 request, 
-                f'{len(created_reports)} relatórios criados com sucesso!'
+                f'{criados} relatórios criados com sucesso!'
             )
             return redirect('reports:list')
             
@@ -546,6 +567,139 @@ def report_bulk_create(request):
     })
 
 
+@login_required
+@require_POST
+def api_report_bulk_create(request):
+    """
+    Cria relatórios em lote a partir de JSON e transmite o progresso.
+
+    Corpo: {"titulo_base", "descricao", "local", "prioridade",
+    "data_ocorrencia", "equipamentos": [ids]}. Erros de validação voltam
+    com 400 antes de gravar qualquer coisa; depois disso a resposta é NDJSON,
+    uma linha {"criados", "total"} por lote e uma final com "concluido".
+    """
+    try:
+        dados = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    if not isinstance(dados, dict):
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+
+    erros = {}
+    for campo in ('titulo_base', 'descricao'):
+        valor = dados.get(campo)
+        if valor is not None and not isinstance(valor, str):
+            erros[campo] = 'Informe um texto'
+        elif not (valor or '').strip():
+            erros[campo] = 'Campo obrigatório'
+    prioridade = dados.get('prioridade') or 'media'
+    if prioridade not in dict(Report.PRIORIDADE_CHOICES):
+        erros['prioridade'] = 'Prioridade inválida'
+    try:
+        data_ocorrencia = parse_data_ocorrencia(dados.get('data_ocorrencia'))
+    except ValueError as e:
+        erros['data_ocorrencia'] = str(e)
+
+    equipamentos_ids = dados.get('equipamentos')
+    limite = getattr(settings, 'REPORTS_BULK_MAX_TARGETS', 50000)
+    if not isinstance(equipamentos_ids, list) or not equipamentos_ids:
+        erros['equipamentos'] = 'Informe a lista de equipamentos'
+    elif len(equipamentos_ids) > limite:
+        erros['equipamentos'] = f'No máximo {limite} equipamentos por requisição'
+
+    local = Local.objects.filter(pk=dados.get('local')).first() if str(dados.get('local', '')).isdigit() else None
+    if local is None:
+        erros['local'] = 'Local não encontrado'
+    if erros:
+        return JsonResponse({'errors': erros}, status=400)
+
+    equipamentos, invalidos = load_equipamentos(local, equipamentos_ids)
+    if invalidos:
+        return JsonResponse({
+            'errors': {'equipamentos': 'Equipamentos inexistentes ou de outro local'},
+            'invalidos': invalidos[:100],
+        }, status=400)
+
+    reports = build_reports(
+        # Sem repetir equipamento: 5 e "5" são o mesmo id
+        [equipamentos[pk] for pk in dict.fromkeys(map(int, equipamentos_ids))],
+        dados['titulo_base'].strip(), request.user, local,
+        descricao=dados['descricao'], prioridade=prioridade, data_ocorrencia=data_ocorrencia,
+    )
+
+    def progresso():
+        criados = 0
+        try:
+            for criados, total in bulk_create_reports(reports):
+                yield dumps({'criados': criados, 'total': total}) + b'\n'
+        except Exception as e:
+            # Os lotes anteriores já foram gravados
+            yield dumps({'concluido': False, 'criados': criados, 'error': str(e)}) + b'\n'
+            return
+        yield dumps({'concluido': True, 'criados': criados}) + b'\n'
+
+    return StreamingHttpResponse(progresso(), content_type='application/x-ndjson')
+
+
+@login_required
+@require_POST
+def api_upload_start(request):
+    """Inicia um upload em partes: corpo JSON {"nome", "tamanho"} (ver reports.chunked_upload)"""
+    try:
+        dados = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    if not isinstance(dados, dict):
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    try:
+        upload = start_upload(request.user, dados.get('nome'), dados.get('tamanho'))
+    except UploadRejected as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({
+        'id': str(upload.pk),
+        'offset': 0,
+        'chunk_size': chunk_size(),
+        'url': reverse('reports:upload_chunk', args=[upload.pk]),
+    }, status=201)
+
+
+@login_required
+@require_http_methods(['GET', 'HEAD', 'PUT'])
+def api_upload_chunk(request, upload_id):
+    """Offset atual do upload (GET) ou acréscimo de uma parte a partir de Upload-Offset (PUT)"""
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, usuario=request.user)
+    if request.method != 'PUT':
+        return JsonResponse({
+            'offset': upload.recebido, 'tamanho': upload.tamanho, 'concluido': upload.status == 'concluido',
+        })
+
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return JsonResponse({'error': 'Informe Upload-Offset e Content-Length'}, status=400)
+    try:
+        # O corpo é lido direto do socket, em blocos, sem passar por request.body
+        recebido = append_chunk(upload, offset, request, length)
+    except OffsetMismatch as e:
+        return JsonResponse({'error': str(e), 'offset': e.offset}, status=409)
+    except UploadRejected as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'offset': recebido, 'tamanho': upload.tamanho})
+
+
+@login_required
+@require_POST
+def api_upload_finish(request, upload_id):
+    """Finaliza o upload: valida, reduz e grava a foto; o id passa a valer no formulário de atualização"""
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, usuario=request.user)
+    try:
+        upload = finish_upload(upload)
+    except UploadRejected as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'id': str(upload.pk), 'blob': upload.blob, 'url': blob_storage().url(upload.blob)})
+
+
 @login_required
 def report_update_status(request, pk):
     """Atualizar status e progresso do relatório via modal"""
@@ -573,7 +727,7 @@ def report_update_status(request, pk):
     
     if request.method == 'POST':
         form = ReportUpdateForm(request.POST, report=report, user=request.user)
-        image_formset = ReportUpdateImageFormSet(request.POST, request.FILES)
+        image_formset = ReportUpdateImageFormSet(request.POST, request.FILES, form_kwargs={'usuario': request.user})
         
         if form.is_valid() and image_formset.is_valid():
             try:
@@ -608,6 +762,7 @@ def report_update_status(request, pk):
                     # Atualizar o relatório principal
                     report.progresso = novo_progresso
                     report.status = novo_status
+                    report.atualizar_marcos(resposta=True, agora=update.data_atualizacao)
                     report.save()
                     
                     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -677,160 +832,131 @@ def report_update_status(request, pk):
     }) 
 
 
+# Períodos aceitos pelo analytics; qualquer outro valor vira o padrão, para
+# não criar chaves de cache (e nomes de arquivo) a partir da query string
+ANALYTICS_PERIODS = [
+    ('7d', 'Últimos 7 dias'),
+    ('30d', 'Últimos 30 dias'),
+    ('90d', 'Últimos 90 dias'),
+    ('365d', 'Último ano'),
+]
+DEFAULT_ANALYTICS_PERIOD = '30d'
+
+# Agrupamentos aceitos em chart=timeline
+TIMELINE_GROUPS = ('day', 'week', 'month', 'year')
+
+
+def _analytics_period(request):
+    period = request.GET.get('period', DEFAULT_ANALYTICS_PERIOD)
+    return period if period in dict(ANALYTICS_PERIODS) else DEFAULT_ANALYTICS_PERIOD
+
+
+def _dashboard_payload(user, period):
+    """JSON completo do dashboard de analytics, servido do cache quando possível"""
+    def build():
+        dashboard = SimpleDashboardData(user=user, period=period)
+        data = dashboard.get_complete_dashboard_data()
+        payload = dumps(data)
+        if is_partial(data['sections']):
+            return analytics_cache.PartialPayload(payload)
+        return payload
+    
+    return analytics_cache.get_or_build('dashboard', period, user, build)
+
+
 @login_required
 def analytics_dashboard(request):
     """Dashboard de analytics inteligente para relatórios"""
     
     # Obter período selecionado
-    period = request.GET.get('period', '30d')
-    
-    # Criar instância do dashboard
-    dashboard = SimpleDashboardData(user=request.user, period=period)
-    
-    # Obter todos os dados
-    data = dashboard.get_complete_dashboard_data()
-    
-    # Serializar dados para JSON de forma segura
-    import json
-    from django.core.serializers.json import DjangoJSONEncoder
-    from decimal import Decimal
-    from datetime import datetime, date, timedelta
-    
-    def safe_serialize(obj):
-        """Função para serializar objetos de forma segura, evitando referências circulares"""
-        if hasattr(obj, 'isoformat'):
-            return obj.isoformat()
-        elif isinstance(obj, Decimal):
-            return float(obj)
-        elif hasattr(obj, '__dict__'):
-            # Para objetos complexos, retornar apenas valores básicos
-            return str(obj)
-        return obj
-    
-    # Criar uma cópia limpa dos dados para serialização
-    clean_data = {}
-    
-    # Processar cada seção dos dados
-    for key, value in data.items():
-        if key == 'date_range':
-            # Converter range de datas para strings
-            if isinstance(value, tuple) and len(value) == 2:
-                clean_data[key] = [
-                    value[0].isoformat() if hasattr(value[0], 'isoformat') else str(value[0]),
-                    value[1].isoformat() if hasattr(value[1], 'isoformat') else str(value[1])
-                ]
-            else:
-                clean_data[key] = str(value)
-        elif key == 'timeline':
-            # Processar dados de timeline
-            clean_timeline = []
-            if isinstance(value, list):
-                for item in value:
-                    if isinstance(item, dict):
-                        clean_item = {}
-                        for k, v in item.items():
-                            if k == 'periodo':
-                                clean_item[k] = v.isoformat() if hasattr(v, 'isoformat') else str(v)
-                            else:
-                                clean_item[k] = safe_serialize(v)
-                        clean_timeline.append(clean_item)
-            clean_data[key] = clean_timeline
-        elif isinstance(value, list):
-            # Processar listas (como priority_distribution, location_performance, etc.)
-            clean_list = []
-            for item in value:
-                if isinstance(item, dict):
-                    clean_item = {}
-                    for k, v in item.items():
-                        clean_item[k] = safe_serialize(v)
-                    clean_list.append(clean_item)
-                else:
-                    clean_list.append(safe_serialize(item))
-            clean_data[key] = clean_list
-        elif isinstance(value, dict):
-            # Processar dicionários
-            clean_dict = {}
-            for k, v in value.items():
-                clean_dict[k] = safe_serialize(v)
-            clean_data[key] = clean_dict
-        else:
-            # Valores simples
-            clean_data[key] = safe_serialize(value)
+    period = _analytics_period(request)
     
-    # Serializar para JSON
-    try:
-        dashboard_data_json = json.dumps(clean_data, ensure_ascii=False, indent=2)
-    except Exception as e:
-        # Fallback: criar estrutura mínima
-        print(f"Erro na serialização: {e}")
-        fallback_data = {
-            'overview': data.get('overview', {}),
-            'timeline': [],
-            'priority_distribution': [],
-            'location_performance': [],
-            'equipment_issues': [],
-            'period': period
-        }
-        dashboard_data_json = json.dumps(fallback_data, ensure_ascii=False)
+    # JSON já serializado (cache por período, escopo e versão dos dados)
+    payload = _dashboard_payload(request.user, period)
+    dashboard_data_json = payload.decode('utf-8')
     
     # Adicionar dados específicos para o template
     context = {
-        'dashboard_data': data,
+        'dashboard_data': json.loads(dashboard_data_json),
         'dashboard_data_json': dashboard_data_json,
         'period': period,
-        'period_options': [
-            ('7d', 'Últimos 7 dias'),
-            ('30d', 'Últimos 30 dias'),
-            ('90d', 'Últimos 90 dias'),
-            ('365d', 'Último ano'),
-        ],
+        'period_options': ANALYTICS_PERIODS,
         'user_is_staff': request.user.is_staff,
     }
     
     return render(request, 'reports/analytics_dashboard.html', context)
 
 
+# Gráficos servidos por analytics_api e o método que gera cada um
+ANALYTICS_CHARTS = {
+    'overview': 'get_overview_stats',
+    'priority': 'get_priority_distribution',
+    'timeline': 'get_timeline_data',
+    'locations': 'get_location_performance',
+    'equipment': 'get_equipment_issues',
+    'resolution': 'get_resolution_time_stats',
+    'trends': 'get_trends_analysis',
+}
+
+# Limite de janelas de comparação aceitas em chart=trends
+MAX_TREND_WINDOWS = 12
+
+
 @login_required
 def analytics_api(request):
     """API para dados de analytics em tempo real"""
     
-    period = request.GET.get('period', '30d')
+    period = _analytics_period(request)
     chart_type = request.GET.get('chart', 'overview')
     
-    analytics = SimpleReportAnalytics(
-        user=request.user,
-        date_range=SimpleDashboardData(period=period)._get_date_range(period)
-    )
+    if chart_type not in ANALYTICS_CHARTS:
+        return JsonResponse({})
     
-    data = {}
-    
-    if chart_type == 'overview':
-        data = analytics.get_overview_stats()
-    elif chart_type == 'priority':
-        data = analytics.get_priority_distribution()
-    elif chart_type == 'timeline':
+    # Argumentos do gráfico; entram também na chave do cache
+    args = []
+    if chart_type == 'timeline':
         group_by = request.GET.get('group_by', 'day')
-        data = analytics.get_timeline_data(group_by)
-    elif chart_type == 'locations':
-        data = analytics.get_location_performance()
-    elif chart_type == 'equipment':
-        data = analytics.get_equipment_issues()
-    
-    return JsonResponse(data, safe=False)
+        args = [group_by if group_by in TIMELINE_GROUPS else 'day']
+    elif chart_type == 'trends':
+        # ?windows=N&step=period|week|month|year
+        try:
+            janelas = min(max(int(request.GET.get('windows', 2)), 2), MAX_TREND_WINDOWS)
+        except ValueError:
+            janelas = 2
+        passo = request.GET.get('step', 'period')
+        if passo not in COMPARISON_STEPS:
+            return JsonResponse({'error': f'Passo inválido: {passo}'}, status=400)
+        args = [janelas, passo]
+    
+    def build():
+        analytics = SimpleReportAnalytics(
+            user=request.user,
+            date_range=SimpleDashboardData(period=period)._get_date_range(period)
+        )
+        return dumps(getattr(analytics, ANALYTICS_CHARTS[chart_type])(*args))
+    
+    name = ':'.join(['chart', chart_type] + [str(arg) for arg in args])
+    payload = analytics_cache.get_or_build(name, period, request.user, build)
+    return HttpResponse(payload, content_type='application/json')
+
+
+@login_required
+def analytics_cache_stats(request):
+    """Contadores do cache de analytics (apenas staff)"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Permissão negada'}, status=403)
+    return JsonResponse({'success': True, 'stats': analytics_cache.get_cache_stats()})
 
 
 @login_required
 def export_analytics(request):
     """Exportar dados de analytics"""
     
-    period = request.GET.get('period', '30d')
+    period = _analytics_period(request)
     format_type = request.GET.get('format', 'json')
     
-    dashboard = SimpleDashboardData(user=request.user, period=period)
-    data = dashboard.get_complete_dashboard_data()
-    
     if format_type == 'json':
-        response = JsonResponse(data)
+        response = HttpResponse(_dashboard_payload(request.user, period), content_type='application/json')
         response['Content-Disposition'] = f'attachment; filename="analytics_{period}.json"'
         return response
     
@@ -0,0 +1,168 @@
+// Autocomplete dos selects com data-autocomplete-url (core/autocomplete.py)
+// O servidor renderiza só a opção selecionada; as demais são buscadas por
+// prefixo, página a página, quando o usuário abre o select ou digita na busca.
+(function() {
+    const MAIS = '__mais__';
+    const DEBOUNCE_MS = 250;
+
+    function paramName(forwardId) {
+        return forwardId.replace(/^id_/, '');
+    }
+
+    function setupAutocomplete(select) {
+        const url = select.dataset.autocompleteUrl;
+        const forwardId = select.dataset.autocompleteForward;
+        const forward = forwardId ? document.getElementById(forwardId) : null;
+        const emptyOption = select.querySelector('option[value=""]');
+
+        const busca = document.createElement('input');
+        busca.type = 'search';
+        busca.className = 'form-control form-control-sm mb-1';
+        busca.placeholder = 'Digite para buscar...';
+        busca.setAttribute('aria-label', 'Buscar opções');
+        select.parentNode.insertBefore(busca, select);
+
+        let pagina = 0;
+        let carregado = false;
+        let controller = null;
+        let timer = null;
+
+        function resetOptions() {
+            const selecionada = select.selectedOptions[0];
+            select.innerHTML = '';
+            if (emptyOption) select.appendChild(emptyOption);
+            if (selecionada && selecionada.value && selecionada.value !== MAIS) {
+                select.appendChild(selecionada);
+                selecionada.selected = true;
+            }
+        }
+
+        function appendOption(value, text) {
+            value = String(value);
+            if (select.querySelector(`option[value="${value}"]`)) return;
+            const option = document.createElement('option');
+            option.value = value;
+            option.textContent = text;
+            select.appendChild(option);
+        }
+
+        // Lista completa do valor de `forward` (ex.: equipamentos do local),
+        // revalidada pelo navegador com If-None-Match; o prefixo é filtrado aqui
+        const scopedUrl = select.dataset.autocompleteScopedUrl;
+        let lista = null;
+        let listaUrl = null;
+
+        function loadScoped() {
+            const listUrl = scopedUrl.replace('{id}', encodeURIComponent(forward.value));
+            const pronto = listaUrl === listUrl ? Promise.resolve(lista) : fetch(listUrl, {
+                signal: controller.signal, headers: { 'Accept': 'application/json' }
+            })
+                .then(response => {
+                    if (!response.ok) throw new Error(response.statusText);
+                    return response.json();
+                })
+                .then(data => {
+                    const idx = Object.fromEntries(data.campos.map((campo, i) => [campo, i]));
+                    lista = data.equipamentos.map(row => ({
+                        id: row[idx.id],
+                        nome: row[idx.nome],
+                        codigo: row[idx.codigo],
+                    }));
+                    listaUrl = listUrl;
+                    return lista;
+                });
+
+            return pronto
+                .then(itens => {
+                    const termo = busca.value.trim().toLocaleUpperCase();
+                    resetOptions();
+                    itens
+                        .filter(item => !termo
+                            || item.nome.toLocaleUpperCase().startsWith(termo)
+                            || item.codigo.toLocaleUpperCase().startsWith(termo))
+                        .forEach(item => appendOption(item.id, `${item.nome} (${item.codigo})`));
+                    carregado = true;
+                })
+                .catch(error => {
+                    if (error.name !== 'AbortError') console.error('Erro ao carregar opções:', error);
+                });
+        }
+
+        function load(append) {
+            if (controller) controller.abort();
+            controller = new AbortController();
+            if (scopedUrl && forward && forward.value) return loadScoped();
+
+            const params = new URLSearchParams(select.dataset.autocompleteParams || '');
+            params.set('q', busca.value.trim());
+            params.set('page', append ? pagina + 1 : 1);
+            if (forward && forward.value) params.set(paramName(forwardId), forward.value);
+
+            return fetch(`${url}?${params}`, { signal: controller.signal, headers: { 'Accept': 'application/json' } })
+                .then(response => {
+                    if (!response.ok) throw new Error(response.statusText);
+                    return response.json();
+                })
+                .then(data => {
+                    if (!append) resetOptions();
+                    const mais = select.querySelector(`option[value="${MAIS}"]`);
+                    if (mais) mais.remove();
+
+                    data.results.forEach(item => appendOption(item.id, item.text));
+                    if (data.has_more) {
+                        const option = document.createElement('option');
+                        option.value = MAIS;
+                        option.textContent = 'Carregar mais...';
+                        select.appendChild(option);
+                    }
+                    pagina = append ? pagina + 1 : 1;
+                    carregado = true;
+                })
+                .catch(error => {
+                    if (error.name !== 'AbortError') console.error('Erro ao carregar opções:', error);
+                });
+        }
+
+        function ensureLoaded() {
+            if (!carregado) load(false);
+        }
+
+        select.addEventListener('focus', ensureLoaded);
+        select.addEventListener('mousedown', ensureLoaded);
+        busca.addEventListener('focus', ensureLoaded);
+        busca.addEventListener('input', function() {
+            clearTimeout(timer);
+            timer = setTimeout(() => load(false), DEBOUNCE_MS);
+        });
+
+        let anterior = select.value;
+        select.addEventListener('change', function(e) {
+            if (select.value === MAIS) {
+                e.stopImmediatePropagation();
+                select.value = anterior;
+                load(true);
+                return;
+            }
+            anterior = select.value;
+        });
+
+        if (forward) {
+            // Trocar o local invalida o equipamento escolhido
+            forward.addEventListener('change', function() {
+                if (forward.value === MAIS) return;
+                select.value = '';
+                anterior = '';
+                busca.value = '';
+                carregado = false;
+                // Revalida a lista a cada troca (304 se nada mudou)
+                listaUrl = null;
+                resetOptions();
+                if (forward.value) load(false);
+            });
+        }
+    }
+
+    document.addEventListener('DOMContentLoaded', function() {
+        document.querySelectorAll('select[data-autocomplete-url]').forEach(setupAutocomplete);
+    });
+})();
@@ -0,0 +1,123 @@
+// chunked_upload.js - Envio de fotos em partes, retomável (API /reports/api/uploads/)
+//
+// Cada foto é enviada em partes (PUT com Upload-Offset). Se a conexão cair,
+// o envio consulta o offset que o servidor já tem e continua dali, sem
+// reenviar o que já chegou. Ao final, devolve o id do upload, que o
+// formulário de atualização recebe no lugar do arquivo.
+
+window.ChunkedUpload = (function() {
+    const START_URL = '/reports/api/uploads/';
+    const MAX_TENTATIVAS = 8;
+
+    function csrfToken() {
+        const input = document.querySelector('input[name=csrfmiddlewaretoken]');
+        if (input) {
+            return input.value;
+        }
+        const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+        return match ? decodeURIComponent(match[1]) : '';
+    }
+
+    function esperar(ms) {
+        return new Promise(resolve => setTimeout(resolve, ms));
+    }
+
+    async function lerJson(response) {
+        const data = await response.json().catch(() => ({}));
+        if (!response.ok && response.status !== 409) {
+            const erro = new Error(data.error || ('Erro HTTP: ' + response.status));
+            // 4xx: o servidor recusou; repetir não adianta
+            erro.definitivo = response.status >= 400 && response.status < 500;
+            throw erro;
+        }
+        return data;
+    }
+
+    // Repete em falha de rede ou 5xx, com espera crescente
+    async function comRetentativas(funcao) {
+        for (let tentativa = 1; ; tentativa++) {
+            try {
+                return await funcao();
+            } catch (erro) {
+                if (erro.definitivo || tentativa >= MAX_TENTATIVAS) {
+                    throw erro;
+                }
+                await esperar(Math.min(1000 * 2 ** (tentativa - 1), 30000));
+            }
+        }
+    }
+
+    async function upload(file, onProgress) {
+        const headers = {'X-CSRFToken': csrfToken(), 'X-Requested-With': 'XMLHttpRequest'};
+        const inicio = await comRetentativas(async () => lerJson(await fetch(START_URL, {
+            method: 'POST',
+            headers: Object.assign({'Content-Type': 'application/json'}, headers),
+            body: JSON.stringify({nome: file.name, tamanho: file.size}),
+        })));
+
+        let offset = inicio.offset;
+        while (offset < file.size) {
+            const parte = file.slice(offset, offset + inicio.chunk_size);
+            offset = await comRetentativas(async () => {
+                try {
+                    const data = await lerJson(await fetch(inicio.url, {
+                        method: 'PUT',
+                        headers: Object.assign({
+                            'Content-Type': 'application/offset+octet-stream',
+                            'Upload-Offset': String(offset),
+                        }, headers),
+                        body: parte,
+                    }));
+                    // 409: o servidor já tem outro offset (parte repetida ou interrompida)
+                    return data.offset;
+                } catch (erro) {
+                    if (!erro.definitivo) {
+                        // Antes de repetir, pergunta quanto da parte chegou
+                        const status = await lerJson(await fetch(inicio.url, {headers: headers})).catch(() => null);
+                        if (status && status.offset !== offset) {
+                            return status.offset;
+                        }
+                    }
+                    throw erro;
+                }
+            });
+            if (onProgress) {
+                onProgress(offset, file.size);
+            }
+        }
+
+        const fim = await comRetentativas(async () => lerJson(await fetch(inicio.url + 'finalize/', {
+            method: 'POST',
+            headers: headers,
+        })));
+        return fim.id;
+    }
+
+    // Envia as fotos escolhidas no formset e troca cada arquivo do FormData
+    // pelo id do upload (campo "<prefixo>-upload")
+    async function uploadFormsetFiles(form, formData, onStatus) {
+        const inputs = Array.from(form.querySelectorAll('input[type=file]')).filter(input => input.files.length);
+        for (let i = 0; i < inputs.length; i++) {
+            const input = inputs[i];
+            const file = input.files[0];
+            const progresso = input.parentNode.querySelector('.upload-progress');
+            const id = await upload(file, (enviado, total) => {
+                const pct = Math.floor(enviado * 100 / total);
+                if (progresso) {
+                    progresso.textContent = `Enviando: ${pct}%`;
+                }
+                if (onStatus) {
+                    onStatus(i + 1, inputs.length, pct);
+                }
+            });
+            if (progresso) {
+                progresso.textContent = 'Foto enviada';
+            }
+            formData.delete(input.name);
+            formData.set(input.name.replace(/-imagem$/, '-upload'), id);
+        }
+        return formData;
+    }
+
+    return {upload: upload, uploadFormsetFiles: uploadFormsetFiles};
+})();
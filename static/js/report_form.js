@@ -145,39 +145,7 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    // Filtrar equipamentos baseado no local selecionado
-    const localSelect = document.getElementById('id_local');
-    const equipamentoSelect = document.getElementById('id_equipamento');
-    
-    if (localSelect && equipamentoSelect) {
-        localSelect.addEventListener('change', function() {
-            const localId = this.value;
-            
-            // Limpar opções de equipamento
-            equipamentoSelect.innerHTML = '<option value="">Selecione um equipamento</option>';
-            
-            if (localId) {
-                // Buscar equipamentos do local selecionado
-                fetch(`/reports/api/equipamentos-por-local/${localId}/`)
-                    .then(response => response.json())
-                    .then(data => {
-                        if (data.success) {
-                            data.equipamentos.forEach(eq => {
-                                const option = document.createElement('option');
-                                option.value = eq.id;
-                                option.textContent = `${eq.nome} (${eq.codigo}) - ${eq.tipo}`;
-                                equipamentoSelect.appendChild(option);
-                            });
-                        } else {
-                            console.error('Erro ao carregar equipamentos:', data.error);
-                        }
-                    })
-                    .catch(error => {
-                        console.error('Erro na requisição:', error);
-                    });
-            }
-        });
-    }
+    // Os equipamentos do local escolhido são carregados pelo autocomplete.js
 });
 
 // Função para definir data/hora atual (será chamada pelo template se necessário)
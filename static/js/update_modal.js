@@ -139,14 +139,22 @@ window.initUpdateModal = function() {
                 newSaveBtn.disabled = true;
                 newSaveBtn.innerHTML = '<i class="bi bi-hourglass-split"></i> Salvando...';
                 
+                // Fotos vão antes, em partes e com retomada (chunked_upload.js);
+                // o formulário leva só os ids dos uploads
+                const enviarFotos = window.ChunkedUpload
+                    ? window.ChunkedUpload.uploadFormsetFiles(form, formData, (atual, total, pct) => {
+                        newSaveBtn.innerHTML = `<i class="bi bi-cloud-upload"></i> Enviando fotos (${atual}/${total}) ${pct}%`;
+                    })
+                    : Promise.resolve(formData);
+                
                 // Enviar requisição
-                fetch(actionUrl, {
+                enviarFotos.then(dados => fetch(actionUrl, {
                     method: 'POST',
-                    body: formData,
+                    body: dados,
                     headers: {
                         'X-Requested-With': 'XMLHttpRequest'
                     }
-                })
+                }))
                 .then(response => {
                     console.log('📥 Resposta recebida - Status:', response.status);
                     if (!response.ok) {